@@ -59,6 +59,36 @@ SECSINQUARTER = 900
 SECSINTWOHOUR = 7200
 SECSINTHREEHOUR = 10800
 DT06JAN80 = (1980, 1, 6, 0, 0, 0)  # (year, month, day, hh, mm, ss)
+GPSWEEK_GST = 1024  # GPS week at start of Galileo System Time (22/08/1999)
+
+# epochs used by the vectorised conversions, GPS time is expressed as int64 nanoseconds since the GPS epoch
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00', 'ns')
+NSECSINSEC = 1000000000
+
+# table of leap seconds: UTC date from which on the offset GPS-UTC is valid
+LEAPSECS = [('1981-07-01', 1),
+            ('1982-07-01', 2),
+            ('1983-07-01', 3),
+            ('1985-07-01', 4),
+            ('1988-01-01', 5),
+            ('1990-01-01', 6),
+            ('1991-01-01', 7),
+            ('1992-07-01', 8),
+            ('1993-07-01', 9),
+            ('1994-07-01', 10),
+            ('1996-01-01', 11),
+            ('1997-07-01', 12),
+            ('1999-01-01', 13),
+            ('2006-01-01', 14),
+            ('2009-01-01', 15),
+            ('2012-07-01', 16),
+            ('2015-07-01', 17),
+            ('2017-01-01', 18)]
+
+LEAPSECS_UTC = np.array([leap[0] for leap in LEAPSECS], dtype='datetime64[ns]')
+LEAPSECS_OFFSET = np.array([0] + [leap[1] for leap in LEAPSECS], dtype=np.int64)
+# instants of the leap seconds expressed in GPS nanoseconds
+LEAPSECS_GPSNS = (LEAPSECS_UTC - GPS_EPOCH).astype(np.int64) + LEAPSECS_OFFSET[1:] * NSECSINSEC
 
 
 def dayOfWeek(year, month, day):
@@ -154,7 +184,7 @@ def mkUTC(year, month, day, hour, min, sec):
     # print('min %s = %s' % (type(min), min))
     # print('sec %s = %s' % (type(sec), sec))
     # print('spec %s' % spec)
-    utc = time.mktime(spec) + msec - time.timezone
+    utc = time.mktime(tuple(spec)) + msec - time.timezone
     return utc
 
 
@@ -173,18 +203,18 @@ def ymdhmsFromPyUTC(pyUTC):
     return datetime.datetime.utcfromtimestamp(pyUTC)
 
 
-def wtFromUTCpy(pyUTC, leapSecs=14):
+def wtFromUTCpy(pyUTC, leapSecs=None):
     """
     convenience function:
          allows to use python UTC times and
          returns only week and tow
     """
     ymdhms = ymdhmsFromPyUTC(pyUTC)
-    wSowDSoD = apply(gpsFromUTC, ymdhms.timetuple()[:6] + (leapSecs,))
+    wSowDSoD = gpsFromUTC(*(ymdhms.timetuple()[:6] + (leapSecs,)))
     return wSowDSoD[0:2]
 
 
-def gpsFromUTC(year, month, day, hour, min, sec, leapSecs=14):
+def gpsFromUTC(year, month, day, hour, min, sec, leapSecs=None):
     """converts UTC to: gpsWeek, secsOfWeek, gpsDay, secsOfDay
 
     a good reference is:  http://www.oc.nps.navy.mil/~jclynch/timsys.html
@@ -197,11 +227,9 @@ def gpsFromUTC(year, month, day, hour, min, sec, leapSecs=14):
     The GPS week starts on Saturday midnight (Sunday morning), and runs
     for 604800 seconds.
 
-    Currently, GPS time is 14 seconds ahead of UTC (see above reference).
-    While GPS SVs transmit this difference and the date when another leap
-    second takes effect, the use of leap seconds cannot be predicted.  This
-    routine is precise until the next leap second is introduced and has to be
-    updated after that.
+    GPS time is ahead of UTC by the number of leap seconds introduced since
+    the GPS epoch. When leapSecs is not given, it is taken from the table
+    LEAPSECS which has to be updated when another leap second is announced.
 
     SOW = Seconds of Week
     SOD = Seconds of Day
@@ -223,6 +251,9 @@ def gpsFromUTC(year, month, day, hour, min, sec, leapSecs=14):
     else:
         msec = float(str(sec-int(sec))[1:])
 
+    if leapSecs is None:
+        leapSecs = int(leapSecsFromUTC(np.datetime64(datetime.datetime(year, month, day, hour, min, int(sec)))))
+
     t = time.mktime((year, month, day, hour, min, int(sec), -1, -1, 0))
     # Note: time.mktime strictly works in localtime and to yield UTC, it should be
     #       corrected with time.timezone
@@ -238,7 +269,7 @@ def gpsFromUTC(year, month, day, hour, min, sec, leapSecs=14):
     return (gpsWeek, gpsSOW, gpsDay, gpsSOD)
 
 
-def UTCFromGps(gpsWeek, SOW, leapSecs=14):
+def UTCFromGps(gpsWeek, SOW, leapSecs=None):
     """converts gps week and seconds to UTC
 
     see comments of inverse function!
@@ -246,6 +277,9 @@ def UTCFromGps(gpsWeek, SOW, leapSecs=14):
     SOW = seconds of week
     gpsWeek is the full number (not modulo 1024)
     """
+    if leapSecs is None:
+        leapSecs = int(leapSecsFromGpsns(gpsnsFromWTOW(gpsWeek, SOW)))
+
     secFract = SOW % 1
     epochTuple = DT06JAN80 + (-1, -1, 0)
     t0 = time.mktime(epochTuple) - time.timezone  # mktime is localtime, correct for UTC
@@ -268,12 +302,12 @@ def UTCFromString(year, month, day, dataString):
     return time
 
 
-def GpsSecondsFromPyUTC(pyUTC, leapSecs=14):
+def GpsSecondsFromPyUTC(pyUTC, leapSecs=None):
     """converts the python epoch to gps seconds
 
     pyEpoch = the python epoch from time.time()
     """
-    t = gpsFromUTC(*ymdhmsFromPyUTC(pyUTC))
+    t = gpsFromUTC(*(ymdhmsFromPyUTC(pyUTC).timetuple()[:6] + (leapSecs,)))
     return int(t[0] * 60 * 60 * 24 * 7 + t[1])
 
 
@@ -293,6 +327,224 @@ def UTCFromWT(weeknr, tow):
     time = datum + week + sec
     return time
 
+
+# ===== Vectorised conversions =========================================
+# GPS time is represented as int64 nanoseconds since the GPS epoch (gpsns), UTC as numpy datetime64[ns]
+
+
+def leapSecsFromUTC(utc):
+    """
+    returns the number of leap seconds (GPS-UTC) valid at the UTC times
+
+    :param utc: UTC times
+    :type utc: array_like of datetime64
+    :returns: leap seconds
+    :rtype: ndarray of int64
+    """
+    utc = np.asarray(utc, dtype='datetime64[ns]')
+    return LEAPSECS_OFFSET[np.searchsorted(LEAPSECS_UTC, utc, side='right')]
+
+
+def leapSecsFromGpsns(gpsns):
+    """
+    returns the number of leap seconds (GPS-UTC) valid at the GPS times
+
+    :param gpsns: GPS time in nanoseconds since GPS epoch
+    :type gpsns: array_like of int64
+    :returns: leap seconds
+    :rtype: ndarray of int64
+    """
+    gpsns = np.asarray(gpsns, dtype=np.int64)
+    return LEAPSECS_OFFSET[np.searchsorted(LEAPSECS_GPSNS, gpsns, side='right')]
+
+
+def gpsnsFromUTC(utc):
+    """
+    converts UTC times to GPS nanoseconds since the GPS epoch
+
+    :param utc: UTC times
+    :type utc: array_like of datetime64 (or datetime / ISO strings)
+    :returns: GPS time in nanoseconds
+    :rtype: ndarray of int64
+    """
+    utc = np.asarray(utc, dtype='datetime64[ns]')
+    return (utc - GPS_EPOCH).astype(np.int64) + leapSecsFromUTC(utc) * NSECSINSEC
+
+
+def UTCFromGpsns(gpsns):
+    """
+    converts GPS nanoseconds since the GPS epoch to UTC times
+
+    :param gpsns: GPS time in nanoseconds
+    :type gpsns: array_like of int64
+    :returns: UTC times
+    :rtype: ndarray of datetime64[ns]
+    """
+    gpsns = np.asarray(gpsns, dtype=np.int64)
+    return GPS_EPOCH + (gpsns - leapSecsFromGpsns(gpsns) * NSECSINSEC).astype('timedelta64[ns]')
+
+
+def wtowFromGpsns(gpsns):
+    """
+    converts GPS nanoseconds to GPS week and time of week
+
+    :param gpsns: GPS time in nanoseconds
+    :type gpsns: array_like of int64
+    :returns: GPS week and TOW in seconds
+    :rtype: tuple of ndarray (int64, float64)
+    """
+    week, towns = np.divmod(np.asarray(gpsns, dtype=np.int64), SECSINWEEK * NSECSINSEC)
+    return week, towns / NSECSINSEC
+
+
+def gpsnsFromWTOW(week, tow):
+    """
+    converts GPS week and time of week to GPS nanoseconds
+
+    :param week: GPS week (full number, not modulo 1024)
+    :type week: array_like of int
+    :param tow: time of week in seconds
+    :type tow: array_like of float
+    :returns: GPS time in nanoseconds
+    :rtype: ndarray of int64
+    """
+    week = np.asarray(week, dtype=np.int64)
+    towns = np.round(np.asarray(tow, dtype=np.float64) * NSECSINSEC).astype(np.int64)
+    return week * SECSINWEEK * NSECSINSEC + towns
+
+
+def gstFromGpsns(gpsns):
+    """
+    converts GPS nanoseconds to Galileo System Time week and time of week
+
+    GST is aligned with GPS time, its week 0 starts at GPS week 1024
+
+    :param gpsns: GPS time in nanoseconds
+    :type gpsns: array_like of int64
+    :returns: GST week and TOW in seconds
+    :rtype: tuple of ndarray (int64, float64)
+    """
+    week, tow = wtowFromGpsns(gpsns)
+    return week - GPSWEEK_GST, tow
+
+
+def gpsnsFromGST(week, tow):
+    """
+    converts Galileo System Time week and time of week to GPS nanoseconds
+
+    :param week: GST week
+    :type week: array_like of int
+    :param tow: time of week in seconds
+    :type tow: array_like of float
+    :returns: GPS time in nanoseconds
+    :rtype: ndarray of int64
+    """
+    return gpsnsFromWTOW(np.asarray(week, dtype=np.int64) + GPSWEEK_GST, tow)
+
+
+def wtowFromUTC(utc):
+    """
+    converts UTC times to GPS week and time of week
+
+    :param utc: UTC times
+    :type utc: array_like of datetime64
+    :returns: GPS week and TOW in seconds
+    :rtype: tuple of ndarray (int64, float64)
+    """
+    return wtowFromGpsns(gpsnsFromUTC(utc))
+
+
+def UTCFromWTOW(week, tow):
+    """
+    converts GPS week and time of week to UTC times
+
+    :param week: GPS week
+    :type week: array_like of int
+    :param tow: time of week in seconds
+    :type tow: array_like of float
+    :returns: UTC times
+    :rtype: ndarray of datetime64[ns]
+    """
+    return UTCFromGpsns(gpsnsFromWTOW(week, tow))
+
+
+def ydoyFromUTC(utc):
+    """
+    converts UTC times to year, day of year and seconds of day
+
+    :param utc: UTC times
+    :type utc: array_like of datetime64
+    :returns: year, day of year (starting at 1) and seconds of day
+    :rtype: tuple of ndarray (int64, int64, float64)
+    """
+    utc = np.asarray(utc, dtype='datetime64[ns]')
+    utc_year = utc.astype('datetime64[Y]')
+    utc_day = utc.astype('datetime64[D]')
+
+    year = utc_year.astype(np.int64) + 1970
+    doy = (utc_day - utc_year).astype(np.int64) + 1
+    sod = (utc - utc_day).astype(np.int64) / NSECSINSEC
+
+    return year, doy, sod
+
+
+def UTCFromYDoy(year, doy, sod=0):
+    """
+    converts year, day of year and seconds of day to UTC times
+
+    :param year: the year
+    :type year: array_like of int
+    :param doy: day of year (starting at 1)
+    :type doy: array_like of int
+    :param sod: seconds of day
+    :type sod: array_like of float
+    :returns: UTC times
+    :rtype: ndarray of datetime64[ns]
+    """
+    utc_year = (np.asarray(year, dtype=np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[ns]')
+    utc_day = (np.asarray(doy, dtype=np.int64) - 1).astype('timedelta64[D]')
+    utc_sec = np.round(np.asarray(sod, dtype=np.float64) * NSECSINSEC).astype('timedelta64[ns]')
+
+    return utc_year + utc_day + utc_sec
+
+
+def epochFromUTC(utc, utc_start, interval):
+    """
+    converts UTC times to epoch indices counted at the observation interval from utc_start
+
+    :param utc: UTC times
+    :type utc: array_like of datetime64
+    :param utc_start: UTC time of epoch 0
+    :type utc_start: datetime / datetime64
+    :param interval: observation interval in seconds
+    :type interval: float
+    :returns: epoch indices
+    :rtype: ndarray of int32
+    """
+    interval_ns = int(round(interval * NSECSINSEC))
+    dt_ns = (np.asarray(utc, dtype='datetime64[ns]') - np.datetime64(utc_start, 'ns')).astype(np.int64)
+
+    return ((dt_ns + interval_ns // 2) // interval_ns).astype(np.int32)
+
+
+def UTCFromEpoch(epoch, utc_start, interval):
+    """
+    converts epoch indices counted at the observation interval from utc_start to UTC times
+
+    :param epoch: epoch indices
+    :type epoch: array_like of int
+    :param utc_start: UTC time of epoch 0
+    :type utc_start: datetime / datetime64
+    :param interval: observation interval in seconds
+    :type interval: float
+    :returns: UTC times
+    :rtype: ndarray of datetime64[ns]
+    """
+    interval_ns = int(round(interval * NSECSINSEC))
+
+    return np.datetime64(utc_start, 'ns') + (np.asarray(epoch, dtype=np.int64) * interval_ns).astype('timedelta64[ns]')
+
+
 # def PyUTCFromGpsSeconds(gpsseconds):
 #     """converts gps seconds to the
 #     python epoch. That is, the time
@@ -317,7 +569,7 @@ def testTimeStuff():
     (w, sow, d, sod) = gpsFromUTC(1999, 8, 21, 23, 59, 47)
     print("**** week: %s, sow: %s, day: %s, sod: %s" % (w, sow, d, sod))
     print("     and hopefully back:")
-    print("**** %s, %s, %s, %s, %s, %s\n" % UTCFromGps(w, sow, leapSecs=14))
+    print("**** %s, %s, %s, %s, %s, %s\n" % UTCFromGps(w, sow))
 
     print("Today is GPS week 1186, day 3, seems to run ok (2002, 10, 2, 12, 6, 13.56)")
     (w, sow, d, sod) = gpsFromUTC(2002, 10, 2, 12, 6, 13.56)
@@ -347,7 +599,7 @@ def testPyUtilties():
     ymdhms = (2002, 10, 12, 8, 34, 12.3)
     print("testing for: ", ymdhms)
 
-    pyUtc = apply(mkUTC, ymdhms)
+    pyUtc = mkUTC(*ymdhms)
     back = ymdhmsFromPyUTC(pyUtc)
     print("yields     : ", back)
 # *********************** !!!!!!!!
@@ -0,0 +1,94 @@
+import sys
+import os
+import logging
+from termcolor import colored
+import json
+import pathlib
+import numpy as np
+
+__author__ = 'amuls'
+
+# a column store is a directory containing a raw binary file per column and the file schema.json describing the columns
+SCHEMA = 'schema.json'
+
+
+def colstore_create(store_dir: str, dColumns: dict, logger: logging.Logger = None) -> dict:
+    """
+    colstore_create creates the directory for the column store, dColumns gives the numpy dtype per column
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    pathlib.Path(store_dir).mkdir(parents=True, exist_ok=True)
+
+    dStore = {}
+    dStore['dir'] = store_dir
+    dStore['columns'] = {column: np.dtype(dtype).str for column, dtype in dColumns.items()}
+    dStore['rows'] = 0
+    dStore['files'] = {column: open(os.path.join(store_dir, '{col:s}.bin'.format(col=column)), 'wb') for column in dColumns}
+
+    if logger is not None:
+        logger.debug('{func:s}: created column store {store:s} with columns {cols:s}'.format(store=colored(store_dir, 'green'),
+                                                                                             cols=', '.join(dColumns),
+                                                                                             func=cFuncName))
+
+    return dStore
+
+
+def colstore_append(dStore: dict, dChunk: dict) -> int:
+    """
+    colstore_append appends a chunk of rows (dict of column lists or arrays of equal length) to the column store
+    """
+    nr_rows = None
+    for column, dtype in dStore['columns'].items():
+        values = np.asarray(dChunk[column], dtype=dtype)
+        if nr_rows is None:
+            nr_rows = values.shape[0]
+        values.tofile(dStore['files'][column])
+
+    dStore['rows'] += nr_rows if nr_rows is not None else 0
+
+    return dStore['rows']
+
+
+def colstore_close(dStore: dict, dMeta: dict = None) -> str:
+    """
+    colstore_close closes the column files and writes the schema of the column store
+    """
+    for fout in dStore['files'].values():
+        fout.close()
+
+    dSchema = {}
+    dSchema['rows'] = dStore['rows']
+    dSchema['columns'] = dStore['columns']
+    dSchema['meta'] = dMeta if dMeta is not None else {}
+
+    schemaf = os.path.join(dStore['dir'], SCHEMA)
+    with open(schemaf, 'w') as fout:
+        json.dump(dSchema, fout, indent=4)
+
+    return schemaf
+
+
+def colstore_schema(store_dir: str) -> dict:
+    """
+    colstore_schema returns the schema of the column store
+    """
+    with open(os.path.join(store_dir, SCHEMA), 'r') as fin:
+        return json.load(fin)
+
+
+def colstore_read(store_dir: str, columns: list = None) -> dict:
+    """
+    colstore_read returns the (selected) columns of the column store as read-only memory maps
+    """
+    dSchema = colstore_schema(store_dir=store_dir)
+
+    dColumns = {}
+    for column in (columns if columns is not None else dSchema['columns'].keys()):
+        colf = os.path.join(store_dir, '{col:s}.bin'.format(col=column))
+        if dSchema['rows'] == 0:
+            dColumns[column] = np.empty(0, dtype=dSchema['columns'][column])
+        else:
+            dColumns[column] = np.memmap(colf, dtype=dSchema['columns'][column], mode='r', shape=(dSchema['rows'],))
+
+    return dColumns
@@ -7,7 +7,6 @@ import inspect
 import tempfile
 from typing import Tuple
 from termcolor import colored
-import json
 
 from ampyutils import amutils
 
@@ -94,6 +93,9 @@ def logDataframeInfo(df: pd.DataFrame, dfName: str, callerName: str, logger: log
     """
     lofDataframeInfo logs the info of a dataframe from log level DEBUG
     """
+    if not amutils.log_enabled(logger=logger, level=logging.DEBUG):
+        return
+
     buf = io.StringIO()
     df.info(buf=buf)
     logger.debug('{func:s}: {name:s} info = {info!s}'.format(func=callerName, name=dfName, info=buf.getvalue()))
@@ -127,7 +129,7 @@ def get_title_info(logger: logging.Logger) -> Tuple[str, str]:
     dInfo = dRTK['INFO']
 
     # print('Info = {!s}'.format(dInfo))
-    logger.info('{func:s}: dInfo =\n{json!s}'.format(func=cFuncName, json=json.dumps(dInfo, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='dInfo =', dInfo=dInfo, logger=logger)
 
     marker = dInfo['rx']['marker']
     gnss = dInfo['rx']['gnss']
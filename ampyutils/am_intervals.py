@@ -0,0 +1,198 @@
+from datetime import datetime
+from typing import Tuple
+import numpy as np
+
+__author__ = 'amuls'
+
+# a set of intervals is the tuple (keys, starts, ends) of int64 arrays: the intervals [start, end) in integer seconds (since the
+# Unix epoch) of the key (eg the index of a PRN in a list of PRNs). A normalised set is sorted by key and start and its intervals
+# of a key neither overlap nor touch. The operations work on all keys at once by shifting the times of each key to its own span
+
+
+def iv_seconds(dts) -> np.ndarray:
+    """
+    iv_seconds converts datetimes (datetime, numpy datetime64 array or pandas series) to integer seconds, truncating fractions
+    """
+    if isinstance(dts, datetime):
+        return np.datetime64(dts, 's').astype(np.int64)
+
+    return np.asarray(dts, dtype='datetime64[ns]').astype('datetime64[s]').astype(np.int64)
+
+
+def iv_datetimes(secs: np.ndarray) -> np.ndarray:
+    """
+    iv_datetimes converts integer seconds to numpy datetime64
+    """
+    return np.asarray(secs, dtype=np.int64).astype('datetime64[s]')
+
+
+def iv_empty() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_empty returns the empty set of intervals
+    """
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+
+def iv_span(*ivs) -> Tuple[int, int]:
+    """
+    iv_span returns the first time and the span (in seconds) covering all intervals of the sets ivs, so that the times of key k
+    are shifted to k * span + (time - first)
+    """
+    starts = [iv[1] for iv in ivs if iv[1].size > 0]
+    if len(starts) == 0:
+        return 0, 1
+    t_first = min(int(s.min()) for s in starts)
+    t_last = max(int(iv[2].max()) for iv in ivs if iv[2].size > 0)
+
+    return t_first, t_last - t_first + 1
+
+
+def iv_normalise(keys: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_normalise sorts the intervals and merges per key the intervals that overlap or touch (the union of the intervals of each
+    key). Empty intervals are dropped
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    not_empty = ends > starts
+    keys, starts, ends = keys[not_empty], starts[not_empty], ends[not_empty]
+    if keys.size == 0:
+        return iv_empty()
+
+    order = np.lexsort((starts, keys))
+    keys, starts, ends = keys[order], starts[order], ends[order]
+
+    # an interval starts a merged interval when it starts after all preceding intervals of its key have ended
+    t_first, span = iv_span((keys, starts, ends))
+    end_max = np.maximum.accumulate(keys * span + (ends - t_first))
+    is_new = np.ones(keys.size, dtype=bool)
+    is_new[1:] = keys[1:] * span + (starts[1:] - t_first) > end_max[:-1]
+
+    idx_first = np.flatnonzero(is_new)
+    idx_last = np.r_[idx_first[1:] - 1, keys.size - 1]
+
+    return keys[idx_first], starts[idx_first], end_max[idx_last] - keys[idx_first] * span + t_first
+
+
+def iv_sweep(iv_a: tuple, iv_b: tuple, op) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_sweep combines the normalised sets iv_a and iv_b per key into the normalised set covering the times at which op(in_a, in_b)
+    holds, in_a / in_b being the boolean arrays telling whether a time is covered by iv_a / iv_b. op(False, False) must be False
+    """
+    t_first, span = iv_span(iv_a, iv_b)
+
+    # the boundaries of both sets shifted per key, with their change of coverage
+    times = np.concatenate([iv[0] * span + (iv[i] - t_first) for iv in (iv_a, iv_b) for i in (1, 2)])
+    delta_a = np.concatenate([np.ones(iv_a[0].size, dtype=np.int8), -np.ones(iv_a[0].size, dtype=np.int8), np.zeros(2 * iv_b[0].size, dtype=np.int8)])
+    delta_b = np.concatenate([np.zeros(2 * iv_a[0].size, dtype=np.int8), np.ones(iv_b[0].size, dtype=np.int8), -np.ones(iv_b[0].size, dtype=np.int8)])
+    if times.size == 0:
+        return iv_empty()
+
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    in_a = np.cumsum(delta_a[order]) > 0
+    in_b = np.cumsum(delta_b[order]) > 0
+
+    # the coverage after the last boundary at a time holds up to the next boundary
+    idx_last = np.r_[np.flatnonzero(times[1:] != times[:-1]), times.size - 1]
+    holds = op(in_a[idx_last], in_b[idx_last])[:-1]
+    seg_starts = times[idx_last[:-1]][holds]
+    seg_ends = times[idx_last[1:]][holds]
+
+    keys = seg_starts // span
+    return iv_normalise(keys=keys, starts=seg_starts - keys * span + t_first, ends=seg_ends - keys * span + t_first)
+
+
+def iv_union(iv_a: tuple, iv_b: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_union returns per key the union of the sets of intervals iv_a and iv_b
+    """
+    return iv_normalise(keys=np.concatenate([iv_a[0], iv_b[0]]),
+                        starts=np.concatenate([iv_a[1], iv_b[1]]),
+                        ends=np.concatenate([iv_a[2], iv_b[2]]))
+
+
+def iv_intersection(iv_a: tuple, iv_b: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_intersection returns per key the times covered by both the normalised sets iv_a and iv_b
+    """
+    return iv_sweep(iv_a=iv_a, iv_b=iv_b, op=np.logical_and)
+
+
+def iv_difference(iv_a: tuple, iv_b: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_difference returns per key the times covered by the normalised set iv_a and not by iv_b
+    """
+    return iv_sweep(iv_a=iv_a, iv_b=iv_b, op=lambda in_a, in_b: in_a & ~in_b)
+
+
+def iv_clip(iv: tuple, start: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_clip limits the intervals of all keys to the window [start, end)
+    """
+    starts = np.maximum(iv[1], start)
+    ends = np.minimum(iv[2], end)
+    within = ends > starts
+
+    return iv[0][within], starts[within], ends[within]
+
+
+def iv_epochs(keys: np.ndarray, secs: np.ndarray, interval: int, arc: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    iv_epochs creates the normalised set of arcs covered by the observation epochs secs of the keys, each epoch covering interval
+    seconds. Without arc, an arc ends at a gap between successive epochs of a key. When arc flags the epochs starting an arc,
+    the epochs may be a selection of the observations containing at least the first and last epoch of each arc
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    secs = np.asarray(secs, dtype=np.int64)
+    if arc is None:
+        return iv_normalise(keys=keys, starts=secs, ends=secs + interval)
+
+    order = np.lexsort((secs, keys))
+    keys, secs, arc = keys[order], secs[order], np.asarray(arc, dtype=bool)[order]
+    if keys.size == 0:
+        return iv_empty()
+
+    is_new = arc.copy()
+    is_new[0] = True
+    is_new[1:] |= keys[1:] != keys[:-1]
+    idx_first = np.flatnonzero(is_new)
+    idx_last = np.r_[idx_first[1:] - 1, keys.size - 1]
+
+    return iv_normalise(keys=keys[idx_first], starts=secs[idx_first], ends=secs[idx_last] + interval)
+
+
+def iv_locate(iv: tuple, keys: np.ndarray, secs: np.ndarray) -> np.ndarray:
+    """
+    iv_locate returns for the times secs of the keys the index of the interval of the normalised set iv containing it, its end
+    included (-1 when no interval contains the time)
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    secs = np.asarray(secs, dtype=np.int64)
+    if iv[0].size == 0 or keys.size == 0:
+        return np.full(keys.size, -1, dtype=np.int64)
+
+    t_first = min(int(iv[1].min()), int(secs.min()))
+    span = max(int(iv[2].max()), int(secs.max())) - t_first + 1
+
+    idx = np.searchsorted(iv[0] * span + (iv[1] - t_first), keys * span + (secs - t_first), side='right') - 1
+    idx_iv = np.maximum(idx, 0)
+    within = (idx >= 0) & (iv[0][idx_iv] == keys) & (secs <= iv[2][idx_iv])
+
+    return np.where(within, idx, -1)
+
+
+def iv_duration(iv: tuple, nr_keys: int) -> np.ndarray:
+    """
+    iv_duration returns per key the total duration (in seconds) of its intervals
+    """
+    return np.bincount(iv[0], weights=iv[2] - iv[1], minlength=nr_keys).astype(np.int64)
+
+
+def iv_count(iv: tuple, nr_keys: int) -> np.ndarray:
+    """
+    iv_count returns per key the number of its intervals
+    """
+    return np.bincount(iv[0], minlength=nr_keys)
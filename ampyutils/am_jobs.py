@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import socket
+import tempfile
+from typing import Tuple
+
+__author__ = 'amuls'
+
+# UNIX socket on which the analysis server accepts jobs
+JOB_SOCKET = os.path.join(tempfile.gettempdir(), 'rnx3proc-{uid:d}.sock'.format(uid=os.getuid()))
+JOB_BUFSIZE = 64 * 1024  # size of the buffer receiving a job description
+JOB_FDS = 3  # the standard input, output and error of the caller are passed with the job
+JOB_LOST = 99  # exit code (amc.E_FAILURE) when a job ended without reporting its exit code
+
+# this module only uses the standard library so that forwarding a job does not pay the startup of the analysis modules
+
+
+def job_connect(address: str = JOB_SOCKET) -> socket.socket:
+    """
+    job_connect connects to the analysis server listening on address, raises OSError when no server is listening
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+
+    return sock
+
+
+def job_send(sock: socket.socket, script: str, argv: list) -> int:
+    """
+    job_send forwards the run of script with arguments argv to the analysis server connected by sock. The job writes to the
+    standard output / error of the caller and runs in its working directory and environment. Returns the exit code of the job,
+    JOB_LOST when the connection to the server is lost before the job reported its exit code
+    """
+    dJob = {}
+    dJob['script'] = script
+    dJob['argv'] = argv
+    dJob['cwd'] = os.getcwd()
+    dJob['env'] = dict(os.environ)
+
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(sock, [(json.dumps(dJob) + '\n').encode()], [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()])
+
+        # the server replies with the exit code once the job has finished
+        with sock.makefile('r') as fsock:
+            reply = fsock.readline()
+    except OSError as e:
+        sys.stderr.write('{script:s}: connection to the analysis server lost ({err!s})\n'.format(script=script, err=e))
+        return JOB_LOST
+
+    return int(reply) if reply.strip() else JOB_LOST
+
+
+def job_receive(conn: socket.socket) -> Tuple[dict, list]:
+    """
+    job_receive reads a job description and the file descriptors of the caller from the connection conn
+    """
+    msg, lst_fds, _, _ = socket.recv_fds(conn, JOB_BUFSIZE, JOB_FDS)
+    while not msg.endswith(b'\n'):
+        block = conn.recv(JOB_BUFSIZE)
+        if not block:
+            break
+        msg += block
+
+    return json.loads(msg), lst_fds
+
+
+def job_reply(conn: socket.socket, exit_code: int):
+    """
+    job_reply reports the exit code of the job to the caller
+    """
+    conn.sendall('{code:d}\n'.format(code=exit_code).encode())
@@ -0,0 +1,191 @@
+import sys
+import os
+import logging
+from termcolor import colored
+import time
+import resource
+import functools
+import threading
+import atexit
+import json
+import tempfile
+from datetime import datetime
+from shutil import copyfile
+from contextlib import contextmanager
+from typing import Callable
+from tabulate import tabulate
+
+__author__ = 'amuls'
+
+# global used variables for the profiling of the stages of a run
+dProfile = {}  # contains the name of the script, the metrics file and the logger used
+lst_metrics = []  # contains the metrics per executed stage
+profile_lock = threading.Lock()
+
+
+def rss_peak_MB() -> float:
+    """
+    rss_peak_MB returns the peak resident set size of this process and its finished children in MB
+    """
+    rss_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    # ru_maxrss is expressed in kB on Linux and in bytes on macOS
+    if sys.platform == 'darwin':
+        return max(rss_self, rss_children) / (1024 * 1024)
+    return max(rss_self, rss_children) / 1024
+
+
+def profile_init(baseName: str, logger: logging.Logger = None) -> str:
+    """
+    profile_init starts the profiling of a run: creates the temporary metrics file and registers the summary at exit
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dProfile['script'] = os.path.splitext(baseName)[0]
+    # create the metrics file which gets a JSON line per executed stage
+    fd, dProfile['metricsf'] = tempfile.mkstemp(suffix='.metrics')
+    os.close(fd)
+    dProfile['logger'] = logger
+    dProfile['start'] = datetime.now()
+
+    atexit.register(profile_summary)
+
+    if logger is not None:
+        logger.info('{func:s}: stage metrics are written to {metrf:s}'.format(metrf=colored(dProfile['metricsf'], 'blue'), func=cFuncName))
+
+    return dProfile['metricsf']
+
+
+def profile_record(dStage: dict):
+    """
+    profile_record keeps the metrics of a stage and writes them to the metrics file
+    """
+    with profile_lock:
+        lst_metrics.append(dStage)
+
+        if 'metricsf' in dProfile:
+            with open(dProfile['metricsf'], 'a') as fout:
+                fout.write(json.dumps(dStage, default=str) + '\n')
+
+
+@contextmanager
+def profile_stage(stage: str, rows: int = None):
+    """
+    profile_stage measures wall time, CPU time, peak RSS and rows processed of the enclosed block.
+    The yielded dict can be used to set the number of rows processed.
+    """
+    dStage = {}
+    dStage['script'] = dProfile.get('script', '')
+    dStage['stage'] = stage
+    dStage['start'] = datetime.now().isoformat(timespec='seconds')
+    dStage['rows'] = rows
+
+    rss_start = rss_peak_MB()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    try:
+        yield dStage
+    finally:
+        dStage['wall'] = time.perf_counter() - wall_start
+        dStage['cpu'] = time.process_time() - cpu_start
+        dStage['rss_peak_MB'] = rss_peak_MB()
+        dStage['rss_delta_MB'] = dStage['rss_peak_MB'] - rss_start
+
+        profile_record(dStage=dStage)
+
+
+def profile_func(stage: str = None,
+                 rows: Callable = None,
+                 rows_arg: str = None) -> Callable:
+    """
+    profile_func decorates a function so that each call is measured as a stage.
+    The rows processed are determined by rows (applied on the returned value) or as the length of the keyword argument rows_arg.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_stage(stage=stage if stage is not None else func.__name__) as dStage:
+                if rows_arg is not None and kwargs.get(rows_arg) is not None:
+                    dStage['rows'] = len(kwargs[rows_arg])
+
+                ret_value = func(*args, **kwargs)
+
+                if rows is not None:
+                    try:
+                        dStage['rows'] = rows(ret_value)
+                    except (TypeError, AttributeError, IndexError):
+                        pass
+
+            return ret_value
+        return wrapper
+    return decorator
+
+
+def profile_table() -> str:
+    """
+    profile_table summarises the recorded metrics per stage into a table
+    """
+    dSummary = {}
+    with profile_lock:
+        for dStage in lst_metrics:
+            dSum = dSummary.setdefault(dStage['stage'], {'calls': 0, 'wall': 0., 'wall_max': 0., 'cpu': 0., 'rows': 0, 'rss_peak_MB': 0.})
+            dSum['calls'] += 1
+            dSum['wall'] += dStage['wall']
+            dSum['wall_max'] = max(dSum['wall_max'], dStage['wall'])
+            dSum['cpu'] += dStage['cpu']
+            dSum['rows'] += dStage['rows'] if dStage['rows'] is not None else 0
+            dSum['rss_peak_MB'] = max(dSum['rss_peak_MB'], dStage['rss_peak_MB'])
+
+    # slowest stages first
+    lst_rows = []
+    for stage, dSum in sorted(dSummary.items(), key=lambda item: item[1]['wall'], reverse=True):
+        lst_rows.append([stage, dSum['calls'], dSum['wall'], dSum['wall_max'], dSum['cpu'], dSum['rows'],
+                         dSum['rows'] / dSum['wall'] if dSum['rows'] > 0 and dSum['wall'] > 0 else None,
+                         dSum['rss_peak_MB']])
+
+    return tabulate(lst_rows,
+                    headers=['stage', 'calls', 'wall [s]', 'max wall [s]', 'cpu [s]', 'rows', 'rows/s', 'peak RSS [MB]'],
+                    floatfmt='.3f')
+
+
+def profile_summary():
+    """
+    profile_summary reports the metrics per stage at the end of the run
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    if len(lst_metrics) == 0:
+        return
+
+    summary = '{func:s}: stage metrics for {script:s} (run time {run:.1f} s)\n{table:s}'.format(script=dProfile.get('script', ''),
+                                                                                                run=(datetime.now() - dProfile['start']).total_seconds() if 'start' in dProfile else 0,
+                                                                                                table=profile_table(),
+                                                                                                func=cFuncName)
+
+    if dProfile.get('logger') is not None:
+        dProfile['logger'].info(summary)
+    else:
+        sys.stderr.write(summary + '\n')
+
+    # summary is only given once
+    with profile_lock:
+        lst_metrics.clear()
+
+
+def profile_save(dir: str) -> str:
+    """
+    profile_save reports the metrics per stage and moves the metrics file to the directory dir
+    """
+    if 'metricsf' not in dProfile:
+        return None
+
+    profile_summary()
+
+    metricsf = os.path.join(dir, '{scrname:s}.metrics'.format(scrname=dProfile['script']))
+    copyfile(dProfile['metricsf'], metricsf)
+    os.remove(dProfile['metricsf'])
+    dProfile.pop('metricsf')
+
+    return metricsf
@@ -5,8 +5,6 @@ import os
 import stat
 from termcolor import colored
 import webcolors
-import gzip
-import shutil
 import logging
 from pandas import DataFrame
 import subprocess
@@ -14,15 +12,22 @@ from datetime import datetime, date
 from typing import Tuple
 import matplotlib._color_data as mcd
 import enum
+import functools
+import json
 import numpy as np
 import pandas as pd
 from tabulate import tabulate
 
 from GNSS import gpstime
 from ampyutils import am_config as amc
+from ampyutils import am_profile
+from ampyutils import compress_utils
 
 __author__ = 'amuls'
 
+# throttling of repetitive (per PRN) dataframe dumps: first max_dumps dumps per key are logged, afterwards one out of sample
+dLogThrottle = {'max_dumps': 3, 'sample': 25, 'count': {}}
+
 
 # Enum for size units
 class SIZE_UNIT(enum.Enum):
@@ -183,13 +188,53 @@ def pprint_df(dframe: pd.DataFrame, tablefmt: str = 'simple'):
     print(tabulate(dframe, headers='keys', tablefmt=tablefmt, showindex=False))
 
 
+def log_enabled(logger: logging.Logger, level: int = logging.INFO) -> bool:
+    """
+    log_enabled checks whether a message at level would be emitted by at least one handler of the logger
+    """
+    if logger is None or not logger.isEnabledFor(level):
+        return False
+
+    # the logger level is set to DEBUG, the handlers decide what is written
+    cur_logger = logger
+    has_handlers = False
+    while cur_logger is not None:
+        for handler in cur_logger.handlers:
+            has_handlers = True
+            if level >= handler.level:
+                return True
+        if not cur_logger.propagate:
+            break
+        cur_logger = cur_logger.parent
+
+    # without handlers the last resort handler is used by the logging module
+    if not has_handlers and logging.lastResort is not None:
+        return level >= logging.lastResort.level
+
+    return False
+
+
+def log_throttle(key: str) -> bool:
+    """
+    log_throttle returns whether the dump identified by key is to be logged according to the settings in dLogThrottle
+    """
+    count = dLogThrottle['count'][key] = dLogThrottle['count'].get(key, 0) + 1
+
+    if count <= dLogThrottle['max_dumps']:
+        return True
+
+    return dLogThrottle['sample'] > 0 and (count - dLogThrottle['max_dumps']) % dLogThrottle['sample'] == 0
+
+
 def logHeadTailDataFrame(callerName: str,
                          df: DataFrame,
                          dfName: str = 'DataFrame',
                          logger: logging.Logger = None,
                          head: int = 10,
                          tail: int = 10,
-                         index: bool = True):
+                         index: bool = True,
+                         level: int = logging.INFO,
+                         throttle: bool = False):
     """
     logHeadTailDataFrame logs the head first/tail last rows of the dataframe df
 
@@ -203,16 +248,39 @@ def logHeadTailDataFrame(callerName: str,
     :type tail: int
     :param index: display th eindex of the dataframe or not
     :type: bool
+    :param level: log level used (def ``logging.INFO``)
+    :type level: int
+    :param throttle: limit the number of dumps for repetitive calls (per PRN)
+    :type throttle: bool
     """
     # cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
+    # only format the dataframe when it will be written by one of the handlers
+    if not log_enabled(logger=logger, level=level):
+        return
+
+    if throttle and not log_throttle(key='{func:s}-{dfname:s}'.format(func=callerName, dfname=dfName)):
+        return
+
     if df.shape[0] <= (head + tail):
-        if logger is not None:
-            logger.info('{func:s}: dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.to_string(index=index)))
+        logger.log(level, '{func:s}: dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.to_string(index=index)))
     else:
-        if logger is not None:
-            logger.info('{func:s}: head of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.head(n=head).to_string(index=index)))
-            logger.info('{func:s}: tail of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.tail(n=tail).to_string(index=index)))
+        logger.log(level, '{func:s}: head of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.head(n=head).to_string(index=index)))
+        logger.log(level, '{func:s}: tail of dataframe {dfname:s} (#{shape:d})\n{df:s}'.format(func=callerName, dfname=colored(dfName, 'green'), shape=df.shape[0], df=df.tail(n=tail).to_string(index=index)))
+
+
+def logJSON(callerName: str,
+            title: str,
+            dInfo: dict,
+            logger: logging.Logger = None,
+            level: int = logging.INFO):
+    """
+    logJSON logs the dictionary dInfo in JSON format, the formatting is only done when the message will be written
+    """
+    if not log_enabled(logger=logger, level=level):
+        return
+
+    logger.log(level, '{func:s}: {title:s}\n{json!s}'.format(func=callerName, title=title, json=json.dumps(dInfo, sort_keys=False, indent=4, default=json_convertor)))
 
 
 def get_spaced_colors(n):
@@ -313,7 +381,7 @@ def line_num_for_phrase_in_file(phrase='the dog barked', filename='file.txt'):
     :returns: linenumber of searched text, if not founf returns -1
     :rtype: int
     """
-    with open(filename, 'r') as f:
+    with compress_utils.open_compressed(filename) as f:
         for (i, line) in enumerate(f):
             if phrase in line:
                 return i
@@ -322,15 +390,18 @@ def line_num_for_phrase_in_file(phrase='the dog barked', filename='file.txt'):
 
 def hms2sec(x):
     """
-    hms2sec converts a string in HH:MM:SS.SS into a float value
+    hms2sec converts a string in HH:MM:SS.SS into a float value, arrays / series of strings are converted at once
 
     :param x: time expressed as HH:MM:SS.SS
-    :type x: string
+    :type x: string or array_like of strings
     :returns: number of seconds
-    :rtype: float
+    :rtype: float or ndarray of float
     """
-    times = x.split(':')
-    return (60 * float(times[0]) + float(times[1])) * 60 + float(times[2])
+    if isinstance(x, str):
+        times = x.split(':')
+        return (60 * float(times[0]) + float(times[1])) * 60 + float(times[2])
+
+    return pd.to_timedelta(pd.Series(np.asarray(x, dtype=str))).to_numpy().astype(np.int64) / gpstime.NSECSINSEC
 
 
 def tow2sod(x):
@@ -338,11 +409,14 @@ def tow2sod(x):
     tow2sec converts a string in TOW into a float value
 
     :param x: time expressed as TOW
-    :type x: string
+    :type x: float or array_like of float
     :returns: number of seconds
-    :rtype: float
+    :rtype: float or ndarray of float
     """
-    return(x % gpstime.SECSINDAY)
+    if np.isscalar(x):
+        return(x % gpstime.SECSINDAY)
+
+    return np.mod(np.asarray(x, dtype=np.float64), gpstime.SECSINDAY)
 
 
 def yeardoy2ymd(year: int, doy: int) -> datetime.date:
@@ -374,10 +448,9 @@ def count_lines(filename):
 
 def decompress(fileCompName: str, fileName: str):
     """
-    decompresses fileCompName
+    decompresses fileCompName (compression detected by its magic bytes)
     """
-    with open(fileName, 'wb') as f_out, gzip.open(fileCompName, 'rb') as f_in:
-        shutil.copyfileobj(f_in, f_out)
+    compress_utils.decompress_file(cmpf=fileCompName, fname=fileName)
 
 
 def make_rgb_transparent(rgb, bg_rgb, alpha):
@@ -401,7 +474,8 @@ def run_subprocess(sub_proc: list, logger: logging.Logger = None) -> int:
     try:
         if logger is not None:
             logger.info('{func:s}: running\n{proc:s}'.format(proc=colored(' '.join(strargs), 'blue'), func=cFuncName))
-        subprocess.check_output(strargs, stderr=subprocess.DEVNULL)
+        with am_profile.profile_stage(stage='run_subprocess: {prog:s}'.format(prog=os.path.basename(strargs[0]))):
+            subprocess.check_output(strargs, stderr=subprocess.DEVNULL)
         return amc.E_SUCCESS
     except subprocess.CalledProcessError as e:
         # handle errors in the called executable
@@ -428,7 +502,8 @@ def run_subprocess_output(sub_proc: list, logger: logging.Logger = None) -> Tupl
     try:
         if logger is not None:
             logger.info('{func:s}: running\n{proc:s}'.format(proc=colored(' '.join(strargs), 'blue'), func=cFuncName))
-        byte_output = subprocess.check_output(strargs, stderr=subprocess.STDOUT)
+        with am_profile.profile_stage(stage='run_subprocess: {prog:s}'.format(prog=os.path.basename(strargs[0]))):
+            byte_output = subprocess.check_output(strargs, stderr=subprocess.STDOUT)
         try:
             proc_output = byte_output.decode('UTF-8').strip()
         except UnicodeDecodeError:
@@ -454,9 +529,10 @@ def json_convertor(o):
         return int(o)
 
 
-def create_colormap_font(nrcolors: int, font_size: int) -> Tuple[list, dict]:
+@functools.lru_cache(maxsize=None)
+def colormap_names(nrcolors: int) -> tuple:
     """
-    create_colormap_font creates a colormap for the number entered and returns a color list and dict with fonts for title and axes
+    colormap_names selects nrcolors equally spaced color names, the selection is kept for next calls
     """
     # get the color names
     # color_names = [name for name in mcd.XKCD_COLORS]
@@ -465,10 +541,15 @@ def create_colormap_font(nrcolors: int, font_size: int) -> Tuple[list, dict]:
     # color_names = [name for name in mcd.TABLEAU_COLORS]
 
     color_step = len(color_names) // nrcolors
-    # print(len(color_names))
-    # print(nrcolors)
-    # print(color_step)
-    color_used = color_names[::color_step]
+
+    return tuple(color_names[::color_step])
+
+
+def create_colormap_font(nrcolors: int, font_size: int) -> Tuple[list, dict]:
+    """
+    create_colormap_font creates a colormap for the number entered and returns a color list and dict with fonts for title and axes
+    """
+    color_used = list(colormap_names(nrcolors=nrcolors))
 
     font = {'family': 'serif',
             # 'color': 'darkred',
@@ -559,8 +640,8 @@ def txt_lines_with(fname: str, substr: str):
     Returns:
         list[str]: List of lines containing substr.
     """
-    f_contents = open(fname, 'r').read()
-    return get_lines_with(f_contents, substr)
+    with compress_utils.open_compressed(fname) as fin:
+        return [line.rstrip('\n') for line in fin if substr in line]
 
 
 def path_writable(path: str) -> bool:
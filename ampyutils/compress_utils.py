@@ -2,106 +2,468 @@ import os
 from termcolor import colored
 import logging
 import sys
-import glob
+import re
+import io
+import gzip
+import zlib
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 
 from ampyutils import am_config as amc
-from ampyutils import amutils
+from ampyutils import am_profile
+from ampyutils import hatanaka
+
+# zstandard is only needed for reading zstd compressed files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 __author__ = 'amuls'
 
+GZ_LEVEL = 6  # default gzip compression level
+GZ_BLOCK = 4 * 1024 * 1024  # size of the blocks compressed (in parallel) as separate gzip members
+GZ_MAGIC = b'\x1f\x8b'  # magic bytes of gzip files
+LZW_MAGIC = b'\x1f\x9d'  # magic bytes of UNIX compress (.Z) files
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'  # magic bytes of zstd files
+CRX_MAGIC = b'COMPACT RINEX FORMAT'  # identifies a compact RINEX file in its first line
+LZW_BITS = 16  # maximum code width of UNIX compress
+
 
-def compress_rnx_obs(rnx2crz: str, obsf: str, rnxdir: str, logger: logging.Logger = None) -> str:
+def gzip_member(block: bytes, level: int = GZ_LEVEL) -> bytes:
     """
-    compress_rnx_obs compresses the observation file using RNX2CRZ
+    gzip_member compresses block into a complete gzip member
     """
-    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+    cmp = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return cmp.compress(block) + cmp.flush()
+
+
+def gzip_stream(fin: io.BufferedIOBase, fout: io.BufferedIOBase, level: int = GZ_LEVEL, block_size: int = GZ_BLOCK, workers: int = 1) -> int:
+    """
+    gzip_stream compresses the stream fin to the gzip stream fout. Using multiple workers, the blocks are compressed in parallel into
+    consecutive gzip members (which is a valid gzip file)
+    """
+    nr_bytes = 0
+    if workers <= 1:
+        cmp = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for block in iter(functools.partial(fin.read, block_size), b''):
+            nr_bytes += len(block)
+            fout.write(cmp.compress(block))
+        fout.write(cmp.flush())
+    else:
+        # zlib releases the GIL so that threads compress in parallel, at most workers blocks are kept in memory
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                lst_blocks = [block for block in (fin.read(block_size) for _ in range(workers)) if len(block) > 0]
+                if len(lst_blocks) == 0:
+                    break
+                nr_bytes += sum(len(block) for block in lst_blocks)
+                for member in executor.map(functools.partial(gzip_member, level=level), lst_blocks):
+                    fout.write(member)
+        if nr_bytes == 0:
+            fout.write(gzip_member(block=b'', level=level))
+
+    return nr_bytes
+
+
+class BlockReader(io.RawIOBase):
+    """
+    BlockReader presents an iterator of bytes blocks as a binary stream, fin is the file closed with the stream
+    """
+    def __init__(self, blocks: Iterator[bytes], fin: io.IOBase = None):
+        self.blocks = blocks
+        self.fin = fin
+        self.block = b''
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.pos >= len(self.block):
+            self.block = next(self.blocks, None)
+            self.pos = 0
+            if self.block is None:
+                self.block = b''
+                return 0
+        nr_bytes = min(len(buffer), len(self.block) - self.pos)
+        buffer[:nr_bytes] = self.block[self.pos:self.pos + nr_bytes]
+        self.pos += nr_bytes
+        return nr_bytes
+
+    def close(self):
+        if self.fin is not None:
+            self.fin.close()
+        super().close()
+
+
+def text_blocks(lines: Iterator[str], block_size: int = GZ_BLOCK) -> Iterator[bytes]:
+    """
+    text_blocks joins the lines into encoded blocks of about block_size bytes
+    """
+    lst_lines = []
+    nr_chars = 0
+    for line in lines:
+        lst_lines.append(line + '\n')
+        nr_chars += len(line) + 1
+        if nr_chars >= block_size:
+            yield ''.join(lst_lines).encode()
+            lst_lines = []
+            nr_chars = 0
+    if len(lst_lines) > 0:
+        yield ''.join(lst_lines).encode()
+
+
+def lzw_pack(lst_codes: list, n_bits: int, padded: bool) -> bytes:
+    """
+    lzw_pack packs the codes of n_bits LSB first in groups of 8 codes, a last partial group is padded to a full group when padded
+    """
+    out = bytearray()
+    for i in range(0, len(lst_codes), 8):
+        group = 0
+        for j, code in enumerate(lst_codes[i:i + 8]):
+            group |= code << (j * n_bits)
+        nr_codes = min(8, len(lst_codes) - i)
+        out += group.to_bytes(n_bits, 'little') if padded else group.to_bytes((nr_codes * n_bits + 7) // 8, 'little')
+
+    return bytes(out)
+
+
+class LzwCompressor:
+    """
+    LzwCompressor compresses data in the UNIX compress (.Z) format block by block, like zlib.compressobj: compress returns the
+    compressed data available so far and flush the remaining compressed data
+    """
+    def __init__(self, maxbits: int = LZW_BITS):
+        self.maxbits = maxbits
+        self.maxmaxcode = 1 << maxbits
+        self.lst_codes = []  # codes of the current code width not yet packed
+        self.n_bits = 9
+        self.maxcode = (1 << self.n_bits) - 1
+        self.free_ent = 257
+        self.dCodes = {}
+        self.ent = None
+        self.header = LZW_MAGIC + bytes([0x80 | maxbits])
+
+    def output(self, code: int) -> bytes:
+        # the codes of a width end with the group containing the last code, padded to a full group
+        self.lst_codes.append(code)
+        if self.free_ent <= self.maxcode:
+            return b''
+        out = lzw_pack(lst_codes=self.lst_codes, n_bits=self.n_bits, padded=True)
+        self.lst_codes = []
+        self.n_bits += 1
+        self.maxcode = self.maxmaxcode if self.n_bits == self.maxbits else (1 << self.n_bits) - 1
+        return out
+
+    def compress(self, data: bytes) -> bytes:
+        out = bytearray(self.header)
+        self.header = b''
+        if len(data) == 0:
+            return bytes(out)
+
+        ent = self.ent
+        if ent is None:
+            ent = data[0]
+            data = data[1:]
+        dCodes = self.dCodes
+        for c in data:
+            key = (ent << 8) | c
+            code = dCodes.get(key)
+            if code is not None:
+                ent = code
+                continue
+            out += self.output(ent)
+            if self.free_ent < self.maxmaxcode:
+                dCodes[key] = self.free_ent
+                self.free_ent += 1
+            ent = c
+        self.ent = ent
+
+        # the complete groups of 8 codes are packed
+        nr_codes = len(self.lst_codes) // 8 * 8
+        out += lzw_pack(lst_codes=self.lst_codes[:nr_codes], n_bits=self.n_bits, padded=False)
+        del self.lst_codes[:nr_codes]
+
+        return bytes(out)
+
+    def flush(self) -> bytes:
+        out = bytearray(self.header)
+        self.header = b''
+        if self.ent is not None:
+            out += self.output(self.ent)
+            self.ent = None
+        out += lzw_pack(lst_codes=self.lst_codes, n_bits=self.n_bits, padded=False)
+        self.lst_codes = []
+
+        return bytes(out)
+
+
+def lzw_compress(data: bytes, maxbits: int = LZW_BITS) -> bytes:
+    """
+    lzw_compress compresses data in the UNIX compress (.Z) format
+    """
+    cmp = LzwCompressor(maxbits=maxbits)
+    return cmp.compress(data) + cmp.flush()
+
+
+def lzw_decompress_blocks(blocks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    lzw_decompress_blocks decompresses the blocks of a UNIX compress (.Z) stream into bytes blocks
+    """
+    buf = b''
+    pos = 0
+    maxbits = None
+
+    for block in itertools.chain(blocks, [None]):
+        at_end = block is None
+        if not at_end:
+            buf = buf[pos:] + block
+            pos = 0
+
+        if maxbits is None:
+            if len(buf) < 3 and not at_end:
+                continue
+            if buf[:2] != LZW_MAGIC:
+                raise ValueError('not in UNIX compress format')
+            maxbits = buf[2] & 0x1f
+            block_mode = (buf[2] & 0x80) != 0
+            maxmaxcode = 1 << maxbits
+
+            lst_table = [bytes([i]) for i in range(256)] + ([b''] if block_mode else [])
+            n_bits = 9
+            maxcode = (1 << n_bits) - 1
+            prev = None
+            pos = 3
 
-    # cmp_obsf = '{obs:s}D.Z'.format(obs=obsf[:-1])
+        # codes are read in groups of n_bits bytes (8 codes), only the last group of the stream may be partial
+        out = bytearray()
+        while pos < len(buf) and (at_end or len(buf) - pos >= n_bits):
+            group = buf[pos:pos + n_bits]
+            pos += n_bits
+            group_val = int.from_bytes(group, 'little')
+            mask = (1 << n_bits) - 1
 
-    # create CLI line for RNX2CRZ
-    args4RNX2CRZ = [rnx2crz, '-f', '-d', os.path.join(rnxdir, obsf)]
+            for k in range(len(group) * 8 // n_bits):
+                code = (group_val >> (k * n_bits)) & mask
+
+                if code == 256 and block_mode:
+                    # clear code: restart with an initial table at the next group
+                    del lst_table[257:]
+                    prev = None
+                    n_bits = 9
+                    maxcode = (1 << n_bits) - 1
+                    break
+
+                if prev is None:
+                    entry = lst_table[code]
+                else:
+                    entry = lst_table[code] if code < len(lst_table) else prev + prev[:1]
+                    if len(lst_table) < maxmaxcode:
+                        lst_table.append(prev + entry[:1])
+                out += entry
+                prev = entry
+
+                # increase code width at the next group
+                if len(lst_table) > maxcode:
+                    n_bits += 1
+                    maxcode = maxmaxcode if n_bits == maxbits else (1 << n_bits) - 1
+                    break
+
+        yield bytes(out)
+
+
+def lzw_decompress(data: bytes) -> bytes:
+    """
+    lzw_decompress decompresses data in the UNIX compress (.Z) format
+    """
+    return b''.join(lzw_decompress_blocks(blocks=[data]))
+
+
+def open_compressed(fname: str, rnx: bool = True) -> io.TextIOBase:
+    """
+    open_compressed opens a plain, gzip, UNIX compress or zstd compressed file (detected by its magic bytes) as a text stream.
+    A compact RINEX file is presented as the RINEX observation file when rnx is True
+    """
+    with open(fname, 'rb') as fmagic:
+        magic = fmagic.read(len(ZSTD_MAGIC))
+
+    if magic.startswith(GZ_MAGIC):
+        fbin = gzip.open(fname, 'rb')
+    elif magic.startswith(LZW_MAGIC):
+        fz = open(fname, 'rb')
+        fbin = io.BufferedReader(BlockReader(blocks=lzw_decompress_blocks(iter(functools.partial(fz.read, GZ_BLOCK), b'')), fin=fz))
+    elif magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise IOError('reading zstd compressed {fname:s} requires the zstandard package'.format(fname=fname))
+        fbin = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(fname, 'rb'), closefd=True))
+    else:
+        fbin = open(fname, 'rb')
+
+    # the first line tells whether it is a compact RINEX file
+    is_crx = CRX_MAGIC in fbin.peek(80)[:80]
+    fin = io.TextIOWrapper(fbin)
+
+    if rnx and is_crx:
+        return hatanaka.CrxReader(fin)
+
+    return fin
+
+
+def compress_file(fname: str, cmpf: str, level: int = GZ_LEVEL, workers: int = 1, crx: bool = False) -> int:
+    """
+    compress_file compresses fname to cmpf (gzip for .gz, UNIX compress for .Z), applying Hatanaka compression first when crx is True
+    """
+    # the (Hatanaka compressed) file is streamed in blocks through the compression
+    if crx:
+        frnx = open_compressed(fname)
+        fin = io.BufferedReader(BlockReader(blocks=text_blocks(hatanaka.rnx2crx_lines(frnx)), fin=frnx))
+    else:
+        fin = open(fname, 'rb')
+
+    # a failed compression does not leave a partial cmpf
+    try:
+        with fin, open(cmpf, 'wb') as fout:
+            if cmpf.endswith('.gz'):
+                return gzip_stream(fin=fin, fout=fout, level=level, workers=workers)
+
+            cmp = LzwCompressor() if cmpf.endswith('.Z') else None
+            nr_bytes = 0
+            for block in iter(functools.partial(fin.read, GZ_BLOCK), b''):
+                nr_bytes += len(block)
+                fout.write(block if cmp is None else cmp.compress(block))
+            if cmp is not None:
+                fout.write(cmp.flush())
+            return nr_bytes
+    except BaseException:
+        if os.path.exists(cmpf):
+            os.remove(cmpf)
+        raise
+
+
+def decompress_file(cmpf: str, fname: str, rnx: bool = False) -> int:
+    """
+    decompress_file decompresses cmpf to fname, restoring the RINEX observation file from a compact RINEX file when rnx is True
+    """
+    nr_chars = 0
+    # a truncated or corrupt cmpf does not leave a partial fname
+    try:
+        with open_compressed(fname=cmpf, rnx=rnx) as fin, open(fname, 'w') as fout:
+            for block in iter(functools.partial(fin.read, GZ_BLOCK), ''):
+                nr_chars += fout.write(block)
+    except BaseException:
+        if os.path.exists(fname):
+            os.remove(fname)
+        raise
+
+    return nr_chars
+
+
+@am_profile.profile_func()
+def compress_rnx_obs(obsf: str, rnxdir: str, level: int = GZ_LEVEL, logger: logging.Logger = None) -> str:
+    """
+    compress_rnx_obs compresses the observation file using Hatanaka compression followed by gzip (RINEX v3 names) or UNIX compress (short names)
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # name of the compressed file as created by RNX2CRZ
+    if obsf.endswith('.rnx'):
+        cmp_obsf = obsf[:-4] + '.crx.gz'
+    elif re.search(r'\.\d\d[oO]$', obsf):
+        cmp_obsf = obsf[:-1] + ('D' if obsf[-1] == 'O' else 'd') + '.Z'
+    else:
+        cmp_obsf = obsf + '.crx.gz'
 
     if logger is not None:
         logger.info('{func:s}: Compressing RINEX observation {rnx:s}'.format(rnx=colored(obsf, 'green'), func=cFuncName))
 
-    # run the program
-    ret_code = amutils.run_subprocess(sub_proc=args4RNX2CRZ, logger=logger)
-    if ret_code != amc.E_SUCCESS:
+    try:
+        compress_file(fname=os.path.join(rnxdir, obsf), cmpf=os.path.join(rnxdir, cmp_obsf), level=level, crx=True)
+    except (IOError, EOFError, ValueError) as e:
         if logger is not None:
-            logger.info('{func:s}: RINEX rnx2crz compression failed with error: {errcode:d}'.format(func=cFuncName, errcode=ret_code))
-        sys.exit(ret_code)
-    else:
-        # look for last created file
-        return glob.glob(os.path.join(rnxdir, '*.Z'))[0]
+            logger.error('{func:s}: RINEX Hatanaka compression failed with error: {err!s}'.format(func=cFuncName, err=e))
+        sys.exit(amc.E_FAILURE)
+
+    os.remove(os.path.join(rnxdir, obsf))
 
+    return os.path.join(rnxdir, cmp_obsf)
 
-def gzip_compress(gzip: str, ungzipf: str, dir: str, logger: logging.Logger = None) -> str:
+
+@am_profile.profile_func()
+def gzip_compress(ungzipf: str, dir: str, level: int = GZ_LEVEL, workers: int = 1, logger: logging.Logger = None) -> str:
     """
     gzip_compress compresses the rinex navigation file using gzip
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # create CLI line for GZIP compression
-    args4GZIP = [gzip, '-f', os.path.join(dir, ungzipf)]
+    gzipf = os.path.join(dir, ungzipf + '.gz')
 
     if logger is not None:
-        logger.info('{func:s}: Compressing RINEX navigation {rnx:s}'.format(rnx=colored(ungzipf, 'green'), func=cFuncName))
+        logger.info('{func:s}: Compressing {rnx:s} (level {level:d}, {workers:d} workers)'.format(rnx=colored(ungzipf, 'green'),
+                                                                                                  level=level,
+                                                                                                  workers=workers,
+                                                                                                  func=cFuncName))
 
-    # run the program
-    ret_code = amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-    if ret_code != amc.E_SUCCESS:
+    try:
+        compress_file(fname=os.path.join(dir, ungzipf), cmpf=gzipf, level=level, workers=workers)
+    except IOError as e:
         if logger is not None:
-            logger.info('{func:s}: gzip navigation compression failed with error: {errcode:d}'.format(func=cFuncName, errcode=ret_code))
-        sys.exit(ret_code)
-    else:
-        # look for last created file
-        return glob.glob(os.path.join(dir, '*.gz'))[0]
+            logger.error('{func:s}: gzip compression failed with error: {err!s}'.format(func=cFuncName, err=e))
+        sys.exit(amc.E_FAILURE)
+
+    os.remove(os.path.join(dir, ungzipf))
 
+    return gzipf
 
-def uncompress_rnx_obs(crz2rnx: str, rnx_dir: str, cmp_obsf: str, obs_ext: str = 'location.py', logger: logging.Logger = None) -> str:
+
+@am_profile.profile_func()
+def uncompress_rnx_obs(rnx_dir: str, cmp_obsf: str, logger: logging.Logger = None) -> str:
     """
     uncompress_rnx_obs uncompresses the hatanaka compressed observation file
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    obsf = '{cmp_obsf:s}{obsext:s}'.format(cmp_obsf=cmp_obsf[:-3], obsext=obs_ext)
-
-    # create CLI options for crz2rnx
-    args4CRZ2RNX = [crz2rnx, '-f', os.path.join(rnx_dir, cmp_obsf)]
+    # name of the RINEX observation file as created by CRZ2RNX
+    obsf = re.sub(r'\.(gz|Z)$', '', cmp_obsf)
+    if obsf.endswith('.crx'):
+        obsf = obsf[:-4] + '.rnx'
+    elif re.search(r'\.\d\d[dD]$', obsf):
+        obsf = obsf[:-1] + ('O' if obsf[-1] == 'D' else 'o')
 
     if logger is not None:
         logger.info('{func:s}: hatanaka decompressing  RINEX observation {rnx:s}'.format(rnx=colored(cmp_obsf, 'green'), func=cFuncName))
 
-    # run the program
-    ret_code = amutils.run_subprocess(sub_proc=args4CRZ2RNX, logger=logger)
-    if ret_code != amc.E_SUCCESS:
+    try:
+        decompress_file(cmpf=os.path.join(rnx_dir, cmp_obsf), fname=os.path.join(rnx_dir, obsf), rnx=True)
+    except (IOError, EOFError, ValueError) as e:
         if logger is not None:
-            logger.info('{func:s}: RINEX Hatanaka decompression failed with error: {errcode:d}'.format(func=cFuncName, errcode=ret_code))
-        sys.exit(ret_code)
+            logger.error('{func:s}: RINEX Hatanaka decompression failed with error: {err!s}'.format(func=cFuncName, err=e))
+        sys.exit(amc.E_FAILURE)
 
     return obsf
 
 
-def gzip_uncompress(gzip: str, gzipf: str, dir: str, logger: logging.Logger = None) -> str:
+@am_profile.profile_func()
+def gzip_uncompress(gzipf: str, dir: str, logger: logging.Logger = None) -> str:
     """
-    gzip_uncompress compresses the rinex navigation file using gzip
+    gzip_uncompress uncompresses the gzip compressed (navigation) file
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     navf = '{nav:s}'.format(nav=gzipf[:-3])
 
-    # create CLI line for GZIP compression
-    args4GZIP = [gzip, '-d', '-f', os.path.join(dir, gzipf)]
-
     if logger is not None:
         logger.info('{func:s}: Decompressing file {rnx:s}'.format(rnx=colored(gzipf, 'green'), func=cFuncName))
 
-    # run the program
-    ret_code = amutils.run_subprocess(sub_proc=args4GZIP, logger=logger)
-    if ret_code != amc.E_SUCCESS:
+    try:
+        decompress_file(cmpf=os.path.join(dir, gzipf), fname=os.path.join(dir, navf))
+    except (IOError, EOFError) as e:
         if logger is not None:
-            logger.info('{func:s}: gzip navigation decompression failed with error: {errcode:d}'.format(func=cFuncName, errcode=ret_code))
-        sys.exit(ret_code)
+            logger.error('{func:s}: gzip decompression failed with error: {err!s}'.format(func=cFuncName, err=e))
+        sys.exit(amc.E_FAILURE)
 
-    return navf
+    os.remove(os.path.join(dir, gzipf))
 
+    return navf
@@ -52,6 +52,14 @@ class marker_action(argparse.Action):
         setattr(namespace, self.dest, marker)
 
 
+class doy_list_action(argparse.Action):
+    def __call__(self, parser, namespace, doys, option_string=None):
+        for doy in doys:
+            if doy not in range(1, 367):
+                raise argparse.ArgumentError(self, "day-of-year must be in [1...366]")
+        setattr(namespace, self.dest, doys)
+
+
 class gnss_action(argparse.Action):
     def __call__(self, parser, namespace, gnsss, option_string=None):
         for gnss in gnsss:
@@ -60,6 +68,14 @@ class gnss_action(argparse.Action):
         setattr(namespace, self.dest, gnsss)
 
 
+class gnsscomb_action(argparse.Action):
+    def __call__(self, parser, namespace, gnsscombs, option_string=None):
+        for gnsscomb in gnsscombs:
+            if len(gnsscomb) == 0 or len(set(gnsscomb)) != len(gnsscomb) or not set(gnsscomb).issubset(gfzc.lst_GNSSs):
+                raise argparse.ArgumentError(self, 'GNSS combination {comb:s} must consist of {gnsss:s}'.format(comb=gnsscomb, gnsss='|'.join(gfzc.lst_GNSSs)))
+        setattr(namespace, self.dest, gnsscombs)
+
+
 class obstype_action(argparse.Action):
     def __call__(self, parser, namespace, obstypes, option_string=None):
         for obstype in obstypes:
@@ -97,6 +113,30 @@ class cutoff_action(argparse.Action):
         setattr(namespace, self.dest, cutoff)
 
 
+class cutoff_list_action(argparse.Action):
+    def __call__(self, parser, namespace, cutoffs, option_string=None):
+        for cutoff in cutoffs:
+            if cutoff not in range(0, 45):
+                raise argparse.ArgumentError(self, "cutoff angle must be in [0...45] degrees")
+        setattr(namespace, self.dest, cutoffs)
+
+
+class prcodes_action(argparse.Action):
+    def __call__(self, parser, namespace, prcodes, option_string=None):
+        regex = re.compile(r'^C[{freqs:s}][A-Z](,C[{freqs:s}][A-Z])*$'.format(freqs=''.join(gfzc.lst_freqs)))
+        for prcode in prcodes:
+            if not re.search(regex, prcode):
+                raise argparse.ArgumentError(self, 'code combination {codes:s} must be comma separated pseudo range codes (eg C1C or C1C,C5Q)'.format(codes=prcode))
+        setattr(namespace, self.dest, prcodes)
+
+
+class workers_action(argparse.Action):
+    def __call__(self, parser, namespace, workers, option_string=None):
+        if workers not in range(1, 65):
+            raise argparse.ArgumentError(self, "number of workers must be in [1...64]")
+        setattr(namespace, self.dest, workers)
+
+
 class elevstep_action(argparse.Action):
     def __call__(self, parser, namespace, elev_step, option_string=None):
         if elev_step not in range(1, 15):
@@ -127,6 +167,13 @@ class snrth_action(argparse.Action):
         setattr(namespace, self.dest, snrth)
 
 
+class window_action(argparse.Action):
+    def __call__(self, parser, namespace, window, option_string=None):
+        if not 0 < window <= 168:
+            raise argparse.ArgumentError(self, "time window must be in ]0...168] hours")
+        setattr(namespace, self.dest, window)
+
+
 def secondsPerDay(hms):
     hours, minutes, seconds = hms.split(':')
     return ((hours * 60) + minutes) * 60 + seconds
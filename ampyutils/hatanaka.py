@@ -0,0 +1,427 @@
+import io
+import re
+from datetime import datetime
+from typing import Iterator
+
+__author__ = 'amuls'
+
+# Compact RINEX (Hatanaka) format: CRINEX 1.0 for RINEX v2.x and CRINEX 3.0 for RINEX v3.x observation files
+CRX_VERSION = {2: '1.0', 3: '3.0'}
+CRX_ARC_ORDER = 3  # order of the differences for the observations
+CRX_CLK_ORDER = 2  # order of the differences for the receiver clock offset
+RNX_OBS_DECIMALS = 3  # observations are F14.3
+RNX_CLK_DECIMALS = {2: 9, 3: 12}  # receiver clock offset is F12.9 (RINEX v2) or F15.12 (RINEX v3)
+RNX_ERR_RECORD = re.compile(r'^\D\d{4}')  # erroneous formatted pseudo-range records in RINEX v3 files of the P3RS2 receiver
+
+
+def text_diff(new: str, old: str) -> str:
+    """
+    text_diff compresses the line new with respect to the line old: unchanged characters become a space, a changed space becomes '&'
+    """
+    lst_diff = []
+    for i, c in enumerate(new):
+        if i < len(old) and c == old[i]:
+            lst_diff.append(' ')
+        elif c == ' ':
+            lst_diff.append('&')
+        else:
+            lst_diff.append(c)
+    # characters of old beyond the length of new are erased
+    for c in old[len(new):]:
+        lst_diff.append(' ' if c == ' ' else '&')
+
+    return ''.join(lst_diff).rstrip()
+
+
+def text_repair(diff: str, old: str) -> str:
+    """
+    text_repair reconstructs a line from its text difference diff with respect to the line old
+    """
+    lst_new = list(old.ljust(len(diff)))
+    for i, c in enumerate(diff):
+        if c == '&':
+            lst_new[i] = ' '
+        elif c != ' ':
+            lst_new[i] = c
+
+    return ''.join(lst_new)
+
+
+def str2int(value: str, decimals: int) -> int:
+    """
+    str2int converts a fixed point number to an integer expressed in units of its last decimal
+    """
+    value = value.strip()
+    negative = value.startswith('-')
+    int_part, _, dec_part = value.lstrip('+-').partition('.')
+    ivalue = int(int_part or '0') * 10 ** decimals + int((dec_part + '0' * decimals)[:decimals])
+
+    return -ivalue if negative else ivalue
+
+
+def int2str(ivalue: int, decimals: int, width: int) -> str:
+    """
+    int2str converts an integer expressed in units of the last decimal to a fixed point number of given width
+    """
+    int_part, dec_part = divmod(abs(ivalue), 10 ** decimals)
+
+    return '{sign:s}{int:d}.{dec:0{nrdec:d}d}'.format(sign='-' if ivalue < 0 else '', int=int_part, dec=dec_part, nrdec=decimals).rjust(width)
+
+
+def diff_encode(ivalue: int, lst_prev: list, arc_order: int) -> tuple:
+    """
+    diff_encode returns the CRINEX field for ivalue and the differences of all orders, lst_prev holds those of the previous epoch (None starts a new arc)
+    """
+    if lst_prev is None:
+        return '{order:d}&{value:d}'.format(order=arc_order, value=ivalue), [ivalue], arc_order
+
+    lst_diffs, order = lst_prev
+    lst_new = [ivalue]
+    for i in range(min(len(lst_diffs), order)):
+        lst_new.append(lst_new[i] - lst_diffs[i])
+
+    return str(lst_new[-1]), lst_new, order
+
+
+def diff_decode(field: str, lst_prev: list) -> tuple:
+    """
+    diff_decode reconstructs the integer value from the CRINEX field and the differences of all orders of the previous epoch
+    """
+    if '&' in field:
+        order, _, value = field.partition('&')
+        return int(value), [int(value)], int(order)
+
+    if lst_prev is None:
+        raise ValueError('difference {field:s} without the start of its arc'.format(field=field))
+    lst_diffs, order = lst_prev
+    cur_order = min(len(lst_diffs), order)
+    lst_new = [0] * (cur_order + 1)
+    lst_new[cur_order] = int(field)
+    for i in range(cur_order, 0, -1):
+        lst_new[i - 1] = lst_diffs[i - 1] + lst_new[i]
+
+    return lst_new[0], lst_new, order
+
+
+def rnx_header(lines: Iterator[str]) -> tuple:
+    """
+    rnx_header reads the header lines and returns them with the RINEX major version and the observation types per system
+    """
+    lst_header = []
+    dObsTypes = {}
+    sys_cont = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        lst_header.append(line)
+        label = line[60:].strip()
+
+        if label == 'RINEX VERSION / TYPE':
+            version = int(float(line[:9]))
+        elif label == 'SYS / # / OBS TYPES':
+            # RINEX v3: continuation lines have a blank system identifier
+            if line[0] != ' ':
+                sys_cont = line[0]
+                dObsTypes[sys_cont] = []
+            dObsTypes[sys_cont] += line[7:60].split()
+        elif label == '# / TYPES OF OBSERV':
+            # RINEX v2: same observation types for all systems
+            dObsTypes.setdefault(' ', [])
+            dObsTypes[' '] += line[6:60].split()
+        elif label == 'END OF HEADER':
+            break
+    else:
+        raise ValueError('file truncated in the RINEX header')
+
+    return lst_header, version, dObsTypes
+
+
+def next_line(lines: Iterator[str], after: str) -> str:
+    """
+    next_line returns the next line, a file ending before the record is complete raises ValueError (a StopIteration would end
+    the generator reading the lines)
+    """
+    try:
+        return next(lines)
+    except StopIteration:
+        raise ValueError('file truncated after {after:s}'.format(after=after.rstrip())) from None
+
+
+def nr_obstypes(dObsTypes: dict, sat: str, line: str) -> int:
+    """
+    nr_obstypes returns the number of observation types for satellite sat of the epoch line
+    """
+    try:
+        return len(dObsTypes[' '] if ' ' in dObsTypes else dObsTypes[sat[0]])
+    except (KeyError, IndexError):
+        raise ValueError('no observation types for satellite {sat!r} of epoch {line:s}'.format(sat=sat, line=line.rstrip())) from None
+
+
+def crx_header(version: int, prog: str = 'compress_utils') -> list:
+    """
+    crx_header returns the CRINEX header lines preceding the RINEX header
+    """
+    return ['{vers:<20s}{type:<40s}{label:<20s}'.format(vers=CRX_VERSION[version], type='COMPACT RINEX FORMAT', label='CRINEX VERS   / TYPE'),
+            '{prog:<40s}{date:<20s}{label:<20s}'.format(prog=prog, date=datetime.utcnow().strftime('%d-%b-%y %H:%M'), label='CRINEX PROG / DATE')]
+
+
+def rnx_epoch(lines: Iterator[str], line: str, version: int) -> tuple:
+    """
+    rnx_epoch reads a RINEX epoch record starting with line and returns the CRINEX epoch line, the clock offset, the satellites with their observation records and the special records (epoch flag > 1)
+    """
+    if version == 3:
+        flag = int(line[31]) if line[31:32].strip() else 0
+        nr_sats = int(line[32:35])
+        crx_line = line[:35]
+        clock = line[41:56].strip()
+    else:
+        flag = int(line[28]) if line[28:29].strip() else 0
+        nr_sats = int(line[29:32]) if line[29:32].strip() else 0
+        crx_line = line[:32]
+        clock = line[68:80].strip()
+
+    # special records following the event epoch are copied
+    if flag > 1:
+        return line.rstrip(), None, [], [next_line(lines, after=line).rstrip('\r\n') for _ in range(nr_sats)]
+
+    if version == 3:
+        lst_sats = []
+        lst_records = []
+        for _ in range(nr_sats):
+            obs_line = next_line(lines, after=line).rstrip('\r\n')
+            lst_sats.append(obs_line[:3])
+            lst_records.append(obs_line[3:])
+        crx_line = crx_line.ljust(41) + ''.join(lst_sats)
+    else:
+        sats = line[32:68].rstrip()
+        while len(sats) < 3 * nr_sats:
+            sats += next_line(lines, after=line)[32:68].rstrip()
+        lst_sats = [sats[3 * i:3 * i + 3] for i in range(nr_sats)]
+        crx_line = crx_line + ''.join(lst_sats)
+        lst_records = []
+
+    return crx_line, clock, lst_sats, lst_records
+
+
+def rnx2crx_lines(lines: Iterator[str]) -> Iterator[str]:
+    """
+    rnx2crx_lines converts the lines of a RINEX observation file into the lines of a compact RINEX file
+    """
+    lines = iter(lines)
+    lst_header, version, dObsTypes = rnx_header(lines)
+
+    for line in crx_header(version=version) + lst_header:
+        yield line
+
+    # the erroneous pseudo-range records are skipped (as done by rnx15_combine)
+    if version == 3:
+        lines = (line for line in lines if not RNX_ERR_RECORD.match(line))
+
+    epoch_prev = ''
+    clock_prev = None
+    dSatsPrev = {}  # per satellite the differences per observation type and the LLI/SSI flags
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if len(line.strip()) == 0:
+            continue
+
+        crx_line, clock, lst_sats, lst_records = rnx_epoch(lines=lines, line=line, version=version)
+
+        # event epoch: written completely and restart the differences
+        if clock is None:
+            yield crx_line if version == 3 else '&' + crx_line[1:]
+            for record in lst_records:
+                yield record
+            epoch_prev = ''
+            clock_prev = None
+            dSatsPrev = {}
+            continue
+
+        # epoch line as text difference or completely at start
+        if epoch_prev == '':
+            yield crx_line if version == 3 else '&' + crx_line[1:]
+        else:
+            yield text_diff(new=crx_line, old=epoch_prev)
+        epoch_prev = crx_line
+
+        # receiver clock offset
+        if len(clock) > 0:
+            field, lst_diffs, order = diff_encode(ivalue=str2int(clock, RNX_CLK_DECIMALS[version]), lst_prev=clock_prev, arc_order=CRX_CLK_ORDER)
+            clock_prev = (lst_diffs, order)
+            yield field
+        else:
+            clock_prev = None
+            yield ''
+
+        # observations per satellite
+        dSats = {}
+        for i, sat in enumerate(lst_sats):
+            nr_obs = nr_obstypes(dObsTypes=dObsTypes, sat=sat, line=line)
+            if version == 3:
+                record = lst_records[i]
+            else:
+                record = ''.join(next_line(lines, after=line).rstrip('\r\n').ljust(80) for _ in range((nr_obs + 4) // 5))
+            record = record.ljust(16 * nr_obs)
+
+            lst_prev, flags_prev = dSatsPrev.get(sat, ([None] * nr_obs, ''))
+            lst_fields = []
+            lst_state = []
+            flags = ''
+            for j in range(nr_obs):
+                value = record[16 * j:16 * j + 14]
+                flags += record[16 * j + 14:16 * j + 16]
+                if len(value.strip()) == 0:
+                    lst_fields.append('')
+                    lst_state.append(None)
+                else:
+                    field, lst_diffs, order = diff_encode(ivalue=str2int(value, RNX_OBS_DECIMALS), lst_prev=lst_prev[j], arc_order=CRX_ARC_ORDER)
+                    lst_fields.append(field)
+                    lst_state.append((lst_diffs, order))
+            dSats[sat] = (lst_state, flags)
+
+            flags_diff = text_diff(new=flags.rstrip(), old=flags_prev.rstrip())
+            yield ' '.join(lst_fields) + (' ' + flags_diff if len(flags_diff) > 0 else '')
+
+        dSatsPrev = dSats
+
+
+def crx2rnx_lines(lines: Iterator[str]) -> Iterator[str]:
+    """
+    crx2rnx_lines converts the lines of a compact RINEX file into the lines of the RINEX observation file
+    """
+    lines = iter(lines)
+    crx_vers = next(lines, '')
+    if 'COMPACT RINEX' not in crx_vers:
+        raise ValueError('not a compact RINEX file')
+    next_line(lines, after=crx_vers)  # CRINEX PROG / DATE
+
+    lst_header, version, dObsTypes = rnx_header(lines)
+    for line in lst_header:
+        yield line
+
+    epoch_prev = ''
+    clock_prev = None
+    dSatsPrev = {}
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        # reconstruct the epoch line
+        if line.startswith('>') or line.startswith('&'):
+            epoch = line if version == 3 else ' ' + line[1:]
+        else:
+            epoch = text_repair(diff=line, old=epoch_prev)
+
+        flag_idx, nr_idx = (31, 32) if version == 3 else (28, 29)
+        flag = int(epoch[flag_idx]) if epoch[flag_idx:flag_idx + 1].strip() else 0
+        nr_sats = int(epoch[nr_idx:nr_idx + 3]) if epoch[nr_idx:nr_idx + 3].strip() else 0
+
+        # event epoch followed by special records
+        if flag > 1:
+            yield epoch.rstrip()
+            for _ in range(nr_sats):
+                yield next_line(lines, after=epoch).rstrip('\r\n')
+            epoch_prev = ''
+            clock_prev = None
+            dSatsPrev = {}
+            continue
+        epoch_prev = epoch
+
+        # receiver clock offset
+        clock_field = next_line(lines, after=epoch).rstrip('\r\n').strip()
+        if len(clock_field) > 0:
+            ivalue, lst_diffs, order = diff_decode(field=clock_field, lst_prev=clock_prev)
+            clock_prev = (lst_diffs, order)
+            clock = int2str(ivalue=ivalue, decimals=RNX_CLK_DECIMALS[version], width=15 if version == 3 else 12)
+        else:
+            clock_prev = None
+            clock = ''
+
+        # epoch record
+        if version == 3:
+            lst_sats = [epoch[41 + 3 * i:44 + 3 * i] for i in range(nr_sats)]
+            yield (epoch[:35].ljust(41) + clock).rstrip() if len(clock) > 0 else epoch[:35].rstrip()
+        else:
+            lst_sats = [epoch[32 + 3 * i:35 + 3 * i] for i in range(nr_sats)]
+            yield (epoch[:32] + ''.join(lst_sats[:12]).ljust(36) + clock).rstrip()
+            for i in range(12, nr_sats, 12):
+                yield ' ' * 32 + ''.join(lst_sats[i:i + 12])
+
+        # observations per satellite
+        dSats = {}
+        for sat in lst_sats:
+            nr_obs = nr_obstypes(dObsTypes=dObsTypes, sat=sat, line=epoch)
+            lst_fields = next_line(lines, after=epoch).rstrip('\r\n').split(' ', nr_obs)
+            flags_diff = lst_fields[nr_obs] if len(lst_fields) > nr_obs else ''
+            lst_fields = (lst_fields + [''] * nr_obs)[:nr_obs]
+
+            lst_prev, flags_prev = dSatsPrev.get(sat, ([None] * nr_obs, ''))
+            flags = text_repair(diff=flags_diff, old=flags_prev).ljust(2 * nr_obs)
+            lst_state = []
+            record = ''
+            for j, field in enumerate(lst_fields):
+                if len(field) == 0:
+                    lst_state.append(None)
+                    record += ' ' * 14
+                else:
+                    ivalue, lst_diffs, order = diff_decode(field=field, lst_prev=lst_prev[j])
+                    lst_state.append((lst_diffs, order))
+                    record += int2str(ivalue=ivalue, decimals=RNX_OBS_DECIMALS, width=14)
+                record += flags[2 * j:2 * j + 2]
+            dSats[sat] = (lst_state, flags.rstrip())
+
+            if version == 3:
+                yield (sat + record).rstrip()
+            else:
+                for i in range(0, nr_obs, 5):
+                    yield record[16 * i:16 * (i + 5)].rstrip()
+
+        dSatsPrev = dSats
+
+
+class CrxReader(io.TextIOBase):
+    """
+    CrxReader presents a (text) stream of a compact RINEX file as the stream of the RINEX observation file
+    """
+    def __init__(self, fin: io.TextIOBase):
+        self.fin = fin
+        self.lines = crx2rnx_lines(fin)
+        self.buffer = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def __iter__(self):
+        return self
+
+    def readline(self, size: int = -1) -> str:
+        if len(self.buffer) > 0:
+            line, self.buffer = self.buffer, ''
+            return line
+        line = next(self.lines, None)
+        return '' if line is None else line + '\n'
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if line == '':
+            raise StopIteration
+        return line
+
+    def read(self, size: int = -1) -> str:
+        lst_lines = [self.buffer]
+        nr_chars = len(self.buffer)
+        for line in self.lines:
+            lst_lines.append(line + '\n')
+            nr_chars += len(line) + 1
+            if size >= 0 and nr_chars >= size:
+                break
+        text = ''.join(lst_lines)
+        if size < 0:
+            self.buffer = ''
+            return text
+        self.buffer = text[size:]
+        return text[:size]
+
+    def close(self):
+        self.fin.close()
+        super().close()
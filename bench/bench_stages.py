@@ -0,0 +1,155 @@
+import sys
+import os
+import logging
+from termcolor import colored
+import time
+import tracemalloc
+import platform
+import json
+from datetime import datetime
+from typing import Callable
+from tabulate import tabulate
+
+from ampyutils import amutils
+
+__author__ = 'amuls'
+
+
+def bench_stage(stage: str,
+                func: Callable,
+                setup: Callable,
+                rows: int,
+                repeat: int = 1,
+                trace_mem: bool = True,
+                logger: logging.Logger = None) -> dict:
+    """
+    bench_stage times func (called with the keyword arguments returned by setup) and returns wall / cpu time, throughput and peak memory
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dStage = {}
+    lst_wall = []
+    lst_cpu = []
+
+    # time the stage, setup is done outside the timing since func may alter its arguments
+    try:
+        for _ in range(repeat):
+            kwargs = setup()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            func(**kwargs)
+            lst_cpu.append(time.process_time() - cpu_start)
+            lst_wall.append(time.perf_counter() - wall_start)
+    except Exception as e:
+        # a failing stage should not stop the benchmarking of the other stages
+        if logger is not None:
+            logger.error('{func:s}: stage {stage:s} failed with error {err!s}'.format(stage=colored(stage, 'red'), err=e, func=cFuncName))
+        dStage['error'] = repr(e)
+
+        return dStage
+
+    dStage['wall'] = min(lst_wall)
+    dStage['cpu'] = min(lst_cpu)
+    dStage['rows'] = rows
+    dStage['rows_per_s'] = rows / dStage['wall'] if dStage['wall'] > 0 else None
+
+    # peak memory is determined in a separate run since tracing slows down the stage
+    if trace_mem:
+        kwargs = setup()
+        tracemalloc.start()
+        func(**kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        dStage['peak_MB'] = amutils.convert_unit(peak, amutils.SIZE_UNIT.MB)
+    else:
+        dStage['peak_MB'] = None
+
+    if logger is not None:
+        logger.info('{func:s}: {stage:s}: {wall:.3f} s wall, {cpu:.3f} s cpu for {rows:d} rows'
+                    .format(stage=colored(stage, 'green'), wall=dStage['wall'], cpu=dStage['cpu'], rows=rows, func=cFuncName))
+
+    return dStage
+
+
+def bench_git_commit(repo_dir: str, logger: logging.Logger = None) -> str:
+    """
+    bench_git_commit returns the short commit hash of the repository the benchmark is run from
+    """
+    err_code, commit = amutils.run_subprocess_output(sub_proc=['git', '-C', repo_dir, 'rev-parse', '--short', 'HEAD'], logger=logger)
+    if err_code != 0:
+        return 'unknown'
+
+    return commit
+
+
+def bench_report(dBench: dict, reportf: str, logger: logging.Logger = None) -> str:
+    """
+    bench_report adds the run information to the benchmark results and writes them to a JSON file
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dBench['run'] = {}
+    dBench['run']['date'] = datetime.now()
+    dBench['run']['host'] = platform.node()
+    dBench['run']['python'] = platform.python_version()
+    dBench['run']['platform'] = platform.platform()
+
+    with open(reportf, 'w') as fout:
+        json.dump(dBench, fout, ensure_ascii=False, indent=4, default=amutils.json_convertor)
+
+    if logger is not None:
+        logger.info('{func:s}: benchmark report written to {report:s}'.format(report=colored(reportf, 'green'), func=cFuncName))
+
+    return reportf
+
+
+def bench_compare(dBench: dict,
+                  reff: str,
+                  tolerance: float = 0.1,
+                  logger: logging.Logger = None) -> bool:
+    """
+    bench_compare compares the stages with a reference report and returns False when a stage regressed more than tolerance
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    with open(reff, 'r') as fin:
+        dRef = json.load(fin)
+
+    no_regression = True
+    lst_rows = []
+    for stage, dStage in dBench['stages'].items():
+        if stage not in dRef['stages']:
+            lst_rows.append([stage, None, dStage.get('wall'), None, None, None, 'new'])
+            continue
+
+        dRefStage = dRef['stages'][stage]
+        if 'error' in dStage or 'error' in dRefStage:
+            lst_rows.append([stage, dRefStage.get('wall'), dStage.get('wall'), None, None, None, 'error'])
+            continue
+
+        ratio = dStage['wall'] / dRefStage['wall'] if dRefStage['wall'] > 0 else None
+
+        if ratio is not None and ratio > 1 + tolerance:
+            state = 'SLOWER'
+            no_regression = False
+        elif ratio is not None and ratio < 1 - tolerance:
+            state = 'faster'
+        else:
+            state = 'same'
+
+        lst_rows.append([stage, dRefStage['wall'], dStage['wall'], ratio, dRefStage['peak_MB'], dStage['peak_MB'], state])
+
+    table = tabulate(lst_rows,
+                     headers=['stage',
+                              'wall [s] {ref:s}'.format(ref=dRef['commit']),
+                              'wall [s] {cur:s}'.format(cur=dBench['commit']),
+                              'ratio',
+                              'peak [MB] {ref:s}'.format(ref=dRef['commit']),
+                              'peak [MB] {cur:s}'.format(cur=dBench['commit']),
+                              'state'],
+                     floatfmt='.3f')
+
+    if logger is not None:
+        logger.info('{func:s}: comparison with {ref:s}\n{table:s}'.format(ref=colored(reff, 'green'), table=table, func=cFuncName))
+
+    return no_regression
@@ -0,0 +1,306 @@
+import sys
+import os
+import logging
+from termcolor import colored
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from ampyutils import amutils
+
+__author__ = 'amuls'
+
+# observable types written into the synthetic RINEX / obstab files per GNSS
+dSynth_obstypes = {'E': ['C1C', 'L1C', 'D1C', 'S1C', 'C5Q', 'L5Q', 'D5Q', 'S5Q'],
+                   'G': ['C1C', 'L1C', 'D1C', 'S1C', 'C5Q', 'L5Q', 'D5Q', 'S5Q']}
+
+# orbital period in hours used for simulating the visibility arcs
+dSynth_period = {'E': 14.08, 'G': 11.97}
+
+# number of PRNs per GNSS (same as in gfzrnx_constants)
+dSynth_nrprns = {'E': 36, 'G': 32}
+
+# receivers and observables used for filling the synthetic cvsdb
+lst_synth_rxs = ['P3RS', 'SEPT', 'TURX', 'ASTX']
+lst_synth_cvsdb_obst = ['C1C', 'C5Q', 'D1C', 'D5Q', 'L1C', 'L5Q', 'S1C', 'S5Q']
+
+
+def synth_prns(gnss: str) -> list:
+    """
+    synth_prns returns the list of PRNs simulated for a GNSS
+    """
+    return ['{gnss:s}{prn:02d}'.format(gnss=gnss, prn=prn) for prn in range(1, dSynth_nrprns[gnss] + 1)]
+
+
+def synth_jam_windows(hours: float,
+                      nr_windows: int = 6,
+                      duration: int = 600) -> list:
+    """
+    synth_jam_windows returns a list of (start, end) offsets in seconds during which the receiver is jammed
+    """
+    # spread the jamming windows evenly over the observation period
+    span = int(hours * 3600)
+    step = span // (nr_windows + 1)
+
+    return [(step * (i + 1), step * (i + 1) + duration) for i in range(nr_windows)]
+
+
+def synth_visibility(gnss: str,
+                     nr_epochs: int,
+                     interval: float,
+                     jam_windows: list) -> np.ndarray:
+    """
+    synth_visibility returns an elevation like matrix (PRN x epoch) with NaN where a PRN is not tracked
+    """
+    # seconds since start for each epoch
+    tsec = np.arange(nr_epochs) * interval
+
+    # each PRN gets its own phase in the orbit
+    nr_prns = dSynth_nrprns[gnss]
+    phases = np.arange(nr_prns)[:, np.newaxis] / nr_prns
+    omega = 2 * np.pi / (dSynth_period[gnss] * 3600)
+    elev = np.sin(omega * tsec[np.newaxis, :] + 2 * np.pi * phases)
+
+    # not tracked below the horizon
+    elev[elev < 0] = np.nan
+
+    # no tracking at all during jamming
+    for jam_start, jam_end in jam_windows:
+        elev[:, (tsec >= jam_start) & (tsec < jam_end)] = np.nan
+
+    return elev
+
+
+def synth_obs_values(obstypes: list,
+                     elev: np.ndarray,
+                     prn_idx: np.ndarray,
+                     rng: np.random.Generator) -> dict:
+    """
+    synth_obs_values creates realistic values for the observables given the simulated elevation
+    """
+    dObs = {}
+    for obst in obstypes:
+        if obst[0] == 'S':
+            dObs[obst] = 30 + 18 * elev + rng.normal(0, 0.5, elev.size)
+        elif obst[0] == 'C':
+            dObs[obst] = 2.6e7 - 3.0e6 * elev + prn_idx * 1.0e3
+        elif obst[0] == 'L':
+            dObs[obst] = (2.6e7 - 3.0e6 * elev) / 0.19
+        elif obst[0] == 'D':
+            dObs[obst] = 3000 * np.cos(np.pi * elev) + prn_idx
+    return dObs
+
+
+def synth_obstab(obstabf: str,
+                 gnss: str,
+                 DTG_start: datetime,
+                 hours: float,
+                 interval: float,
+                 jam_windows: list,
+                 logger: logging.Logger = None) -> int:
+    """
+    synth_obstab creates a gfzrnx like observation tabular file (-tab_sep ,) and returns the number of observation lines
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    rng = np.random.default_rng(seed=2020)
+    obstypes = dSynth_obstypes[gnss]
+    nr_epochs = int(hours * 3600 / interval)
+
+    # determine the tracked PRN / epoch combinations
+    elev = synth_visibility(gnss=gnss, nr_epochs=nr_epochs, interval=interval, jam_windows=jam_windows)
+    prn_idx, epoch_idx = np.nonzero(~np.isnan(elev))
+
+    # sort on epoch and than PRN as gfzrnx does
+    order = np.lexsort((prn_idx, epoch_idx))
+    prn_idx = prn_idx[order]
+    epoch_idx = epoch_idx[order]
+
+    # the date / time strings are only formatted once per epoch
+    epochs = [DTG_start + timedelta(seconds=i * interval) for i in range(nr_epochs)]
+    ep_dates = np.array([epoch.strftime('%Y-%m-%d') for epoch in epochs])
+    ep_times = np.array([epoch.strftime('%H:%M:%S.0000000') for epoch in epochs])
+    prns = np.array(synth_prns(gnss=gnss))
+
+    dfObs = pd.DataFrame({'#HD': 'OBS',
+                          'GNSS': gnss,
+                          'DATE': ep_dates[epoch_idx],
+                          'TIME': ep_times[epoch_idx],
+                          'PRN': prns[prn_idx]})
+    for obst, values in synth_obs_values(obstypes=obstypes, elev=elev[prn_idx, epoch_idx], prn_idx=prn_idx, rng=rng).items():
+        dfObs[obst] = values
+
+    with open(obstabf, 'w') as fout:
+        fout.write('#HD,G,DATE,TIME,PRN\n')
+        fout.write('#HD,{gnss:s},DATE,TIME,PRN,{obst:s}\n'.format(gnss=gnss, obst=','.join(obstypes)))
+        dfObs.to_csv(fout, header=False, index=False, float_format='%.3f')
+
+    if logger is not None:
+        logger.info('{func:s}: created {obstab:s} with {count:d} observations'.format(obstab=colored(obstabf, 'green'), count=dfObs.shape[0], func=cFuncName))
+
+    return dfObs.shape[0]
+
+
+def synth_rnx_header(marker: str,
+                     DTG_first: datetime,
+                     interval: float) -> str:
+    """
+    synth_rnx_header returns a minimal RINEX v3.04 observation header
+    """
+    hdr_lines = ['     3.04           OBSERVATION DATA    M                   RINEX VERSION / TYPE',
+                 '{marker:<60s}MARKER NAME'.format(marker=marker),
+                 '{:14.4f}{:14.4f}{:14.4f}                  APPROX POSITION XYZ'.format(4027881.8, 302009.7, 4919475.1)]
+    for gnss, obstypes in dSynth_obstypes.items():
+        hdr_lines.append('{gnss:1s}  {count:3d} {obst:<53s}SYS / # / OBS TYPES'.format(gnss=gnss,
+                                                                                       count=len(obstypes),
+                                                                                       obst=' '.join(obstypes)))
+    hdr_lines.append('{:10.3f}                                                  INTERVAL'.format(interval))
+    hdr_lines.append('{:6d}{:6d}{:6d}{:6d}{:6d}{:13.7f}     GPS         TIME OF FIRST OBS'.format(DTG_first.year, DTG_first.month, DTG_first.day,
+                                                                                                  DTG_first.hour, DTG_first.minute, DTG_first.second))
+    hdr_lines.append('                                                            END OF HEADER')
+
+    return '\n'.join(hdr_lines) + '\n'
+
+
+def synth_rnx_obs_files(rnx_dir: str,
+                        marker: str,
+                        DTG_start: datetime,
+                        nr_files: int,
+                        interval: float,
+                        jam_windows: list,
+                        nr_errors: int = 5,
+                        logger: logging.Logger = None) -> list:
+    """
+    synth_rnx_obs_files creates the quarterly P3RS2 RINEX observation files and returns their names
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    rng = np.random.default_rng(seed=2020)
+    amutils.mkdir_p(rnx_dir)
+
+    # simulate the complete period at once, last file runs a few epochs into the next day
+    nr_epochs = int(nr_files * 900 / interval)
+    dElev = {}
+    for gnss in dSynth_obstypes:
+        dElev[gnss] = synth_visibility(gnss=gnss, nr_epochs=nr_epochs + 10, interval=interval, jam_windows=jam_windows)
+
+    lst_obsf = []
+    for nr_file in range(nr_files):
+        DTG_file = DTG_start + timedelta(seconds=nr_file * 900)
+        obsf = os.path.join(rnx_dir, 'P3RS-2_RX_R_{date:s}_15M_00U_MO.rnx'.format(date=DTG_file.strftime('%Y%j%H%M')))
+
+        ep_first = int(nr_file * 900 / interval)
+        ep_last = ep_first + int(900 / interval)
+        if nr_file == nr_files - 1:
+            ep_last += 10
+
+        lines = [synth_rnx_header(marker=marker, DTG_first=DTG_file, interval=interval)]
+        for epoch in range(ep_first, ep_last):
+            DTG_epoch = DTG_start + timedelta(seconds=epoch * interval)
+
+            sat_lines = []
+            for gnss, obstypes in dSynth_obstypes.items():
+                prn_idx = np.nonzero(~np.isnan(dElev[gnss][:, epoch]))[0]
+                dObs = synth_obs_values(obstypes=obstypes, elev=dElev[gnss][prn_idx, epoch], prn_idx=prn_idx, rng=rng)
+                for i, idx in enumerate(prn_idx):
+                    obs_fields = ''.join(['{:14.3f}  '.format(dObs[obst][i]) for obst in obstypes])
+                    sat_lines.append('{gnss:1s}{prn:02d}{obs:s}'.format(gnss=gnss, prn=idx + 1, obs=obs_fields))
+
+            lines.append('> {epoch:s}{sec:11.7f}  0{count:3d}\n'.format(epoch=DTG_epoch.strftime('%Y %m %d %H %M'), sec=DTG_epoch.second, count=len(sat_lines)))
+            lines.append('\n'.join(sat_lines) + '\n')
+
+        # insert some erroneous formatted pseudo-range records as seen in P3RS2 files
+        if nr_errors > 0:
+            lines.insert(len(lines) // 2, ''.join(['E{:04d}{:10.3f}\n'.format(rng.integers(1000, 9999), 1.0e6) for _ in range(nr_errors)]))
+
+        with open(obsf, 'w') as fout:
+            fout.write(''.join(lines))
+
+        lst_obsf.append(obsf)
+
+    if logger is not None:
+        logger.info('{func:s}: created {count:d} RINEX observation files in {dir:s}'.format(count=len(lst_obsf), dir=colored(rnx_dir, 'green'), func=cFuncName))
+
+    return lst_obsf
+
+
+def synth_cvsdb(cvsdbf: str,
+                years: list,
+                logger: logging.Logger = None) -> int:
+    """
+    synth_cvsdb creates a obsstat_tle like database file and returns the number of lines
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    rng = np.random.default_rng(seed=2020)
+    values = ','.join(['{:d}'.format(value) for value in rng.integers(0, 86400, 36)])
+
+    nr_lines = 0
+    with open(cvsdbf, 'w') as fout:
+        for year in years:
+            for doy in range(1, 366):
+                for rx in lst_synth_rxs:
+                    for gnss in dSynth_obstypes:
+                        for src in ['OBS', 'TLE']:
+                            for obst in lst_synth_cvsdb_obst:
+                                fout.write('{yyyy:04d},{doy:03d},{rx:s},{gnss:s},{src:s},{obst:s},{values:s}\n'
+                                           .format(yyyy=year, doy=doy, rx=rx, gnss=gnss, src=src, obst=obst, values=values))
+                                nr_lines += 1
+
+    if logger is not None:
+        logger.info('{func:s}: created {cvsdb:s} with {count:d} lines'.format(cvsdb=colored(cvsdbf, 'green'), count=nr_lines, func=cFuncName))
+
+    return nr_lines
+
+
+def tle_checksum(line: str) -> int:
+    """
+    tle_checksum calculates the modulo 10 checksum of a TLE line
+    """
+    return sum([int(c) if c.isdigit() else (1 if c == '-' else 0) for c in line[:68]]) % 10
+
+
+def synth_tle(prn: str,
+              norad: int,
+              DTG_epoch: datetime) -> tuple:
+    """
+    synth_tle returns the 2 lines of a TLE for a MEO GNSS satellite, orbit parameters are spread according to the PRN
+    """
+    gnss = prn[0]
+    prn_nr = int(prn[1:])
+
+    # inclination and mean motion depending on GNSS
+    if gnss == 'E':
+        incl, mean_motion = 56.0, 1.70475
+    else:
+        incl, mean_motion = 55.0, 2.00565
+
+    # spread satellites over 3 (Galileo) or 6 (GPS) orbital planes
+    nr_planes = 3 if gnss == 'E' else 6
+    raan = (prn_nr % nr_planes) * 360.0 / nr_planes
+    mean_anomaly = (prn_nr * 360.0 / dSynth_nrprns[gnss] * nr_planes) % 360.0
+
+    tle_line1 = '1 {norad:05d}U {intl:<8s} {yy:02d}{doy:012.8f}  .00000000  00000-0  00000-0 0  999'.format(
+                norad=norad,
+                intl='{yy:02d}{nr:03d}A'.format(yy=DTG_epoch.year % 100, nr=prn_nr),
+                yy=DTG_epoch.year % 100,
+                doy=DTG_epoch.timetuple().tm_yday + (DTG_epoch.hour * 3600 + DTG_epoch.minute * 60 + DTG_epoch.second) / 86400)
+    tle_line2 = '2 {norad:05d} {incl:8.4f} {raan:8.4f} {ecc:07d} {argp:8.4f} {ma:8.4f} {mm:11.8f}{rev:5d}'.format(
+                norad=norad, incl=incl, raan=raan, ecc=2000, argp=0.0, ma=mean_anomaly, mm=mean_motion, rev=1000)
+
+    return (tle_line1 + str(tle_checksum(tle_line1)), tle_line2 + str(tle_checksum(tle_line2)))
+
+
+def synth_tles(prns: list,
+               DTG_epoch: datetime) -> pd.DataFrame:
+    """
+    synth_tles creates the dataframe with TLE lines per PRN as returned by tle_parser.find_norad_tle_yydoy
+    """
+    df_tle = pd.DataFrame(columns=['PRN', 'NORAD', 'TLE1', 'TLE2'])
+
+    for i, prn in enumerate(prns):
+        norad = 90000 + i
+        tle_line1, tle_line2 = synth_tle(prn=prn, norad=norad, DTG_epoch=DTG_epoch)
+        df_tle.loc[len(df_tle.index)] = [prn, '{norad:d}U'.format(norad=norad), tle_line1, tle_line2]
+
+    return df_tle
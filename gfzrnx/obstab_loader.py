@@ -0,0 +1,340 @@
+import sys
+import os
+import io
+import logging
+from termcolor import colored
+from datetime import datetime, timedelta
+from typing import Tuple, Iterator
+import numpy as np
+import pandas as pd
+
+from ampyutils import compress_utils
+
+__author__ = 'amuls'
+
+# number of characters of the obstab read, filtered and parsed at once
+OBSTAB_BLOCK_SIZE = 16 * 1024 * 1024
+# smaller blocks are read when analysing per time window since they determine the memory used
+OBSTAB_WINDOW_BLOCK_SIZE = 4 * 1024 * 1024
+# number of bytes at the end of the obstab searched for its last observation line
+OBSTAB_TAIL_SIZE = 64 * 1024
+# number of bytes preceding a read position which identify the lines read before
+OBSTAB_MARK_SIZE = 256
+# the PRNs are selected on the text lines while less than this fraction of the lines is kept
+OBSTAB_PREFILTER_FRAC = 0.5
+
+# observable types stored in single precision, pseudoranges and carrier phases keep double precision
+lst_obst_float32 = ['S', 'D']
+
+# generic header line of an obstab file created with -tab_sep ,
+OBSTAB_HDR_GENERIC = '#HD,G,DATE,TIME,PRN'
+
+
+def obstab_header(obstabf: str) -> Tuple[list, int]:
+    """
+    obstab_header returns the column names of the obstab file and the number of header lines preceding the observations
+    """
+    hdr_count = 0
+    hdr_line = OBSTAB_HDR_GENERIC
+    with compress_utils.open_compressed(obstabf, rnx=False) as fin:
+        for line in fin:
+            if line.strip().startswith('OBS'):
+                break
+            hdr_count += 1
+            if line.strip() != OBSTAB_HDR_GENERIC:
+                hdr_line = line.strip()
+
+    return hdr_line.split(','), hdr_count
+
+
+def obstab_dtypes(hdr_columns: list) -> dict:
+    """
+    obstab_dtypes returns the dtype used for storing each column of the obstab
+    """
+    idx_obst = hdr_columns.index('PRN') + 1
+
+    dDtypes = {column: str for column in hdr_columns[:idx_obst]}
+    for obst in hdr_columns[idx_obst:]:
+        dDtypes[obst] = np.float32 if obst[0] in lst_obst_float32 else np.float64
+
+    return dDtypes
+
+
+def obstab_datetime(dates: pd.Series, times: pd.Series) -> np.ndarray:
+    """
+    obstab_datetime combines the DATE and TIME columns, only their unique values (shared by all PRNs at an epoch) are converted
+    """
+    date_codes, uniq_dates = pd.factorize(dates)
+    time_codes, uniq_times = pd.factorize(times)
+
+    return pd.to_datetime(uniq_dates, format='%Y-%m-%d').to_numpy()[date_codes] + pd.to_timedelta(uniq_times).to_numpy()[time_codes]
+
+
+def obstab_blocks(fin: io.TextIOBase, block_size: int = OBSTAB_BLOCK_SIZE, complete_lines: bool = False) -> Iterator[bytes]:
+    """
+    obstab_blocks reads the (remaining) lines of fin in blocks of about block_size characters ending at a line end. When
+    complete_lines is set, a last line without line end (still being written) is not returned
+    """
+    rest = ''
+    while True:
+        block = fin.read(block_size)
+        if block == '':
+            break
+        block = rest + block
+        idx_eol = block.rfind('\n') + 1
+        rest = block[idx_eol:]
+        if idx_eol > 0:
+            yield block[:idx_eol].encode()
+
+    if rest != '' and not complete_lines:
+        yield (rest + '\n').encode()
+
+
+def obstab_last_epoch(obstabf: str) -> datetime:
+    """
+    obstab_last_epoch returns the epoch of the last complete observation line of a (plain) obstab file, None when there is none
+    """
+    hdr_columns, _ = obstab_header(obstabf=obstabf)
+    idx_date, idx_time = hdr_columns.index('DATE'), hdr_columns.index('TIME')
+
+    with open(obstabf, 'rb') as fin:
+        fin.seek(max(0, os.path.getsize(obstabf) - OBSTAB_TAIL_SIZE))
+        tail = fin.read().decode(errors='replace')
+
+    # a last line without line end is still being written
+    for line in reversed(tail[:tail.rfind('\n') + 1].splitlines()):
+        if line.startswith('OBS'):
+            fields = line.split(',')
+            return pd.Timestamp('{date:s} {time:s}'.format(date=fields[idx_date], time=fields[idx_time])).to_pydatetime()
+
+    return None
+
+
+def obstab_mark(obstabf: str, offset: int) -> bytes:
+    """
+    obstab_mark returns the bytes of the (plain) obstab preceding offset, which tell whether the lines read up to offset were
+    rewritten since. Returns empty bytes when the file is shorter than offset
+    """
+    if offset is None or os.path.getsize(obstabf) < offset:
+        return b''
+
+    with open(obstabf, 'rb') as fin:
+        fin.seek(max(0, offset - OBSTAB_MARK_SIZE))
+        return fin.read(offset - fin.tell())
+
+
+def obstab_select_prns(block: bytes, idx_prn: int, prn_codes: np.ndarray) -> Tuple[bytes, float]:
+    """
+    obstab_select_prns keeps the lines of the block whose PRN field (3 characters) is in prn_codes and returns these lines
+    and the fraction of lines kept. The PRN field of each line is located from the positions of the field separators
+    """
+    chars = np.frombuffer(block, dtype=np.uint8)
+    eols = np.flatnonzero(chars == ord('\n'))
+    starts = np.concatenate(([0], eols[:-1] + 1))
+    seps = np.flatnonzero(chars == ord(','))
+
+    # lines (eg blank lines) lacking the separators around the PRN field are dropped
+    idx_sep = np.searchsorted(seps, starts)
+    valid = np.searchsorted(seps, eols) - idx_sep > idx_prn
+    keep = np.zeros(starts.size, dtype=bool)
+
+    # position of the PRN field in each line and its 3 characters combined in one code
+    prn_pos = seps[idx_sep[valid] + idx_prn - 1] + 1
+    codes = (chars[prn_pos].astype(np.int32) << 16) | (chars[prn_pos + 1].astype(np.int32) << 8) | chars[prn_pos + 2]
+    keep[valid] = np.isin(codes, prn_codes) & (chars[prn_pos + 3] == ord(','))
+
+    if keep.all():
+        return block, 1.
+    return chars[np.repeat(keep, eols - starts + 1)].tobytes(), keep.mean()
+
+
+def obstab_split_last_epoch(block: bytes, idx_date: int, idx_time: int) -> Tuple[bytes, bytes]:
+    """
+    obstab_split_last_epoch splits the block (complete lines) into the lines preceding its last epoch and the lines of its last
+    epoch, which may not be completely written yet
+    """
+    idx_start = block.rfind(b'\n', 0, len(block) - 1) + 1
+    fields = block[idx_start:].split(b',')
+    if len(fields) <= max(idx_date, idx_time):
+        return block, b''
+    epoch = b',' + fields[idx_date] + b',' + fields[idx_time] + b','
+
+    # the lines of an epoch follow each other
+    while idx_start > 0:
+        idx_prev = block.rfind(b'\n', 0, idx_start - 1) + 1
+        if epoch not in block[idx_prev:idx_start]:
+            break
+        idx_start = idx_prev
+
+    return block[:idx_start], block[idx_start:]
+
+
+def prn_code(prn: str) -> int:
+    """
+    prn_code combines the 3 characters of a PRN into the code used by obstab_select_prns
+    """
+    return (ord(prn[0]) << 16) | (ord(prn[1]) << 8) | ord(prn[2])
+
+
+def obstab_chunks(obstabf: str,
+                  obstypes: list,
+                  prns: list = None,
+                  dt_start: datetime = None,
+                  dt_end: datetime = None,
+                  block_size: int = OBSTAB_BLOCK_SIZE,
+                  offset: int = None,
+                  dProgress: dict = None) -> Iterator[pd.DataFrame]:
+    """
+    obstab_chunks reads the observables obstypes for the selected PRNs within [dt_start, dt_end] in blocks of block_size
+    characters. For a small selection of PRNs the lines of other PRNs are dropped before being parsed, reading stops after
+    dt_end. Yields per block a dataframe with the columns DATE_TIME, PRN and obstypes.
+    Reading starts at the file position offset (a line start after the header) when given. When dProgress is given only
+    complete epochs are read: the lines of the last epoch are held back since the epoch may still be written. The position of
+    its first line is stored in dProgress['offset'] once the whole file is read, so that the last epoch and the lines appended
+    later are read starting from there
+    """
+    hdr_columns, hdr_count = obstab_header(obstabf=obstabf)
+    idx_date, idx_time, idx_prn = [hdr_columns.index(column) for column in ['DATE', 'TIME', 'PRN']]
+
+    usecols = ['DATE', 'TIME', 'PRN'] + obstypes
+    dDtypes = {column: dtype for column, dtype in obstab_dtypes(hdr_columns=hdr_columns).items() if column in usecols}
+    dt_start = None if dt_start is None else np.datetime64(dt_start, 'ns')
+    dt_end = None if dt_end is None else np.datetime64(dt_end, 'ns')
+
+    # the PRN predicate is applied on the text lines as long as it removes most of them
+    prefilter = prns is not None
+    if prefilter:
+        prn_codes = np.array([prn_code(prn=prn) for prn in prns])
+
+    with compress_utils.open_compressed(obstabf, rnx=False) as fin:
+        if offset is None:
+            for _ in range(hdr_count):
+                fin.readline()
+        else:
+            fin.seek(offset)
+        # the obstab is ASCII so that the position advances by the length of each block
+        pos = fin.tell()
+        held = b''
+
+        for block in obstab_blocks(fin=fin, block_size=block_size, complete_lines=dProgress is not None):
+            pos += len(block)
+            if dProgress is not None:
+                block, held = obstab_split_last_epoch(block=held + block, idx_date=idx_date, idx_time=idx_time)
+                if len(block) == 0:
+                    continue
+
+            # observations are sorted in time, the last line tells whether the end of the time window is passed
+            passed_end = False
+            if dt_end is not None:
+                last_fields = block[block.rfind(b'\n', 0, len(block) - 1) + 1:].decode().split(',')
+                passed_end = pd.Timestamp('{date:s} {time:s}'.format(date=last_fields[idx_date], time=last_fields[idx_time])).to_datetime64() > dt_end
+
+            if prefilter:
+                block, frac_kept = obstab_select_prns(block=block, idx_prn=idx_prn, prn_codes=prn_codes)
+                # when most lines are kept, selecting on the parsed PRN column is cheaper
+                prefilter = frac_kept < OBSTAB_PREFILTER_FRAC
+
+            if len(block) > 0:
+                dfChunk = pd.read_csv(io.BytesIO(block), delimiter=',', header=None, names=hdr_columns, usecols=usecols, dtype=dDtypes)
+                if prns is not None:
+                    dfChunk = dfChunk[dfChunk['PRN'].isin(prns)]
+
+                dfChunk.insert(loc=0, column='DATE_TIME', value=obstab_datetime(dates=dfChunk['DATE'], times=dfChunk['TIME']))
+
+                # apply the time window
+                if dt_start is not None or dt_end is not None:
+                    dt_obs = dfChunk['DATE_TIME'].to_numpy()
+                    in_window = np.ones(dt_obs.size, dtype=bool)
+                    if dt_start is not None:
+                        in_window &= dt_obs >= dt_start
+                    if dt_end is not None:
+                        in_window &= dt_obs <= dt_end
+                    dfChunk = dfChunk[in_window]
+
+                if dfChunk.shape[0] > 0:
+                    yield dfChunk[['DATE_TIME', 'PRN'] + obstypes]
+
+            if passed_end:
+                break
+        else:
+            if dProgress is not None:
+                dProgress['offset'] = pos - len(held)
+
+
+def obstab_windows(obstabf: str,
+                   obstypes: list,
+                   window: timedelta,
+                   prns: list = None,
+                   dt_start: datetime = None,
+                   dt_end: datetime = None,
+                   block_size: int = OBSTAB_WINDOW_BLOCK_SIZE,
+                   offset: int = None,
+                   dProgress: dict = None) -> Iterator[pd.DataFrame]:
+    """
+    obstab_windows regroups the blocks read by obstab_chunks in successive time windows of length window starting at the first
+    observation. A window contains complete epochs, only the observations of the current window and of one block are kept in
+    memory. Windows without observations are skipped. offset and dProgress are passed to obstab_chunks
+    """
+    dt_window = pd.Timedelta(window)
+    dt_win_end = None
+    lst_dfPending = []
+
+    for dfChunk in obstab_chunks(obstabf=obstabf, obstypes=obstypes, prns=prns, dt_start=dt_start, dt_end=dt_end, block_size=block_size,
+                                 offset=offset, dProgress=dProgress):
+        if dt_win_end is None:
+            dt_win_end = dfChunk['DATE_TIME'].iloc[0] + dt_window
+        lst_dfPending.append(dfChunk)
+
+        # the observations are sorted in time, a window is complete once a later epoch is read
+        while dfChunk['DATE_TIME'].iloc[-1] >= dt_win_end:
+            dfPending = pd.concat(lst_dfPending, ignore_index=True)
+            in_window = dfPending['DATE_TIME'].to_numpy() < dt_win_end.to_datetime64()
+            if in_window.any():
+                yield dfPending[in_window].reset_index(drop=True)
+            lst_dfPending = [dfPending[~in_window]]
+            dt_win_end += dt_window
+
+    if len(lst_dfPending) > 0:
+        dfPending = pd.concat(lst_dfPending, ignore_index=True)
+        if dfPending.shape[0] > 0:
+            yield dfPending
+
+
+def obstab_load(obstabf: str,
+                obstypes: list,
+                prns: list = None,
+                dt_start: datetime = None,
+                dt_end: datetime = None,
+                block_size: int = OBSTAB_BLOCK_SIZE,
+                logger: logging.Logger = None) -> pd.DataFrame:
+    """
+    obstab_load loads the observables obstypes of the selected PRNs within [dt_start, dt_end] from the obstab file. The
+    selection is applied while reading so that memory usage scales with the selection, PRN is stored as categorical
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    prn_dtype = None if prns is None else pd.CategoricalDtype(categories=sorted(set(prns)))
+
+    lst_dfChunks = []
+    for dfChunk in obstab_chunks(obstabf=obstabf, obstypes=obstypes, prns=prns, dt_start=dt_start, dt_end=dt_end, block_size=block_size):
+        if prn_dtype is not None:
+            dfChunk = dfChunk.astype({'PRN': prn_dtype})
+        lst_dfChunks.append(dfChunk)
+
+    if len(lst_dfChunks) > 0:
+        dfObs = pd.concat(lst_dfChunks, ignore_index=True)
+    else:
+        dfObs = pd.DataFrame(columns=['DATE_TIME', 'PRN'] + obstypes)
+
+    # keep as PRN categories only those observed
+    dfObs['PRN'] = dfObs['PRN'].astype('category').cat.remove_unused_categories()
+
+    if logger is not None:
+        logger.info('{func:s}: loaded {rows:d} observations of {prns:d} PRNs from {tab:s} ({size:.1f} MB)'
+                    .format(rows=dfObs.shape[0],
+                            prns=len(dfObs['PRN'].cat.categories),
+                            tab=colored(os.path.basename(obstabf), 'green'),
+                            size=dfObs.memory_usage(deep=True).sum() / 1024 ** 2,
+                            func=cFuncName))
+
+    return dfObs
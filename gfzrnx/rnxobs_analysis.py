@@ -3,15 +3,21 @@ import os
 from termcolor import colored
 import logging
 import json
+import io
+import itertools
 from typing import Union
 import pandas as pd
-import tempfile
+import numpy as np
 from datetime import datetime
 
 from ampyutils import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, am_profile, compress_utils
+from GNSS import gpstime
 from plot import obstab_plot
 
+# number of obstab lines filtered and parsed at once
+OBSTAB_CHUNK_LINES = 250000
+
 
 def RX3obs_header_info(gfzrnx: str, obs3f: str, logger: logging.Logger = None) -> dict:
     """
@@ -42,6 +48,24 @@ def RX3obs_header_info(gfzrnx: str, obs3f: str, logger: logging.Logger = None) -
     return {key: dobs_hdr[key] for key in ['data', 'file']}
 
 
+def obstab_headers(gfzdir: str, obstabf: str) -> dict:
+    """
+    obstab_headers returns per GNSS the column names of its #HD line, only the comment lines at the head of the obstab file are read
+    """
+    dHdrs = {}
+    with compress_utils.open_compressed(os.path.join(gfzdir, obstabf), rnx=False) as fin:
+        for line in fin:
+            if not line.startswith('#'):
+                break
+            if line.startswith('#HD'):
+                hdr = line.split()
+                # keep the most complete header line for a GNSS
+                if len(hdr) > len(dHdrs.get(hdr[1], [])):
+                    dHdrs[hdr[1]] = hdr
+
+    return dHdrs
+
+
 def get_observable_types(gfzdir: str, obstabf: str, gnss: str, logger: logging.Logger) -> Union[dict, int]:
     """
     get_observable_types finds the observable types for the selected GNSSs and returns as a dict per GNSS
@@ -49,28 +73,23 @@ def get_observable_types(gfzdir: str, obstabf: str, gnss: str, logger: logging.L
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # read in the header lines of the obstab file and retain the headers requested
-    gnss_hdrs = {}
-    idx2use = {}
+    dHdrs = obstab_headers(gfzdir=gfzdir, obstabf=obstabf)
+    if gnss not in dHdrs:
+        logger.error('{func:s}: no header for GNSS {gnss:s} found in {tab:s}'.format(gnss=colored(gnss, 'red'), tab=obstabf, func=cFuncName))
+        sys.exit(amc.E_FAILURE)
+    hdr = dHdrs[gnss]
 
-    # for gnss in amc.dRTK['cli']['GNSSs']:
-    hdr_lines = amutils.txt_lines_with(substr='#HD {gnss:s}'.format(gnss=gnss), fname=os.path.join(gfzdir, obstabf))
+    # retain headers up until PRN
+    idx_obstypes = hdr.index('PRN') + 1
+    idx2use = list(range(idx_obstypes))
 
-    for hdr_line in hdr_lines:
-        hdr = hdr_line.split()
-        idx2use[gnss] = []
+    # retain headers according to the selected observable types
+    for obstype in amc.dRTK['cli']['obstypes']:
+        for idx in range(idx_obstypes, len(hdr), 1):
+            if hdr[idx].startswith(obstype):
+                idx2use.append(idx)
 
-        # retain headers up until PRN
-        idx_obstypes = hdr.index('PRN') + 1
-        for idx in range(idx_obstypes):
-            idx2use[gnss].append(idx)
-
-        # retain headers according to the selected observable types
-        for obstype in amc.dRTK['cli']['obstypes']:
-            for idx in range(idx_obstypes, len(hdr), 1):
-                if hdr[idx].startswith(obstype):
-                    idx2use[gnss].append(idx)
-
-    gnss_hdrs = [hdr[i] for i in idx2use[gnss]]
+    gnss_hdrs = [hdr[i] for i in idx2use]
 
     logger.info('{func:s} gnss_hdrs are = {hdr!s}'.format(hdr=gnss_hdrs, func=cFuncName))
 
@@ -103,56 +122,82 @@ def create_obstab(gfzrnx: str, dir_gfzrnx: str, obs3f: str, logger: logging.Logg
     return obs3tabf
 
 
-def timing_overview(gnss: str, dfobs: dict, PRNs: list, obst_used: list, nrepochs: int, logger: logging.Logger = None) -> dict:
+def timing_overview(gnss: str, dfobs: pd.DataFrame, PRNs: list, obst_used: list, nrepochs: int, logger: logging.Logger = None) -> pd.DataFrame:
     """
-    timing_overview analyses the general timing and number of observations per satsyst
+    timing_overview analyses the general timing and number of observations per PRN. Returns a table indexed by PRN with the
+    count per observable, the first and last observed epoch and the completeness of the observed epochs in between
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # # determine index of header PRN
-    # prn_idx = dfobs.columns.get_loc('PRN')
-    # obs_list = list(dfobs.columns.values)[prn_idx + 1:]
-    # # get the number of unique epochs
-    # epochs_observed = len(dfobs['DATE_TIME'].unique())
-
-    # interate over the loged SVs and determine the number of observations per requested observable
-    epochs_prn = {}
-    for prn in PRNs:
-        epochs_prn[prn] = {}
-        for obst in obst_used:
-            # print("dfobs[dfobs['{!s}'] == {!s}][obst].count() = {!s}".format(obst, prn, dfobs[dfobs['PRN'] == prn][obst].count()))
-            epochs_prn[prn][obst] = dfobs[dfobs['PRN'] == prn][obst].count()
-        if logger is not None:
-            logger.debug('{func:s}: count of observables for {prn:s}: {count!s}'.format(prn=prn, count=epochs_prn[prn], func=cFuncName))
-            # print('type(epochs_prn[prn]) = {!s}'.format(type(epochs_prn[prn])))
+    # count the observables and determine the time span per PRN in a single grouped aggregation
+    dAgg = {obst: (obst, 'count') for obst in obst_used}
+    dfPRNCount = dfobs.groupby('PRN', sort=True).agg(**dAgg,
+                                                     first=('DATE_TIME', 'min'),
+                                                     last=('DATE_TIME', 'max'),
+                                                     epochs=('EPOCH', 'size'),
+                                                     epoch_first=('EPOCH', 'min'),
+                                                     epoch_last=('EPOCH', 'max')).reindex(PRNs)
 
-    # print('type(epochs_prn) = {!s}'.format(type(epochs_prn)))
+    # number of epochs between first and last observation and the ratio observed
+    dfPRNCount['expected'] = dfPRNCount['epoch_last'] - dfPRNCount['epoch_first'] + 1
+    dfPRNCount['complete'] = dfPRNCount['epochs'] / dfPRNCount['expected']
+    dfPRNCount.drop(columns=['epoch_first', 'epoch_last'], inplace=True)
+
+    if logger is not None:
+        amutils.logHeadTailDataFrame(df=dfPRNCount, dfName='dfPRNCount[{gnss:s}]'.format(gnss=gnss), logger=logger, callerName=cFuncName)
 
-    return epochs_prn
+    return dfPRNCount
 
 
+@am_profile.profile_func(rows=lambda ret: ret[0].shape[0])
 def read_obstab(gfzdir: str, obstabf: str, gnss: str, hdr: str, logger: logging.Logger) -> Union[pd.DataFrame, list, list]:
     """
     read_obstab reads the OBS tabular file into a dataframe
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # retain lines that start with "OBS GNSS"
-    # create temporay file with only data for selected GNSS
-    tmp_obstabf = os.path.join(tempfile.gettempdir(), obstabf)
-
-    # read in the lines according to the selected GNSS
-    with open(os.path.join(gfzdir, obstabf), 'r') as finp:
-        hdr_line = amutils.lines_that_start_with('#HD {gnss:s}'.format(gnss=gnss), finp)
-        finp.seek(0, 0)
-        gnss_lines = amutils.lines_that_start_with('OBS {gnss:s}'.format(gnss=gnss), finp)
-    # xrite these lines to a temporary file for loading into a dataframe
-    with open(tmp_obstabf, 'w') as fout:
-        fout.writelines(hdr_line)
-        fout.writelines(gnss_lines)
-
-    # dfobs = pd.DataFrame(columns=hdr)
-    dfobs = pd.read_csv(tmp_obstabf, sep='\\s+', usecols=hdr, parse_dates=[['DATE', 'TIME']], na_values=['9999999999.999'])
+    # column names of the lines for this GNSS
+    hdr_cols = obstab_headers(gfzdir=gfzdir, obstabf=obstabf)[gnss]
+    obs_gnss = 'OBS {gnss:s}'.format(gnss=gnss)
+
+    # filter the lines of the selected GNSS in blocks of lines and parse each block with the C parser
+    lst_dfobs = []
+    with compress_utils.open_compressed(os.path.join(gfzdir, obstabf), rnx=False) as finp:
+        while True:
+            lines = list(itertools.islice(finp, OBSTAB_CHUNK_LINES))
+            if len(lines) == 0:
+                break
+
+            gnss_lines = [line for line in lines if line.startswith(obs_gnss)]
+            if len(gnss_lines) > 0:
+                lst_dfobs.append(pd.read_csv(io.StringIO(''.join(gnss_lines)),
+                                             delim_whitespace=True,
+                                             header=None,
+                                             names=hdr_cols,
+                                             usecols=hdr,
+                                             dtype={'DATE': str, 'TIME': str},
+                                             na_values=['9999999999.999'],
+                                             engine='c'))
+
+    if len(lst_dfobs) == 0:
+        logger.error('{func:s}: no observations for GNSS {gnss:s} in {tab:s}'.format(gnss=colored(gnss, 'red'), tab=obstabf, func=cFuncName))
+        sys.exit(amc.E_FAILURE)
+    dfobs = pd.concat(lst_dfobs, ignore_index=True)
+
+    # combine DATE and TIME, only their unique values (shared by all PRNs at an epoch) are converted
+    date_codes, dates = pd.factorize(dfobs['DATE'])
+    time_codes, times = pd.factorize(dfobs['TIME'])
+    dfobs.insert(loc=0,
+                 column='DATE_TIME',
+                 value=pd.to_datetime(dates, format='%Y-%m-%d').to_numpy()[date_codes] + pd.to_timedelta(times).to_numpy()[time_codes])
+    dfobs.drop(columns=['DATE', 'TIME'], inplace=True)
+
+    # add the integer epoch index using as interval the smallest time difference between observed epochs
+    epochs = np.unique(dfobs['DATE_TIME'].to_numpy(dtype='datetime64[ns]'))
+    interval = np.diff(epochs).min() / np.timedelta64(1, 's') if epochs.size > 1 else 1.
+    dfobs.insert(loc=dfobs.columns.get_loc('DATE_TIME') + 1,
+                 column='EPOCH',
+                 value=gpstime.epochFromUTC(utc=dfobs['DATE_TIME'].to_numpy(dtype='datetime64[ns]'), utc_start=epochs[0], interval=interval))
     amutils.logHeadTailDataFrame(df=dfobs, dfName='dfobs[{gnss:s}]'.format(gnss=gnss), logger=logger, callerName=cFuncName)
 
     # get list of observed SVs
@@ -172,7 +217,7 @@ def rnx_observation(show_plot: bool = False, logger: logging.Logger = None) -> d
     dTimeSpan = {}  # keep track of the observed epochs
     dPRNs = {}  # keep track of the observed PRNs
     dhdr_GNSS = {}  # keep track of the observables used for analysis
-    dPRNepochs = {}  # count of observations per GNSS and per PRN
+    dPRNepochs = {}  # table of observation counts and time span per GNSS and per PRN
     idx_obst = {}  # index of first column with observables
     amc.dRTK['obstab']['obs_used'] = {}  # keeps observables per GNSS
 
@@ -222,6 +267,6 @@ def rnx_observation(show_plot: bool = False, logger: logging.Logger = None) -> d
 
     amc.dRTK['obstab']['t_span'] = dTimeSpan
     amc.dRTK['obstab']['PRNs'] = dPRNs
-    # amc.dRTK['obstab']['prn_epochs'] = dPRNepochs
+    amc.dRTK['obstab']['prn_epochs'] = dPRNepochs
 
     return dPRNepochs
@@ -0,0 +1,270 @@
+import sys
+import os
+import time
+import socket
+import logging
+from termcolor import colored
+from datetime import datetime, timedelta
+from typing import Iterator, Tuple
+
+from ampyutils import hatanaka
+
+__author__ = 'amuls'
+
+# minimum number of PRNs tracked for having PNT, as used by pnt_available
+PNT_MIN_PRNS = 4
+# width of an observation field (F14.3 followed by LLI and signal strength) of a RINEX v3 observation record
+RNX_OBS_WIDTH = 16
+
+
+def tail_lines(fname: str, poll: float = 0.5, follow: bool = True) -> Iterator[str]:
+    """
+    tail_lines yields the complete lines of fname. When follow is set, the lines appended to fname are waited for by polling
+    every poll seconds, otherwise reading stops at the end of the file
+    """
+    rest = ''
+    with open(fname, 'r') as fin:
+        while True:
+            line = fin.readline()
+            if line.endswith('\n'):
+                yield rest + line
+                rest = ''
+            else:
+                # a line without line end is still being written
+                rest += line
+                if not follow:
+                    break
+                time.sleep(poll)
+
+
+def socket_lines(address: str) -> Iterator[str]:
+    """
+    socket_lines yields the lines received from the local stream socket address, a UNIX socket path or host:port, until the
+    sender closes the connection
+    """
+    if os.path.exists(address):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    else:
+        host, _, port = address.rpartition(':')
+        sock = socket.create_connection((host or 'localhost', int(port)))
+
+    with sock, sock.makefile('r') as fsock:
+        for line in fsock:
+            yield line
+
+
+def rnx_stream_header(lines: Iterator[str]) -> Tuple[int, dict, float]:
+    """
+    rnx_stream_header reads the header of a RINEX observation stream and returns its version, the observation types per system
+    and the observation interval (None when not given)
+    """
+    lst_header, version, dObsTypes = hatanaka.rnx_header(lines)
+
+    interval = None
+    for line in lst_header:
+        if line[60:].strip() == 'INTERVAL':
+            interval = float(line[:10])
+
+    return version, dObsTypes, interval
+
+
+def rnx_obs_select(dObsTypes: dict, gnsss: list, freqs: list, obstypes: list) -> dict:
+    """
+    rnx_obs_select returns per GNSS the selected observables with their index in the observation record. As for the obstab
+    the first observable of the header matching the observation type and frequency is used
+    """
+    dObsIdx = {}
+    for gnss in gnsss:
+        lst_obstypes = dObsTypes.get(gnss, [])
+        dObsIdx[gnss] = []
+        for freq in freqs:
+            for obst in obstypes:
+                lst_match = [obstid for obstid in lst_obstypes if obstid.startswith('{obst:s}{freq:s}'.format(obst=obst, freq=freq))]
+                if len(lst_match) > 0:
+                    dObsIdx[gnss].append((lst_match[0], lst_obstypes.index(lst_match[0])))
+
+    return dObsIdx
+
+
+def rnx_obs_epochs(lines: Iterator[str], dObsIdx: dict) -> Iterator[Tuple[datetime, dict]]:
+    """
+    rnx_obs_epochs decodes the epochs of a RINEX v3 observation stream one at a time and yields the epoch time with per PRN
+    the values of the observables selected in dObsIdx. Event records (epoch flag > 1) are skipped
+    """
+    for line in lines:
+        if not line.startswith('>'):
+            continue
+
+        try:
+            _, clock, lst_sats, lst_records = hatanaka.rnx_epoch(lines, line, version=3)
+        except StopIteration:
+            break
+
+        # the special records following an event epoch have no clock offset
+        if clock is None:
+            continue
+
+        dt_epoch = datetime(int(line[2:6]), int(line[7:9]), int(line[10:12]), int(line[13:15]), int(line[16:18])) \
+            + timedelta(seconds=float(line[18:29]))
+
+        dObs = {}
+        for sat, record in zip(lst_sats, lst_records):
+            if sat[0] not in dObsIdx:
+                continue
+            dValues = {}
+            for obst, idx in dObsIdx[sat[0]]:
+                field = record[idx * RNX_OBS_WIDTH:idx * RNX_OBS_WIDTH + 14]
+                if field.strip():
+                    dValues[obst] = float(field)
+            dObs[sat.replace(' ', '0')] = dValues
+
+        yield dt_epoch, dObs
+
+
+def monitor_init(dNavSigs: dict, lst_prns: list, snrth: float, interval: float = None) -> dict:
+    """
+    monitor_init creates the state of the online monitor for the navigation signals in dNavSigs (per navigation signal name
+    its observables) of the PRNs in lst_prns
+    """
+    dMon = {}
+    dMon['prns'] = set(lst_prns)
+    dMon['snrth'] = snrth
+    dMon['interval'] = interval
+    dMon['epochs'] = 0
+    dMon['last_epoch'] = None
+
+    dMon['navsigs'] = {}
+    for navsig_name, navsig_obst_lst in dNavSigs.items():
+        dState = {}
+        # the navigation signal name starts with its GNSS
+        dState['gnss'] = navsig_name[0]
+        dState['obsts'] = navsig_obst_lst
+        # PRNs tracked at the previous epoch with per PRN its last epoch and last value per observable
+        dState['tracked'] = set()
+        dState['last'] = {}
+        dState['values'] = {}
+        # last epoch of the PRNs that lost lock
+        dState['loss'] = {}
+        # PNT availability, None until the first epoch
+        dState['pnt'] = None
+        dState['pnt_last'] = None
+        dState['pnt_loss'] = None
+        dMon['navsigs'][navsig_name] = dState
+
+    return dMon
+
+
+def monitor_event(dt: datetime, event: str, navsig: str, evtype: str, duration: float = None, value: float = None) -> dict:
+    """
+    monitor_event creates an event as reported by the online monitor, named as the events combined by loss_lock_combine
+    """
+    return {'DATE_TIME': dt, 'event': event, 'navsig': navsig, 'type': evtype, 'duration': duration, 'value': value}
+
+
+def monitor_epoch(dMon: dict, dt_epoch: datetime, dObs: dict) -> list:
+    """
+    monitor_epoch updates the monitor state with the observations of an epoch and returns the events detected: SNR jumps
+    above the SNR threshold, loss and reacquisition of lock per PRN and of PNT per navigation signal. The work done only
+    depends on the number of PRNs observed at the epoch
+    """
+    lst_events = []
+
+    # a missing epoch breaks the lock of all PRNs
+    epoch_gap = dMon['last_epoch'] is not None and dMon['interval'] is not None and \
+        (dt_epoch - dMon['last_epoch']).total_seconds() > 1.5 * dMon['interval']
+    if dMon['interval'] is None and dMon['last_epoch'] is not None:
+        dMon['interval'] = (dt_epoch - dMon['last_epoch']).total_seconds()
+
+    for navsig_name, dState in dMon['navsigs'].items():
+        # the PRNs tracked have all observables of the navigation signal
+        tracked = set(prn for prn, dValues in dObs.items()
+                      if prn[0] == dState['gnss'] and prn in dMon['prns'] and all(obst in dValues for obst in dState['obsts']))
+        prev_tracked = set() if epoch_gap else dState['tracked']
+        if epoch_gap and dState['pnt']:
+            dState['pnt'] = False
+            dState['pnt_loss'] = dState['pnt_last']
+            lst_events.append(monitor_event(dt=dState['pnt_last'], event='Loss', navsig=navsig_name, evtype='PNT', value=0))
+
+        # SNR jumps with respect to the previous observation of each PRN
+        for prn in tracked:
+            dPrev = dState['values'].setdefault(prn, {})
+            for obst in dState['obsts']:
+                if obst[0] == 'S' and obst in dPrev:
+                    dsnr = dObs[prn][obst] - dPrev[obst]
+                    if dsnr > dMon['snrth']:
+                        lst_events.append(monitor_event(dt=dt_epoch, event='SNR rise', navsig=navsig_name, evtype=prn, value=dsnr))
+                    elif dsnr < -dMon['snrth']:
+                        lst_events.append(monitor_event(dt=dt_epoch, event='SNR drop', navsig=navsig_name, evtype=prn, value=dsnr))
+                dPrev[obst] = dObs[prn][obst]
+
+        # loss of lock is reported at the last epoch of a PRN, reacquisition with the duration of the gap
+        for prn in dState['tracked'] - (tracked & prev_tracked):
+            dState['loss'][prn] = dState['last'][prn]
+            lst_events.append(monitor_event(dt=dState['last'][prn], event='Loss', navsig=navsig_name, evtype=prn))
+        for prn in tracked - prev_tracked:
+            if prn in dState['loss']:
+                dt_loss = dState['loss'].pop(prn)
+                lst_events.append(monitor_event(dt=dt_epoch, event='Reacquisition', navsig=navsig_name, evtype=prn,
+                                                duration=(dt_epoch - dt_loss).total_seconds()))
+        for prn in tracked:
+            dState['last'][prn] = dt_epoch
+        dState['tracked'] = tracked
+
+        # PNT availability as determined by pnt_available
+        has_pnt = len(tracked) >= PNT_MIN_PRNS
+        if dState['pnt'] is None and not has_pnt:
+            dState['pnt_loss'] = dt_epoch
+            lst_events.append(monitor_event(dt=dt_epoch, event='Loss', navsig=navsig_name, evtype='PNT', value=len(tracked)))
+        elif dState['pnt'] and not has_pnt:
+            dState['pnt_loss'] = dState['pnt_last']
+            lst_events.append(monitor_event(dt=dState['pnt_last'], event='Loss', navsig=navsig_name, evtype='PNT', value=len(tracked)))
+        elif dState['pnt'] is False and has_pnt:
+            lst_events.append(monitor_event(dt=dt_epoch, event='Reacquisition', navsig=navsig_name, evtype='PNT', value=len(tracked),
+                                            duration=(dt_epoch - dState['pnt_loss']).total_seconds()))
+        dState['pnt'] = has_pnt
+        if has_pnt:
+            dState['pnt_last'] = dt_epoch
+
+    dMon['last_epoch'] = dt_epoch
+    dMon['epochs'] += 1
+
+    return lst_events
+
+
+def monitor_stream(lines: Iterator[str],
+                   gnsss: list,
+                   lst_prns: list,
+                   freqs: list,
+                   obstypes: list,
+                   snrth: float,
+                   logger: logging.Logger = None) -> Iterator[Tuple[datetime, list]]:
+    """
+    monitor_stream decodes the RINEX v3 observation stream lines epoch by epoch and yields per epoch the events detected
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    lines = iter(lines)
+    version, dObsTypes, interval = rnx_stream_header(lines)
+    if version != 3:
+        if logger is not None:
+            logger.error('{func:s}: monitoring requires a RINEX v3 observation stream (version {version:d})'.format(version=version, func=cFuncName))
+        return
+
+    # the navigation signals are monitored per GNSS
+    dObsIdx = rnx_obs_select(dObsTypes=dObsTypes, gnsss=gnsss, freqs=freqs, obstypes=obstypes)
+    dNavSigs = {}
+    for gnss, lst_obsidx in dObsIdx.items():
+        for obst, _ in lst_obsidx:
+            dNavSigs.setdefault('{gnss:s}{navsig:s}'.format(gnss=gnss, navsig=obst[1:]), []).append(obst)
+
+    if logger is not None:
+        logger.info('{func:s}: monitoring {navsigs:s} (interval {interval!s} s)'
+                    .format(navsigs=', '.join('{navsig:s}: {obsts:s}'.format(navsig=navsig, obsts=' '.join(obsts)) for navsig, obsts in dNavSigs.items()),
+                            interval=interval,
+                            func=cFuncName))
+
+    dMon = monitor_init(dNavSigs=dNavSigs, lst_prns=lst_prns, snrth=snrth, interval=interval)
+
+    for dt_epoch, dObs in rnx_obs_epochs(lines=lines, dObsIdx=dObsIdx):
+        yield dt_epoch, monitor_epoch(dMon=dMon, dt_epoch=dt_epoch, dObs=dObs)
@@ -0,0 +1,203 @@
+import sys
+import os
+import logging
+from termcolor import colored
+import re
+import numpy as np
+import pandas as pd
+
+from ampyutils import am_colstore, am_profile, compress_utils
+from GNSS import gpstime
+
+__author__ = 'amuls'
+
+# field numbers (counting from 1 as in the gLAB documentation) of the gLAB v6 OUTPUT message and dtype used for storing
+# (see glabng -faq: seconds of day is field 4, the north / east / up errors are fields 24 / 25 / 26)
+dGLab_OUTPUT = {'year': (2, np.int16),
+                'doy': (3, np.int16),
+                'sod': (4, np.float64),
+                'lat': (21, np.float64),
+                'lon': (22, np.float64),
+                'h': (23, np.float64),
+                'dN': (24, np.float64),
+                'dE': (25, np.float64),
+                'dU': (26, np.float64),
+                'sdN': (27, np.float32),
+                'sdE': (28, np.float32),
+                'sdU': (29, np.float32),
+                'GDOP': (30, np.float32),
+                'PDOP': (31, np.float32),
+                'TDOP': (32, np.float32),
+                'HDOP': (33, np.float32),
+                'VDOP': (34, np.float32)}
+
+# field numbers of the gLAB v6 POSTFIT message (one line per satellite and measurement), PRN is combined from GNSS and PRN fields
+dGLab_POSTFIT = {'year': (2, np.int16),
+                 'doy': (3, np.int16),
+                 'sod': (4, np.float64),
+                 'gnss': (6, 'S1'),
+                 'prn': (7, np.int16),
+                 'meas': (10, 'S8'),
+                 'residual': (11, np.float64)}
+
+# regular expressions for the INFO lines used to fill in the processing information
+dGLab_INFO = {'obs': re.compile(r'^INFO\s+INPUT\s+Observation file.*?:\s*(\S+)', re.IGNORECASE),
+              'nav': re.compile(r'^INFO\s+INPUT\s+Navigation (?:message )?file.*?:\s*(\S+)', re.IGNORECASE),
+              'mask': re.compile(r'^INFO\s+PREPROCESSING\s+Elevation mask\s*:\s*(.+)$', re.IGNORECASE),
+              'tropo': re.compile(r'^INFO\s+MODELLING\s+Tropospheric correction\s*:\s*(.+)$', re.IGNORECASE),
+              'iono': re.compile(r'^INFO\s+MODELLING\s+Ionospheric correction\s*:\s*(.+)$', re.IGNORECASE),
+              'ref_clk': re.compile(r'^INFO\s+FILTER\s+Reference (?:GNSS )?clock.*?:\s*(.+)$', re.IGNORECASE),
+              'meas': re.compile(r'^INFO\s+FILTER\s+.*Measurements? used.*?:\s*(.+)$', re.IGNORECASE)}
+
+
+def glab_flush(dStore: dict, dBuffer: dict) -> int:
+    """
+    glab_flush writes the buffered fields to the column store and empties the buffer
+    """
+    if len(dBuffer['sod']) > 0:
+        am_colstore.colstore_append(dStore=dStore, dChunk=dBuffer)
+        for column in dBuffer:
+            dBuffer[column] = []
+
+    return dStore['rows']
+
+
+@am_profile.profile_func(rows=lambda ret: ret['rows']['OUTPUT'])
+def glab_parse_output(glab_outf: str,
+                      store_dir: str = None,
+                      chunk_rows: int = 50000,
+                      logger: logging.Logger = None) -> dict:
+    """
+    glab_parse_output streams through a (gzipped) gLAB output file and stores the OUTPUT and POSTFIT messages in a column store
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # column store is created next to the gLAB output file
+    if store_dir is None:
+        store_dir = re.sub(r'(\.out)?(\.gz)?$', '', glab_outf) + '.cols'
+
+    dOutput = {}
+    dOutput['glab_out'] = glab_outf
+    dOutput['stores'] = {'OUTPUT': os.path.join(store_dir, 'OUTPUT'), 'POSTFIT': os.path.join(store_dir, 'POSTFIT')}
+    dOutput['rows'] = {}
+
+    dStores = {}
+    dStores['OUTPUT'] = am_colstore.colstore_create(store_dir=dOutput['stores']['OUTPUT'],
+                                                    dColumns={col: dtype for col, (_, dtype) in dGLab_OUTPUT.items()},
+                                                    logger=logger)
+    dStores['POSTFIT'] = am_colstore.colstore_create(store_dir=dOutput['stores']['POSTFIT'],
+                                                     dColumns={col: dtype for col, (_, dtype) in dGLab_POSTFIT.items()},
+                                                     logger=logger)
+
+    # buffers keep the fields (as strings) until chunk_rows lines are collected
+    dBuffers = {msg: {col: [] for col in dStores[msg]['columns']} for msg in dStores}
+    dFields = {'OUTPUT': [(col, idx - 1) for col, (idx, _) in dGLab_OUTPUT.items()],
+               'POSTFIT': [(col, idx - 1) for col, (idx, _) in dGLab_POSTFIT.items()]}
+    dInfoLines = {key: [] for key in dGLab_INFO}
+
+    with compress_utils.open_compressed(glab_outf, rnx=False) as fin:
+        for line in fin:
+            msg = line[:7]
+            if msg == 'OUTPUT ' or msg == 'POSTFIT':
+                msg = msg.strip()
+                fields = line.split()
+                dBuffer = dBuffers[msg]
+                for col, idx in dFields[msg]:
+                    dBuffer[col].append(fields[idx])
+
+                if len(dBuffer['sod']) >= chunk_rows:
+                    glab_flush(dStore=dStores[msg], dBuffer=dBuffer)
+
+            elif msg.startswith('INFO'):
+                for key, regex in dGLab_INFO.items():
+                    match = regex.match(line)
+                    if match:
+                        dInfoLines[key].append(match.group(1).strip())
+
+    for msg, dStore in dStores.items():
+        dOutput['rows'][msg] = glab_flush(dStore=dStore, dBuffer=dBuffers[msg])
+        am_colstore.colstore_close(dStore=dStore, dMeta={'glab_out': os.path.basename(glab_outf), 'message': msg})
+
+    # create the processing information from the INFO lines and the OUTPUT messages
+    dOutput['info'] = glab_info(dInfoLines=dInfoLines, dCols=am_colstore.colstore_read(store_dir=dOutput['stores']['OUTPUT']))
+
+    if logger is not None:
+        logger.info('{func:s}: parsed {out:s}: {output:d} OUTPUT / {postfit:d} POSTFIT messages stored in {store:s}'
+                    .format(out=colored(os.path.basename(glab_outf), 'green'),
+                            output=dOutput['rows']['OUTPUT'],
+                            postfit=dOutput['rows']['POSTFIT'],
+                            store=store_dir,
+                            func=cFuncName))
+
+    return dOutput
+
+
+def glab_info(dInfoLines: dict, dCols: dict) -> dict:
+    """
+    glab_info creates the processing information dict (as used by am_config.get_title_info) from the INFO lines and the OUTPUT columns
+    """
+    dInfo = {}
+    dInfo['files'] = {}
+    dInfo['files']['obs'] = [os.path.basename(obsf) for obsf in dInfoLines['obs']]
+    dInfo['files']['nav'] = [os.path.basename(navf) for navf in dInfoLines['nav']]
+
+    dInfo['rx'] = {}
+    dInfo['rx']['marker'] = dInfo['files']['obs'][0][:4] if len(dInfo['files']['obs']) > 0 else ''
+
+    dInfo['filter'] = {}
+    dInfo['filter']['meas'] = dInfoLines['meas'][0] if len(dInfoLines['meas']) > 0 else ''
+    dInfo['filter']['ref_clk'] = dInfoLines['ref_clk'][0] if len(dInfoLines['ref_clk']) > 0 else ''
+    dInfo['rx']['gnss'] = dInfo['filter']['ref_clk']
+
+    dInfo['model'] = {}
+    dInfo['model']['tropo'] = dInfoLines['tropo'][0] if len(dInfoLines['tropo']) > 0 else ''
+    dInfo['model']['iono'] = dInfoLines['iono'][0] if len(dInfoLines['iono']) > 0 else ''
+
+    dInfo['pp'] = {}
+    dInfo['pp']['mask'] = dInfoLines['mask'][0] if len(dInfoLines['mask']) > 0 else ''
+
+    # date and mean position are determined from the OUTPUT messages
+    dInfo['summary'] = {}
+    if dCols['sod'].shape[0] > 0:
+        utc_first = gpstime.UTCFromYDoy(year=dCols['year'][0], doy=dCols['doy'][0], sod=dCols['sod'][0])
+        dt_first = pd.Timestamp(utc_first)
+        week, _ = gpstime.wtowFromUTC(utc=utc_first)
+
+        dInfo['summary']['Year'] = dt_first.year
+        dInfo['summary']['Month'] = dt_first.month
+        dInfo['summary']['Day'] = dt_first.day
+        dInfo['summary']['DoY'] = int(dCols['doy'][0])
+        dInfo['summary']['GPSWeek'] = int(week)
+        dInfo['summary']['epochs'] = int(dCols['sod'].shape[0])
+
+        dInfo['pp']['rx_geod'] = [float(np.mean(dCols['lat'])), float(np.mean(dCols['lon'])), float(np.mean(dCols['h']))]
+    else:
+        dInfo['pp']['rx_geod'] = None
+
+    return dInfo
+
+
+def glab_position_stats(lst_stores: list) -> pd.DataFrame:
+    """
+    glab_position_stats determines the statistics of the NEU position errors for the OUTPUT column stores in lst_stores
+    """
+    lst_stats = []
+    for store_dir in lst_stores:
+        dCols = am_colstore.colstore_read(store_dir=store_dir, columns=['dN', 'dE', 'dU', 'PDOP'])
+        dSchema = am_colstore.colstore_schema(store_dir=store_dir)
+
+        dStats = {}
+        dStats['glab_out'] = dSchema['meta'].get('glab_out', store_dir)
+        dStats['epochs'] = dSchema['rows']
+        for crd in ['dN', 'dE', 'dU']:
+            values = np.asarray(dCols[crd])
+            dStats['{crd:s} mean'.format(crd=crd)] = np.mean(values) if values.size > 0 else np.nan
+            dStats['{crd:s} std'.format(crd=crd)] = np.std(values) if values.size > 0 else np.nan
+            dStats['{crd:s} 95%'.format(crd=crd)] = np.percentile(np.abs(values), 95) if values.size > 0 else np.nan
+        dist_3D = np.sqrt(np.asarray(dCols['dN']) ** 2 + np.asarray(dCols['dE']) ** 2 + np.asarray(dCols['dU']) ** 2)
+        dStats['3D rms'] = np.sqrt(np.mean(dist_3D ** 2)) if dist_3D.size > 0 else np.nan
+        dStats['PDOP mean'] = np.mean(dCols['PDOP']) if dSchema['rows'] > 0 else np.nan
+
+        lst_stats.append(dStats)
+
+    return pd.DataFrame(lst_stats)
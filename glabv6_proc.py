@@ -7,12 +7,17 @@ from termcolor import colored
 import json
 import logging
 import pathlib
+import itertools
+import time
 from string import Template
+from shutil import copyfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ampyutils import am_config as amc
 from gfzrnx import gfzrnx_constants as gfzc
-from ampyutils import amutils, location
+from ampyutils import amutils, location, am_profile, compress_utils
 from ampyutils import gnss_cmd_opts as gco
+from glab import glab_output
 
 __author__ = 'amuls'
 
@@ -27,7 +32,7 @@ def treatCmdOpts(argv):
     baseName = os.path.basename(__file__)
     amc.cBaseName = colored(baseName, 'yellow')
 
-    helpTxt = amc.cBaseName + ' gLAB (v6) processing of receiver position based on a template configuration file'
+    helpTxt = amc.cBaseName + ' gLAB (v6) processing of receiver position based on a template configuration file. A session is run for each combination of the given days, GNSS combinations, cutoff angles and code combinations'
 
     # create the parser for command line arguments
     parser = argparse.ArgumentParser(description=helpTxt)
@@ -37,29 +42,49 @@ def treatCmdOpts(argv):
                         type=str,
                         default=gco.dir_igs)
 
+    parser.add_argument('--rxtype', help='receiver type (default {rx:s})'.format(rx=colored('P3RS2', 'green')),
+                        required=False,
+                        type=str,
+                        default='P3RS2')
+
+    parser.add_argument('--marker', help='marker name (4 chars)',
+                        required=True,
+                        type=str,
+                        action=gco.marker_action)
+
     parser.add_argument('--year', help='Year (4 digits)',
                         required=True, type=int,
                         action=gco.year_action)
 
-    parser.add_argument('--doy', help='day-of-year [1..366]',
+    parser.add_argument('--doy', help='day(s)-of-year [1..366]',
                         required=True, type=int,
-                        action=gco.doy_action)
+                        action=gco.doy_list_action,
+                        nargs='+')
 
-    parser.add_argument('--gnss', help='select GNSS(s) to use (out of {gnsss:s}, default {gnss:s})'
-                                       .format(gnsss='|'.join(gfzc.lst_GNSSs),
+    parser.add_argument('--gnss', help='GNSS combination(s) to use (eg {gnsss:s}, default {gnss:s})'
+                                       .format(gnsss=' '.join(gfzc.lst_GNSSs + [''.join(gfzc.lst_GNSSs)]),
                                                gnss=colored(gfzc.lst_GNSSs[0], 'green')),
-                        default=gfzc.lst_GNSSs[0],
+                        default=gfzc.lst_GNSSs[:1],
                         type=str,
                         required=False,
-                        action=gco.gnss_action,
+                        action=gco.gnsscomb_action,
                         nargs='+')
 
-    parser.add_argument('--cutoff', help='cutoff angle (default {cutoff:s})'
+    parser.add_argument('--cutoff', help='cutoff angle(s) (default {cutoff:s})'
                                          .format(cutoff=colored('5 deg', 'green')),
                         required=False,
-                        default=5,
+                        default=[5],
                         type=int,
-                        action=gco.cutoff_action)
+                        action=gco.cutoff_list_action,
+                        nargs='+')
+
+    parser.add_argument('--prcodes', help='code combination(s) used, codes of a combination are comma separated (eg C1C C1C,C5Q, default {codes:s})'
+                                          .format(codes=colored('C1C', 'green')),
+                        required=False,
+                        default=['C1C'],
+                        type=str,
+                        action=gco.prcodes_action,
+                        nargs='+')
 
     parser.add_argument('--template', help='glab template file (out of {tmpls:s}, default {tmpl:s})'
                                            .format(tmpls='|'.join(gco.dGLab_tmpls.values()),
@@ -68,6 +93,13 @@ def treatCmdOpts(argv):
                         type=str,
                         default=gco.dGLab_tmpls['kin'])
 
+    parser.add_argument('--workers', help='maximum number of glabng sessions running concurrently (default {workers:s})'
+                                          .format(workers=colored(str(min(4, os.cpu_count())), 'green')),
+                        required=False,
+                        type=int,
+                        default=min(4, os.cpu_count()),
+                        action=gco.workers_action)
+
     parser.add_argument('--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'
                                           .format(choices='|'.join(gco.lst_logging_choices), choice=colored(' '.join(gco.lst_logging_choices[3:5]), 'green')),
                         nargs=2,
@@ -79,7 +111,7 @@ def treatCmdOpts(argv):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.igsdir, args.year, args.doy, args.gnss, args.cutoff, args.template, args.logging
+    return args.igsdir, args.rxtype, args.marker, args.year, args.doy, args.gnss, args.cutoff, args.prcodes, args.template, args.workers, args.logging
 
 
 def check_arguments(logger: logging.Logger) -> int:
@@ -88,41 +120,10 @@ def check_arguments(logger: logging.Logger) -> int:
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # check whether the given dir_rnx exist
     # root directory for processing
     amc.dRTK['proc'] = {}
-
-    amc.dRTK['proc']['dir_rnx'] = os.path.join(os.path.expanduser("~"),
-                                               'RxTURP/BEGPIOS',
-                                               amc.dRTK['options']['rxtype'],
-                                               'rinex',
-                                               '{yy:s}{doy:03d}'.format(yy=str(amc.dRTK['options']['year'])[-2:],
-                                                                        doy=amc.dRTK['options']['doy']))
-    path = pathlib.Path(amc.dRTK['proc']['dir_rnx'])
-    if not path.is_dir():
-        logger.info('{func:s}: root directory {root:s} does not exist'.format(root=colored(amc.dRTK['proc']['dir_rnx'], 'red'),
-                                                                              func=cFuncName))
-        return amc.E_DIR_NOT_EXIST
-    else:  # change to directory
-        os.chdir(path)
-
-    # check whether the given IGS dir exist
-    amc.dRTK['proc']['dir_igs'] = os.path.join(amc.dRTK['options']['igs_root'],
-                                               '{yy:s}{doy:03d}'.format(yy=str(amc.dRTK['options']['year'])[-2:],
-                                                                        doy=amc.dRTK['options']['doy']))
-    path = pathlib.Path(amc.dRTK['proc']['dir_igs'])
-    if not path.is_dir():
-        logger.info('{func:s}: IGS directory {igs:s} does not exist'.format(igs=colored(amc.dRTK['proc']['dir_igs'], 'red'),
-                                                                            func=cFuncName))
-        return amc.E_DIR_NOT_EXIST
-
-    # path to the glab directory, create it of not existing
-    amc.dRTK['proc']['dir_glab'] = os.path.join(amc.dRTK['proc']['dir_rnx'], 'glab')
-    path = pathlib.Path(amc.dRTK['proc']['dir_glab'])
-    if not path.is_dir():
-        path.mkdir(parents=True, exist_ok=True)
-        logger.info('{func:s}: Created glab directory {glab:s} does not exist'.format(glab=colored(amc.dRTK['proc']['dir_glab'], 'green'),
-                                                                                      func=cFuncName))
+    amc.dRTK['proc']['dir_root'] = os.path.join(gco.ROOTDIR, amc.dRTK['options']['rxtype'], 'rinex')
+    amc.dRTK['proc']['marker'] = amc.dRTK['options']['marker']
 
     # check whether the template file exists
     path = pathlib.Path(amc.dRTK['options']['template'])
@@ -131,126 +132,285 @@ def check_arguments(logger: logging.Logger) -> int:
                                                                                   func=cFuncName))
         return amc.E_FILE_NOT_EXIST
 
-    # create the RINEX obs name and check whether it exists
-    amc.dRTK['proc']['cmp_obs'] = '{marker:s}{doy:03d}0.{yy:s}D.Z'.format(marker=amc.dRTK['options']['marker'],
-                                                                          yy=str(amc.dRTK['options']['year'])[-2:],
-                                                                          doy=amc.dRTK['options']['doy'])
+    # check the directories for each day processed
+    amc.dRTK['proc']['days'] = {}
+    for doy in amc.dRTK['options']['doy']:
+        yydoy = '{yy:s}{doy:03d}'.format(yy=str(amc.dRTK['options']['year'])[-2:], doy=doy)
+
+        dDay = {}
+        dDay['dir_rnx'] = os.path.join(amc.dRTK['proc']['dir_root'], yydoy)
+        path = pathlib.Path(dDay['dir_rnx'])
+        if not path.is_dir():
+            logger.info('{func:s}: root directory {root:s} does not exist'.format(root=colored(dDay['dir_rnx'], 'red'),
+                                                                                  func=cFuncName))
+            return amc.E_DIR_NOT_EXIST
+
+        # check whether the given IGS dir exist
+        dDay['dir_igs'] = os.path.join(amc.dRTK['options']['igs_root'], yydoy)
+        path = pathlib.Path(dDay['dir_igs'])
+        if not path.is_dir():
+            logger.info('{func:s}: IGS directory {igs:s} does not exist'.format(igs=colored(dDay['dir_igs'], 'red'),
+                                                                                func=cFuncName))
+            return amc.E_DIR_NOT_EXIST
+
+        # path to the glab directory, create it of not existing
+        dDay['dir_glab'] = os.path.join(dDay['dir_rnx'], 'glab')
+        path = pathlib.Path(dDay['dir_glab'])
+        if not path.is_dir():
+            path.mkdir(parents=True, exist_ok=True)
+            logger.info('{func:s}: Created glab directory {glab:s}'.format(glab=colored(dDay['dir_glab'], 'green'),
+                                                                           func=cFuncName))
+
+        # create the RINEX obs name and check whether it exists
+        dDay['cmp_obs'] = '{marker:s}{doy:03d}0.{yy:s}D.Z'.format(marker=amc.dRTK['options']['marker'],
+                                                                  yy=str(amc.dRTK['options']['year'])[-2:],
+                                                                  doy=doy)
+        if not pathlib.Path(os.path.join(dDay['dir_rnx'], dDay['cmp_obs'])).is_file():
+            logger.info('{func:s}: RINEX observation file {obs:s} does not exist'.format(obs=colored(dDay['cmp_obs'], 'red'),
+                                                                                         func=cFuncName))
+            return amc.E_FILE_NOT_EXIST
 
-    # determine the options for GNSS and codes / freqs
-    amc.dRTK['proc']['marker'] = amc.dRTK['options']['marker']
-    amc.dRTK['proc']['gnss'] = [gnss for gnss in amc.dRTK['options']['gnss']]
-    amc.dRTK['proc']['cmp_nav'] = []
-    for gnss in amc.dRTK['proc']['gnss']:
         # determine the navigation files used (currently using the IGS NAV files - should be changed)
-        amc.dRTK['proc']['cmp_nav'].append('BRUX00BEL_R_{year:04d}{doy:03d}0000_01D_{gnss:s}N.rnx.gz'
-                                           .format(year=amc.dRTK['options']['year'],
-                                                   doy=amc.dRTK['options']['doy'],
-                                                   gnss=gnss))
+        dDay['cmp_nav'] = {}
+        for gnss in sorted(set(''.join(amc.dRTK['options']['gnss']))):
+            dDay['cmp_nav'][gnss] = 'BRUX00BEL_R_{year:04d}{doy:03d}0000_01D_{gnss:s}N.rnx.gz'.format(year=amc.dRTK['options']['year'],
+                                                                                                      doy=doy,
+                                                                                                      gnss=gnss)
+
+        amc.dRTK['proc']['days'][doy] = dDay
+
+    return amc.E_SUCCESS
+
 
-    # get the codes used and corresponding frequency numbers
-    amc.dRTK['proc']['codes'] = [code for code in amc.dRTK['options']['prcodes']]
-    amc.dRTK['proc']['freqs'] = [prcode[1:2] for prcode in amc.dRTK['proc']['codes']]
+def prepare_inputs(logger: logging.Logger) -> int:
+    """
+    prepare_inputs decompresses the observation and navigation files once per day so that they are shared by all sessions of that day
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # name for glab output file
-    amc.dRTK['proc']['glab_out'] = '{marker:s}-{gnss:s}-{codes:s}.out'.format(marker=amc.dRTK['proc']['marker'],
-                                                                              gnss=''.join(amc.dRTK['proc']['gnss']),
-                                                                              codes='-'.join(amc.dRTK['proc']['codes']))
-    amc.dRTK['proc']['glab_cfg'] = amc.dRTK['proc']['glab_out'][:-3] + 'cfg'
+    for doy, dDay in amc.dRTK['proc']['days'].items():
+        # uncompress the RINEX OBS file (Hatanaka compressed) in the RINEX directory
+        dDay['obs'] = os.path.join(dDay['dir_rnx'], dDay['cmp_obs'][:-3] + 'O')
+        if not pathlib.Path(dDay['obs']).is_file():
+            try:
+                compress_utils.decompress_file(cmpf=os.path.join(dDay['dir_rnx'], dDay['cmp_obs']), fname=dDay['obs'], rnx=True)
+            except (IOError, EOFError, ValueError) as e:
+                logger.error('{func:s}: error {err!s} decompressing {obs:s}'.format(obs=colored(dDay['cmp_obs'], 'red'), err=e, func=cFuncName))
+                return amc.E_FAILURE
+
+        # uncompress the navigation files into the glab directory
+        dDay['nav'] = {}
+        for gnss, cmp_nav in dDay['cmp_nav'].items():
+            dDay['nav'][gnss] = os.path.join(dDay['dir_glab'], cmp_nav[:-3])
+            if not pathlib.Path(dDay['nav'][gnss]).is_file():
+                try:
+                    compress_utils.decompress_file(cmpf=os.path.join(dDay['dir_igs'], cmp_nav), fname=dDay['nav'][gnss])
+                except (IOError, EOFError) as e:
+                    logger.error('{func:s}: error {err!s} decompressing {nav:s}'.format(nav=colored(cmp_nav, 'red'), err=e, func=cFuncName))
+                    return amc.E_FILE_NOT_EXIST
+
+        logger.info('{func:s}: inputs for DOY {doy:03d}: {obs:s} {navs:s}'.format(doy=doy,
+                                                                                  obs=colored(os.path.basename(dDay['obs']), 'green'),
+                                                                                  navs=colored(' '.join([os.path.basename(nav) for nav in dDay['nav'].values()]), 'green'),
+                                                                                  func=cFuncName))
 
     return amc.E_SUCCESS
 
 
-def create_session_template(logger: logging.Logger):
+def create_sessions(logger: logging.Logger) -> list:
     """
-    create_session_template creates the configuration file for glabng
+    create_sessions expands the grid of days, GNSS combinations, cutoff angles and code combinations into a list of sessions
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    lst_sessions = []
+    for doy, gnss, cutoff, prcodes in itertools.product(amc.dRTK['options']['doy'],
+                                                        amc.dRTK['options']['gnss'],
+                                                        amc.dRTK['options']['cutoff'],
+                                                        amc.dRTK['options']['prcodes']):
+        dDay = amc.dRTK['proc']['days'][doy]
+
+        dSession = {}
+        dSession['doy'] = doy
+        dSession['gnss'] = [syst for syst in gnss]
+        dSession['cutoff'] = cutoff
+        # get the codes used and corresponding frequency numbers
+        dSession['codes'] = prcodes.split(',')
+        dSession['freqs'] = [prcode[1:2] for prcode in dSession['codes']]
+        dSession['dir_glab'] = dDay['dir_glab']
+        dSession['obs'] = dDay['obs']
+        dSession['nav'] = [dDay['nav'][syst] for syst in dSession['gnss']]
+
+        # name for glab output and configuration file
+        dSession['glab_out'] = '{marker:s}-{gnss:s}-{codes:s}-{cutoff:02d}.out'.format(marker=amc.dRTK['proc']['marker'],
+                                                                                       gnss=gnss,
+                                                                                       codes='-'.join(dSession['codes']),
+                                                                                       cutoff=cutoff)
+        dSession['glab_cfg'] = dSession['glab_out'][:-3] + 'cfg'
+
+        lst_sessions.append(dSession)
+
+    logger.info('{func:s}: created {count:d} sessions'.format(count=len(lst_sessions), func=cFuncName))
+
+    return lst_sessions
+
+
+def create_session_template(dSession: dict, glab_templ: Template, logger: logging.Logger) -> str:
+    """
+    create_session_template creates the configuration file for glabng for this session
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # create dict used for replacing the template keywords
     dTemplate = {}
-    dTemplate['CMP_OBS_FILE'] = os.path.join(amc.dRTK['proc']['dir_rnx'], amc.dRTK['proc']['obs'])
-    dTemplate['CMP_NAV_FILES'] = ''
-    for nav_file in amc.dRTK['proc']['nav']:
-        dTemplate['CMP_NAV_FILES'] += ' ' + os.path.join(amc.dRTK['proc']['dir_igs'], nav_file)
-    dTemplate['CUTOFF_ANGLE'] = amc.dRTK['options']['cutoff']
-    dTemplate['GNSS'] = ''.join(amc.dRTK['proc']['gnss'])
-    if len(amc.dRTK['proc']['codes']) == 1:
-        dTemplate['PRCODES'] = '-'.join(amc.dRTK['proc']['codes'])
+    dTemplate['CMP_OBS_FILE'] = dSession['obs']
+    dTemplate['CMP_NAV_FILES'] = ' '.join(dSession['nav'])
+    dTemplate['CUTOFF_ANGLE'] = dSession['cutoff']
+    dTemplate['GNSS'] = ''.join(dSession['gnss'])
+    if len(dSession['codes']) == 1:
+        dTemplate['PRCODES'] = '-'.join(dSession['codes'])
     else:
-        dTemplate['PRCODES'] = 'PC' + ''.join(amc.dRTK['proc']['freqs']) + '-' + '-'.join(amc.dRTK['proc']['codes'])
-    dTemplate['GLAB_OUT'] = os.path.join(amc.dRTK['proc']['dir_glab'], amc.dRTK['proc']['glab_out'])
-
-    # report to the user
-    # logger.info('{func:s}: creating config file {cfg:s} using:\n{json!s}'.format(cfg=colored(amc.dRTK['proc']['glab_cfg'], 'green'), func=cFuncName, json=json.dumps(dTemplate, sort_keys=False, indent=4, default=amutils.DT_convertor)))
+        dTemplate['PRCODES'] = 'PC' + ''.join(dSession['freqs']) + '-' + '-'.join(dSession['codes'])
+    dTemplate['GLAB_OUT'] = os.path.join(dSession['dir_glab'], dSession['glab_out'])
 
     # create the configuration file
+    glab_cfg = os.path.join(dSession['dir_glab'], dSession['glab_cfg'])
     try:
-        f_tmpl = open(amc.dRTK['options']['template'])
-        glab_templ = Template(f_tmpl.read())
-
-        # substitute the variables in the template file
-        glab_cfg = glab_templ.substitute(dTemplate)
+        with open(glab_cfg, 'w') as fd_cfg:
+            fd_cfg.write(glab_templ.substitute(dTemplate))
 
-        # save to configuration file
-        fd_cfg = open(os.path.join(amc.dRTK['proc']['dir_glab'], amc.dRTK['proc']['glab_cfg']), 'w')
-        fd_cfg.write(glab_cfg)
-        fd_cfg.close()
-
-        logger.info('{func:s}: created glab configuration file {cfg:s}\n{content!s}'.format(cfg=amc.dRTK['proc']['glab_cfg'],
-                                                                                            content=glab_cfg, func=cFuncName))
+        logger.debug('{func:s}: created glab configuration file {cfg:s}'.format(cfg=glab_cfg, func=cFuncName))
 
     except IOError:
-        logger.info('{func:s}: problems using template file {tmpl:s}'.format(tmpl=amc.dRTK['options']['template'],
-                                                                             func=cFuncName))
+        logger.info('{func:s}: problems creating configuration file {cfg:s}'.format(cfg=glab_cfg, func=cFuncName))
         sys.exit(amc.E_FILE_NOT_EXIST)
 
+    return glab_cfg
+
 
-def run_glabng_session(logger: logging.Logger):
+def run_glabng_session(dSession: dict, glab_templ: Template, logger: logging.Logger) -> dict:
     """
-    run_glabng_session runs gLAB (v6.x) using provided configuration file
+    run_glabng_session runs gLAB (v6.x) for a session and returns the result of this session
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # uncompress the RINEX OBS file
-    runGLABNG = '{prog:s} -input:cfg {cfg:s}'.format(prog=amc.dRTK['progs']['glabng'],
-                                                     cfg=os.path.join(amc.dRTK['proc']['dir_glab'],
-                                                                      amc.dRTK['proc']['glab_cfg']))
-    logger.info('{func:s}: Running:\n{cmd:s}'.format(func=cFuncName,
-                                                     cmd=colored(runGLABNG, 'green')))
+    dResult = {key: dSession[key] for key in ['doy', 'gnss', 'cutoff', 'codes']}
+    dResult['cfg'] = create_session_template(dSession=dSession, glab_templ=glab_templ, logger=logger)
 
     # run the program
-    exeprogram.subProcessDisplayStdOut(cmd=runGLABNG, verbose=True)
+    wall_start = time.perf_counter()
+    dResult['err_code'] = amutils.run_subprocess(sub_proc=[amc.dRTK['progs']['glabng'], '-input:cfg', dResult['cfg']], logger=logger)
 
     # compress the resulting "out" file
-    runGZIP = '{prog:s} -f {zip:s}'.format(prog=amc.dRTK['progs']['gzip'],
-                                           zip=os.path.join(amc.dRTK['proc']['dir_glab'], amc.dRTK['proc']['glab_out']))
-    logger.info('{func:s}: compressing {out:s} file by:\n{cmd:s}'.format(out=amc.dRTK['proc']['glab_out'],
-                                                                         func=cFuncName,
-                                                                         cmd=colored(runGZIP, 'green')))
-    # run the program
-    exeprogram.subProcessDisplayStdErr(cmd=runGZIP, verbose=True)
+    glab_out = os.path.join(dSession['dir_glab'], dSession['glab_out'])
+    if dResult['err_code'] == amc.E_SUCCESS:
+        dResult['out'] = glab_out + '.gz'
+        try:
+            compress_utils.compress_file(fname=glab_out, cmpf=dResult['out'])
+            os.remove(glab_out)
+        except IOError as e:
+            logger.error('{func:s}: error {err!s} compressing {out:s}'.format(out=colored(glab_out, 'red'), err=e, func=cFuncName))
+            dResult['err_code'] = amc.E_FAILURE
+    else:
+        dResult['out'] = None
+    dResult['wall'] = time.perf_counter() - wall_start
 
-    runGZIP
+    # stream the OUTPUT / POSTFIT / INFO messages into a column store for the analysis over the sessions
+    if dResult['err_code'] == amc.E_SUCCESS:
+        dOutput = glab_output.glab_parse_output(glab_outf=dResult['out'], logger=logger)
+        dResult['stores'] = dOutput['stores']
+        dResult['rows'] = dOutput['rows']
+        dResult['info'] = dOutput['info']
+        dResult['info']['rx']['marker'] = amc.dRTK['proc']['marker']
+        dResult['info']['rx']['gnss'] = dSession['gnss']
 
+    logger.info('{func:s}: session {cfg:s} finished with error code {err:d} in {wall:.1f} s'
+                .format(cfg=colored(dSession['glab_cfg'], 'green' if dResult['err_code'] == amc.E_SUCCESS else 'red'),
+                        err=dResult['err_code'],
+                        wall=dResult['wall'],
+                        func=cFuncName))
 
-def main_glab_proc(argv) -> bool:
+    return dResult
+
+
+def run_sessions(lst_sessions: list, glab_templ: Template, workers: int, logger: logging.Logger) -> list:
+    """
+    run_sessions runs the sessions over a pool of at most workers concurrent glabng processes
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    logger.info('{func:s}: running {count:d} sessions using {workers:d} workers'.format(count=len(lst_sessions), workers=workers, func=cFuncName))
+
+    lst_results = []
+    # glabng runs as an external program so threads are sufficient to run the sessions in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_glabng_session, dSession=dSession, glab_templ=glab_templ, logger=logger) for dSession in lst_sessions]
+        for future in as_completed(futures):
+            lst_results.append(future.result())
+
+    # keep the order of the sessions in the results
+    lst_results.sort(key=lambda dResult: dResult['cfg'])
+
+    return lst_results
+
+
+def write_sessions_index(lst_results: list, logger: logging.Logger) -> str:
+    """
+    write_sessions_index writes the index of the sessions and their output files
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    indexf = os.path.join(amc.dRTK['proc']['dir_root'], '{marker:s}-{year:04d}-glab-sessions.json'.format(marker=amc.dRTK['proc']['marker'],
+                                                                                                          year=amc.dRTK['options']['year']))
+    with open(indexf, 'w') as fout:
+        json.dump(lst_results, fout, ensure_ascii=False, indent=4, default=amutils.json_convertor)
+
+    logger.info('{func:s}: {ok:d} of {count:d} sessions succeeded, index written to {index:s}'
+                .format(ok=len([dResult for dResult in lst_results if dResult['err_code'] == amc.E_SUCCESS]),
+                        count=len(lst_results),
+                        index=colored(indexf, 'green'),
+                        func=cFuncName))
+
+    return indexf
+
+
+def report_position_stats(lst_results: list, logger: logging.Logger) -> str:
     """
-    glabplotposn plots data from gLAB (v6) OUTPUT messages
+    report_position_stats reports the statistics of the position errors over the succeeded sessions
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    lst_stores = [dResult['stores']['OUTPUT'] for dResult in lst_results if 'stores' in dResult]
+    if len(lst_stores) == 0:
+        return None
 
+    dfStats = glab_output.glab_position_stats(lst_stores=lst_stores)
+
+    statsf = os.path.join(amc.dRTK['proc']['dir_root'], '{marker:s}-{year:04d}-glab-stats.csv'.format(marker=amc.dRTK['proc']['marker'],
+                                                                                                      year=amc.dRTK['options']['year']))
+    dfStats.to_csv(statsf, index=False, float_format='%.4f')
+    amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfStats, dfName='position error statistics', head=len(dfStats.index))
+
+    return statsf
+
+
+def main_glab_proc(argv) -> bool:
+    """
+    main_glab_proc runs gLAB (v6) for each combination of days, GNSSs, cutoff angles and codes
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # store cli parameters
     amc.dRTK = {}
     cli_opt = {}
-    cli_opt['igs_root'], cli_opt['year'], cli_opt['doy'], cli_opt['gnss'], cli_opt['cutoff'], cli_opt['template'], log_levels = treatCmdOpts(argv)
+    cli_opt['igs_root'], cli_opt['rxtype'], cli_opt['marker'], cli_opt['year'], cli_opt['doy'], cli_opt['gnss'], cli_opt['cutoff'], cli_opt['prcodes'], cli_opt['template'], cli_opt['workers'], log_levels = treatCmdOpts(argv)
     amc.dRTK['options'] = cli_opt
 
-    # check some arguments
-
     # create logging for better debugging
-    logger, log_name = amc.createLoggers(os.path.basename(__file__), dir=os.getcwd(), logLevels=log_levels)
+    logger, log_name = amc.createLoggers(os.path.basename(__file__), logLevels=log_levels)
+    am_profile.profile_init(baseName=os.path.basename(__file__), logger=logger)
 
+    # check some arguments
     ret_val = check_arguments(logger=logger)
     if ret_val != amc.E_SUCCESS:
         sys.exit(ret_val)
@@ -258,28 +418,35 @@ def main_glab_proc(argv) -> bool:
     # locate the program used for execution
     amc.dRTK['progs'] = {}
     amc.dRTK['progs']['glabng'] = location.locateProg('glabng', logger)
-    amc.dRTK['progs']['crz2rnx'] = location.locateProg('crz2rnx', logger)
-    amc.dRTK['progs']['gunzip'] = location.locateProg('gunzip', logger)
-    amc.dRTK['progs']['gzip'] = location.locateProg('gzip', logger)
 
-    # use the template file for creation of glab config file
-    create_session_template(logger=logger)
+    # decompress the observation and navigation files used by the sessions
+    ret_val = prepare_inputs(logger=logger)
+    if ret_val != amc.E_SUCCESS:
+        sys.exit(ret_val)
+
+    # read the template file used for creation of the glab config files
+    with open(amc.dRTK['options']['template']) as f_tmpl:
+        glab_templ = Template(f_tmpl.read())
 
-    # run glabng using created cfg file
-    run_glabng_session(logger=logger)
+    # run glabng for all sessions
+    lst_sessions = create_sessions(logger=logger)
+    amc.dRTK['proc']['sessions'] = run_sessions(lst_sessions=lst_sessions, glab_templ=glab_templ, workers=cli_opt['workers'], logger=logger)
+    amc.dRTK['proc']['index'] = write_sessions_index(lst_results=amc.dRTK['proc']['sessions'], logger=logger)
+    amc.dRTK['proc']['stats'] = report_position_stats(lst_results=amc.dRTK['proc']['sessions'], logger=logger)
+
+    # processing information used for titles is taken from the first succeeded session
+    lst_info = [dResult['info'] for dResult in amc.dRTK['proc']['sessions'] if 'info' in dResult]
+    if len(lst_info) > 0:
+        amc.dRTK['INFO'] = lst_info[0]
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName,
-                                                                   json=json.dumps(amc.dRTK,
-                                                                                   sort_keys=False,
-                                                                                   indent=4,
-                                                                                   default=amutils.DT_convertor)))
-
-    # # move the log file to the glab directory
-    # code_txt = ''
-    # for code in amc.dRTK['proc']['codes']:
-    #     code_txt += ('_' + code)
-    # move(log_name, os.path.join(amc.dRTK['proc']['dir_glab'], 'glab_proc_{gnss:s}{prcodes:s}.log'.format(gnss=''.join(amc.dRTK['proc']['gnss']), prcodes=code_txt)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=amc.dRTK, logger=logger)
+
+    # move the log file to the root directory
+    am_profile.profile_save(dir=amc.dRTK['proc']['dir_root'])
+    copyfile(log_name, os.path.join(amc.dRTK['proc']['dir_root'], '{marker:s}-{scrname:s}.log'.format(marker=amc.dRTK['proc']['marker'],
+                                                                                                      scrname=os.path.basename(__file__).replace('.', '_'))))
+    os.remove(log_name)
 
     return amc.E_SUCCESS
 
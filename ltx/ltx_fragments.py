@@ -0,0 +1,176 @@
+import sys
+import os
+import re
+import json
+import hashlib
+import logging
+from termcolor import colored
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from pylatex import NoEscape
+from pylatex.utils import dumps_list
+
+__author__ = 'amuls'
+
+# index of the fragments in a fragment directory: per fragment the key of its inputs and the hash of its content
+FRAG_INDEX = 'fragments.json'
+# number of bytes of a file added at once to a hash
+FRAG_HASH_BLOCK = 1024 * 1024
+
+# files referenced in a tex file which determine the result of the compilation
+re_tex_input = re.compile(r'\\(?:input|include)\{([^}]+)\}')
+re_tex_graphics = re.compile(r'\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}')
+
+
+def content_hash(content) -> str:
+    """
+    content_hash returns the SHA1 hash of a str or bytes content
+    """
+    return hashlib.sha1(content.encode() if isinstance(content, str) else content).hexdigest()
+
+
+def file_hash(fname: str, sha1) -> None:
+    """
+    file_hash adds the content of the file fname to the SHA1 hash sha1
+    """
+    with open(fname, 'rb') as fin:
+        for block in iter(lambda: fin.read(FRAG_HASH_BLOCK), b''):
+            sha1.update(block)
+
+
+def fragment_key(name: str, builder: Callable, dArgs: dict, outputs: list = None) -> str:
+    """
+    fragment_key determines the key of a fragment from its builder and arguments. Dataframes are hashed on their values and
+    arguments naming an existing file on its content, so that a plot rewritten with the same content keeps the key. The
+    arguments in outputs name files written by the builder and are hashed on their name only
+    """
+    sha1 = hashlib.sha1('{name:s}:{mod:s}.{func:s}'.format(name=name, mod=builder.__module__, func=builder.__name__).encode())
+
+    def update(value, is_input: bool = True):
+        if isinstance(value, pd.DataFrame):
+            sha1.update(repr(value.columns.tolist()).encode())
+            sha1.update(pd.util.hash_pandas_object(value.astype(str), index=True).values.tobytes())
+        elif isinstance(value, dict):
+            for key in sorted(value, key=str):
+                sha1.update(str(key).encode())
+                update(value[key], is_input=is_input)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                update(item, is_input=is_input)
+        else:
+            sha1.update(repr(value).encode())
+            if is_input and isinstance(value, str) and os.path.isfile(value):
+                file_hash(fname=value, sha1=sha1)
+
+    for key in sorted(dArgs, key=str):
+        sha1.update(str(key).encode())
+        update(dArgs[key], is_input=outputs is None or key not in outputs)
+
+    return sha1.hexdigest()
+
+
+def fragment_index(frag_dir: str) -> dict:
+    """
+    fragment_index returns the index of the fragments in frag_dir
+    """
+    try:
+        with open(os.path.join(frag_dir, FRAG_INDEX), 'r') as fin:
+            return json.load(fin)
+    except (IOError, ValueError):
+        return {}
+
+
+def fragment_tex(builder: Callable, dArgs: dict) -> str:
+    """
+    fragment_tex builds the latex content of a fragment, builder returns a pylatex object or a list of these
+    """
+    ltx_content = builder(**dArgs)
+
+    if isinstance(ltx_content, (list, tuple)):
+        return dumps_list(ltx_content)
+    return ltx_content.dumps()
+
+
+def fragments_generate(frag_dir: str,
+                       lst_frags: list,
+                       workers: int = 1,
+                       outputs: list = None,
+                       logger: logging.Logger = None) -> dict:
+    """
+    fragments_generate writes the fragments (list of tuples name, builder, arguments) as separate tex files in frag_dir.
+    Fragments whose inputs did not change are not rebuilt and a tex file is only rewritten when its content changes. The
+    arguments in outputs name files written by the builders, these are not part of the inputs.
+    Returns per fragment the \\input command to include it.
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    os.makedirs(frag_dir, exist_ok=True)
+    dIndex = fragment_index(frag_dir=frag_dir)
+
+    dInputs = {}
+    lst_todo = []
+    for name, builder, dArgs in lst_frags:
+        texf = os.path.abspath(os.path.join(frag_dir, '{name:s}.tex'.format(name=name)))
+        dInputs[name] = NoEscape(r'\input{' + texf + '}')
+
+        key = fragment_key(name=name, builder=builder, dArgs=dArgs, outputs=outputs)
+        if dIndex.get(name, {}).get('key') == key and os.path.isfile(texf):
+            continue
+        lst_todo.append((name, texf, key, builder, dArgs))
+
+    # build the changed fragments, in parallel processes when more workers are requested
+    if workers > 1 and len(lst_todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            lst_tex = list(executor.map(fragment_tex, [frag[3] for frag in lst_todo], [frag[4] for frag in lst_todo]))
+    else:
+        lst_tex = [fragment_tex(builder=frag[3], dArgs=frag[4]) for frag in lst_todo]
+
+    nr_written = 0
+    for (name, texf, key, _, _), tex in zip(lst_todo, lst_tex):
+        tex_hash = content_hash(tex)
+        if dIndex.get(name, {}).get('hash') != tex_hash or not os.path.isfile(texf):
+            with open(texf, 'w') as fout:
+                fout.write(tex)
+            nr_written += 1
+        dIndex[name] = {'key': key, 'hash': tex_hash}
+
+    with open(os.path.join(frag_dir, FRAG_INDEX), 'w') as fout:
+        json.dump(dIndex, fout, indent=4)
+
+    if logger is not None:
+        logger.info('{func:s}: {count:d} fragments in {dir:s}: {built:d} rebuilt, {written:d} rewritten'.format(count=len(lst_frags),
+                                                                                                                dir=colored(frag_dir, 'green'),
+                                                                                                                built=len(lst_todo),
+                                                                                                                written=nr_written,
+                                                                                                                func=cFuncName))
+
+    return dInputs
+
+
+def tex_inputs_hash(texf: str, sha1=None) -> str:
+    """
+    tex_inputs_hash determines the hash over the tex file, the (recursively) included tex files and the included graphics
+    """
+    if sha1 is None:
+        sha1 = hashlib.sha1()
+
+    with open(texf, 'r') as fin:
+        tex = fin.read()
+    sha1.update(tex.encode())
+
+    tex_dir = os.path.dirname(os.path.abspath(texf))
+    for inputf in re_tex_input.findall(tex):
+        inputf = inputf if inputf.endswith('.tex') else inputf + '.tex'
+        for path in (inputf, os.path.join(tex_dir, inputf)):
+            if os.path.isfile(path):
+                tex_inputs_hash(texf=path, sha1=sha1)
+                break
+
+    for graphf in re_tex_graphics.findall(tex):
+        for path in (graphf, os.path.join(tex_dir, graphf)):
+            if os.path.isfile(path):
+                file_hash(fname=path, sha1=sha1)
+                break
+
+    return sha1.hexdigest()
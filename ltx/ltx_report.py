@@ -1,6 +1,11 @@
+import os
+import json
 from pylatex import Document, Section, Command, Package, simple_page_number, NewLine, FootnoteText, UnsafeCommand
 from pylatex.utils import bold
 
+from ampyutils import am_profile
+from ltx import ltx_fragments
+
 __author__ = 'amuls'
 
 
@@ -70,13 +75,33 @@ def create_document(fhead: list, ffoot: list) -> Document:
     return doc
 
 
-def document2pdf(doc: Document, pdfname: str):
+@am_profile.profile_func()
+def document2pdf(doc: Document, pdfname: str, force: bool = False) -> bool:
     """
-    document2pdf creates the pdf file from doc
+    document2pdf creates the pdf file from doc. The pdf is only recompiled when the tex file, its included tex fragments or
+    graphics changed since the previous build (or when force is set). Returns True when the pdf was compiled
     """
     doc.generate_tex(pdfname.split('.')[0])
+
+    # the hash over all inputs of the previous build is kept next to the pdf
+    build_hash = ltx_fragments.tex_inputs_hash(texf=pdfname.split('.')[0] + '.tex')
+    buildf = pdfname.split('.')[0] + '.build.json'
+    try:
+        with open(buildf, 'r') as fin:
+            dBuild = json.load(fin)
+    except (IOError, ValueError):
+        dBuild = {}
+
+    if not force and dBuild.get('hash') == build_hash and os.path.isfile(pdfname.split('.')[0] + '.pdf'):
+        return False
+
     doc.generate_pdf(pdfname.split('.')[0], clean_tex=False, compiler_args=['--pdf'])
 
+    with open(buildf, 'w') as fout:
+        json.dump({'hash': build_hash}, fout, indent=4)
+
+    return True
+
 
 def add_section(doc: Document, sec_title: str, sec_content: list):
     """
@@ -1,8 +1,9 @@
 import sys
 import os
+import logging
 from math import isnan
 from pylatex import Subsection, NoEscape, Figure, LongTabu, Subsubsection, Enumerate, MultiColumn, NewPage, TextColor, Tabular, NewLine
-from pylatex.utils import bold
+from pylatex.utils import bold, escape_latex
 from pylatex.section import Paragraph
 import datetime as dt
 from nested_lookup import nested_lookup
@@ -10,10 +11,13 @@ import pandas as pd
 
 from gfzrnx import gfzrnx_constants as gfzc
 
-from ltx import ltx_gfzrnx_report
+from ltx import ltx_gfzrnx_report, ltx_fragments
 
 __author__ = 'amuls'
 
+# maximum number of rows of an events table, the remaining events are reported in an appendix CSV file
+MAX_TABLE_ROWS = 250
+
 
 def rnxobs_script_information(dCli: dict,
                               dHdr: dict,
@@ -299,168 +303,229 @@ def tle_conversion(tle_value):
             return str(tle_value)
 
 
+def events_loss_reacq(df_events_navsig: pd.DataFrame, event_type: str) -> pd.DataFrame:
+    """
+    events_loss_reacq returns the loss events of event_type (PNT or PRN) with their reacquisition time
+    """
+    df_loss = df_events_navsig[(df_events_navsig['type'] == event_type) & (df_events_navsig['event'] == 'Loss')].copy()
+    df_loss['reacq'] = df_events_navsig[(df_events_navsig['type'] == event_type) & (df_events_navsig['event'] == 'Reacquisition')]['DATE_TIME'].tolist()
+
+    return df_loss
+
+
+def csv_path(csv_dir: str, name: str) -> str:
+    """
+    csv_path returns the name of the appendix CSV file for an events table, None if no csv_dir is used
+    """
+    if csv_dir is None:
+        return None
+    return os.path.join(csv_dir, '{name:s}.csv'.format(name=name))
+
+
+def dataframe_rows(df: pd.DataFrame) -> NoEscape:
+    """
+    dataframe_rows formats the dataframe column-wise into the latex rows of a tabular
+    """
+    if df.shape[0] == 0:
+        return NoEscape('')
+
+    # convert and escape each column at once, the cells of a row are joined by adding the columns
+    lst_cols = [df[col].astype(str).map(escape_latex) for col in df.columns]
+    rows = lst_cols[0]
+    for col in lst_cols[1:]:
+        rows = rows + '&' + col
+
+    return NoEscape('\\\\%\n'.join(rows.tolist()) + '\\\\')
+
+
+def events_longtabu(df_events: pd.DataFrame,
+                    navsig: str,
+                    csvf: str = None,
+                    max_rows: int = MAX_TABLE_ROWS) -> LongTabu:
+    """
+    events_longtabu creates the longtabu listing the events for a navigation signal. When more than max_rows events are present and
+    csvf is given, all events are written to the CSV file and only the first max_rows events are tabulated
+    """
+    nr_cols = len(df_events.columns)
+
+    longtabu = LongTabu('c' * nr_cols)
+    longtabu.add_hline()
+    longtabu.add_row((MultiColumn(nr_cols, align='c', data=TextColor('blue', 'Navigation signal {navs:s}'.format(navs=navsig))),))
+    longtabu.add_row(df_events.columns, mapper=[bold])  # header row
+    longtabu.add_hline()
+    longtabu.end_table_header()
+
+    longtabu.add_hline()
+    longtabu.add_row((MultiColumn(nr_cols, align='r',
+                                  data='Continued on Next Page'),))
+    longtabu.add_hline()
+    longtabu.end_table_footer()
+
+    longtabu.add_hline()
+    longtabu.end_table_last_footer()
+
+    if csvf is not None and df_events.shape[0] > max_rows:
+        df_events.to_csv(csvf, index=False)
+        longtabu.append(dataframe_rows(df=df_events.iloc[:max_rows]))
+        longtabu.add_hline()
+        longtabu.add_row((MultiColumn(nr_cols, align='c',
+                                      data='{count:d} more events listed in {csv:s}'.format(count=df_events.shape[0] - max_rows,
+                                                                                            csv=os.path.basename(csvf))),))
+    else:
+        longtabu.append(dataframe_rows(df=df_events))
+    longtabu.add_hline()
+
+    return longtabu
+
+
+def obstab_tleobs_prn(navsig: str,
+                      prn_plt: str,
+                      df_PRN: pd.DataFrame,
+                      csvf: str = None) -> list:
+    """
+    obstab_tleobs_prn creates the plot and the table of loss / reacquisition events of a PRN for an observable of a navigation signal
+    """
+    plot = Figure(position='H')
+    plot.add_image(prn_plt,
+                   width=NoEscape(r'0.95\linewidth'),
+                   placement=NoEscape(r'\centering'))
+
+    ltx_prn = [plot]
+
+    # only produce this when we have detected a loss / reacq for this PRN
+    if df_PRN.shape[0] > 0:
+        ltx_prn.append(events_longtabu(df_events=df_PRN, navsig=navsig, csvf=csvf))
+
+    return ltx_prn
+
+
+def obstab_tleobs_navsig(gnss: str,
+                         navsig: str,
+                         navsig_plt: dict,
+                         navsig_obsts: list,
+                         df_events_navsig: pd.DataFrame,
+                         dPRN_ltx: dict,
+                         csv_dir: str = None) -> list:
+    """
+    obstab_tleobs_navsig creates the analysis of a navigation signal, dPRN_ltx contains per observable the latex content
+    (or the input of its fragment) for each PRN. Oversized event tables are written to CSV files in csv_dir
+    """
+    paragraph = Paragraph(r'Analysis of navigation signal {gnss:s}{navs:s}'.format(gnss=gnss, navs=navsig))
+    ltx_navsig = [NewPage(), paragraph]
+
+    with paragraph.create(Enumerate()) as enum:
+
+        # add figures representing the observations per navigation signal
+        enum.add_item(NoEscape(r'Figure \ref{fig:tle_navsig_' + '{navs:s}'.format(navs=navsig) + '{gnss:s}'.format(gnss=gnss) + '}} represents the observed time span for navigation signal {gnss:s}{navs:s} set out against the maximum time span calculated from the  Two Line Elements (TLE). If present, the culmination point for a satellite is represented by a triangle. The time span from TLEs is represented by the lighter area while the real observations are represented by the dark super-imposed areas.'.format(gnss=gnss, navs=navsig)))
+
+        with enum.create(Figure(position='H')) as plot:
+            plot.add_image(navsig_plt['tle-obs'],
+                           width=NoEscape(r'0.95\textwidth'),
+                           placement=NoEscape(r'\centering'))
+
+            plot.add_caption(NoEscape(r'\label{fig:tle_navsig_' + '{navs:s}'.format(navs=navsig) + '{gnss:s}'.format(gnss=gnss) + '}} Navigation signal {gnss:s}{navs:s} versus TLE time span'.format(gnss=gnss, navs=navsig)))
+
+        for navsig_obst in navsig_obsts:
+            enum.add_item(NoEscape(r'Figure \ref{fig:tle_navsig_' + '{gnss:s}'.format(gnss=gnss) + '{navsobst:s}'.format(navsobst=navsig_obst) + '}} displays the evolution of observation type {obst:s}. \\newline The upper plot represents the variation of the observation type while the middle plot (if available) displays the variation of this observable between 2 consecutive epochs. The bottom plot displays the TLE time spans for the satellies.'.format(obst=navsig_obst)))
+            with enum.create(Figure(position='H')) as plot:
+                plot.add_image(navsig_plt['obst'][navsig_obst],
+                               width=NoEscape(r'0.95\textwidth'),
+                               placement=NoEscape(r'\centering'))
+
+                plot.add_caption(NoEscape(r'\label{fig:tle_navsig_' + '{gnss:s}'.format(gnss=gnss) + '{navsobst:s}'.format(navsobst=navsig_obst) + '}} Navigation signal {navsobst:s} evolution'.format(navsobst=navsig_obst)))
+
+            # create the dataframe with PNT loss events
+            df_PNT = events_loss_reacq(df_events_navsig=df_events_navsig, event_type='PNT')
+
+            if df_PNT.shape[0] > 0:
+                enum.append('The table below reports the loss and reacquisition of PNT for observable {obst:s}.'.format(obst=navsig_obst))
+                enum.append('')
+                enum.append(events_longtabu(df_events=df_PNT, navsig=navsig,
+                                            csvf=csv_path(csv_dir=csv_dir, name='{gnss:s}{navs:s}-{obst:s}-PNT'.format(gnss=gnss, navs=navsig, obst=navsig_obst))))
+
+            # start reporting for each PRN
+            enum.add_item('Analysis of navigation signal {gnss:s}{navs:s} for each observed satellite.\newline The following plots display the same information as described above per satellite. Each plot is accompanied by a table displaying the time of loss of lock and reacquisition of the satellite when such events are detected.'.format(gnss=gnss, navs=navsig))
+
+            for ltx_prn in dPRN_ltx[navsig_obst]:
+                if isinstance(ltx_prn, list):
+                    enum.extend(ltx_prn)
+                else:
+                    enum.append(ltx_prn)
+
+            # add overview for all events sorted according to time
+            df_events_sorted = df_events_navsig.sort_values(by='DATE_TIME')
+
+            if df_events_sorted.shape[0] > 0:
+                enum.add_item('Chronological overview of detected events for navigation signal {gnss:s}{navs:s}'.format(gnss=gnss, navs=navsig))
+                enum.append(events_longtabu(df_events=df_events_sorted, navsig=navsig,
+                                            csvf=csv_path(csv_dir=csv_dir, name='{gnss:s}{navs:s}-events'.format(gnss=gnss, navs=navsig))))
+
+    return ltx_navsig
+
+
 def obstab_tleobs_overview(dInfo: dict,
                            navsigs: list,
                            navsig_plts: dict,
                            navsig_obst_lst: dict,
                            lst_PRNs: list,
-                           dEvents_df) -> Subsubsection:
+                           dEvents_df,
+                           frag_dir: str = None,
+                           csv_dir: str = None,
+                           workers: int = 1,
+                           logger: logging.Logger = None) -> Subsubsection:
     """
-    obstab_tleobs_overview adds the info about the TLE rise/set/cul times and the general overview plot
+    obstab_tleobs_overview adds the info about the TLE rise/set/cul times and the general overview plot.
+    When frag_dir is given, the analysis per navigation signal and per PRN is written as tex fragments which are only rebuilt
+    (using workers processes) when their input changed. Event tables exceeding MAX_TABLE_ROWS are written as CSV files in csv_dir
     """
+    if csv_dir is not None:
+        os.makedirs(csv_dir, exist_ok=True)
+
     sssec = Subsubsection(r'Navigation signals analysis for {gnssn:s}'.format(gnssn=dInfo['gnss_name']))
 
     gnss = dInfo['gnss']
 
-    # go over the available navigation signals
-    # print('navsigs = {}'.format(navsigs))
+    # per PRN fragments for each observable of the navigation signals
+    lst_prn_frags = []
+    dPRN_names = {}
+    for navsig in navsigs:
+        dPRN_names[navsig] = {}
+        for navsig_obst in navsig_obst_lst[navsig]:
+            dPRN_names[navsig][navsig_obst] = []
+            for prn in lst_PRNs:
+                frag_name = '{gnss:s}{navs:s}-{obst:s}-{prn:s}'.format(gnss=gnss, navs=navsig, obst=navsig_obst, prn=prn)
+                dArgs = {'navsig': navsig,
+                         'prn_plt': navsig_plts[navsig][prn][navsig_obst],
+                         'df_PRN': events_loss_reacq(df_events_navsig=dEvents_df[navsig], event_type=prn),
+                         'csvf': csv_path(csv_dir=csv_dir, name=frag_name)}
+                lst_prn_frags.append((frag_name, obstab_tleobs_prn, dArgs))
+                dPRN_names[navsig][navsig_obst].append(frag_name)
+
+    if frag_dir is not None:
+        dPRN_ltx = ltx_fragments.fragments_generate(frag_dir=frag_dir, lst_frags=lst_prn_frags, workers=workers, outputs=['csvf'], logger=logger)
+    else:
+        dPRN_ltx = {frag_name: obstab_tleobs_prn(**dArgs) for frag_name, _, dArgs in lst_prn_frags}
+
+    # fragments per navigation signal including the PRN fragments
+    lst_navsig_frags = []
     for navsig in navsigs:
-        # print('navsig = {}'.format(navsig))
-        # print('navsig_plts = {}'.format(navsig_plts))
-
-        sssec.append(NewPage())
-
-        df_events_navsig = dEvents_df[navsig]
-
-        with sssec.create(Paragraph(r'Analysis of navigation signal {gnss:s}{navs:s}'.format(gnss=gnss, navs=navsig))) as paragraph:
-
-            with paragraph.create(Enumerate()) as enum:
-
-                # add figures representing the observations per navigation signal
-                enum.add_item(NoEscape(r'Figure \ref{fig:tle_navsig_' + '{navs:s}'.format(navs=navsig) + '{gnss:s}'.format(gnss=gnss) + '}} represents the observed time span for navigation signal {gnss:s}{navs:s} set out against the maximum time span calculated from the  Two Line Elements (TLE). If present, the culmination point for a satellite is represented by a triangle. The time span from TLEs is represented by the lighter area while the real observations are represented by the dark super-imposed areas.'.format(gnss=gnss, navs=navsig)))
-
-                with enum.create(Figure(position='H')) as plot:
-                    plot.add_image(navsig_plts[navsig]['tle-obs'],
-                                   width=NoEscape(r'0.95\textwidth'),
-                                   placement=NoEscape(r'\centering'))
-
-                    # print(r'\label{fig:tle_navsig_' + r'{gnss:s}'.format(gnss=gnss) + r'{navs:s}'.format(navs=navsig) + r'}} Navigation signal {gnss:s}{navs:s} versus TLE time span'.format(gnss=gnss, navs=navsig))
-
-                    plot.add_caption(NoEscape(r'\label{fig:tle_navsig_' + '{navs:s}'.format(navs=navsig) + '{gnss:s}'.format(gnss=gnss) + '}} Navigation signal {gnss:s}{navs:s} versus TLE time span'.format(gnss=gnss, navs=navsig)))
-
-                # print('navsig_obst_lst[{}] = {}'.format(navsig, navsig_obst_lst[navsig]))
-
-                for navsig_obst in navsig_obst_lst[navsig]:
-                    # print('navsig_obst = {}'.format(navsig_obst))
-                    enum.add_item(NoEscape(r'Figure \ref{fig:tle_navsig_' + '{gnss:s}'.format(gnss=gnss) + '{navsobst:s}'.format(navsobst=navsig_obst) + '}} displays the evolution of observation type {obst:s}. \\newline The upper plot represents the variation of the observation type while the middle plot (if available) displays the variation of this observable between 2 consecutive epochs. The bottom plot displays the TLE time spans for the satellies.'.format(obst=navsig_obst)))
-                    with enum.create(Figure(position='H')) as plot:
-                        plot.add_image(navsig_plts[navsig]['obst'][navsig_obst],
-                                       width=NoEscape(r'0.95\textwidth'),
-                                       placement=NoEscape(r'\centering'))
-
-                        # print(r'\label{fig:tle_navsig_' + r'{gnss:s}'.format(gnss=gnss) + r'{navs:s}'.format(navs=navsig) + r'}} Navigation signal {gnss:s}{navs:s} versus TLE time span'.format(gnss=gnss, navs=navsig))
-
-                        plot.add_caption(NoEscape(r'\label{fig:tle_navsig_' + '{gnss:s}'.format(gnss=gnss) + '{navsobst:s}'.format(navsobst=navsig_obst) + '}} Navigation signal {navsobst:s} evolution'.format(navsobst=navsig_obst)))
-
-                    # create the dataframe with events for this PRN
-                    # print('df_events_navsig = {}'.format(df_events_navsig))
-                    # print('df_events_navsig.columns = {}'.format(df_events_navsig.columns))
-                    df_PNT = df_events_navsig[(df_events_navsig['type'] == 'PNT') & (df_events_navsig['event'] == 'Loss')]
-                    df_PNT['reacq'] = df_events_navsig[(df_events_navsig['type'] == 'PNT') & (df_events_navsig['event'] == 'Reacquisition')]['DATE_TIME'].tolist()
-                    # print('df_PNT = \n{}'.format(df_PNT))
-                    # print('df_PNT.columns = \n{}'.format(df_PNT.columns))
-
-                    if df_PNT.shape[0] > 0:
-                        enum.append('The table below reports the loss and reacquisition of PNT for observable {obst:s}.'.format(obst=navsig_obst))
-                        enum.append('')
-
-                        nr_cols = len(df_PNT.columns)
-                        with enum.create(LongTabu('c' * nr_cols)) as longtabu:
-                            longtabu.add_hline()
-                            longtabu.add_row((MultiColumn(nr_cols, align='c', data=TextColor('blue', 'Navigation signal {navs:s}'.format(navs=navsig))),))
-                            longtabu.add_row(df_PNT.columns, mapper=[bold])  # header row
-                            longtabu.add_hline()
-                            longtabu.end_table_header()
-                            # longtabu.add_row(['PRN'] + dfTle.columns.tolist(), mapper=[bold])  # header row
-                            # longtabu.add_hline()
-                            # longtabu.end_header()
-
-                            longtabu.add_hline()
-                            longtabu.add_row((MultiColumn(nr_cols, align='r',
-                                                          data='Continued on Next Page'),))
-                            longtabu.add_hline()
-                            longtabu.end_table_footer()
-
-                            longtabu.add_hline()
-                            longtabu.end_table_last_footer()
-
-                            for row in df_PNT.index:
-                                longtabu.add_row(list(df_PNT.loc[row, :]))
-                            longtabu.add_hline()
-
-                    # start reporting for each PRN
-                    enum.add_item('Analysis of navigation signal {gnss:s}{navs:s} for each observed satellite.\newline The following plots display the same information as described above per satellite. Each plot is accompanied by a table displaying the time of loss of lock and reacquisition of the satellite when such events are detected.'.format(gnss=gnss, navs=navsig))
-
-                    for prn in lst_PRNs:
-                        with enum.create(Figure(position='H')) as plot:
-                            plot.add_image(navsig_plts[navsig][prn][navsig_obst],
-                                           width=NoEscape(r'0.95\linewidth'),
-                                           placement=NoEscape(r'\centering'))
-
-                        # create the dataframe with events for this PRN
-                        df_PRN = df_events_navsig[(df_events_navsig['type'] == prn) & (df_events_navsig['event'] == 'Loss')]
-                        df_PRN['reacq'] = df_events_navsig[(df_events_navsig['type'] == prn) & (df_events_navsig['event'] == 'Reacquisition')]['DATE_TIME'].tolist()
-                        print('df_PRN = \n{}'.format(df_PRN))
-                        print('df_PRN.shape = \n{}'.format(df_PRN.shape))
-                        print('df_PRN.columns = \n{}'.format(df_PRN.columns))
-
-                        # only produce this when we have detected a loss / reacq for this PRN
-                        if df_PRN.shape[0] > 0:
-                            nr_cols = len(df_PRN.columns)
-                            with enum.create(LongTabu('c' * nr_cols)) as longtabu:
-                                longtabu.add_hline()
-                                longtabu.add_row((MultiColumn(nr_cols, align='c', data=TextColor('blue', 'Navigation signal {navs:s}'.format(navs=navsig))),))
-                                longtabu.add_row(df_PRN.columns, mapper=[bold])  # header row
-                                longtabu.add_hline()
-                                longtabu.end_table_header()
-                                # longtabu.add_row(['PRN'] + dfTle.columns.tolist(), mapper=[bold])  # header row
-                                # longtabu.add_hline()
-                                # longtabu.end_header()
-
-                                longtabu.add_hline()
-                                longtabu.add_row((MultiColumn(nr_cols, align='r',
-                                                              data='Continued on Next Page'),))
-                                longtabu.add_hline()
-                                longtabu.end_table_footer()
-
-                                longtabu.add_hline()
-                                longtabu.end_table_last_footer()
-
-                                for row in df_PRN.index:
-                                    longtabu.add_row(list(df_PRN.loc[row, :]))
-                                longtabu.add_hline()
-
-                    # add overview for aal events
-                    # sort the events for this signal according to time
-                    df_events_navsig.sort_values(by='DATE_TIME', inplace=True)
-
-                    if df_events_navsig.shape[0] > 0:
-                        sssec.append(NewPage())
-                        enum.add_item('Chronological overview of detected events for navigation signal {gnss:s}{navs:s}'.format(gnss=gnss, navs=navsig))
-
-                        nr_cols = len(df_events_navsig.columns)
-
-                        with enum.create(LongTabu('c' * nr_cols)) as longtabu:
-                            longtabu.add_hline()
-                            longtabu.add_row((MultiColumn(nr_cols, align='c', data=TextColor('blue', 'Navigation signal {navs:s}'.format(navs=navsig))),))
-                            longtabu.add_row(df_events_navsig.columns, mapper=[bold])  # header row
-                            longtabu.add_hline()
-                            longtabu.end_table_header()
-                            # longtabu.add_row(['PRN'] + dfTle.columns.tolist(), mapper=[bold])  # header row
-                            # longtabu.add_hline()
-                            # longtabu.end_header()
-
-                            longtabu.add_hline()
-                            longtabu.add_row((MultiColumn(nr_cols, align='r',
-                                                          data='Continued on Next Page'),))
-                            longtabu.add_hline()
-                            longtabu.end_table_footer()
-
-                            longtabu.add_hline()
-                            longtabu.end_table_last_footer()
-
-                            for row in df_events_navsig.index:
-                                longtabu.add_row(list(df_events_navsig.loc[row, :]))
-                            longtabu.add_hline()
+        dArgs = {'gnss': gnss,
+                 'navsig': navsig,
+                 'navsig_plt': {'tle-obs': navsig_plts[navsig]['tle-obs'], 'obst': navsig_plts[navsig]['obst']},
+                 'navsig_obsts': navsig_obst_lst[navsig],
+                 'df_events_navsig': dEvents_df[navsig],
+                 'dPRN_ltx': {navsig_obst: [dPRN_ltx[frag_name] for frag_name in frag_names]
+                              for navsig_obst, frag_names in dPRN_names[navsig].items()},
+                 'csv_dir': csv_dir}
+        lst_navsig_frags.append(('{gnss:s}{navs:s}'.format(gnss=gnss, navs=navsig), obstab_tleobs_navsig, dArgs))
+
+    if frag_dir is not None:
+        dNavsig_ltx = ltx_fragments.fragments_generate(frag_dir=frag_dir, lst_frags=lst_navsig_frags, workers=workers, logger=logger)
+        for frag_name, _, _ in lst_navsig_frags:
+            sssec.append(dNavsig_ltx[frag_name])
+    else:
+        for _, _, dArgs in lst_navsig_frags:
+            for ltx_obj in obstab_tleobs_navsig(**dArgs):
+                sssec.append(ltx_obj)
 
     return sssec
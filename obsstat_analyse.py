@@ -17,7 +17,7 @@ from gfzrnx import gfzrnx_constants as gfzc
 from ampyutils import gnss_cmd_opts as gco
 
 from ampyutils import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, am_profile, am_intervals
 from tle import tle_visibility, tleobs_plot
 from ltx import ltx_rnxobs_reporting
 from cvsdb import cvsdb_ops
@@ -220,6 +220,7 @@ def main_rnx_obsstat(argv):
 
     # create logging for better debugging
     logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+    am_profile.profile_init(baseName=os.path.basename(__file__), logger=logger)
 
     # read the observation header info from the Pickle file
     dStat['obshdr'] = '{obsf:s}.obshdr'.format(obsf=os.path.splitext(dStat['cli']['obsstatf'])[0][:-2])
@@ -242,7 +243,7 @@ def main_rnx_obsstat(argv):
 
     # sys.file_exists(9)
 
-    logger.info('{func:s}: Imported header information from {hdrf:s}\n{json!s}'.format(func=cFuncName, json=json.dumps(dStat['hdr'], sort_keys=False, indent=4, default=amutils.json_convertor), hdrf=colored(dStat['obshdr'], 'blue')))
+    amutils.logJSON(callerName=cFuncName, title='Imported header information from {hdrf:s}'.format(hdrf=colored(dStat['obshdr'], 'blue')), dInfo=dStat['hdr'], logger=logger)
 
     # dStat['time']['first'] = datetime.strptime(dStat['hdr']['data']['epoch']['first'].split('.')[0], '%Y %m %d %H %M %S')
     # dStat['time']['last'] = datetime.strptime(dStat['hdr']['data']['epoch']['last'].split('.')[0], '%Y %m %d %H %M %S')
@@ -254,24 +255,21 @@ def main_rnx_obsstat(argv):
     amutils.logHeadTailDataFrame(df=dfObsStat, dfName='dfObsStat', callerName=cFuncName, logger=logger)
 
     # get the observation time spans based on TLE values
-    dfTLE, dfTLEVis = tle_visibility.PRNs_visibility(prn_lst=dfObsStat.PRN.unique(),
-                                                     DTG_start=dStat['time']['first'],
-                                                     DTG_end=dStat['time']['last'],
-                                                     interval=dStat['time']['interval'],
-                                                     cutoff=dStat['cli']['mask'],
-                                                     logger=logger)
+    dfTLE, dfTLEVis, ivTLE = tle_visibility.PRNs_visibility(prn_lst=dfObsStat.PRN.unique(),
+                                                            DTG_start=dStat['time']['first'],
+                                                            DTG_end=dStat['time']['last'],
+                                                            interval=dStat['time']['interval'],
+                                                            cutoff=dStat['cli']['mask'],
+                                                            logger=logger)
     amutils.logHeadTailDataFrame(df=dfTLE, dfName='dfTLE', callerName=cFuncName, logger=logger)
     amutils.logHeadTailDataFrame(df=dfTLEVis, dfName='dfTLEVis', callerName=cFuncName, logger=logger)
 
-    # combine the observation count and TLE count per PRN
-    dfTLEtmp = pd.DataFrame(columns=['PRN', 'TLE_count'])  # , dtype={'PRN':'object','TLE_count':'int'})
-    dfTLEtmp.PRN = dfTLEVis.index  # convert the TLE index (which are the PRNs) to a column
+    # combine the observation count and TLE count per PRN, the total number of observations over all arcs (at 1 s) of a PRN
+    # is the duration of its TLE arcs
+    dfTLEtmp = pd.DataFrame({'PRN': dfTLEVis.index,
+                             'TLE_count': am_intervals.iv_duration(iv=ivTLE, nr_keys=len(dfTLEVis.index))})
     amutils.logHeadTailDataFrame(df=dfTLEtmp, dfName='dfTLEtmp', callerName=cFuncName, logger=logger)
 
-    # add colmun which contains the total number of observations over all arcs
-    for i, (prn, tle_prn) in enumerate(dfTLEVis.iterrows()):
-        dfTLEtmp.iloc[i].TLE_count = sum(tle_prn.tle_arc_count)
-
     print('dfTLEtmp = {}'.format(dfTLEtmp))
     # combine TLE and actual observations (only SNR column used since values for all other obst are the same)
     dfObsTLE = pd.merge(dfObsStat, dfTLEtmp, on='PRN')
@@ -311,7 +309,8 @@ def main_rnx_obsstat(argv):
     dStat['ltx']['obsstat'] = os.path.join(dStat['ltx']['path'],
                                            '{marker:s}_02_{gnss:s}_obs_stat'.format(marker=dStat['obsstatf'][:9],
                                                                                     gnss=dStat['info']['gnss']))
-    sec_obsstat.generate_tex(dStat['ltx']['obsstat'])
+    with am_profile.profile_stage(stage='generate_tex'):
+        sec_obsstat.generate_tex(dStat['ltx']['obsstat'])
 
     # store the observation info from TLE in CVS file
     tle_name = '{basen:s}.tle'.format(basen=os.path.basename(dStat['obsstatf']).split('.')[0])
@@ -319,7 +318,7 @@ def main_rnx_obsstat(argv):
     # dfTLE.to_csv(tle_name, index=True, date_format='%H:%M:%S')
 
     # dGFZ['ltx']['script'] = os.path.join(dGFZ['ltx']['path'], 'script_info')
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dStat, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dStat, logger=logger)
 
     # report to the user
 
@@ -329,6 +328,7 @@ def main_rnx_obsstat(argv):
         json.dump(dStat, f, ensure_ascii=False, indent=4, default=amutils.json_convertor)
 
     # clean up
+    am_profile.profile_save(dir=dStat['dir'])
     copyfile(log_name, os.path.join(dStat['dir'], '{scrname:s}.log'.format(scrname=os.path.basename(__file__).replace('.', '_'))))
     os.remove(log_name)
 
@@ -6,7 +6,7 @@ import argparse
 from termcolor import colored
 import logging
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import pandas as pd
 from shutil import copyfile
@@ -15,16 +15,22 @@ import pickle
 import numpy as np
 
 from gfzrnx import gfzrnx_constants as gfzc
+from GNSS import gpstime
 from ampyutils import gnss_cmd_opts as gco
 
 from ampyutils import am_config as amc
-from ampyutils import amutils
+from ampyutils import amutils, am_profile, am_intervals
 from tle import tle_visibility, tleobs_plot
 from ltx import ltx_rnxobs_reporting
+from gfzrnx import obstab_loader
+from plot import plot_utils
 
 
 __author__ = 'amuls'
 
+# length in hours of the time windows used by the incremental analysis when no window is given
+INCREMENTAL_WINDOW = 1.
+
 
 def treatCmdOpts(argv):
     """
@@ -92,6 +98,26 @@ def treatCmdOpts(argv):
                         default=10,
                         action=gco.elevstep_action)
 
+    parser.add_argument('--window', help='analyse the observations per time window of the given hours to limit memory usage (default {window:s})'
+                                         .format(window=colored('None', 'green')),
+                        type=float,
+                        required=False,
+                        default=None,
+                        action=gco.window_action)
+
+    parser.add_argument('--incremental', help='analyse only the observations appended to the obstab since the previous incremental run, '
+                                              'the observation day is analysed per time window (default False)',
+                        action='store_true',
+                        required=False,
+                        default=False)
+
+    parser.add_argument('--workers', help='number of processes generating the latex fragments (default {workers:s})'
+                                          .format(workers=colored(str(min(4, os.cpu_count())), 'green')),
+                        required=False,
+                        type=int,
+                        default=min(4, os.cpu_count()),
+                        action=gco.workers_action)
+
     parser.add_argument('--plot', help='displays interactive plots (default False)',
                         action='store_true',
                         required=False,
@@ -108,7 +134,7 @@ def treatCmdOpts(argv):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.obstab, args.freqs, args.prns, args.obstypes, args.snr_th, args.cutoff, args.jamsc, args.elev_step, args.plot, args.logging
+    return args.obstab, args.freqs, args.prns, args.obstypes, args.snr_th, args.cutoff, args.jamsc, args.elev_step, args.window, args.incremental, args.workers, args.plot, args.logging
 
 
 def check_arguments(logger: logging.Logger = None):
@@ -171,59 +197,46 @@ def check_arguments(logger: logging.Logger = None):
             sys.exit(amc.E_FILE_NOT_EXIST)
 
 
-def read_obstab(obstabf: str,
-                lst_PRNs: list,
-                dCli: dict,
-                logger: logging.Logger = None) -> Tuple[list, list, list, pd.DataFrame]:
+def obstab_obsfreqs(obstabf: str, dCli: dict) -> Tuple[list, list]:
     """
-    read_obstab reads the SNR for the selected frequencies into a dataframe
+    obstab_obsfreqs determines the observables selected by the --freqs and --obstypes options and their navigation signals
     """
-    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
-
     # determine what the columnheaders will be
-    hdr_count = -1
-    hdr_columns = []
-    with open(obstabf) as fin:
-        for line in fin:
-            # print(line.strip())
-            hdr_count += 1
-            if line.strip().startswith('OBS'):
-                break
-            else:
-                if line.strip() != '#HD,G,DATE,TIME,PRN':
-                    hdr_line = line.strip()
-
-    # split up on comma into a list
-    hdr_columns = hdr_line.split(',')
-    # print('hdr_columns = {!s}'.format(hdr_columns))
-    # print('hdr_columns[2:4] = {!s}'.format(hdr_columns[2:4]))
-    # print('hdr_count = {!s}'.format(hdr_count))
+    hdr_columns, _ = obstab_loader.obstab_header(obstabf=obstabf)
 
     # keep the header columns selected by --freqs and --obstypes options
-    obstypes = hdr_columns[2:5]
     obsfreqs = []
     for freq in dTab['cli']['freqs']:
         for obst in dCli['obs_types']:
             obsfreq = '{obst:s}{freq:s}'.format(obst=obst, freq=freq)
             obsfreqs.append([obstid for obstid in hdr_columns[2:] if obstid.startswith(obsfreq)][0])
-    obstypes += obsfreqs
 
     # created the possible navigation signals we have
     nav_signals = list(set([obsfreq[1:] for obsfreq in obsfreqs]))
     # print(nav_signals)
 
-    logger.info('{func:s}: loading from {tab:s}: {cols:s}'.format(tab=obstabf, cols=colored(', '.join(obstypes), 'green'), func=cFuncName))
+    return nav_signals, obsfreqs
 
-    dfTmp = pd.read_csv(obstabf, delimiter=',', skiprows=hdr_count, names=hdr_columns, header=None, parse_dates=[hdr_columns[2:4]], usecols=obstypes)
 
-    # check whether the selected PRNs are in the dataframe, else remove this PRN from
-    # print('lst_PRNs = {}'.format(lst_PRNs))
-    lst_ObsPRNs = sorted(dfTmp.PRN.unique())
-    # print('lst_obsPRNs = {}'.format(lst_ObsPRNs))
-    # print("dfTmp[dfTmp['PRN'] == 'E07'] = \n{}".format(dfTmp[dfTmp['PRN'] == 'E07']))
+@am_profile.profile_func(rows=lambda ret: ret[3].shape[0])
+def read_obstab(obstabf: str,
+                lst_PRNs: list,
+                dCli: dict,
+                logger: logging.Logger = None) -> Tuple[list, list, list, pd.DataFrame]:
+    """
+    read_obstab reads the SNR for the selected frequencies into a dataframe
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    nav_signals, obsfreqs = obstab_obsfreqs(obstabf=obstabf, dCli=dCli)
+
+    logger.info('{func:s}: loading from {tab:s}: {cols:s}'.format(tab=obstabf, cols=colored(', '.join(['DATE', 'TIME', 'PRN'] + obsfreqs), 'green'), func=cFuncName))
 
-    lst_CommonPRNS = [prn for prn in lst_ObsPRNs if prn in lst_PRNs]
-    # print('lst_CommonPRNS = {}'.format(lst_CommonPRNS))
+    # only the observations of the selected PRNs are parsed
+    dfTmp = obstab_loader.obstab_load(obstabf=obstabf, obstypes=obsfreqs, prns=lst_PRNs, logger=logger)
+
+    # check whether the selected PRNs are observed
+    lst_CommonPRNS = dfTmp['PRN'].cat.categories.tolist()
 
     if len(lst_CommonPRNS) == 0:
         logger.error('{func:s}: selected list of PRNs ({lstprns:s}) not observed. program exits'.format(lstprns=colored(', '.join(lst_PRNs), 'red'), func=cFuncName))
@@ -231,16 +244,8 @@ def read_obstab(obstabf: str,
     else:
         logger.info('{func:s}: following PRNs examined: {prns:s}'.format(prns=', '.join(lst_CommonPRNS), func=cFuncName))
 
-    # apply mask to dataframe to select PRNs in the list
-    # print('lst_PRNs = {}'.format(lst_PRNs))
-    # print("dfTmp['PRN'].isin(lst_PRNs) = {}".format(dfTmp['PRN'].isin(lst_PRNs)))
-    dfTmp = dfTmp[dfTmp['PRN'].isin(lst_CommonPRNS)]
-
-    # # XXX TEST BEGIN for testing remove some lines for SV E02
-    # indices = dfTmp[dfTmp['PRN'] == 'E02'].index
-    # print('dropping indices = {!s}'.format(indices[5:120]))
-    # dfTmp.drop(indices[5:120], inplace=True)
-    # # END XXX TEST
+    # add the integer EPOCH index at the observation interval
+    dfTmp.insert(loc=1, column='EPOCH', value=gpstime.epochFromUTC(utc=dfTmp['DATE_TIME'].values, utc_start=dTab['time']['start'], interval=dTab['time']['interval']))
 
     if logger is not None:
         amutils.logHeadTailDataFrame(df=dfTmp, dfName='dfTmp', callerName=cFuncName, logger=logger)
@@ -268,6 +273,7 @@ def read_RFIscenario(jamscf: str,
     return df_jam
 
 
+@am_profile.profile_func(rows_arg='dfPrnNavSig')
 def analyse_obsprn(marker: str,
                    obstabf: str,
                    navsig_name: str,
@@ -280,10 +286,12 @@ def analyse_obsprn(marker: str,
                    navsig_obst_lst: dict,
                    snrth: float,
                    interval: int,
+                   dTemplates: dict = None,
                    show_plot: bool = False,
                    logger: logging.Logger = None) -> Tuple[list, list, dict]:
     """
     analyse_obsprn analyses the observations for the given PRN and determines a loss in SNR if asked.
+    The plot layouts per observable in dTemplates are reused for the plots of this PRN.
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
@@ -293,11 +301,12 @@ def analyse_obsprn(marker: str,
     posidx_snr_negjumps = {}
 
     # get a list of time jumps for this navigation signal
-    # calculate the time difference between successive entries
-    dfPrnNavSig.insert(loc=dfPrnNavSig.columns.get_loc('DATE_TIME') + 1,
-                       column='dt',
-                       value=(dfPrnNavSig['DATE_TIME'] - dfPrnNavSig['DATE_TIME'].shift(1)).astype('timedelta64[s]'))
-    amutils.logHeadTailDataFrame(df=dfPrnNavSig, dfName='dfPrnNavSig', callerName=cFuncName, logger=logger)
+    # calculate the time difference between successive entries from the integer epoch indices
+    dEpoch = np.diff(dfPrnNavSig['EPOCH'].to_numpy())
+    dt = np.full(dfPrnNavSig.shape[0], np.nan)
+    dt[1:] = dEpoch * interval
+    dfPrnNavSig.insert(loc=dfPrnNavSig.columns.get_loc('EPOCH') + 1, column='dt', value=dt)
+    amutils.logHeadTailDataFrame(df=dfPrnNavSig, dfName='dfPrnNavSig', callerName=cFuncName, logger=logger, level=logging.DEBUG, throttle=True)
 
     # check whether data is available for this PRN, if no data available, just return with empty stuff
     if dfPrnNavSig.shape[0] == 0:
@@ -309,9 +318,8 @@ def analyse_obsprn(marker: str,
 
         return posidx_time_gaps, posidx_snr_posjumps, posidx_snr_negjumps, plots
 
-    idx_time_gaps = dfPrnNavSig.index[dfPrnNavSig.dt != interval].tolist()
-    # convert to positional indices
-    posidx_time_gaps = [dfPrnNavSig.index.get_loc(gap) for gap in idx_time_gaps]
+    # positional indices of the epochs following a gap (the first epoch is always a reacquisition)
+    posidx_time_gaps = [0] + (np.flatnonzero(dEpoch != 1) + 1).tolist()
     # insert the first and last positional indices to get start and end time
     if posidx_time_gaps[0] != 0:
         posidx_time_gaps.insert(0, 0)
@@ -331,7 +339,7 @@ def analyse_obsprn(marker: str,
     for navsig_obs in navsig_obst_lst:
         # print('{}: navsig_obs = {}'.format(prn, navsig_obs))
         # select only the elements for this prn
-        dfPrnNSObs = dfPrnNavSig[['DATE_TIME', 'dt', 'PRN', navsig_obs]].dropna()
+        dfPrnNSObs = dfPrnNavSig[['DATE_TIME', 'EPOCH', 'dt', 'PRN', navsig_obs]].dropna()
 
         # add column which is difference between current and previous obst
         dfPrnNSObs.insert(loc=dfPrnNSObs.columns.get_loc(navsig_obs) + 1,
@@ -350,14 +358,11 @@ def analyse_obsprn(marker: str,
 
         # find the SNR differences that are higher than snrth (SNR threshold)
         if navsig_obs[0] == 'S':
-            idx_snr_posjumps = dfPrnNSObs.index[dfPrnNSObs['d{nso:s}'.format(nso=navsig_obs)] > snrth].tolist()
-            # convert to poisionla indices
-            posidx_snr_posjumps[navsig_obs] = [dfPrnNSObs.index.get_loc(jump) for jump in idx_snr_posjumps]
+            # positional indices of the SNR jumps
+            posidx_snr_posjumps[navsig_obs] = np.flatnonzero(dfPrnNSObs['d{nso:s}'.format(nso=navsig_obs)].to_numpy() > snrth).tolist()
             # print('posidx_snr_posjumps[navsig_obs] = {} #{}'.format(posidx_snr_posjumps[navsig_obs], len(posidx_snr_posjumps[navsig_obs])))
 
-            idx_snr_negjumps = dfPrnNSObs.index[dfPrnNSObs['d{nso:s}'.format(nso=navsig_obs)] < -snrth].tolist()
-            # convert to poisionla indices
-            posidx_snr_negjumps[navsig_obs] = [dfPrnNSObs.index.get_loc(jump) for jump in idx_snr_negjumps]
+            posidx_snr_negjumps[navsig_obs] = np.flatnonzero(dfPrnNSObs['d{nso:s}'.format(nso=navsig_obs)].to_numpy() < -snrth).tolist()
             # print('posidx_snr_negjumps[navsig_obs] = {} #{}'.format(posidx_snr_negjumps[navsig_obs], len(posidx_snr_negjumps[navsig_obs])))
         else:
             posidx_snr_posjumps[navsig_obs] = None
@@ -365,7 +370,7 @@ def analyse_obsprn(marker: str,
 
         # info to user
         if logger is not None:
-            amutils.logHeadTailDataFrame(df=dfPrnNSObs, dfName='dfPrnNSObs', callerName=cFuncName, logger=logger)
+            amutils.logHeadTailDataFrame(df=dfPrnNSObs, dfName='dfPrnNSObs', callerName=cFuncName, logger=logger, level=logging.DEBUG, throttle=True)
 
         # calculate the times that PRN reaches a elevation angle
         df_PrnElev = tle_visibility.prn_elevation(prn=prn,
@@ -387,6 +392,7 @@ def analyse_obsprn(marker: str,
                                                             obst=navsig_obs,
                                                             posidx_gaps=posidx_time_gaps,
                                                             snrth=snrth,
+                                                            dTemplates=dTemplates,
                                                             show_plot=show_plot,
                                                             logger=logger)
 
@@ -402,6 +408,41 @@ def analyse_obsprn(marker: str,
     return time_gaps.tolist(), time_reacqs.tolist()[1:-1], plots
 
 
+def navsig_prn_count(dfNavSig: pd.DataFrame, dTime: dict) -> pd.DataFrame:
+    """
+    navsig_prn_count counts the number of PRNs observed at each epoch for a navigation signal
+    """
+    epochs, prn_count = np.unique(dfNavSig['EPOCH'].to_numpy(), return_counts=True)
+
+    dfNavSigPRNCount = pd.DataFrame({'DATE_TIME': gpstime.UTCFromEpoch(epoch=epochs, utc_start=dTime['start'], interval=dTime['interval']),
+                                     'EPOCH': epochs,
+                                     'PRNcnt': prn_count})
+
+    # add difference in PRNcnt and the time difference between successive epochs
+    dfNavSigPRNCount['dPRNcnt'] = dfNavSigPRNCount['PRNcnt'].diff(1)
+    dt = np.full(epochs.size, np.nan)
+    dt[1:] = np.diff(epochs) * dTime['interval']
+    dfNavSigPRNCount['dt'] = dt
+
+    return dfNavSigPRNCount
+
+
+def navsig_prn_evolution(dfNavSigPRNCount: pd.DataFrame, interval: float, idx_first: int = 0) -> pd.DataFrame:
+    """
+    navsig_prn_evolution keeps the epochs at which the PRN count changes or a gap occurs, together with their preceding epoch.
+    The epochs before idx_first are only kept as preceding epoch
+    """
+    idx_list = np.flatnonzero((dfNavSigPRNCount['dPRNcnt'].to_numpy() != 0) | (dfNavSigPRNCount['dt'].to_numpy() > interval))
+    idx_list = idx_list[idx_list >= idx_first]
+    idx_merged = np.sort(np.concatenate((idx_list, idx_list[idx_list > 0] - 1)))
+
+    dfPRNEvol = dfNavSigPRNCount.iloc[idx_merged]
+    dfPRNEvol.reset_index(drop=True, inplace=True)
+
+    return dfPRNEvol
+
+
+@am_profile.profile_func(rows_arg='dfPrnEvol')
 def pnt_available(dfPrnEvol: pd.DataFrame,
                   interval: int,
                   logger: logging.Logger = None) -> dict:
@@ -469,6 +510,49 @@ def pnt_available(dfPrnEvol: pd.DataFrame,
     return dPNT
 
 
+def navsig_coverage(dfNavSig: pd.DataFrame,
+                    lst_prns: list,
+                    ivTLE: tuple,
+                    dTime: dict,
+                    dt_last: datetime,
+                    logger: logging.Logger = None) -> dict:
+    """
+    navsig_coverage determines the observed arcs of the PRNs of a navigation signal and compares these with their TLE arcs ivTLE
+    (see tle_visibility.prns_coverage) up to the last epoch dt_last read from the obstab. The observations of the windowed
+    analysis only contain the first and last observation of each arc, which are flagged by column arc. Returns per PRN the
+    coverage
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    interval = max(int(round(dTime['interval'])), 1)
+    keys = pd.Index(lst_prns).get_indexer(dfNavSig['PRN'])
+    in_prns = keys >= 0
+    ivObs = am_intervals.iv_epochs(keys=keys[in_prns],
+                                   secs=am_intervals.iv_seconds(dfNavSig['DATE_TIME'])[in_prns],
+                                   interval=interval,
+                                   arc=dfNavSig['arc'].to_numpy()[in_prns] if 'arc' in dfNavSig.columns else None)
+
+    # the TLE arcs span the observation day in an incremental analysis, only the part up to the last epoch read can be observed
+    t_start = am_intervals.iv_seconds(dTime['start'])
+    t_end = am_intervals.iv_seconds(dt_last) + interval
+    ivObs = am_intervals.iv_clip(iv=ivObs, start=t_start, end=t_end)
+    ivTLE = am_intervals.iv_clip(iv=ivTLE, start=t_start, end=t_end)
+
+    dfCoverage = tle_visibility.prns_coverage(ivTLE=ivTLE, ivObs=ivObs, lst_prns=lst_prns)
+    amutils.logHeadTailDataFrame(df=dfCoverage, dfName='dfCoverage', callerName=cFuncName, logger=logger)
+
+    if logger is not None:
+        tle_secs = dfCoverage['tle_secs'].sum()
+        logger.info('{func:s}: observed {cover:.1f}% of {tle:d} s of TLE arcs, missed {missed:d} arcs ({secs:d} s)'
+                    .format(cover=100 * (1 - dfCoverage['missed_secs'].sum() / tle_secs) if tle_secs > 0 else 0,
+                            tle=tle_secs,
+                            missed=dfCoverage['missed_arcs'].sum(),
+                            secs=dfCoverage['missed_secs'].sum(),
+                            func=cFuncName))
+
+    return dfCoverage.to_dict(orient='index')
+
+
 def loss_lock_combine(navsig: str,
                       dPNT: dict,
                       lst_prns: list,
@@ -505,6 +589,323 @@ def loss_lock_combine(navsig: str,
     return df_event
 
 
+def window_navsig_init(navsig_obst_lst: list) -> dict:
+    """
+    window_navsig_init creates the state of a navigation signal which is carried between the time windows
+    """
+    dState = {}
+    dState['obsts'] = navsig_obst_lst
+    # last PRN count and per PRN the last epoch and observables seen in the previous windows
+    dState['last_count'] = None
+    dState['last'] = None
+    # loss / reacquisition times per PRN
+    dState['lock'] = {}
+    # the PRN count evolution, the reduced observations and PRN counts and the availability counts used for plotting
+    dState['lst_evol'] = []
+    dState['lst_obs'] = []
+    dState['lst_count'] = []
+    dState['obs_cnt'] = None
+
+    return dState
+
+
+def analyse_window_navsig(dState: dict,
+                          dfWin: pd.DataFrame,
+                          dTime: dict,
+                          prn_rows: np.ndarray,
+                          width_px: int):
+    """
+    analyse_window_navsig analyses the observations of a navigation signal within a time window (PRN categorical, prn_rows gives
+    the row in the arcs plot of each category). The gaps and the observable differences at the start of the window are determined
+    from the per PRN state of the previous windows. Only the observations needed for plotting at width_px pixels over the
+    observation period are kept
+    """
+    navsig_obst_lst = dState['obsts']
+    dnavsig_obst_lst = ['d{nso:s}'.format(nso=navsig_obs) for navsig_obs in navsig_obst_lst]
+
+    dfNavSig = dfWin[['DATE_TIME', 'EPOCH', 'PRN'] + navsig_obst_lst].dropna().reset_index(drop=True)
+    if dfNavSig.shape[0] == 0:
+        return
+
+    # pixel column of each epoch over the observation period
+    ns_start = np.datetime64(dTime['start'], 'ns').astype(np.int64)
+    ns_span = max(int((dTime['end'] - dTime['start']).total_seconds() * 1e9), 1)
+    epoch_col = (dfNavSig['DATE_TIME'].to_numpy().astype('datetime64[ns]').astype(np.int64) - ns_start) * (width_px - 1) // ns_span
+
+    # PRN count at each epoch, the first epoch is compared to the last epoch of the previous window
+    dfCount = navsig_prn_count(dfNavSig=dfNavSig, dTime=dTime)
+    if dState['last_count'] is None:
+        dState['lst_evol'].append(navsig_prn_evolution(dfNavSigPRNCount=dfCount, interval=dTime['interval']))
+    else:
+        dfCount.loc[0, 'dPRNcnt'] = dfCount.loc[0, 'PRNcnt'] - dState['last_count']['PRNcnt'].iloc[0]
+        dfCount.loc[0, 'dt'] = (dfCount.loc[0, 'EPOCH'] - dState['last_count']['EPOCH'].iloc[0]) * dTime['interval']
+        dState['lst_evol'].append(navsig_prn_evolution(dfNavSigPRNCount=pd.concat([dState['last_count'], dfCount], ignore_index=True),
+                                                       interval=dTime['interval'],
+                                                       idx_first=1))
+    dState['last_count'] = dfCount.iloc[-1:]
+
+    count_col = (dfCount['DATE_TIME'].to_numpy().astype('datetime64[ns]').astype(np.int64) - ns_start) * (width_px - 1) // ns_span
+    dState['lst_count'].append(dfCount.iloc[plot_utils.minmax_rows(keys=count_col, lst_values=[dfCount['PRNcnt'].to_numpy()])])
+
+    # previous observation of each PRN, for the first observation in this window it is taken from the previous windows
+    dfPrev = dfNavSig.groupby('PRN', sort=False, observed=True)[['DATE_TIME', 'EPOCH'] + navsig_obst_lst].shift(1)
+    is_first = ~dfNavSig['PRN'].duplicated().to_numpy()
+    if dState['last'] is not None:
+        dfLastPrev = dState['last'].reindex(dfNavSig['PRN'][is_first])
+        for column in dfPrev.columns:
+            dfPrev.loc[is_first, column] = dfLastPrev[column].to_numpy()
+
+    # a reacquisition follows a gap in the epochs of a PRN, the first observation of a PRN also starts an arc
+    dEpoch = (dfNavSig['EPOCH'] - dfPrev['EPOCH']).to_numpy()
+    is_reacq = ~np.isnan(dEpoch) & (dEpoch != 1)
+    for prn, dt_loss, dt_reacq in zip(dfNavSig['PRN'][is_reacq], dfPrev['DATE_TIME'][is_reacq], dfNavSig['DATE_TIME'][is_reacq]):
+        dState['lock'].setdefault(prn, {'loss': [], 'reacq': []})
+        dState['lock'][prn]['loss'].append(dt_loss)
+        dState['lock'][prn]['reacq'].append(dt_reacq)
+
+    dfNavSig['reacq'] = is_reacq
+    dfNavSig['arc'] = is_reacq | np.isnan(dEpoch)
+    for navsig_obs, dnavsig_obs in zip(navsig_obst_lst, dnavsig_obst_lst):
+        dfNavSig[dnavsig_obs] = (dfNavSig[navsig_obs] - dfPrev[navsig_obs]).astype(float)
+
+    # carry the last observation of each PRN to the next window
+    dfWinLast = dfNavSig.groupby('PRN', sort=False, observed=True)[['DATE_TIME', 'EPOCH', 'reacq'] + navsig_obst_lst].last()
+    if dState['last'] is None:
+        dState['last'] = dfWinLast
+    else:
+        dState['last'] = pd.concat([dState['last'][~dState['last'].index.isin(dfWinLast.index)], dfWinLast])
+
+    # keep per PRN and pixel column the first, last and extreme observables and the first and last observation of each arc
+    prn_codes = dfNavSig['PRN'].cat.codes.to_numpy()
+    posidx_prns = np.argsort(prn_codes, kind='stable')
+    arc = dfNavSig['arc'].to_numpy()[posidx_prns]
+    posidx_keep = posidx_prns[plot_utils.minmax_rows(keys=prn_codes[posidx_prns].astype(np.int64) * width_px + epoch_col[posidx_prns],
+                                                     lst_values=[dfNavSig[column].to_numpy()[posidx_prns] for column in navsig_obst_lst + dnavsig_obst_lst])]
+    posidx_arcs = posidx_prns[np.flatnonzero(arc | np.r_[arc[1:], False])]
+
+    dState['lst_obs'].append(dfNavSig.iloc[np.unique(np.concatenate((posidx_keep, posidx_arcs)))])
+
+    # number of observations per PRN and pixel column of the arcs plot
+    obs_cnt = plot_utils.availability_counts(obs_epochs=dfNavSig['DATE_TIME'].to_numpy(),
+                                             obs_rows=prn_rows[prn_codes],
+                                             nr_rows=tleobs_plot.ARCS_MAX_PRN,
+                                             dt_start=dTime['start'],
+                                             dt_end=dTime['end'],
+                                             interval=dTime['interval'],
+                                             width_px=width_px)
+    dState['obs_cnt'] = obs_cnt if dState['obs_cnt'] is None else dState['obs_cnt'] + obs_cnt
+
+
+@am_profile.profile_func(rows=lambda ret: ret['rows'])
+def analyse_windowed(obstabf: str,
+                     lst_PRNs: list,
+                     nav_signals: list,
+                     obsfreqs: list,
+                     dTime: dict,
+                     window: float,
+                     dWindowed: dict = None,
+                     incremental: bool = False,
+                     logger: logging.Logger = None) -> dict:
+    """
+    analyse_windowed analyses the observations per time window of window hours so that memory usage does not depend on the
+    length of the observation file. Per navigation signal the state needed at the start of the next window is carried. When
+    the state dWindowed of a previous analysis is given, only the lines appended to the obstab since are analysed. For an
+    incremental analysis of a growing obstab, the last epoch is left to the next analysis since it may not be complete. Returns
+    the state, from which windowed_navsig_results creates the results
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # the observations are reduced to the resolution of the widest plot
+    width_px = int(tleobs_plot.ARCS_FIGSIZE[0] * plot_utils.DECIMATE_DPI)
+
+    if dWindowed is None:
+        dWindowed = {}
+        dWindowed['offset'] = None
+        dWindowed['last'] = None
+        dWindowed['prns'] = []
+        dWindowed['navsigs'] = {navsig: window_navsig_init(navsig_obst_lst=[obsfreq for obsfreq in obsfreqs if obsfreq.endswith(navsig)])
+                                for navsig in nav_signals}
+    # number of observations and windows analysed in this run
+    dWindowed['rows'] = 0
+    dWindowed['windows'] = 0
+
+    # PRN is stored as categorical, the row of each PRN in the arcs plot is given by its number
+    prn_dtype = pd.CategoricalDtype(categories=sorted(set(lst_PRNs)))
+    prn_rows = np.array([int(prn[1:]) - 1 for prn in prn_dtype.categories])
+    prn_observed = prn_dtype.categories.isin(dWindowed['prns'])
+
+    dProgress = {} if incremental else None
+    for dfWin in obstab_loader.obstab_windows(obstabf=obstabf, obstypes=obsfreqs, window=timedelta(hours=window), prns=lst_PRNs,
+                                              offset=dWindowed['offset'], dProgress=dProgress):
+        dfWin['PRN'] = dfWin['PRN'].astype(prn_dtype)
+        dfWin.insert(loc=1, column='EPOCH', value=gpstime.epochFromUTC(utc=dfWin['DATE_TIME'].values, utc_start=dTime['start'], interval=dTime['interval']))
+        prn_observed[dfWin['PRN'].cat.codes.unique()] = True
+
+        for navsig in nav_signals:
+            analyse_window_navsig(dState=dWindowed['navsigs'][navsig], dfWin=dfWin, dTime=dTime, prn_rows=prn_rows, width_px=width_px)
+
+        dWindowed['last'] = dfWin['DATE_TIME'].iloc[-1]
+        dWindowed['rows'] += dfWin.shape[0]
+        dWindowed['windows'] += 1
+        if logger is not None:
+            logger.debug('{func:s}: analysed window {start!s} - {end!s} ({rows:d} observations)'.format(start=dfWin['DATE_TIME'].iloc[0],
+                                                                                                        end=dfWin['DATE_TIME'].iloc[-1],
+                                                                                                        rows=dfWin.shape[0],
+                                                                                                        func=cFuncName))
+
+    # the analysis continues from the first line of the last epoch read
+    if dProgress is not None:
+        dWindowed['offset'] = dProgress.get('offset', dWindowed['offset'])
+    dWindowed['prns'] = prn_dtype.categories[prn_observed].tolist()
+
+    # the results of the windows are combined so that the state does not grow in number of dataframes
+    for dState in dWindowed['navsigs'].values():
+        for key in ['evol', 'count', 'obs']:
+            lst_dfs = dState['lst_{key:s}'.format(key=key)]
+            if len(lst_dfs) > 1:
+                dState['lst_{key:s}'.format(key=key)] = [pd.concat(lst_dfs, ignore_index=True)]
+
+    if logger is not None:
+        logger.info('{func:s}: analysed {rows:d} observations of {prns:d} PRNs in {windows:d} windows of {window:.1f} h'
+                    .format(rows=dWindowed['rows'],
+                            prns=len(dWindowed['prns']),
+                            windows=dWindowed['windows'],
+                            window=window,
+                            func=cFuncName))
+
+    return dWindowed
+
+
+def windowed_navsig_results(dState: dict, lst_prns: list) -> dict:
+    """
+    windowed_navsig_results combines the windows analysed for a navigation signal in the PRN count evolution, the reduced
+    observations and PRN counts, the availability counts and the loss / reacquisition times of the PRNs in lst_prns.
+    The state itself is not changed so that the analysis can be continued
+    """
+    dResults = {}
+    for key in ['evol', 'count', 'obs']:
+        lst_dfs = dState['lst_{key:s}'.format(key=key)]
+        dResults[key] = pd.concat(lst_dfs, ignore_index=True) if len(lst_dfs) > 0 else None
+    dResults['obs_cnt'] = dState['obs_cnt']
+
+    dResults['lock'] = {}
+    for prn in lst_prns:
+        dLock = dState['lock'].get(prn, {'loss': [], 'reacq': []})
+        prn_loss, prn_reacq = dLock['loss'], dLock['reacq']
+        # as in analyse_obsprn, a reacquisition at the last observation of a PRN is not reported
+        if dState['last'] is not None and prn in dState['last'].index and dState['last'].loc[prn, 'reacq']:
+            prn_loss, prn_reacq = prn_loss[:-1], prn_reacq[:-1]
+
+        dResults['lock'][prn] = {}
+        dResults['lock'][prn]['loss'] = prn_loss
+        dResults['lock'][prn]['reacq'] = prn_reacq
+        dResults['lock'][prn]['gap'] = [(dt_reacq - dt_loss).total_seconds() for dt_loss, dt_reacq in zip(prn_loss, prn_reacq)]
+
+    return dResults
+
+
+def incremental_state_load(statef: str,
+                           obstabf: str,
+                           dCheck: dict,
+                           logger: logging.Logger = None) -> dict:
+    """
+    incremental_state_load returns the state stored by the previous incremental analysis of obstabf. The state is not used
+    when it was created for another selection (dCheck) or when the obstab lines it analysed were rewritten since
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    try:
+        with open(statef, 'rb') as handle:
+            dIncr = pickle.load(handle)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        if logger is not None:
+            logger.info('{func:s}: no analysis state in {statef:s}, analysing {obstab:s} from its start'
+                        .format(statef=colored(statef, 'yellow'), obstab=colored(obstabf, 'green'), func=cFuncName))
+        return None
+
+    if dIncr['check'] != dCheck:
+        reason = 'was created for another selection'
+    elif obstab_loader.obstab_mark(obstabf=obstabf, offset=dIncr['windowed']['offset']) != dIncr['mark']:
+        reason = 'does not match the rewritten {obstab:s}'.format(obstab=obstabf)
+    else:
+        if logger is not None:
+            logger.info('{func:s}: continuing the analysis of {obstab:s} after its first {offset:d} bytes'
+                        .format(obstab=colored(obstabf, 'green'), offset=dIncr['windowed']['offset'], func=cFuncName))
+        return dIncr
+
+    if logger is not None:
+        logger.warning('{func:s}: analysis state in {statef:s} {reason:s}, analysing {obstab:s} from its start'
+                       .format(statef=colored(statef, 'yellow'), reason=reason, obstab=colored(obstabf, 'green'), func=cFuncName))
+    return None
+
+
+def incremental_state_save(statef: str,
+                           obstabf: str,
+                           dIncr: dict):
+    """
+    incremental_state_save stores the state of the incremental analysis of obstabf, the file is replaced at once so that an
+    interrupted run leaves the previous state
+    """
+    dIncr['mark'] = obstab_loader.obstab_mark(obstabf=obstabf, offset=dIncr['windowed']['offset'])
+
+    with open('{statef:s}.tmp'.format(statef=statef), 'wb') as handle:
+        pickle.dump(dIncr, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace('{statef:s}.tmp'.format(statef=statef), statef)
+
+
+def plot_obsprn_windowed(marker: str,
+                         obstabf: str,
+                         dTime: dict,
+                         dfTles: pd.DataFrame,
+                         dfPrnNavSig: pd.DataFrame,
+                         dfPrnVisTle: pd.DataFrame,
+                         dfJamSc: pd.DataFrame,
+                         prn: str,
+                         navsig_obst_lst: dict,
+                         snrth: float,
+                         dTemplates: dict = None,
+                         show_plot: bool = False,
+                         logger: logging.Logger = None) -> dict:
+    """
+    plot_obsprn_windowed plots the observables of the PRN from the observations kept by the windowed analysis, the arcs start
+    at the reacquisitions determined by that analysis
+    """
+    if dfPrnNavSig.shape[0] == 0:
+        return None
+
+    # positional indices of the start of each arc and of the last observation
+    posidx_time_gaps = np.flatnonzero(dfPrnNavSig['arc'].to_numpy()).tolist()
+    if posidx_time_gaps[-1] != dfPrnNavSig.shape[0] - 1:
+        posidx_time_gaps.append(dfPrnNavSig.shape[0] - 1)
+
+    # calculate the times that PRN reaches a elevation angle
+    df_PrnElev = tle_visibility.prn_elevation(prn=prn,
+                                              df_tle_prn=dfTles[dfTles['PRN'] == prn],
+                                              elev_step=dTab['cli']['elev_step'],
+                                              DTG_start=dTab['time']['start'],
+                                              DTG_end=dTab['time']['end'],
+                                              logger=logger)
+
+    plots = {}
+    for navsig_obs in navsig_obst_lst:
+        plots[navsig_obs] = tleobs_plot.plot_prn_navsig_obs(marker=marker,
+                                                            dTime=dTime,
+                                                            obsf=obstabf,
+                                                            prn=prn,
+                                                            dfPrnObst=dfPrnNavSig[['DATE_TIME', 'EPOCH', 'PRN', navsig_obs, 'd{nso:s}'.format(nso=navsig_obs)]],
+                                                            dfTleVisPrn=dfPrnVisTle,
+                                                            df_PRNElev=df_PrnElev,
+                                                            dfJam=dfJamSc,
+                                                            obst=navsig_obs,
+                                                            posidx_gaps=posidx_time_gaps,
+                                                            snrth=snrth,
+                                                            dTemplates=dTemplates,
+                                                            show_plot=show_plot,
+                                                            logger=logger)
+
+    return plots
+
+
 def main_obstab_analyse(argv):
     """
     main_obstab_analyse analyses the created OBSTAB files and compares with TLE data.
@@ -521,8 +922,9 @@ def main_obstab_analyse(argv):
     dTab['lock'] = {}
     dTab['info'] = {}
     dTab['PNT'] = {}
+    dTab['coverage'] = {}
 
-    dTab['cli']['obstabf'], dTab['cli']['freqs'], dTab['cli']['lst_prns'], dTab['cli']['obs_types'], dTab['cli']['snrth'], dTab['cli']['mask'], dTab['cli']['jamsc'], dTab['cli']['elev_step'], show_plot, logLevels = treatCmdOpts(argv)
+    dTab['cli']['obstabf'], dTab['cli']['freqs'], dTab['cli']['lst_prns'], dTab['cli']['obs_types'], dTab['cli']['snrth'], dTab['cli']['mask'], dTab['cli']['jamsc'], dTab['cli']['elev_step'], dTab['cli']['window'], dTab['cli']['incremental'], dTab['cli']['workers'], show_plot, logLevels = treatCmdOpts(argv)
 
     # detect used GNSS from the obstabf filename
     dTab['info']['gnss'] = os.path.splitext(os.path.basename(dTab['cli']['obstabf']))[0][-1]
@@ -530,6 +932,8 @@ def main_obstab_analyse(argv):
 
     # create logging for better debugging
     logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+    am_profile.profile_init(baseName=os.path.basename(__file__), logger=logger)
+
     # read the observation header info from the Pickle file
     dTab['obshdr'] = '{obsf:s}.obshdr'.format(obsf=os.path.splitext(dTab['cli']['obstabf'])[0][:-2])
     try:
@@ -542,7 +946,7 @@ def main_obstab_analyse(argv):
         logger.error('{func:s}: error {err!s} reading header file {hdrf:s}'.format(hdrf=colored(dTab['obshdr'], 'red'), err=e, func=cFuncName))
         sys.exit(amc.E_FILE_NOT_EXIST)
 
-    logger.info('{func:s}: Imported header information from {hdrf:s}\n{json!s}'.format(func=cFuncName, json=json.dumps(dTab['hdr'], sort_keys=False, indent=4, default=amutils.json_convertor), hdrf=colored(dTab['obshdr'], 'blue')))
+    amutils.logJSON(callerName=cFuncName, title='Imported header information from {hdrf:s}'.format(hdrf=colored(dTab['obshdr'], 'blue')), dInfo=dTab['hdr'], logger=logger)
 
     # verify input
     check_arguments(logger=logger)
@@ -551,23 +955,74 @@ def main_obstab_analyse(argv):
     dTab['time']['start'] = datetime.strptime(dTab['hdr']['data']['epoch']['first'].split('.')[0], '%Y %m %d %H %M %S')
     dTab['time']['end'] = datetime.strptime(dTab['hdr']['data']['epoch']['last'].split('.')[0], '%Y %m %d %H %M %S')
 
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dTab, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    if dTab['cli']['incremental']:
+        # the results of successive runs on the growing obstab are combined over the whole observation day
+        dTab['time']['start'] = dTab['time']['date']
+        dTab['time']['end'] = dTab['time']['date'] + timedelta(days=1) - timedelta(seconds=dTab['time']['interval'])
+        if dTab['cli']['window'] is None:
+            dTab['cli']['window'] = INCREMENTAL_WINDOW
+
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dTab, logger=logger, level=logging.DEBUG)
+
+    # state of the incremental analysis
+    dIncr = None
 
-    # read obstab into a dataframe and select the SNR for the selected frequencies
-    dTab['lst_CmnPRNs'], dTab['nav_signals'], dTab['obsfreqs'], dfObsTab = read_obstab(obstabf=dTab['obstabf'],
-                                                                                       lst_PRNs=dTab['lst_prns'],
-                                                                                       dCli=dTab['cli'],
-                                                                                       logger=logger)
+    if dTab['cli']['window'] is None:
+        # read obstab into a dataframe and select the SNR for the selected frequencies
+        dTab['lst_CmnPRNs'], dTab['nav_signals'], dTab['obsfreqs'], dfObsTab = read_obstab(obstabf=dTab['obstabf'],
+                                                                                           lst_PRNs=dTab['lst_prns'],
+                                                                                           dCli=dTab['cli'],
+                                                                                           logger=logger)
+        amutils.logHeadTailDataFrame(df=dfObsTab, dfName='dfObsTab', callerName=cFuncName, logger=logger)
 
-    # get the observation time spans based on TLE values
-    dfTLEs, dfTLEVis = tle_visibility.PRNs_visibility(prn_lst=dfObsTab.PRN.unique(),
-                                                      DTG_start=dTab['time']['start'],
-                                                      DTG_end=dTab['time']['end'],
-                                                      interval=dTab['time']['interval'],
-                                                      cutoff=dTab['cli']['mask'],
-                                                      logger=logger)
+        # last epoch read from the obstab
+        dt_last = dfObsTab['DATE_TIME'].max()
+    else:
+        # analyse the obstab per time window, only the results and the observations needed for plotting are kept
+        dTab['nav_signals'], dTab['obsfreqs'] = obstab_obsfreqs(obstabf=dTab['obstabf'], dCli=dTab['cli'])
+
+        # an incremental analysis continues from the state stored by the previous run
+        if dTab['cli']['incremental']:
+            dTab['statef'] = '{obstab:s}.state'.format(obstab=os.path.splitext(dTab['obstabf'])[0])
+            dIncrCheck = {key: dTab['time'][key] for key in ['start', 'end', 'interval']}
+            dIncrCheck['lst_prns'] = dTab['lst_prns']
+            dIncrCheck['obsfreqs'] = dTab['obsfreqs']
+            dIncr = incremental_state_load(statef=dTab['statef'], obstabf=dTab['obstabf'], dCheck=dIncrCheck, logger=logger)
+            if dIncr is None:
+                dIncr = {'check': dIncrCheck, 'windowed': None, 'tle': None}
+
+        dWindowed = analyse_windowed(obstabf=dTab['obstabf'],
+                                     lst_PRNs=dTab['lst_prns'],
+                                     nav_signals=dTab['nav_signals'],
+                                     obsfreqs=dTab['obsfreqs'],
+                                     dTime=dTab['time'],
+                                     window=dTab['cli']['window'],
+                                     dWindowed=None if dIncr is None else dIncr['windowed'],
+                                     incremental=dTab['cli']['incremental'],
+                                     logger=logger)
+        dTab['lst_CmnPRNs'] = dWindowed['prns']
+        dt_last = dTab['time']['end'] if dWindowed.get('last') is None else dWindowed['last']
+
+        if len(dTab['lst_CmnPRNs']) == 0:
+            logger.error('{func:s}: selected list of PRNs ({lstprns:s}) not observed. program exits'.format(lstprns=colored(', '.join(dTab['lst_prns']), 'red'), func=cFuncName))
+            sys.exit(amc.E_PRN_NOT_IN_DATA)
+
+    # get the observation time spans based on TLE values, an incremental run only recomputes these when new PRNs are observed
+    if dIncr is not None and dIncr['tle'] is not None and dIncr['tle']['key'] == (dTab['lst_CmnPRNs'], dTab['cli']['mask']) and 'ivTLE' in dIncr['tle']:
+        dfTLEs, dfTLEVis, ivTLE = dIncr['tle']['dfTLEs'], dIncr['tle']['dfTLEVis'], dIncr['tle']['ivTLE']
+    else:
+        dfTLEs, dfTLEVis, ivTLE = tle_visibility.PRNs_visibility(prn_lst=dTab['lst_CmnPRNs'],
+                                                                 DTG_start=dTab['time']['start'],
+                                                                 DTG_end=dTab['time']['end'],
+                                                                 interval=dTab['time']['interval'],
+                                                                 cutoff=dTab['cli']['mask'],
+                                                                 logger=logger)
+
+    if dIncr is not None:
+        dIncr['windowed'] = dWindowed
+        dIncr['tle'] = {'key': (dTab['lst_CmnPRNs'], dTab['cli']['mask']), 'dfTLEs': dfTLEs, 'dfTLEVis': dfTLEVis, 'ivTLE': ivTLE}
+        incremental_state_save(statef=dTab['statef'], obstabf=dTab['obstabf'], dIncr=dIncr)
 
-    amutils.logHeadTailDataFrame(df=dfObsTab, dfName='dfObsTab', callerName=cFuncName, logger=logger)
     amutils.logHeadTailDataFrame(df=dfTLEVis, dfName='dfTLEVis', callerName=cFuncName, logger=logger)
 
     # read the jamming scenario into a dataframe
@@ -578,9 +1033,7 @@ def main_obstab_analyse(argv):
     else:
         df_JamSc = pd.DataFrame(columns=['DATE_TIME', 'Signal [dBm]', 'Jammer [dBm]', 'SINR [dB]'])
 
-    logger.info('{func:s}: Project information =\n{json!s}'
-                .format(func=cFuncName,
-                        json=json.dumps(dTab, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dTab, logger=logger, level=logging.DEBUG)
 
     # list with observable types per navigation signal
     lst_navsig_obst = {}
@@ -595,36 +1048,29 @@ def main_obstab_analyse(argv):
         navsig_name = '{gnss:s}{navs:s}'.format(gnss=dTab['info']['gnss'], navs=navsig)
         logger.info('{func:s}: working on navigation signal {navs:s}'.format(navs=colored(navsig, 'green'), func=cFuncName))
 
-        # keep the observables for this navigatoion signal
-        col_navsig = [column for column in dfObsTab.columns.tolist()[:2]]
-        col_navsig += [column for column in dfObsTab.columns.tolist()[2:] if column.endswith(navsig)]
-        # print('col_navsig = {}'.format(col_navsig))
-        dfNavSig = dfObsTab[col_navsig].dropna()
-
-        amutils.logHeadTailDataFrame(df=dfNavSig, dfName='dfNavSig', callerName=cFuncName, logger=logger)
-
-        # create dataframe for this navsig with count of PRN at each date_time
-        dfNavSigPRNCount = dfNavSig.pivot_table(index=['DATE_TIME'], aggfunc='size').to_frame()
-        dfNavSigPRNCount.reset_index(inplace=True)
-        dfNavSigPRNCount.rename(columns={0: 'PRNcnt'}, inplace=True)
-        # add difference in PRNcnt and difference in DATE_TIME
-        dfNavSigPRNCount["dPRNcnt"] = dfNavSigPRNCount["PRNcnt"].diff(1)
-        dfNavSigPRNCount["dt"] = dfNavSigPRNCount["DATE_TIME"].diff(dTab['time']['interval']).dt.total_seconds()
-        amutils.logHeadTailDataFrame(df=dfNavSigPRNCount, dfName='dfNavSigPRNCount', callerName=cFuncName, logger=logger)
-
-        # create a dataframe containing the times where there is a change in PRNcnt or a gap is detected
-        idx_list = dfNavSigPRNCount.index[(dfNavSigPRNCount['dPRNcnt'] != 0) | (dfNavSigPRNCount['dt'] > dTab['time']['interval'])].tolist()
-        idx_prev_list = [x - 1 for x in idx_list if x > 0]
-        idx_merged = idx_list + idx_prev_list
-        idx_merged.sort()
-        # print('idx_list = {}'.format(idx_list))
-        # print('idx_prev_list = {}'.format(idx_prev_list))
-        # print('idx_merged = {}'.format(idx_merged))
-        dfPRNEvol = dfNavSigPRNCount.iloc[idx_merged]
-        dfPRNEvol.reset_index(drop=True, inplace=True)
-        # print('dfPRNEvol = \n{}'.format(dfPRNEvol))
-        # with pd.option_context('display.max_rows', None, 'display.max_columns', None):
-        # print(dfPRNEvol)
+        if dTab['cli']['window'] is None:
+            # keep the observables for this navigatoion signal
+            col_navsig = [column for column in dfObsTab.columns.tolist()[:3]]
+            col_navsig += [column for column in dfObsTab.columns.tolist()[3:] if column.endswith(navsig)]
+            # print('col_navsig = {}'.format(col_navsig))
+            dfNavSig = dfObsTab[col_navsig].dropna()
+
+            amutils.logHeadTailDataFrame(df=dfNavSig, dfName='dfNavSig', callerName=cFuncName, logger=logger)
+
+            # create dataframe for this navsig with count of PRN at each epoch
+            dfNavSigPRNCount = navsig_prn_count(dfNavSig=dfNavSig, dTime=dTab['time'])
+            amutils.logHeadTailDataFrame(df=dfNavSigPRNCount, dfName='dfNavSigPRNCount', callerName=cFuncName, logger=logger)
+
+            # create a dataframe containing the times where there is a change in PRNcnt or a gap is detected
+            dfPRNEvol = navsig_prn_evolution(dfNavSigPRNCount=dfNavSigPRNCount, interval=dTab['time']['interval'])
+            # print('dfPRNEvol = \n{}'.format(dfPRNEvol))
+            # with pd.option_context('display.max_rows', None, 'display.max_columns', None):
+            # print(dfPRNEvol)
+            obs_cnt = None
+        else:
+            # the windowed analysis determined the PRN count evolution and kept the observations and PRN counts for plotting
+            dWinNavSig = windowed_navsig_results(dState=dWindowed['navsigs'][navsig], lst_prns=dTab['lst_CmnPRNs'])
+            dfNavSig, dfNavSigPRNCount, dfPRNEvol, obs_cnt = dWinNavSig['obs'], dWinNavSig['count'], dWinNavSig['evol'], dWinNavSig['obs_cnt']
 
         # create lists with DateTimes of loss / reacquisition of PNT
         dTab['PNT'][navsig] = pnt_available(dfPrnEvol=dfPRNEvol,
@@ -634,6 +1080,14 @@ def main_obstab_analyse(argv):
 
         amutils.logHeadTailDataFrame(df=dfPRNEvol, dfName='dfPRNEvol', callerName=cFuncName, logger=logger)
 
+        # observed and missed parts of the TLE arcs per PRN
+        dTab['coverage'][navsig] = navsig_coverage(dfNavSig=dfNavSig,
+                                                   lst_prns=dTab['lst_CmnPRNs'],
+                                                   ivTLE=ivTLE,
+                                                   dTime=dTab['time'],
+                                                   dt_last=dt_last,
+                                                   logger=logger)
+
         # create plot with all selected PRNs vs the TLE part per navigation signal
         dTab['plots'][navsig]['tle-obs'] = tleobs_plot.obstle_plot_arcs_prns(marker=dTab['marker'],
                                                                              obsf=dTab['obstabf'],
@@ -642,6 +1096,7 @@ def main_obstab_analyse(argv):
                                                                              lst_PRNs=dTab['lst_CmnPRNs'],
                                                                              dfNavSig=dfNavSig,
                                                                              dfTleVis=dfTLEVis,
+                                                                             obs_cnt=obs_cnt,
                                                                              logger=logger,
                                                                              show_plot=show_plot)
 
@@ -662,31 +1117,54 @@ def main_obstab_analyse(argv):
                                                                           logger=logger,
                                                                           show_plot=show_plot)
 
+        # the plot layout per observable is created once for all PRNs of this navigation signal
+        dPlotTemplates = {}
+
+        # split the observations of this navigation signal per PRN at once
+        dNavSigPRNs = dict(tuple(dfNavSig.groupby('PRN', sort=False, observed=True)))
+
         for prn in dTab['lst_CmnPRNs']:
 
             # print('\nPRN = {} {}'.format(prn, navsig_name))
             # select the TLE row for this PRN
             dfTLEVisPrn = dfTLEVis.loc[prn]
 
-            # select the TLE row for this PRN
-            dfNavSigPRN = dfNavSig[dfNavSig['PRN'] == prn].dropna()
+            # select the observations for this PRN
+            dfNavSigPRN = dNavSigPRNs[prn] if prn in dNavSigPRNs else dfNavSig.iloc[0:0].copy()
             # print('dfNavSigPRN = \n{}'.format(dfNavSigPRN))
 
-            # posidx_time_gaps, posidx_snr_posjumps[navsig_obs], posidx_snr_negjumps[navsig_obs], plots
-            prn_loss, prn_reacq, prn_plots = analyse_obsprn(marker=dTab['marker'],
-                                                            obstabf=dTab['obstabf'],
-                                                            navsig_name=navsig_name,
-                                                            dTime=dTab['time'],
-                                                            dfTles=dfTLEs,
-                                                            prn=prn,
-                                                            dfPrnVisTle=dfTLEVisPrn,
-                                                            dfPrnNavSig=dfNavSigPRN,
-                                                            dfJamSc=df_JamSc,
-                                                            navsig_obst_lst=lst_navsig_obst[navsig],
-                                                            snrth=dTab['cli']['snrth'],
-                                                            interval=dTab['time']['interval'],
-                                                            show_plot=show_plot,
-                                                            logger=logger)
+            if dTab['cli']['window'] is None:
+                # posidx_time_gaps, posidx_snr_posjumps[navsig_obs], posidx_snr_negjumps[navsig_obs], plots
+                prn_loss, prn_reacq, prn_plots = analyse_obsprn(marker=dTab['marker'],
+                                                                obstabf=dTab['obstabf'],
+                                                                navsig_name=navsig_name,
+                                                                dTime=dTab['time'],
+                                                                dfTles=dfTLEs,
+                                                                prn=prn,
+                                                                dfPrnVisTle=dfTLEVisPrn,
+                                                                dfPrnNavSig=dfNavSigPRN,
+                                                                dfJamSc=df_JamSc,
+                                                                navsig_obst_lst=lst_navsig_obst[navsig],
+                                                                snrth=dTab['cli']['snrth'],
+                                                                interval=dTab['time']['interval'],
+                                                                dTemplates=dPlotTemplates,
+                                                                show_plot=show_plot,
+                                                                logger=logger)
+            else:
+                prn_loss, prn_reacq = dWinNavSig['lock'][prn]['loss'], dWinNavSig['lock'][prn]['reacq']
+                prn_plots = plot_obsprn_windowed(marker=dTab['marker'],
+                                                 obstabf=dTab['obstabf'],
+                                                 dTime=dTab['time'],
+                                                 dfTles=dfTLEs,
+                                                 prn=prn,
+                                                 dfPrnVisTle=dfTLEVisPrn,
+                                                 dfPrnNavSig=dfNavSigPRN,
+                                                 dfJamSc=df_JamSc,
+                                                 navsig_obst_lst=lst_navsig_obst[navsig],
+                                                 snrth=dTab['cli']['snrth'],
+                                                 dTemplates=dPlotTemplates,
+                                                 show_plot=show_plot,
+                                                 logger=logger)
 
             dTab['plots'][navsig][prn] = prn_plots
 
@@ -696,6 +1174,8 @@ def main_obstab_analyse(argv):
             dTab['lock'][navsig][prn]['gap'] = [(dt_reacq - dt_loss).total_seconds() for dt_loss, dt_reacq in zip(prn_loss, prn_reacq)]
 
             # print("xxx dTab[lock][{}][{}] = {}".format(navsig, prn, dTab['lock'][navsig][prn]))
+        tleobs_plot.close_templates(dTemplates=dPlotTemplates)
+
         # combine the loss / reacquisition events in a dataframe
         ddf_events[navsig] = loss_lock_combine(navsig=navsig,
                                                dPNT=dTab['PNT'][navsig],
@@ -718,17 +1198,23 @@ def main_obstab_analyse(argv):
                                                               navsig_plts=dTab['plots'],
                                                               navsig_obst_lst=lst_navsig_obst,
                                                               lst_PRNs=dTab['lst_CmnPRNs'],
-                                                              dEvents_df=ddf_events)
+                                                              dEvents_df=ddf_events,
+                                                              frag_dir=os.path.join(dTab['ltx']['path'], '{obstab:s}_frags'.format(obstab=dTab['ltx']['obstab'])),
+                                                              csv_dir=os.path.join(dTab['dir'], 'csv'),
+                                                              workers=dTab['cli']['workers'],
+                                                              logger=logger)
     sec_obstab.append(ssec_tleobs)
-    sec_obstab.generate_tex(os.path.join(dTab['ltx']['path'], dTab['ltx']['obstab']))
+    with am_profile.profile_stage(stage='generate_tex'):
+        sec_obstab.generate_tex(os.path.join(dTab['ltx']['path'], dTab['ltx']['obstab']))
 
     # store the json structure
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dTab, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dTab, logger=logger)
     jsonName = os.path.join(dTab['dir'], '{scrname:s}.json'.format(scrname=os.path.splitext(os.path.basename(__file__))[0]))
     with open(jsonName, 'w+') as f:
         json.dump(dTab, f, ensure_ascii=False, indent=4, default=amutils.json_convertor)
 
     # clean up
+    am_profile.profile_save(dir=dTab['dir'])
     copyfile(log_name, os.path.join(dTab['dir'], '{scrname:s}.log'.format(scrname=os.path.basename(__file__).replace('.', '_'))))
     os.remove(log_name)
 
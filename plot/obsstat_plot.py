@@ -8,11 +8,13 @@ import logging
 import matplotlib.ticker as ticker
 from typing import Tuple
 
-from ampyutils import amutils
+from ampyutils import amutils, am_profile
+from plot import plot_utils
 
 __author__ = 'amuls'
 
 
+@am_profile.profile_func()
 def obsstat_plot_obscount(obs_statf: str, gnss: str, gfzrnx: str, show_plot: bool = False, logger: logging.Logger = None):
     """
     obsstat_plot_obscount plots the number of observables per PRN for this gnss
@@ -26,14 +28,15 @@ def obsstat_plot_obscount(obs_statf: str, gnss: str, gfzrnx: str, show_plot: boo
     df_obsstat = pd.read_csv(obs_statf, header=0, delim_whitespace=True)  # skiprows
     amutils.logHeadTailDataFrame(df=df_obsstat, dfName='df_obsstat', logger=logger, callerName=cFuncName)
 
-    # get the number of SVs and the observation types for Cxx only
-    lst_prns = df_obsstat.PRN.unique()
-
     # get the list of observables
     lst_cols = df_obsstat.columns.tolist()
     lst_obst = [x for x in lst_cols[lst_cols.index('PRN') + 1:] if x.startswith('C')]
     nr_bars = len(lst_obst)
 
+    # pivot into a PRN x observable matrix of observation counts
+    dfPRNCount = df_obsstat.groupby('PRN', sort=False)[lst_obst].sum()
+    lst_prns = dfPRNCount.index.tolist()
+
     # set up the plot
     plt.style.use('ggplot')
     # plt.style.use('seaborn-darkgrid')
@@ -48,12 +51,9 @@ def obsstat_plot_obscount(obs_statf: str, gnss: str, gfzrnx: str, show_plot: boo
     # create colormap with nrcolors discrete colors
     bar_colors, title_font = amutils.create_colormap_font(nrcolors=nr_bars, font_size=12)
 
-    for i, prn in enumerate(lst_prns):
-        for j, obst_used in enumerate(lst_obst):
-            if i == 0:
-                ax.barh(y=y_prns[i] + dy_obs[j], width=df_obsstat[df_obsstat.PRN == prn][obst_used], height=bar_width, color=bar_colors[j], label=obst_used)
-            else:
-                ax.barh(y=y_prns[i] + dy_obs[j], width=df_obsstat[df_obsstat.PRN == prn][obst_used], height=bar_width, color=bar_colors[j])
+    # draw the bars of all PRNs for an observable at once
+    for j, obst_used in enumerate(lst_obst):
+        ax.barh(y=y_prns + dy_obs[j], width=dfPRNCount[obst_used].to_numpy(), height=bar_width, color=bar_colors[j], label=obst_used)
 
     # beautify plot
     ax.xaxis.grid(b=True, which='major')
@@ -79,9 +79,8 @@ def obsstat_plot_obscount(obs_statf: str, gnss: str, gfzrnx: str, show_plot: boo
 
     # save the plot in subdir png of GNSSSystem
     amutils.mkdir_p('png')
-    for ext in ['pdf', 'png', 'eps']:
-        plt_name = os.path.join('png', '{basen:s}-{gnss:s}-obscount.{ext:s}'.format(basen=obs_statf.split('.')[0], gnss=gnss, ext=ext))
-        fig.savefig(plt_name, dpi=150, bbox_inches='tight', format=ext)
+    basen = os.path.join('png', '{basen:s}-{gnss:s}-obscount'.format(basen=obs_statf.split('.')[0], gnss=gnss))
+    for plt_name in plot_utils.save_figure_formats(fig=fig, basename=basen, exts=['pdf', 'png', 'eps'], dpi=150):
         logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(plt_name, 'green')))
 
     if show_plot:
@@ -9,14 +9,74 @@ import pandas as pd
 from matplotlib import dates
 from datetime import datetime
 
-from ampyutils import amutils
-from plot import plot_utils
+from ampyutils import amutils, am_profile
+from plot import plot_utils, obsstat_plot
 from gfzrnx import gfzrnx_constants as gfzc
 
 __author__ = 'amuls'
 
 
-def obstab_plot_obstimelines(dfObsTab: pd.DataFrame, lst_prns: list, dTime: dict, show_plot: bool = False, logger: logging.Logger = None) -> str:
+@am_profile.profile_func()
+def obstab_plot_obscount(yyyy: int, doy: int, gnss: str, dprns: dict, obsts_cli: list, obsts_used: list, obs_epochs: pd.DataFrame, dir_gfzplt: str, obstab_name: str, show_plot: bool = False, logger: logging.Logger = None) -> str:
+    """
+    obstab_plot_obscount plots the number of observations per PRN for the observables used, obs_epochs is the table per PRN created by timing_overview
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    # set up the plot
+    plt.style.use('ggplot')
+
+    lst_prns = dprns[gnss]
+    dfPRNCount = obs_epochs.reindex(lst_prns)
+    y_prns = np.arange(len(lst_prns))  # location of the PRNs
+
+    fig, ax = plt.subplots(figsize=(10, 7))
+
+    dy_obs, bar_width = obsstat_plot.bars_info(nr_arcs=len(obsts_used), logger=logger)
+
+    # create colormap with nrcolors discrete colors
+    bar_colors, title_font = amutils.create_colormap_font(nrcolors=len(obsts_used), font_size=12)
+
+    # draw the bars of all PRNs for an observable at once
+    for j, obst_used in enumerate(obsts_used):
+        ax.barh(y=y_prns + dy_obs[j], width=dfPRNCount[obst_used].to_numpy(), height=bar_width, color=bar_colors[j], label=obst_used)
+
+    # mark the number of epochs between first and last observation of the PRN
+    ax.plot(dfPRNCount['expected'].to_numpy(), y_prns, linestyle='', marker='|', markersize=20, color='black', label='Epochs')
+
+    # beautify plot
+    ax.xaxis.grid(b=True, which='major')
+    ax.yaxis.grid(b=True, which='major')
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=6, fancybox=True, shadow=True)
+
+    ax.set_ylabel('PRNs', fontdict=title_font)
+    ax.set_xlabel('# observations [-]', fontdict=title_font)
+    ax.xaxis.set_major_formatter(ticker.FormatStrFormatter('%d'))
+
+    # setticks on Y axis to represent the PRNs with their completeness
+    ax.yaxis.set_ticks(y_prns)
+    ax.set_yticklabels(['{prn:s} ({perc:.0f}%)'.format(prn=prn, perc=complete * 100) for prn, complete in zip(lst_prns, dfPRNCount['complete'].fillna(0))])
+
+    # plot title
+    plt.title('Observations count for GNSS {gnss:s} on {yy:02d}/{doy:03d}'.format(gnss=gnss, yy=(yyyy % 100), doy=doy))
+
+    fig.tight_layout()
+
+    # save the plot in subdir png of GNSSSystem
+    plt_name = '{basen:s}-{gnss:s}-obscount.pdf'.format(basen=obstab_name.split('.')[0], gnss=gnss)
+    fig.savefig(os.path.join(dir_gfzplt, plt_name), dpi=200)
+    logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(plt_name, 'green')))
+
+    if show_plot:
+        plt.show(block=True)
+    else:
+        plt.close(fig)
+
+    return plt_name
+
+
+@am_profile.profile_func()
+def obstab_plot_obstimelines(yyyy: int, doy: int, gnss: str, dfobs: pd.DataFrame, dprns: dict, obsts_cli: list, obsts_used: list, obs_epochs: dict, dir_gfzplt: str, obstab_name: str, show_plot: bool = False, logger: logging.Logger = None) -> str:
     """
     obstab_plot_obstimelines plots the timeline of observales per PRN
     """
@@ -26,9 +86,6 @@ def obstab_plot_obstimelines(dfObsTab: pd.DataFrame, lst_prns: list, dTime: dict
     plt.style.use('ggplot')
     # plt.style.use('seaborn-darkgrid')
 
-    # determine how many PRNs are observed used as coordinate
-    y_prns = np.arange(len())  # location of the PRNs
-
     # determine how many bars per PRN, that is how many observables of one type found
     obst_cli = obsts_cli[0]  # in enumerate(obsts_cli), all observables have the same timeline
     obst_bars = [obst_used for obst_used in obsts_used if obst_used[0].lower() == obst_cli.lower()]
@@ -36,25 +93,41 @@ def obstab_plot_obstimelines(dfObsTab: pd.DataFrame, lst_prns: list, dTime: dict
 
     fig, ax = plt.subplots(figsize=(10, 7))
 
-    dy_obs, bar_width = bars_info(nr_arcs=nr_bars, logger=logger)
-
     # create colormap with nrcolors discrete colors
     bar_colors, title_font = amutils.create_colormap_font(nrcolors=nr_bars, font_size=12)
 
-    for i, prn in enumerate(dprns[gnss]):
-        dfprn = dfobs[dfobs['PRN'] == prn]
-        for j, obst_used in enumerate(obst_bars):
-
-            dfprnobst = dfprn[['DATE_TIME', obst_used]].copy()
-
-            # dfprnobst['value'] = dfprnobst[obst_used].notna() * (y_prns[i] + dy_obs[j] * bar_width)
-            # df[df['A'] > 2]['B'] = new_val  # new_val not set in df
-            # df.loc[df['A'] > 2, 'B'] = new_val
-            dfprnobst.loc[dfprnobst[obst_used].notna(), 'value'] = y_prns[i] + dy_obs[j]
-            if i == 0:
-                ax.plot(dfprnobst['DATE_TIME'], dfprnobst['value'], color=bar_colors[j], linewidth=4, label=obst_used)
-            else:
-                ax.plot(dfprnobst['DATE_TIME'], dfprnobst['value'], color=bar_colors[j], linewidth=4)
+    # rasterise the availability of each observable per PRN in a (PRN x observable) x time matrix drawn as a single image
+    dt_obs = dfobs['DATE_TIME'].values
+    # observation interval is the smallest time step between the first observations of a PRN
+    dt_steps = np.diff(dt_obs[:10000])
+    interval = dt_steps[dt_steps > np.timedelta64(0, 's')].min() / np.timedelta64(1, 's') if np.any(dt_steps > np.timedelta64(0, 's')) else 1
+    prn_rows = dfobs['PRN'].map({prn: i for i, prn in enumerate(dprns[gnss])}).values
+
+    lst_epochs, lst_rows = [], []
+    for j, obst_used in enumerate(obst_bars):
+        obst_avail = dfobs[obst_used].notna().values & ~np.isnan(prn_rows)
+        lst_epochs.append(dt_obs[obst_avail])
+        lst_rows.append(prn_rows[obst_avail].astype(np.int64) * nr_bars + j)
+
+    mAvail = plot_utils.availability_matrix(obs_epochs=np.concatenate(lst_epochs),
+                                            obs_rows=np.concatenate(lst_rows),
+                                            nr_rows=len(dprns[gnss]) * nr_bars,
+                                            lst_visible=[],
+                                            dt_start=dt_obs.min(),
+                                            dt_end=dt_obs.max(),
+                                            interval=interval,
+                                            width_px=int(fig.get_figwidth() * plot_utils.DECIMATE_DPI))
+
+    ax.imshow(plot_utils.availability_image(mAvail=mAvail, lst_colors=bar_colors[:nr_bars] * len(dprns[gnss])),
+              aspect='auto',
+              interpolation='nearest',
+              origin='lower',
+              extent=[dates.date2num(dt_obs.min()), dates.date2num(dt_obs.max()), -0.5, len(dprns[gnss]) - 0.5])
+    ax.xaxis_date()
+
+    # the observables are identified in the legend by their color
+    for obst_used, bar_color in zip(obst_bars, bar_colors):
+        ax.plot([], [], color=bar_color, linewidth=4, label=obst_used)
 
     # beautify plot
     ax.xaxis.grid(b=True, which='major')
@@ -74,7 +147,7 @@ def obstab_plot_obstimelines(dfObsTab: pd.DataFrame, lst_prns: list, dTime: dict
     plt.title('Observation timeline for GNSS {gnss:s} on {yy:02d}/{doy:03d}'.format(gnss=gnss, yy=(yyyy % 100), doy=doy))
 
     # create the ticks for the time axis
-    dtFormat = plot_utils.determine_datetime_ticks(startDT=dfprn['DATE_TIME'].iloc[0], endDT=dfprn['DATE_TIME'].iloc[-1])
+    dtFormat = plot_utils.determine_datetime_ticks(startDT=dfobs['DATE_TIME'].iloc[0], endDT=dfobs['DATE_TIME'].iloc[-1])
 
     if dtFormat['minutes']:
         # ax.xaxis.set_major_locator(dates.MinuteLocator(byminute=range(10, 60, 10), interval=1))
@@ -107,6 +180,7 @@ def obstab_plot_obstimelines(dfObsTab: pd.DataFrame, lst_prns: list, dTime: dict
     return plt_name
 
 
+@am_profile.profile_func()
 def obstab_plot_observable(yyyy: int, doy: int, gnss: str, dfprnobst: pd.DataFrame, dir_gfzplt: str, obstab_name: str, dt_first: datetime, dt_last: datetime, show_plot: bool = False, logger: logging.Logger = None) -> str:
     """
     obstab_plot_observable plots the selected observable type
@@ -135,8 +209,11 @@ def obstab_plot_observable(yyyy: int, doy: int, gnss: str, dfprnobst: pd.DataFra
     # create colormap with nrcolors discrete colors which is th efirst always present plot
     obst_colors, title_font = amutils.create_colormap_font(nrcolors=nr_obsts, font_size=12)
     obst_markers = lst_markers[:nr_obsts]
+    # the series are reduced to the minimum / maximum per pixel column of the figure
+    width_px = int(fig.get_figwidth() * plot_utils.DECIMATE_DPI)
     for obst, obst_color, marker in zip(dfprnobst.columns[idx_PRN:], obst_colors, obst_markers):
-        ax1.plot(dfprnobst['DATE_TIME'], dfprnobst[obst], color=obst_color, label=obst, alpha=0.6, linestyle='', marker=marker, markersize=2)
+        dt_obst, obst_values = plot_utils.decimate_minmax(x=dfprnobst['DATE_TIME'], y=dfprnobst[obst], width_px=width_px)
+        ax1.plot(dt_obst, obst_values, color=obst_color, label=obst, alpha=0.6, linestyle='', marker=marker, markersize=2)
 
     # beautify plot
     ax1.xaxis.grid(b=True, which='major')
@@ -171,7 +248,8 @@ def obstab_plot_observable(yyyy: int, doy: int, gnss: str, dfprnobst: pd.DataFra
                 dfprnobstdiff[obst_diff] = dfprnobst[obst1] - dfprnobst[obst2]
 
                 marker = obst_diff_markers[i * len(dfprnobst.columns[idx_PRN:-1]) + j]
-                ax2.plot(dfprnobstdiff['DATE_TIME'], dfprnobstdiff[obst_diff], label=obst_diff, alpha=0.6, linestyle='', marker=marker, markersize=2)
+                dt_diff, diff_values = plot_utils.decimate_minmax(x=dfprnobstdiff['DATE_TIME'], y=dfprnobstdiff[obst_diff], width_px=width_px)
+                ax2.plot(dt_diff, diff_values, label=obst_diff, alpha=0.6, linestyle='', marker=marker, markersize=2)
 
         # beutify this plot
         if dfprnobst.columns[idx_PRN][0] == 'S':
@@ -1,9 +1,18 @@
+import os
 import datetime
+import pickle
+import numpy as np
+import matplotlib.colors as mcolors
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
 
 from GNSS import gpstime
 
 __author__ = 'amuls'
 
+# resolution used to determine the number of pixel columns a plotted series is decimated to
+DECIMATE_DPI = 150
+
 
 def determineTimeTicks(firstObs, lastObs):
     """
@@ -64,3 +73,214 @@ def determine_datetime_ticks(startDT: datetime.datetime, endDT: datetime.datetim
     # print('dTimeFormatter = {!s}'.format(dTimeFormatter))
 
     return dTimeFormatter
+
+
+def minmax_columns(x, y, width_px: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    minmax_columns returns the pixel column of each value and the positions of the first, last, minimum and maximum value of
+    each of the width_px columns spanned by x (x sorted). (None, None) is returned when the series needs no reduction
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    if y.shape[0] <= 4 * width_px:
+        return None, None
+
+    if np.issubdtype(x.dtype, np.datetime64):
+        x_num = x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    else:
+        x_num = x.astype(np.float64)
+    x_span = x_num[-1] - x_num[0]
+    if x_span <= 0:
+        return None, None
+
+    # pixel column of each value
+    col = ((x_num - x_num[0]) / x_span * (width_px - 1)).astype(np.int64)
+
+    idx_valid = np.flatnonzero(~np.isnan(y))
+    if idx_valid.shape[0] == 0:
+        return col, idx_valid
+
+    return col, idx_valid[minmax_rows(keys=col[idx_valid], lst_values=[y[idx_valid]])]
+
+
+def minmax_rows(keys: np.ndarray, lst_values: list) -> np.ndarray:
+    """
+    minmax_rows returns the sorted positions of the first and last value of each run of equal keys together with the position of
+    the (first) minimum and maximum of each of the value arrays in lst_values within that run. Missing values are ignored
+    """
+    keys = np.asarray(keys)
+    if keys.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, keys.shape[0]])
+    grp = np.repeat(np.arange(starts.shape[0]), counts)
+
+    lst_idx = [starts, starts + counts - 1]
+    for values in lst_values:
+        values = np.asarray(values, dtype=np.float64)
+        for ufunc in (np.fmin, np.fmax):
+            is_extreme = values == np.repeat(ufunc.reduceat(values, starts), counts)
+            _, pos_first = np.unique(grp[is_extreme], return_index=True)
+            lst_idx.append(np.flatnonzero(is_extreme)[pos_first])
+
+    return np.unique(np.concatenate(lst_idx))
+
+
+def decimate_minmax(x, y, width_px: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    decimate_minmax reduces the series (x sorted) to the first, last, minimum and maximum value of each of the width_px columns
+    spanned by x. A NaN is inserted where the series has a gap (empty column or missing values) so that gaps remain visible
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    col, idx_keep = minmax_columns(x=x, y=y, width_px=width_px)
+    if col is None:
+        return x, y
+    if idx_keep.shape[0] == 0:
+        return x[:0], y[:0]
+
+    # break the series where a column is skipped or missing values are removed
+    nr_nan = np.cumsum(np.isnan(y))
+    idx_gaps = np.flatnonzero((np.diff(col[idx_keep]) > 1) | (np.diff(nr_nan[idx_keep]) > 0)) + 1
+
+    x_dec = np.insert(x[idx_keep], idx_gaps, x[idx_keep][idx_gaps])
+    y_dec = np.insert(y[idx_keep], idx_gaps, np.nan)
+
+    return x_dec, y_dec
+
+
+# states of the availability matrix
+AVAIL_NONE = 0  # not observed and not visible
+AVAIL_OBS = 1  # observed during all epochs of the column
+AVAIL_GAP = 2  # visible or partly observed but epochs are missing
+
+
+def availability_epochs(epochs, dt_start: datetime.datetime, interval: float) -> np.ndarray:
+    """
+    availability_epochs returns the index of the epochs at the observation interval since dt_start (in integer nanoseconds)
+    """
+    ns_start = np.datetime64(dt_start, 'ns').astype(np.int64)
+    ns_interval = int(round(interval * 1e9))
+
+    return (np.asarray(epochs, dtype='datetime64[ns]').astype(np.int64) - ns_start + ns_interval // 2) // ns_interval
+
+
+def availability_counts(obs_epochs: np.ndarray,
+                        obs_rows: np.ndarray,
+                        nr_rows: int,
+                        dt_start: datetime.datetime,
+                        dt_end: datetime.datetime,
+                        interval: float,
+                        width_px: int) -> np.ndarray:
+    """
+    availability_counts counts the observations per row (PRN) and pixel column of the availability matrix. The counts of
+    successive parts of the observations can be summed since the columns are determined by dt_start and dt_end
+    """
+    nr_epochs = int(availability_epochs(epochs=[dt_end], dt_start=dt_start, interval=interval)[0]) + 1
+    width_px = max(1, min(width_px, nr_epochs))
+
+    idx_epoch = availability_epochs(epochs=obs_epochs, dt_start=dt_start, interval=interval)
+    in_span = (idx_epoch >= 0) & (idx_epoch < nr_epochs)
+    obs_col = idx_epoch[in_span] * width_px // nr_epochs
+
+    return np.bincount(np.asarray(obs_rows)[in_span] * width_px + obs_col, minlength=nr_rows * width_px).reshape(nr_rows, width_px)
+
+
+def availability_matrix(obs_epochs: np.ndarray,
+                        obs_rows: np.ndarray,
+                        nr_rows: int,
+                        lst_visible: list,
+                        dt_start: datetime.datetime,
+                        dt_end: datetime.datetime,
+                        interval: float,
+                        width_px: int,
+                        obs_cnt: np.ndarray = None) -> np.ndarray:
+    """
+    availability_matrix creates the matrix (nr_rows x width_px) with per pixel column the availability state of each row (PRN).
+    obs_epochs / obs_rows contain the time and row of each observation, lst_visible the tuples (row, start, end) of the
+    (TLE) visibility intervals. The observation counts per pixel column are used when given in obs_cnt
+    """
+    nr_epochs = int(availability_epochs(epochs=[dt_end], dt_start=dt_start, interval=interval)[0]) + 1
+    width_px = max(1, min(width_px, nr_epochs))
+
+    # number of epochs contained in each pixel column
+    epochs_col = np.bincount(np.arange(nr_epochs) * width_px // nr_epochs, minlength=width_px)
+
+    # number of observations per row and pixel column
+    if obs_cnt is None:
+        obs_cnt = availability_counts(obs_epochs=obs_epochs, obs_rows=obs_rows, nr_rows=nr_rows,
+                                      dt_start=dt_start, dt_end=dt_end, interval=interval, width_px=width_px)
+
+    # mark the visibility intervals by their start and end column
+    vis_diff = np.zeros((nr_rows, width_px + 1), dtype=np.int32)
+    for row, dt_vis_start, dt_vis_end in lst_visible:
+        idx_vis = np.sort(availability_epochs(epochs=[dt_vis_start, dt_vis_end], dt_start=dt_start, interval=interval))
+        col_vis = np.clip(idx_vis, 0, nr_epochs - 1) * width_px // nr_epochs
+        vis_diff[row, col_vis[0]] += 1
+        vis_diff[row, col_vis[1] + 1] -= 1
+    visible = np.cumsum(vis_diff, axis=1)[:, :width_px] > 0
+
+    mAvail = np.full((nr_rows, width_px), AVAIL_NONE, dtype=np.uint8)
+    mAvail[(visible | (obs_cnt > 0)) & (obs_cnt < epochs_col)] = AVAIL_GAP
+    mAvail[obs_cnt >= epochs_col] = AVAIL_OBS
+
+    return mAvail
+
+
+def availability_image(mAvail: np.ndarray, lst_colors: list, gap_alpha: float = 0.3, row_space: float = 0.2) -> np.ndarray:
+    """
+    availability_image converts the availability matrix into an RGBA image using the color of each row, gaps are drawn transparent.
+    Each row is drawn in 10 image lines of which the fraction row_space is left empty to separate the rows
+    """
+    rgb_rows = np.array([mcolors.to_rgb(color) for color in lst_colors])[:mAvail.shape[0]]
+
+    rgba = np.zeros(mAvail.shape + (4, ), dtype=np.float32)
+    rgba[..., :3] = rgb_rows[:, np.newaxis, :]
+    rgba[..., 3] = np.where(mAvail == AVAIL_OBS, 1., np.where(mAvail == AVAIL_GAP, gap_alpha, 0.))
+
+    # split each row in image lines and clear the outer lines
+    rgba = np.repeat(rgba, 10, axis=0)
+    nr_space = int(round(row_space * 10 / 2))
+    for line in list(range(nr_space)) + list(range(10 - nr_space, 10)):
+        rgba[line::10, :, 3] = 0
+
+    return rgba
+
+
+def save_figure_format(fig_pickle: bytes, plt_name: str, ext: str, dpi: int, bbox_inches):
+    """
+    save_figure_format saves the pickled figure in format ext (runs in a separate process)
+    """
+    fig = pickle.loads(fig_pickle)
+    fig.savefig(plt_name, dpi=dpi, bbox_inches=bbox_inches, format=ext)
+
+    return plt_name
+
+
+def save_figure_formats(fig, basename: str, exts: list, dpi: int = 150, bbox_inches='tight') -> list:
+    """
+    save_figure_formats saves the figure as basename.ext for each of the formats in exts. On a multi-core machine several
+    formats are rendered in parallel processes from a pickled copy of the figure, otherwise (or when the figure cannot be
+    pickled) they are saved serially
+    """
+    lst_pltnames = ['{basen:s}.{ext:s}'.format(basen=basename, ext=ext) for ext in exts]
+    workers = min(len(exts), os.cpu_count() or 1)
+
+    if workers > 1:
+        try:
+            fig_pickle = pickle.dumps(fig)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            fig_pickle = None
+
+        if fig_pickle is not None:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(save_figure_format,
+                                         [fig_pickle] * len(exts), lst_pltnames, exts, [dpi] * len(exts), [bbox_inches] * len(exts)))
+
+    for plt_name, ext in zip(lst_pltnames, exts):
+        fig.savefig(plt_name, dpi=dpi, bbox_inches=bbox_inches, format=ext)
+
+    return lst_pltnames
@@ -7,13 +7,12 @@ from termcolor import colored
 from shutil import copyfile
 import logging
 from typing import Tuple
-import json
 
 from ampyutils import am_config as amc
 from ampyutils import gnss_cmd_opts as gco
 from gfzrnx import gfzrnx_constants as gfzc
 
-from ampyutils import amutils, compress_utils, location
+from ampyutils import amutils, compress_utils
 
 from rnx15_combine import main_combine_rnx15
 __author__ = 'amuls'
@@ -150,22 +149,18 @@ def main_prepare_P3RS2_data(argv) -> Tuple[str, str, str]:
     # check whether to perform compression of RINEX files
     print("dProc[cli][compress] = {!s}".format(dProc['cli']['compress']))
     if dProc['cli']['compress']:
-        dProc['bin'] = {}
-        dProc['bin']['rnx2crz'] = location.locateProg('rnx2crz', logger)
-        dProc['bin']['gzip'] = location.locateProg('gzip', logger)
-
         # observation file
-        obs3fc = compress_utils.compress_rnx_obs(rnx2crz=dProc['bin']['rnx2crz'], obsf=dProc['rnx']['obs3f'], rnxdir=dProc['dirs']['yydoy'], logger=logger)
+        obs3fc = compress_utils.compress_rnx_obs(obsf=dProc['rnx']['obs3f'], rnxdir=dProc['dirs']['yydoy'], logger=logger)
         dProc['rnx']['obs3fc'] = os.path.basename(obs3fc)
         logger.info('>>>>>> {func:s}: compressed RINEX observation file = {obs3fc:s}'.format(obs3fc=colored(dProc['rnx']['obs3fc'], 'yellow'), func=cFuncName))
 
         # navigation file
-        nav3fc = compress_utils.gzip_compress(gzip=dProc['bin']['gzip'], ungzipf=dProc['rnx']['nav3f'], dir=dProc['dirs']['yydoy'], logger=logger)
+        nav3fc = compress_utils.gzip_compress(ungzipf=dProc['rnx']['nav3f'], dir=dProc['dirs']['yydoy'], logger=logger)
         dProc['rnx']['nav3fc'] = os.path.basename(nav3fc)
         logger.info('>>>>>> {func:s}: compressed RINEX navigation file = {nav3fc:s}'.format(nav3fc=colored(dProc['rnx']['nav3fc'], 'yellow'), func=cFuncName))
 
     # report to the user
-    logger.info('{func:s}: SBF preparation information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dProc, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='SBF preparation information =', dInfo=dProc, logger=logger)
 
     # copy temp log file to the YYDOY directory
     copyfile(log_name, os.path.join(dProc['dirs']['yydoy'], '{scrname:s}.log'.format(scrname=os.path.splitext(os.path.basename(__file__))[0])))
@@ -7,11 +7,10 @@ from termcolor import colored
 from shutil import copyfile
 import logging
 from typing import Tuple
-import json
 
 from ampyutils import am_config as amc
 from ampyutils import gnss_cmd_opts as gco
-from ampyutils import amutils, compress_utils, location
+from ampyutils import amutils, compress_utils
 
 from sbf_daily import main_combine_sbf
 from sbf_rinex import main_sbf2rnx3
@@ -162,20 +161,16 @@ def main_prepare_rnx_data(argv):
 
     # check whether to perform compression of RINEX files
     if dProc['cli']['compress']:
-        dProc['bin'] = {}
-        dProc['bin']['rnx2crz'] = location.locateProg('rnx2crz', logger)
-        dProc['bin']['gzip'] = location.locateProg('gzip', logger)
-
         # observation file
-        dProc['rnx']['obs3fc'] = compress_utils.compress_rnx_obs(rnx2crz=dProc['bin']['rnx2crz'], obsf=dProc['rnx']['obs3f'], rnxdir=dProc['dirs']['rnxdir'], logger=logger)
+        dProc['rnx']['obs3fc'] = compress_utils.compress_rnx_obs(obsf=dProc['rnx']['obs3f'], rnxdir=dProc['dirs']['rnxdir'], logger=logger)
         logger.info('>>>>>> {func:s}: compressed RINEX observation file = {obs3fc:s}'.format(obs3fc=colored(dProc['rnx']['obs3fc'], 'yellow'), func=cFuncName))
 
         # navigation file
-        dProc['rnx']['nav3fc'] = compress_utils.gzip_compress(gzip=dProc['bin']['gzip'], ungzipf=dProc['rnx']['nav3f'], dir=dProc['dirs']['rnxdir'], logger=logger)
+        dProc['rnx']['nav3fc'] = compress_utils.gzip_compress(ungzipf=dProc['rnx']['nav3f'], dir=dProc['dirs']['rnxdir'], logger=logger)
         logger.info('>>>>>> {func:s}: compressed RINEX navigation file = {nav3fc:s}'.format(nav3fc=colored(dProc['rnx']['nav3fc'], 'yellow'), func=cFuncName))
 
     # report to the user
-    logger.info('{func:s}: SBF preparation information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dProc, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='SBF preparation information =', dInfo=dProc, logger=logger)
 
     # copy temp log file to the rnxdir directory
     copyfile(log_name, os.path.join(dProc['dirs']['rnxdir'], '{scrname:s}.log'.format(scrname=os.path.splitext(os.path.basename(__file__))[0])))
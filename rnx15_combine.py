@@ -5,7 +5,6 @@ import os
 import argparse
 from termcolor import colored
 import logging
-import json
 from typing import Union
 import glob
 import pathlib
@@ -20,7 +19,7 @@ from ampyutils import am_config as amc
 from ampyutils import gnss_cmd_opts as gco
 from gfzrnx import gfzrnx_constants as gfzc
 
-from ampyutils import amutils, location
+from ampyutils import amutils, location, am_profile, compress_utils
 
 __author__ = 'amuls'
 
@@ -90,6 +89,11 @@ def treatCmdOpts(argv):
                         type=str,
                         default=gfzc.crux_tmpl)
 
+    parser.add_argument('--incremental', help='append only the observation files not yet combined to the combined file kept in the YYDOY directory (default False)',
+                        action='store_true',
+                        required=False,
+                        default=False)
+
     parser.add_argument('--logging',
                         help='specify logging level console/file (two of {choices:s}, default {choice:s})'
                              .format(choices='|'.join(gco.lst_logging_choices),
@@ -103,7 +107,7 @@ def treatCmdOpts(argv):
     args = parser.parse_args(argv)
 
     # return arguments
-    return args.from_dir, args.rnx_dir, args.marker, args.year, args.doy, args.startepoch, args.endepoch, args.crux, args.logging
+    return args.from_dir, args.rnx_dir, args.marker, args.year, args.doy, args.startepoch, args.endepoch, args.crux, args.incremental, args.logging
 
 
 def list_rinex_files(logger: logging.Logger) -> Union[list, list]:
@@ -112,12 +116,13 @@ def list_rinex_files(logger: logging.Logger) -> Union[list, list]:
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    file_pattern = 'P3RS-2_RX_R_{year:04d}{doy:03d}*_15M_00U_MO.rnx'
-                    .format(year=dRnx['cli']['year'],
-                            doy=dRnx['cli']['doy'])
+    # the files may be stored (Hatanaka / gzip) compressed
+    file_pattern = 'P3RS-2_RX_R_{year:04d}{doy:03d}*_15M_00U_MO.[rc][nr]x*' \
+                   .format(year=dRnx['cli']['year'],
+                           doy=dRnx['cli']['doy'])
     lst_obsf = sorted(glob.glob(file_pattern))
 
-    file_pattern = 'P3RS-2_RX_R_{year:04d}{doy:03d}*_15M_MN.rnx'
+    file_pattern = 'P3RS-2_RX_R_{year:04d}{doy:03d}*_15M_MN.rnx*' \
                    .format(year=dRnx['cli']['year'],
                            doy=dRnx['cli']['doy'])
     lst_nav = sorted(glob.glob(file_pattern))
@@ -132,6 +137,20 @@ def list_rinex_files(logger: logging.Logger) -> Union[list, list]:
     return lst_obsf, lst_nav
 
 
+def header_lines_with(label: str, frnx) -> list:
+    """
+    header_lines_with returns the header lines of the RINEX file containing label, reading stops at the end of the header
+    """
+    lst_lines = []
+    for line in frnx:
+        if label in line:
+            lst_lines.append(line)
+        if 'END OF HEADER' in line:
+            break
+
+    return lst_lines
+
+
 def check_obstypes_order(lst_obsf: list,
                          logger: logging.Logger = None) -> bool:
     """
@@ -142,8 +161,8 @@ def check_obstypes_order(lst_obsf: list,
     # create tmp file for storing the observables
     lst_obst = []
     for rnx_obs in lst_obsf:
-        with open(rnx_obs, 'r') as frnx:
-            lst_obst.append(sorted(amutils.lines_that_contain('SYS / # / OBS TYPES', frnx)))
+        with compress_utils.open_compressed(rnx_obs) as frnx:
+            lst_obst.append(sorted(header_lines_with(label='SYS / # / OBS TYPES', frnx=frnx)))
             logger.debug('{func:s}: {obsf:s}: {obst!s}'.format(obsf=rnx_obs, obst=lst_obst[-1], func=cFuncName))
 
     # create dataframe of this lst_obst
@@ -162,99 +181,74 @@ def check_obstypes_order(lst_obsf: list,
     return ret_value
 
 
+@am_profile.profile_func(rows_arg='lst_obsf')
 def combine_rnx_obs(lst_obsf: list,
                     ext: str,
-                    logger: logging.Logger) -> str:
+                    logger: logging.Logger,
+                    combf: str = None,
+                    append: bool = False) -> str:
     """
-    combine_rnx_obs combines the found observation files
+    combine_rnx_obs combines the found observation files into combf (a temporary file when not given). When append is set,
+    the observation records of the files are appended to the existing combf
     """
     #  Example: ALGO00CAN_R_20121601000_01H_05Z_MO.rnx.gz //1 hour, Obs Mixed and 5Hz
 
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # dRnx['obsf'] = 'P3RS00BEL_R_{year:04s}{doy:03s}{start:04s}_01D_01S_MO.rnx'.format(year=dRnx['cli']['year'], doy=dRnx['cli']['doy'], start=start_time)
-    tmp_obsf = os.path.join(tempfile.gettempdir(), 'P3RS{doy:03d}0.{yy:02d}{ext:s}'.format(doy=dRnx['cli']['doy'], yy=(dRnx['cli']['year'] % 100), ext=ext))
+    tmp_obsf = combf
+    if tmp_obsf is None:
+        tmp_obsf = os.path.join(tempfile.gettempdir(), 'P3RS{doy:03d}0.{yy:02d}{ext:s}'.format(doy=dRnx['cli']['doy'], yy=(dRnx['cli']['year'] % 100), ext=ext))
 
     # regular expression used to search for erroneous formatted fields (pseudo-distance)
     regex = re.compile(r"^\D\d{4}")
     # regex = re.compile(r"^[:upper:][:digit:]{4}")
 
-    # count_error_rnxobs = 0
-    with open(tmp_obsf, 'w') as fout:
+    # date of the next day which is not included from the last file
+    dRnx['rnx']['date'] = amutils.yeardoy2ymd(year=dRnx['cli']['year'], doy=dRnx['cli']['doy'] + 1)
+    search_date = dRnx['rnx']['date'].strftime("> %Y %m %d")
+
+    # the (compressed) observation files are streamed once, removing the erroneous pseudo-range records
+    with open(tmp_obsf, 'a' if append else 'w') as fout:
         for i, rnx_obs in enumerate(lst_obsf):
+            with compress_utils.open_compressed(rnx_obs) as fobs:
+                # include the header from the first file only
+                in_header = (i > 0) or append
+                for line in fobs:
+                    if in_header:
+                        in_header = 'END OF HEADER' not in line
+                        continue
+
+                    # for the last file, make sure we do not include data from the next day
+                    if i == len(lst_obsf) - 1 and search_date in line:
+                        break
 
-            # rewrite to temp file with the erroneous pseudo-range records removed
-            with open(rnx_obs, "r") as f:
-                lines = f.readlines()
-            with open(os.path.join('/tmp/', rnx_obs), "w") as f:
-                for line in lines:
                     if not re.search(regex, line):
-                        f.write(line)
-
-            # process_rnxobs = True
-
-            # # check if current rnx_obs file has erroneous pseudo-range values
-            # for jj, line in enumerate(open(rnx_obs)):
-            #     if re.search(regex, line):
-            #         print('{:d}: {:s}'.format(jj, line.strip()))
-            #         # logger.info('{func:s}: erroneous data in {rnxobs:s}:{line:d}'.format(rnxobs=rnx_obs, line=jj + 1, func=cFuncName))
-            #         count_error_rnxobs += 1
-            #         process_rnxobs = False
-            #         # break
-
-
-            # if process_rnxobs:
-            # include the hedaer from the first file
-            if i == 0:
-                eof_hdr = 0
-            else:
-                eof_hdr = amutils.line_num_for_phrase_in_file(phrase='END OF HEADER', filename=rnx_obs) + 1
-
-            # for the last file, make sure we do not include data from the next day
-            if i < len(lst_obsf) - 1:
-                with open(os.path.join('/tmp/', rnx_obs)) as fobs:
-                    lines_data = fobs.readlines()
-                    # print('\nos.path.join('/tmp/', rnx_obs) = {!s}'.format(os.path.join('/tmp/', rnx_obs)))
-                    # print('len lines_data = {:d}'.format(len(lines_data)))
-                    # print('eof_hdr = {:d}'.format(eof_hdr))
-                    # print('start lines = \n{!s}'.format(''.join(lines_data[eof_hdr:eof_hdr + 2])))
-                    # print('end lines = \n{!s}'.format(''.join(lines_data[-3:])))
-                    fout.write(''.join(lines_data[eof_hdr:]))
-            else:
-                # find line that starts at new day in the next day
-                dRnx['rnx']['date'] = amutils.yeardoy2ymd(year=dRnx['cli']['year'], doy=dRnx['cli']['doy'] + 1)
-                search_date = dRnx['rnx']['date'].strftime("> %Y %m %d")
-                begin_next_day = amutils.line_num_for_phrase_in_file(phrase=search_date, filename=os.path.join('/tmp/', rnx_obs))
-
-                if begin_next_day == -1:
-                    # last file has no day-over effect
-                    with open(os.path.join('/tmp/', rnx_obs)) as fobs:
-                        lines_data = fobs.readlines()
-                        # print('\nos.path.join('/tmp/', rnx_obs) = {!s}'.format(os.path.join('/tmp/', rnx_obs)))
-                        # print('len lines_data = {:d}'.format(len(lines_data)))
-                        # print('eof_hdr = {:d}'.format(eof_hdr))
-                        # print('start lines = \n{!s}'.format(''.join(lines_data[eof_hdr:eof_hdr + 2])))
-                        # print('end lines = \n{!s}'.format(''.join(lines_data[-3:])))
-                        fout.write(''.join(lines_data[eof_hdr:]))
-                else:
-                    with open(os.path.join('/tmp/', rnx_obs)) as fobs:
-                        lines_data = fobs.readlines()
-
-                        # print('\nos.path.join('/tmp/', rnx_obs) = {!s}'.format(os.path.join('/tmp/', rnx_obs)))
-                        # print('len lines_data = {:d}'.format(len(lines_data)))
-                        # print('eof_hdr = {:d}'.format(eof_hdr))
-                        # print('begin_next_day = {:d}'.format(begin_next_day))
-                        # print('start lines = \n{!s}'.format(''.join(lines_data[eof_hdr:eof_hdr + 2])))
-                        # print('end lines = \n{!s}'.format(''.join(lines_data[begin_next_day - 3:begin_next_day])))
-                        fout.write(''.join(lines_data[eof_hdr:begin_next_day]))
-
-            os.remove(os.path.join('/tmp/', rnx_obs))
+                        fout.write(line)
 
     logger.info('{func:s}: combined {count:d} RINEX files into {obsf:s}'.format(count=len(lst_obsf), obsf=tmp_obsf, func=cFuncName))
 
     return tmp_obsf
 
 
+def combined_rnx_files(combf: str, lst_obsf: list) -> list:
+    """
+    combined_rnx_files returns the observation files already combined into combf, these are listed in the file combf.lst.
+    An empty list is returned when combf has to be recreated
+    """
+    try:
+        with open('{combf:s}.lst'.format(combf=combf), 'r') as fin:
+            lst_combined = fin.read().split()
+    except IOError:
+        return []
+
+    # the files are appended in time order, a missing combined file or a file received late requires recombining
+    if not os.path.isfile(combf) or lst_obsf[:len(lst_combined)] != lst_combined:
+        return []
+
+    return lst_combined
+
+
 def create_crux_file(crux_tmpl: str,
                      marker: str,
                      logger: logging.Logger = None):
@@ -293,7 +287,7 @@ def convert_obsrnx3(gfzrnx: str,
     obsf = os.path.basename(rnxf_tmp)
 
     # get the correct RINEX v3 naming convention
-    args4gfzrnx = [gfzrnx, '-finp', rnxf_tmp, '-nomren23', '04,BEL']  #  '-try_append', '900', '-splice_direct'
+    args4gfzrnx = [gfzrnx, '-finp', rnxf_tmp, '-nomren23', '04,BEL']  # '-try_append', '900', '-splice_direct'
 
     # convert start / end epochs to datatime
     dt_start_ep = datetime.strptime('{yyyy:04d}/{doy:03d} {epoch:s}'.format(yyyy=yyyy, doy=doy, epoch=start_ep),
@@ -388,7 +382,7 @@ def main_combine_rnx15(argv):
     # treat command line options
     # store cli parameters
     cli_opt = {}
-    cli_opt['from_dir'], cli_opt['rnx_dir'], cli_opt['marker'], cli_opt['year'], cli_opt['doy'], cli_opt['start_ep'], cli_opt['end_ep'], cruxf, logLevels = treatCmdOpts(argv)
+    cli_opt['from_dir'], cli_opt['rnx_dir'], cli_opt['marker'], cli_opt['year'], cli_opt['doy'], cli_opt['start_ep'], cli_opt['end_ep'], cruxf, cli_opt['incremental'], logLevels = treatCmdOpts(argv)
     cli_opt['crux'] = os.path.expanduser(cruxf)
     dRnx['cli'] = cli_opt
 
@@ -398,6 +392,7 @@ def main_combine_rnx15(argv):
 
     # create logging for better debugging
     logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+    am_profile.profile_init(baseName=os.path.basename(__file__), logger=logger)
 
     # external program
     dRnx['bin'] = {}
@@ -441,11 +436,24 @@ def main_combine_rnx15(argv):
             sys.exit(amc.E_FAILURE)
 
         # create the merged OBS file
-        tmp_obsf = combine_rnx_obs(lst_obsf=dRnx['p3rs2']['obs'], ext='O', logger=logger)
+        if dRnx['cli']['incremental']:
+            # the combined file is kept with the list of its observation files, only the new observation files are appended
+            comb_obsf = os.path.join(dRnx['dirs']['yydoy'], 'P3RS{doy:03d}0.{yy:02d}O'.format(doy=dRnx['cli']['doy'], yy=(dRnx['cli']['year'] % 100)))
+            lst_combined = combined_rnx_files(combf=comb_obsf, lst_obsf=dRnx['p3rs2']['obs'])
+            lst_new = dRnx['p3rs2']['obs'][len(lst_combined):]
+            logger.info('{func:s}: appending {new:d} observation files to the {count:d} combined in {combf:s}'
+                        .format(new=len(lst_new), count=len(lst_combined), combf=colored(comb_obsf, 'blue'), func=cFuncName))
+
+            if len(lst_new) > 0:
+                combine_rnx_obs(lst_obsf=lst_new, ext='O', logger=logger, combf=comb_obsf, append=len(lst_combined) > 0)
+                with open('{combf:s}.lst'.format(combf=comb_obsf), 'w') as fout:
+                    fout.write('\n'.join(dRnx['p3rs2']['obs']) + '\n')
+        else:
+            comb_obsf = tmp_obsf = combine_rnx_obs(lst_obsf=dRnx['p3rs2']['obs'], ext='O', logger=logger)
 
         # correct the faulty headers & rename to ::RX3:: format
         dRnx['rnx']['obs3f'] = convert_obsrnx3(gfzrnx=dRnx['bin']['gfzrnx'],
-                                               rnxf_tmp=tmp_obsf,
+                                               rnxf_tmp=comb_obsf,
                                                cruxf=crux_file,
                                                yyyy=dRnx['cli']['year'],
                                                doy=dRnx['cli']['doy'],
@@ -471,7 +479,7 @@ def main_combine_rnx15(argv):
         sys.exit(amc.E_NORINEXNAV)
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName, json=json.dumps(dRnx, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dRnx, logger=logger)
 
     # remove temporary files
     try:
@@ -485,6 +493,7 @@ def main_combine_rnx15(argv):
         pass
 
     # copy temp log file to the YYDOY directory
+    am_profile.profile_save(dir=dRnx['dirs']['yydoy'])
     copyfile(log_name, os.path.join(dRnx['dirs']['yydoy'], '{scrname:s}.log'.format(scrname=os.path.splitext(os.path.basename(__file__))[0])))
     os.remove(log_name)
 
@@ -494,4 +503,4 @@ def main_combine_rnx15(argv):
 if __name__ == "__main__":  # Only run if this file is called directly
     rnxdir, obs3f, nav3f = main_combine_rnx15(sys.argv[1:])
 
-    print('Created {obsf:s} and {navf:s}'.format(obsf=obs3f, navf=nav3f ))
+    print('Created {obsf:s} and {navf:s}'.format(obsf=obs3f, navf=nav3f))
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from termcolor import colored
+import logging
+from datetime import datetime, timedelta
+import copy
+from shutil import copyfile
+import pandas as pd
+
+from ampyutils import am_config as amc
+from ampyutils import gnss_cmd_opts as gco
+from ampyutils import amutils
+from bench import bench_synth, bench_stages
+from cvsdb import cvsdb_ops
+from tle import tle_parser, tle_visibility, tleobs_plot, tle_sgp4
+import obstab_analyse
+import rnx15_combine
+
+__author__ = 'amuls'
+
+# stages that can be benchmarked
+lst_bench_stages = ['combine_rnx_obs', 'read_obstab', 'pnt_available', 'tle_rise_set', 'prn_elevation',
+                    'analyse_obsprn', 'cvsdb_update_line', 'plot_arcs_prns', 'plot_gnss_obst']
+
+# global used dictionary
+global dBench
+dBench = {}
+
+
+class stage_action(argparse.Action):
+    def __call__(self, parser, namespace, stages, option_string=None):
+        for stage in stages:
+            if stage not in lst_bench_stages:
+                raise argparse.ArgumentError(self, 'select stage(s) out of {stages:s}'.format(stages='|'.join(lst_bench_stages)))
+        setattr(namespace, self.dest, stages)
+
+
+def treatCmdOpts(argv):
+    """
+    Treats the command line options
+
+    :param argv: the options
+    :type argv: list of string
+    """
+    baseName = os.path.basename(__file__)
+    amc.cBaseName = colored(baseName, 'yellow')
+
+    helpTxt = amc.cBaseName + ' benchmarks the processing stages on synthetic RINEX / obstab data'
+
+    # create the parser for command line arguments
+    parser = argparse.ArgumentParser(description=helpTxt)
+
+    parser.add_argument('--dir', help='directory for the synthetic data and plots (default {dir:s})'
+                                      .format(dir=colored('/tmp/rnx3proc_bench', 'green')),
+                        type=str,
+                        required=False,
+                        default='/tmp/rnx3proc_bench')
+
+    parser.add_argument('--hours', help='observation period in hours (default {hours:s})'.format(hours=colored('24', 'green')),
+                        type=float,
+                        required=False,
+                        default=24)
+
+    parser.add_argument('--interval', help='observation interval in seconds (default {intv:s})'.format(intv=colored('1', 'green')),
+                        type=float,
+                        required=False,
+                        default=1,
+                        action=gco.interval_action)
+
+    parser.add_argument('--nr_rnx', help='number of quarterly RINEX files to combine (default {nr:s})'.format(nr=colored('96', 'green')),
+                        type=int,
+                        required=False,
+                        default=96)
+
+    parser.add_argument('--nr_prns', help='number of PRNs used in per PRN stages (default {nr:s})'.format(nr=colored('4', 'green')),
+                        type=int,
+                        required=False,
+                        default=4)
+
+    parser.add_argument('--stages', help='stages to benchmark (default all out of {stages:s})'.format(stages='|'.join(lst_bench_stages)),
+                        type=str,
+                        required=False,
+                        default=lst_bench_stages,
+                        action=stage_action,
+                        nargs='+')
+
+    parser.add_argument('--repeat', help='number of timing runs per stage, best is kept (default {rep:s})'.format(rep=colored('1', 'green')),
+                        type=int,
+                        required=False,
+                        default=1)
+
+    parser.add_argument('--nomem', help='do not trace peak memory per stage (default False)',
+                        action='store_true',
+                        required=False,
+                        default=False)
+
+    parser.add_argument('--compare', help='benchmark report (JSON) to compare with',
+                        type=str,
+                        required=False,
+                        default=None)
+
+    parser.add_argument('--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'
+                                          .format(choices='|'.join(gco.lst_logging_choices), choice=colored(' '.join(gco.lst_logging_choices[3:5]), 'green')),
+                        nargs=2,
+                        required=False,
+                        default=gco.lst_logging_choices[3:5],
+                        action=gco.logging_action)
+
+    # drop argv[0]
+    args = parser.parse_args(argv[1:])
+
+    # return arguments
+    return args.dir, args.hours, args.interval, args.nr_rnx, args.nr_prns, args.stages, args.repeat, args.nomem, args.compare, args.logging
+
+
+def create_synthetic_data(logger: logging.Logger):
+    """
+    create_synthetic_data creates the synthetic obstab, RINEX, cvsdb and TLE data used by the stages
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dBench['time'] = {}
+    dBench['time']['start'] = datetime(2020, 12, 14, 0, 0, 0)
+    dBench['time']['end'] = dBench['time']['start'] + timedelta(seconds=dBench['cli']['hours'] * 3600 - dBench['cli']['interval'])
+    dBench['time']['date'] = dBench['time']['start']
+    dBench['time']['YYYY'] = dBench['time']['start'].year
+    dBench['time']['DOY'] = dBench['time']['start'].timetuple().tm_yday
+    dBench['time']['interval'] = dBench['cli']['interval']
+
+    jam_windows = bench_synth.synth_jam_windows(hours=dBench['cli']['hours'])
+
+    dBench['data'] = {}
+    dBench['data']['obstab'] = os.path.join(dBench['dir'], 'SYNT00BEL_R_{yyyy:04d}{doy:03d}0000_01D_01S_MO-E.obstab'
+                                                           .format(yyyy=dBench['time']['YYYY'], doy=dBench['time']['DOY']))
+    dBench['data']['obstab_rows'] = bench_synth.synth_obstab(obstabf=dBench['data']['obstab'],
+                                                             gnss='E',
+                                                             DTG_start=dBench['time']['start'],
+                                                             hours=dBench['cli']['hours'],
+                                                             interval=dBench['cli']['interval'],
+                                                             jam_windows=jam_windows,
+                                                             logger=logger)
+
+    if 'combine_rnx_obs' in dBench['cli']['stages']:
+        dBench['data']['rnx_dir'] = os.path.join(dBench['dir'], 'rnx')
+        dBench['data']['rnx'] = bench_synth.synth_rnx_obs_files(rnx_dir=dBench['data']['rnx_dir'],
+                                                                marker='P3RS',
+                                                                DTG_start=dBench['time']['start'],
+                                                                nr_files=dBench['cli']['nr_rnx'],
+                                                                interval=dBench['cli']['interval'],
+                                                                jam_windows=jam_windows,
+                                                                logger=logger)
+        dBench['data']['rnx_rows'] = sum([amutils.count_lines(rnxf) for rnxf in dBench['data']['rnx']])
+
+    if 'cvsdb_update_line' in dBench['cli']['stages']:
+        dBench['data']['cvsdb'] = os.path.join(dBench['dir'], 'obsstat_tle.cvs')
+        dBench['data']['cvsdb_rows'] = bench_synth.synth_cvsdb(cvsdbf=dBench['data']['cvsdb'], years=[2019, 2020, 2021], logger=logger)
+
+    # the TLEs for all simulated PRNs
+    dBench['data']['prns'] = bench_synth.synth_prns(gnss='E')
+    dBench['data']['df_tles'] = bench_synth.synth_tles(prns=dBench['data']['prns'], DTG_epoch=dBench['time']['start'])
+
+    logger.info('{func:s}: synthetic data created in {dir:s}'.format(dir=colored(dBench['dir'], 'green'), func=cFuncName))
+
+
+def tle_rise_set(prns: list, df_tles: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
+    """
+    tle_rise_set determines the TLE visibility for the PRNs as done by tle_visibility.PRNs_visibility without NORAD files
+    """
+    RMA = tle_parser.marker_topos()
+
+    date_obs = dBench['time']['date']
+    df_events = tle_sgp4.prns_events(df_tle=df_tles, DTG_start=date_obs, DTG_end=date_obs + timedelta(days=1, seconds=-1), elev_min=5, marker=RMA)
+
+    ivTLE = tle_visibility.tle_visible_intervals(df_events=df_events, lst_prns=prns, DTG_start=dBench['time']['start'], DTG_end=dBench['time']['end'])
+
+    return tle_visibility.tle_visibility_table(ivTLE=ivTLE, df_events=df_events, lst_prns=prns, obs_int=1)
+
+
+def run_stages(logger: logging.Logger) -> dict:
+    """
+    run_stages runs the selected stages on the synthetic data and returns the timing results per stage
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dStages = {}
+    stages = dBench['cli']['stages']
+    repeat = dBench['cli']['repeat']
+    trace_mem = not dBench['cli']['nomem']
+    prns = dBench['data']['prns'][:dBench['cli']['nr_prns']]
+
+    # the plots are created in subdir png of the working directory
+    os.chdir(dBench['dir'])
+
+    # globals used by the obstab_analyse functions
+    obstab_analyse.dTab = {}
+    obstab_analyse.dTab['cli'] = {'freqs': ['1', '5'], 'obs_types': ['C', 'S'], 'elev_step': 10}
+    obstab_analyse.dTab['time'] = dBench['time']
+
+    if 'combine_rnx_obs' in stages:
+        rnx15_combine.dRnx = {'cli': {'year': dBench['time']['YYYY'], 'doy': dBench['time']['DOY']}, 'rnx': {}}
+
+        def combine_rnx_obs(lst_obsf: list):
+            os.chdir(dBench['data']['rnx_dir'])
+            os.remove(rnx15_combine.combine_rnx_obs(lst_obsf=lst_obsf, ext='O', logger=logger))
+            os.chdir(dBench['dir'])
+
+        dStages['combine_rnx_obs'] = bench_stages.bench_stage(stage='combine_rnx_obs',
+                                                              func=combine_rnx_obs,
+                                                              setup=lambda: {'lst_obsf': [os.path.basename(rnxf) for rnxf in dBench['data']['rnx']]},
+                                                              rows=dBench['data']['rnx_rows'],
+                                                              repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    # the obstab is always read since the following stages depend on it
+    _, _, _, dfObsTab = obstab_analyse.read_obstab(obstabf=dBench['data']['obstab'],
+                                                   lst_PRNs=dBench['data']['prns'],
+                                                   dCli=obstab_analyse.dTab['cli'],
+                                                   logger=logger)
+    if 'read_obstab' in stages:
+        dStages['read_obstab'] = bench_stages.bench_stage(stage='read_obstab',
+                                                          func=obstab_analyse.read_obstab,
+                                                          setup=lambda: {'obstabf': dBench['data']['obstab'],
+                                                                         'lst_PRNs': dBench['data']['prns'],
+                                                                         'dCli': obstab_analyse.dTab['cli'],
+                                                                         'logger': logger},
+                                                          rows=dBench['data']['obstab_rows'],
+                                                          repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    # data for navigation signal 1C
+    dfNavSig = dfObsTab[['DATE_TIME', 'EPOCH', 'PRN', 'C1C', 'S1C']].dropna()
+    dfNavSigPRNCount = obstab_analyse.navsig_prn_count(dfNavSig=dfNavSig, dTime=dBench['time'])
+    dfPRNEvol = obstab_analyse.navsig_prn_evolution(dfNavSigPRNCount=dfNavSigPRNCount, interval=dBench['time']['interval'])
+
+    if 'pnt_available' in stages:
+        dStages['pnt_available'] = bench_stages.bench_stage(stage='pnt_available',
+                                                            func=obstab_analyse.pnt_available,
+                                                            setup=lambda: {'dfPrnEvol': dfPRNEvol.copy(),
+                                                                           'interval': dBench['time']['interval'],
+                                                                           'logger': logger},
+                                                            rows=dfPRNEvol.shape[0],
+                                                            repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    # TLE visibility is needed for the analysis and plot stages
+    if set(stages) & set(['tle_rise_set', 'analyse_obsprn', 'plot_arcs_prns', 'plot_gnss_obst']):
+        dfTLEVis = tle_rise_set(prns=dBench['data']['prns'], df_tles=dBench['data']['df_tles'], logger=logger)
+
+    if 'tle_rise_set' in stages:
+        dStages['tle_rise_set'] = bench_stages.bench_stage(stage='tle_rise_set',
+                                                           func=tle_rise_set,
+                                                           setup=lambda: {'prns': dBench['data']['prns'],
+                                                                          'df_tles': dBench['data']['df_tles'],
+                                                                          'logger': logger},
+                                                           rows=len(dBench['data']['prns']),
+                                                           repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    if 'prn_elevation' in stages:
+        def prn_elevation(prns: list):
+            for prn in prns:
+                tle_visibility.prn_elevation(prn=prn,
+                                             df_tle_prn=dBench['data']['df_tles'][dBench['data']['df_tles']['PRN'] == prn],
+                                             elev_step=10,
+                                             DTG_start=dBench['time']['start'],
+                                             DTG_end=dBench['time']['end'],
+                                             logger=logger)
+
+        dStages['prn_elevation'] = bench_stages.bench_stage(stage='prn_elevation',
+                                                            func=prn_elevation,
+                                                            setup=lambda: {'prns': prns},
+                                                            rows=len(prns),
+                                                            repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    if 'analyse_obsprn' in stages:
+        def analyse_obsprns(dfNavSigPRNs: dict):
+            dPlotTemplates = {}
+            for prn, dfNavSigPRN in dfNavSigPRNs.items():
+                obstab_analyse.analyse_obsprn(marker='SYNT',
+                                              obstabf=os.path.basename(dBench['data']['obstab']),
+                                              navsig_name='E1C',
+                                              dTime=dBench['time'],
+                                              dfTles=dBench['data']['df_tles'],
+                                              dfPrnNavSig=dfNavSigPRN,
+                                              dfPrnVisTle=dfTLEVis.loc[prn],
+                                              dfJamSc=pd.DataFrame(columns=['DATE_TIME', 'Signal [dBm]', 'Jammer [dBm]', 'SINR [dB]']),
+                                              prn=prn,
+                                              navsig_obst_lst=['C1C', 'S1C'],
+                                              snrth=2,
+                                              interval=dBench['time']['interval'],
+                                              dTemplates=dPlotTemplates,
+                                              show_plot=False,
+                                              logger=logger)
+            tleobs_plot.close_templates(dTemplates=dPlotTemplates)
+
+        dStages['analyse_obsprn'] = bench_stages.bench_stage(stage='analyse_obsprn',
+                                                             func=analyse_obsprns,
+                                                             setup=lambda: {'dfNavSigPRNs': {prn: dfNavSig[dfNavSig['PRN'] == prn].dropna() for prn in prns}},
+                                                             rows=int(dfNavSig['PRN'].isin(prns).sum()),
+                                                             repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    if 'cvsdb_update_line' in stages:
+        def cvsdb_update_lines(line_data: list):
+            for data in line_data:
+                cvsdb_ops.cvsdb_update_line(cvsdb_name=dBench['data']['cvsdb'], line_data=data, id_fields=6, logger=logger)
+
+        # replace an existing line in the middle of the database and add a new one at its end
+        lst_line_data = [[2020, '183', 'P3RS', 'E', 'OBS', 'S1C'] + list(range(36)),
+                         [2022, '001', 'P3RS', 'E', 'OBS', 'S1C'] + list(range(36))]
+        dStages['cvsdb_update_line'] = bench_stages.bench_stage(stage='cvsdb_update_line',
+                                                                func=cvsdb_update_lines,
+                                                                setup=lambda: {'line_data': copy.deepcopy(lst_line_data)},
+                                                                rows=dBench['data']['cvsdb_rows'] * len(lst_line_data),
+                                                                repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    if 'plot_arcs_prns' in stages:
+        dStages['plot_arcs_prns'] = bench_stages.bench_stage(stage='plot_arcs_prns',
+                                                             func=tleobs_plot.obstle_plot_arcs_prns,
+                                                             setup=lambda: {'marker': 'SYNT',
+                                                                            'obsf': os.path.basename(dBench['data']['obstab']),
+                                                                            'dTime': dBench['time'],
+                                                                            'navsig_name': 'E1C',
+                                                                            'lst_PRNs': dBench['data']['prns'],
+                                                                            'dfNavSig': dfNavSig,
+                                                                            'dfTleVis': dfTLEVis,
+                                                                            'logger': logger},
+                                                             rows=dfNavSig.shape[0],
+                                                             repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    if 'plot_gnss_obst' in stages:
+        dStages['plot_gnss_obst'] = bench_stages.bench_stage(stage='plot_gnss_obst',
+                                                             func=tleobs_plot.obstle_plot_gnss_obst,
+                                                             setup=lambda: {'marker': 'SYNT',
+                                                                            'obsf': os.path.basename(dBench['data']['obstab']),
+                                                                            'dTime': dBench['time'],
+                                                                            'navsig_name': 'E1C',
+                                                                            'lst_PRNs': dBench['data']['prns'],
+                                                                            'dfNavSig': dfNavSig,
+                                                                            'dfNavSigPRNcnt': dfNavSigPRNCount,
+                                                                            'navsig_obst_lst': ['C1C', 'S1C'],
+                                                                            'dfJam': pd.DataFrame(columns=['DATE_TIME', 'Signal [dBm]', 'Jammer [dBm]', 'SINR [dB]']),
+                                                                            'dfTleVis': dfTLEVis,
+                                                                            'logger': logger},
+                                                             rows=dfNavSig.shape[0] * 2,
+                                                             repeat=repeat, trace_mem=trace_mem, logger=logger)
+
+    logger.info('{func:s}: benchmarked {count:d} stages'.format(count=len(dStages), func=cFuncName))
+
+    return dStages
+
+
+def main_rnx3proc_bench(argv) -> int:
+    """
+    main_rnx3proc_bench benchmarks the processing stages on synthetic data and writes a JSON report per commit
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dBench['cli'] = {}
+    dBench['cli']['dir'], dBench['cli']['hours'], dBench['cli']['interval'], dBench['cli']['nr_rnx'], dBench['cli']['nr_prns'], dBench['cli']['stages'], dBench['cli']['repeat'], dBench['cli']['nomem'], dBench['cli']['compare'], logLevels = treatCmdOpts(argv)
+
+    # create logging for better debugging
+    logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+
+    dBench['dir'] = amutils.mkdir_p(os.path.abspath(os.path.expanduser(dBench['cli']['dir'])))
+    if dBench['cli']['compare'] is not None:
+        dBench['cli']['compare'] = os.path.abspath(dBench['cli']['compare'])
+    dBench['commit'] = bench_stages.bench_git_commit(repo_dir=os.path.dirname(os.path.abspath(__file__)), logger=logger)
+
+    # create the data and benchmark the stages
+    create_synthetic_data(logger=logger)
+    dBench['stages'] = run_stages(logger=logger)
+
+    # the TLE dataframe is not stored in the report
+    dBench['data'].pop('df_tles')
+
+    reportf = os.path.join(dBench['dir'], 'bench-{commit:s}.json'.format(commit=dBench['commit']))
+    bench_stages.bench_report(dBench=dBench, reportf=reportf, logger=logger)
+
+    amutils.logJSON(callerName=cFuncName, title='Benchmark results =', dInfo=dBench['stages'], logger=logger)
+
+    # compare with a reference report if asked for
+    ret_value = amc.E_SUCCESS
+    if dBench['cli']['compare'] is not None:
+        if not amutils.file_exists(fname=dBench['cli']['compare'], logger=logger):
+            sys.exit(amc.E_FILE_NOT_EXIST)
+        if not bench_stages.bench_compare(dBench=dBench, reff=dBench['cli']['compare'], logger=logger):
+            ret_value = amc.E_FAILURE
+
+    # copy temp log file to the benchmark directory
+    copyfile(log_name, os.path.join(dBench['dir'], '{scrname:s}.log'.format(scrname=os.path.splitext(os.path.basename(__file__))[0])))
+    os.remove(log_name)
+
+    return ret_value
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    sys.exit(main_rnx3proc_bench(sys.argv))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from termcolor import colored
+
+from ampyutils import am_jobs
+
+__author__ = 'amuls'
+
+
+def treatCmdOpts(argv):
+    """
+    Treats the command line options
+
+    :param argv: the options
+    :type argv: list of string
+    """
+    baseName = colored(os.path.basename(__file__), 'yellow')
+
+    helpTxt = baseName + ' runs an analysis script by the analysis server (rnx3proc_server.py), or by itself when no server is running'
+
+    # create the parser for command line arguments
+    parser = argparse.ArgumentParser(description=helpTxt)
+
+    parser.add_argument('--socket', help='UNIX socket of the analysis server (default {sock:s})'.format(sock=colored(am_jobs.JOB_SOCKET, 'green')),
+                        type=str,
+                        required=False,
+                        default=am_jobs.JOB_SOCKET)
+
+    parser.add_argument('script', help='analysis script to run (eg obstab_analyse.py)', type=str)
+    parser.add_argument('args', help='options of the analysis script', nargs=argparse.REMAINDER)
+
+    # drop argv[0]
+    args = parser.parse_args(argv[1:])
+
+    # return arguments
+    return args.socket, args.script, args.args
+
+
+def main_rnx3proc_client(argv) -> int:
+    """
+    main_rnx3proc_client forwards the analysis script run to the server and returns its exit code
+    """
+    address, script, lst_args = treatCmdOpts(argv)
+    script_name = os.path.splitext(os.path.basename(script))[0]
+
+    try:
+        sock = am_jobs.job_connect(address=address)
+    except OSError:
+        # no server listening, run the script in this process
+        scriptf = os.path.join(os.path.dirname(os.path.abspath(__file__)), '{name:s}.py'.format(name=script_name))
+        os.execv(sys.executable, [sys.executable, scriptf] + lst_args)
+
+    # once the job is sent, a lost server is reported by the exit code and the job is not run again
+    with sock:
+        return am_jobs.job_send(sock=sock, script=script_name, argv=lst_args)
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    sys.exit(main_rnx3proc_client(sys.argv))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from termcolor import colored
+import logging
+import json
+import socket
+import signal
+import importlib
+import traceback
+from shutil import copyfile
+from typing import Tuple
+import matplotlib.pyplot as plt
+
+from ampyutils import am_config as amc
+from ampyutils import gnss_cmd_opts as gco
+from ampyutils import amutils, am_jobs
+from tle import tle_parser
+
+__author__ = 'amuls'
+
+# scripts run as job with their main function and whether this is called with the script name in argv (as sys.argv)
+dJobScripts = {'sbf_rinex': ('main_sbf2rnx3', False),
+               'rnx15_combine': ('main_combine_rnx15', False),
+               'rnxobs_tabular': ('main_rnx_obstab', True),
+               'obsstat_analyse': ('main_rnx_obsstat', True),
+               'obstab_analyse': ('main_obstab_analyse', True)}
+
+# number of colors of the colormaps used by the plots
+lst_colormap_sizes = [36, 37]
+
+
+def treatCmdOpts(argv):
+    """
+    Treats the command line options
+
+    :param argv: the options
+    :type argv: list of string
+    """
+    baseName = os.path.basename(__file__)
+    amc.cBaseName = colored(baseName, 'yellow')
+
+    helpTxt = amc.cBaseName + ' keeps the analysis modules, time scale, TLEs and colormaps loaded and runs the jobs forwarded by rnx3proc_client.py'
+
+    # create the parser for command line arguments
+    parser = argparse.ArgumentParser(description=helpTxt)
+
+    parser.add_argument('--socket', help='UNIX socket on which jobs are accepted (default {sock:s})'.format(sock=colored(am_jobs.JOB_SOCKET, 'green')),
+                        type=str,
+                        required=False,
+                        default=am_jobs.JOB_SOCKET)
+
+    parser.add_argument('--jobs', help='maximum number of jobs running at the same time (default {jobs:s})'.format(jobs=colored('1', 'green')),
+                        type=int,
+                        required=False,
+                        default=1)
+
+    parser.add_argument('--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'
+                                          .format(choices='|'.join(gco.lst_logging_choices), choice=colored(' '.join(gco.lst_logging_choices[3:5]), 'green')),
+                        nargs=2,
+                        required=False,
+                        default=gco.lst_logging_choices[3:5],
+                        action=gco.logging_action)
+
+    # drop argv[0]
+    args = parser.parse_args(argv[1:])
+
+    # return arguments
+    return args.socket, args.jobs, args.logging
+
+
+def server_warm(logger: logging.Logger) -> dict:
+    """
+    server_warm imports the job scripts and loads the resources they share so that the jobs forked from the server find them
+    loaded. Returns per job script its module
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dModules = {}
+    for script in dJobScripts:
+        dModules[script] = importlib.import_module(script)
+
+    # time scale, RMA topos, NORAD / PRN table and TLE files
+    dWarm = tle_parser.tle_resources_warm(logger=logger)
+
+    # colormaps and the font cache of matplotlib
+    for nrcolors in lst_colormap_sizes:
+        amutils.colormap_names(nrcolors=nrcolors)
+    plt.close(plt.figure())
+
+    logger.info('{func:s}: loaded job scripts {scripts:s} ({tles:d} TLE files)'.format(scripts=', '.join(dModules), tles=dWarm['tle_files'], func=cFuncName))
+
+    return dModules
+
+
+def job_run(dJob: dict, lst_fds: list, dModules: dict) -> int:
+    """
+    job_run runs the job in the forked process with the standard input / output / error, working directory and environment of
+    the caller. Returns the exit code the script would have when run by itself
+    """
+    for fd, fd_caller in enumerate(lst_fds):
+        os.dup2(fd_caller, fd)
+        os.close(fd_caller)
+    sys.stdout.reconfigure(line_buffering=sys.stdout.isatty())
+
+    if dJob['script'] not in dModules:
+        sys.stderr.write('{name:s}: script {script:s} is not a job script (one of {scripts:s})\n'
+                         .format(name=os.path.basename(__file__), script=dJob['script'], scripts='|'.join(dModules)))
+        return amc.E_WRONG_OPTION
+
+    os.chdir(dJob['cwd'])
+    os.environ.clear()
+    os.environ.update(dJob['env'])
+
+    main_name, with_script = dJobScripts[dJob['script']]
+    sys.argv = [dModules[dJob['script']].__file__] + dJob['argv']
+
+    exit_code = amc.E_SUCCESS
+    try:
+        getattr(dModules[dJob['script']], main_name)(sys.argv if with_script else sys.argv[1:])
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or amc.E_SUCCESS
+        else:
+            sys.stderr.write('{msg!s}\n'.format(msg=e.code))
+            exit_code = 1
+    except Exception:
+        # reported as by the python interpreter
+        traceback.print_exc()
+        exit_code = 1
+
+    return exit_code
+
+
+def job_fork(conn: socket.socket, server: socket.socket, dModules: dict, logger: logging.Logger) -> Tuple[int, str]:
+    """
+    job_fork receives a job on connection conn and runs it in a forked process, which replies its exit code to the caller.
+    Returns the process id and script of the job (None when no valid job is received)
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    try:
+        dJob, lst_fds = am_jobs.job_receive(conn=conn)
+    except (OSError, ValueError) as e:
+        logger.warning('{func:s}: no valid job received ({err!s})'.format(err=e, func=cFuncName))
+        return None, None
+    logger.info('{func:s}: job {script:s} {args:s} in {cwd:s}'.format(script=colored(dJob['script'], 'green'),
+                                                                      args=' '.join(dJob['argv']),
+                                                                      cwd=dJob['cwd'],
+                                                                      func=cFuncName))
+
+    # flush before forking so that the job does not repeat the output of the server
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        server.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = job_run(dJob=dJob, lst_fds=lst_fds, dModules=dModules)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            am_jobs.job_reply(conn=conn, exit_code=exit_code)
+        except OSError:
+            pass
+        os._exit(exit_code)
+
+    for fd_caller in lst_fds:
+        os.close(fd_caller)
+
+    return pid, dJob['script']
+
+
+def jobs_reap(dRunning: dict, block: bool, logger: logging.Logger):
+    """
+    jobs_reap removes the finished jobs from dRunning, waiting for a job to finish when block is set
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    while len(dRunning) > 0:
+        pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+        if pid == 0:
+            break
+        logger.info('{func:s}: job {script:s} ended with exit code {code:d}'.format(script=dRunning.pop(pid, '?'),
+                                                                                    code=os.waitstatus_to_exitcode(status),
+                                                                                    func=cFuncName))
+        block = False
+
+
+def server_stop(signum, frame):
+    """
+    server_stop stops the server when the process is terminated
+    """
+    raise KeyboardInterrupt
+
+
+def main_rnx3proc_server(argv):
+    """
+    main_rnx3proc_server accepts the jobs forwarded by rnx3proc_client.py and runs each in a process forked from the loaded server
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dServer = {}
+    dServer['cli'] = {}
+    dServer['cli']['socket'], dServer['cli']['jobs'], logLevels = treatCmdOpts(argv)
+
+    # create logging for better debugging
+    logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+
+    dModules = server_warm(logger=logger)
+
+    # a socket left by a server that did not stop is reused
+    if os.path.exists(dServer['cli']['socket']):
+        os.remove(dServer['cli']['socket'])
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(dServer['cli']['socket'])
+    server.listen()
+
+    logger.info('{func:s}: accepting jobs on {sock:s}'.format(sock=colored(dServer['cli']['socket'], 'green'), func=cFuncName))
+
+    signal.signal(signal.SIGTERM, server_stop)
+
+    dServer['jobs'] = 0
+    dRunning = {}
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                pid, script = job_fork(conn=conn, server=server, dModules=dModules, logger=logger)
+            if pid is not None:
+                dRunning[pid] = script
+                dServer['jobs'] += 1
+
+            # wait for a running job to end when the maximum number of jobs is reached
+            jobs_reap(dRunning=dRunning, block=len(dRunning) >= dServer['cli']['jobs'], logger=logger)
+    except KeyboardInterrupt:
+        logger.info('{func:s}: server stopped'.format(func=cFuncName))
+    finally:
+        server.close()
+        os.remove(dServer['cli']['socket'])
+
+    jobs_reap(dRunning=dRunning, block=True, logger=logger)
+    logger.info('{func:s}: ran {jobs:d} jobs'.format(jobs=dServer['jobs'], func=cFuncName))
+
+    amutils.logJSON(callerName=cFuncName, title='Server information =', dInfo=dServer, logger=logger, level=logging.DEBUG)
+
+    # store the json structure
+    jsonName = '{scrname:s}.json'.format(scrname=os.path.splitext(os.path.basename(__file__))[0])
+    with open(jsonName, 'w+') as f:
+        json.dump(dServer, f, ensure_ascii=False, indent=4, default=amutils.json_convertor)
+
+    copyfile(log_name, '{scrname:s}.log'.format(scrname=os.path.basename(__file__).replace('.', '_')))
+    os.remove(log_name)
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    main_rnx3proc_server(sys.argv)
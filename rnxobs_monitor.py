@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from termcolor import colored
+import logging
+import json
+import socket
+import signal
+from shutil import copyfile
+
+from gfzrnx import gfzrnx_constants as gfzc
+from ampyutils import gnss_cmd_opts as gco
+
+from ampyutils import am_config as amc
+from ampyutils import amutils
+from gfzrnx import rnxobs_stream
+
+__author__ = 'amuls'
+
+
+def treatCmdOpts(argv):
+    """
+    Treats the command line options
+
+    :param argv: the options
+    :type argv: list of string
+    """
+    baseName = os.path.basename(__file__)
+    amc.cBaseName = colored(baseName, 'yellow')
+
+    helpTxt = amc.cBaseName + ' monitors a growing RINEX observation file or stream for SNR jumps and loss of lock / PNT'
+
+    # create the parser for command line arguments
+    parser = argparse.ArgumentParser(description=helpTxt)
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--rnxobs', help='RINEX v3 observation file written by the receiver (or by sbf2rin / gfzrnx from its SBF file)', type=str)
+    source.add_argument('--socket', help='local socket (UNIX socket path or host:port) streaming RINEX v3 observations', type=str)
+
+    parser.add_argument('--gnsss', help='select (1 or more) GNSS(s) to use (out of {gnsss:s}, default {gnss:s})'
+                                        .format(gnsss='|'.join(gfzc.lst_GNSSs), gnss=colored(gfzc.lst_GNSSs[0], 'green')),
+                        default=gfzc.lst_GNSSs[:1],
+                        type=str,
+                        required=False,
+                        action=gco.gnss_action,
+                        nargs='+')
+
+    parser.add_argument('--prns', help='list of PRNs to examine (default {:s} (if PRN is 00 than all PRNs for GNSS used)'
+                                       .format(colored('E00', 'green')),
+                        type=str,
+                        required=False,
+                        default=['E00', 'G00'],
+                        action=gco.prn_list_action,
+                        nargs='+')
+
+    parser.add_argument('--freqs', help='select frequencies to use (out of {freqs:s}, default {freq:s})'
+                                        .format(freqs='|'.join(gfzc.lst_freqs), freq=colored(gfzc.lst_freqs[0], 'green')),
+                        default=gfzc.lst_freqs[:1],
+                        type=str,
+                        required=False,
+                        action=gco.freqtype_action,
+                        nargs='+')
+
+    parser.add_argument('--obstypes', help='select observation types(s) to use (out of {osbtypes:s}, default {osbtype:s})'
+                                           .format(osbtypes='|'.join(gfzc.lst_obstypes),
+                                                   osbtype=colored(gfzc.lst_obstypes[0], 'green')),
+                        default=gfzc.lst_obstypes[:1],
+                        type=str,
+                        required=False,
+                        action=gco.obstype_action,
+                        nargs='+')
+
+    parser.add_argument('--snr_th', help='threshold for detecting variation in SNR levels (default {snrtr:s})'
+                                         .format(snrtr=colored('2', 'green')),
+                        type=float,
+                        required=False,
+                        default=2,
+                        action=gco.snrth_action)
+
+    parser.add_argument('--events', help='file to which the events are appended as JSON lines (default {events:s})'
+                                         .format(events=colored('None', 'green')),
+                        type=str,
+                        required=False,
+                        default=None)
+
+    parser.add_argument('--queue', help='UNIX datagram socket to which each event is sent as JSON (default {queue:s})'
+                                        .format(queue=colored('None', 'green')),
+                        type=str,
+                        required=False,
+                        default=None)
+
+    parser.add_argument('--poll', help='seconds between checks for observations appended to the RINEX file (default {poll:s})'
+                                       .format(poll=colored('0.5', 'green')),
+                        type=float,
+                        required=False,
+                        default=0.5)
+
+    parser.add_argument('--nofollow', help='stop at the end of the RINEX file instead of waiting for new observations (default False)',
+                        action='store_true',
+                        required=False,
+                        default=False)
+
+    parser.add_argument('--logging', help='specify logging level console/file (two of {choices:s}, default {choice:s})'
+                                          .format(choices='|'.join(gco.lst_logging_choices), choice=colored(' '.join(gco.lst_logging_choices[3:5]), 'green')),
+                        nargs=2,
+                        required=False,
+                        default=gco.lst_logging_choices[3:5],
+                        action=gco.logging_action)
+
+    # drop argv[0]
+    args = parser.parse_args(argv[1:])
+
+    # return arguments
+    return args.rnxobs, args.socket, args.gnsss, args.prns, args.freqs, args.obstypes, args.snr_th, args.events, args.queue, args.poll, args.nofollow, args.logging
+
+
+def monitor_prns(gnsss: list, cli_prns: list) -> list:
+    """
+    monitor_prns returns the PRNs to monitor for the selected GNSSs, PRN 00 selects all PRNs of its GNSS
+    """
+    lst_prns = []
+    for gnss in gnsss:
+        if gfzc.dict_GNSS_PRNs[gnss][0] in cli_prns:
+            lst_prns += gfzc.dict_GNSS_PRNs[gnss][1:]
+        else:
+            lst_prns += [prn for prn in cli_prns if prn[0] == gnss]
+
+    return lst_prns
+
+
+def event_sinks(eventsf: str, queue: str, logger: logging.Logger = None) -> dict:
+    """
+    event_sinks opens the events file and the datagram socket to which the events are sent
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dSinks = {}
+    dSinks['file'] = None
+    dSinks['queue'] = None
+
+    if eventsf is not None:
+        dSinks['file'] = open(eventsf, 'a')
+    if queue is not None:
+        dSinks['queue'] = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        dSinks['queue'].setblocking(False)
+        dSinks['address'] = queue
+
+    if logger is not None:
+        logger.info('{func:s}: events are reported to the log{file:s}{queue:s}'
+                    .format(file='' if eventsf is None else ', appended to {eventsf:s}'.format(eventsf=colored(eventsf, 'blue')),
+                            queue='' if queue is None else ', sent to {queue:s}'.format(queue=colored(queue, 'blue')),
+                            func=cFuncName))
+
+    return dSinks
+
+
+def emit_events(dSinks: dict, lst_events: list, logger: logging.Logger = None):
+    """
+    emit_events reports the events of an epoch as soon as they are detected. A queue without listener drops the events
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    for dEvent in lst_events:
+        if logger is not None:
+            logger.warning('{func:s}: {dt!s} {navsig:s} {type:s} {event:s}{value:s}{duration:s}'
+                           .format(dt=dEvent['DATE_TIME'],
+                                   navsig=dEvent['navsig'],
+                                   type=dEvent['type'],
+                                   event=colored(dEvent['event'], 'red' if dEvent['event'] in ['Loss', 'SNR drop'] else 'green'),
+                                   value='' if dEvent['value'] is None else ' ({value:.1f})'.format(value=dEvent['value']),
+                                   duration='' if dEvent['duration'] is None else ' after {gap:.1f} s'.format(gap=dEvent['duration']),
+                                   func=cFuncName))
+
+        event_json = json.dumps(dEvent, default=amutils.json_convertor)
+        if dSinks['file'] is not None:
+            dSinks['file'].write(event_json + '\n')
+        if dSinks['queue'] is not None:
+            try:
+                dSinks['queue'].sendto(event_json.encode(), dSinks['address'])
+            except OSError:
+                pass
+
+    if dSinks['file'] is not None and len(lst_events) > 0:
+        dSinks['file'].flush()
+
+
+def monitor_stop(signum, frame):
+    """
+    monitor_stop stops the monitoring when the process is terminated
+    """
+    raise KeyboardInterrupt
+
+
+def main_rnxobs_monitor(argv):
+    """
+    main_rnxobs_monitor monitors the observations epoch by epoch while they are recorded
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    dMonitor = {}
+    dMonitor['cli'] = {}
+    dMonitor['cli']['rnxobs'], dMonitor['cli']['socket'], dMonitor['cli']['gnsss'], dMonitor['cli']['prns'], dMonitor['cli']['freqs'], dMonitor['cli']['obstypes'], dMonitor['cli']['snrth'], dMonitor['cli']['events'], dMonitor['cli']['queue'], dMonitor['cli']['poll'], dMonitor['cli']['nofollow'], logLevels = treatCmdOpts(argv)
+
+    # create logging for better debugging
+    logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+
+    if dMonitor['cli']['rnxobs'] is not None:
+        if not amutils.file_exists(fname=dMonitor['cli']['rnxobs'], logger=logger):
+            logger.error('{func:s}: observation file {file:s} not accessible'.format(file=dMonitor['cli']['rnxobs'], func=cFuncName))
+            sys.exit(amc.E_FILE_NOT_EXIST)
+        lines = rnxobs_stream.tail_lines(fname=dMonitor['cli']['rnxobs'], poll=dMonitor['cli']['poll'], follow=not dMonitor['cli']['nofollow'])
+        dMonitor['dir'] = os.path.dirname(os.path.abspath(dMonitor['cli']['rnxobs']))
+    else:
+        lines = rnxobs_stream.socket_lines(address=dMonitor['cli']['socket'])
+        dMonitor['dir'] = os.getcwd()
+
+    dMonitor['prns'] = monitor_prns(gnsss=dMonitor['cli']['gnsss'], cli_prns=dMonitor['cli']['prns'])
+    dSinks = event_sinks(eventsf=dMonitor['cli']['events'], queue=dMonitor['cli']['queue'], logger=logger)
+
+    amutils.logJSON(callerName=cFuncName, title='Monitor information =', dInfo=dMonitor, logger=logger, level=logging.DEBUG)
+
+    # a daemon is stopped by SIGTERM, handled as an interrupt so that the events and log are closed
+    signal.signal(signal.SIGTERM, monitor_stop)
+
+    # the events of an epoch are reported once all its observations are read
+    dMonitor['epochs'] = 0
+    dMonitor['events'] = 0
+    try:
+        for dt_epoch, lst_events in rnxobs_stream.monitor_stream(lines=lines,
+                                                                 gnsss=dMonitor['cli']['gnsss'],
+                                                                 lst_prns=dMonitor['prns'],
+                                                                 freqs=dMonitor['cli']['freqs'],
+                                                                 obstypes=dMonitor['cli']['obstypes'],
+                                                                 snrth=dMonitor['cli']['snrth'],
+                                                                 logger=logger):
+            emit_events(dSinks=dSinks, lst_events=lst_events, logger=logger)
+            dMonitor['epochs'] += 1
+            dMonitor['events'] += len(lst_events)
+            dMonitor['last_epoch'] = dt_epoch
+    except KeyboardInterrupt:
+        logger.info('{func:s}: monitoring interrupted'.format(func=cFuncName))
+    finally:
+        if dSinks['file'] is not None:
+            dSinks['file'].close()
+        if dSinks['queue'] is not None:
+            dSinks['queue'].close()
+
+    logger.info('{func:s}: monitored {epochs:d} epochs, reported {events:d} events'.format(epochs=dMonitor['epochs'], events=dMonitor['events'], func=cFuncName))
+
+    # store the json structure
+    jsonName = os.path.join(dMonitor['dir'], '{scrname:s}.json'.format(scrname=os.path.splitext(os.path.basename(__file__))[0]))
+    with open(jsonName, 'w+') as f:
+        json.dump(dMonitor, f, ensure_ascii=False, indent=4, default=amutils.json_convertor)
+
+    copyfile(log_name, os.path.join(dMonitor['dir'], '{scrname:s}.log'.format(scrname=os.path.basename(__file__).replace('.', '_'))))
+    os.remove(log_name)
+
+
+if __name__ == "__main__":  # Only run if this file is called directly
+    main_rnxobs_monitor(sys.argv)
@@ -5,19 +5,20 @@ import os
 import argparse
 from termcolor import colored
 import logging
-import json
 from typing import Tuple
 from shutil import copyfile
 from nested_lookup import nested_lookup
 from datetime import datetime
 import pickle
+import tempfile
+import pandas as pd
 
 from gfzrnx import gfzrnx_constants as gfzc
 from ampyutils import gnss_cmd_opts as gco
 
 from ampyutils import am_config as amc
-from ampyutils import amutils, location
-from gfzrnx import rnxobs_analysis
+from ampyutils import amutils, location, am_profile
+from gfzrnx import rnxobs_analysis, obstab_loader
 from ltx import ltx_rnxobs_reporting
 
 __author__ = 'amuls'
@@ -53,6 +54,12 @@ def treatCmdOpts(argv):
                         action=gco.gnss_action,
                         nargs='+')
 
+    parser.add_argument('--incremental',
+                        help='append to an existing observation tabular file only the epochs following its last epoch (default False)',
+                        action='store_true',
+                        required=False,
+                        default=False)
+
     parser.add_argument('--logging',
                         help='specify logging level console/file (two of {choices:s}, default {choice:s})'
                              .format(choices='|'.join(gco.lst_logging_choices),
@@ -66,40 +73,60 @@ def treatCmdOpts(argv):
     args = parser.parse_args(argv[1:])
 
     # return arguments
-    return args.obsfile, args.gnsss, args.logging
+    return args.obsfile, args.gnsss, args.incremental, args.logging
 
 
+@am_profile.profile_func()
 def create_tabular_observations(gfzrnx: str,
                                 obsf: str,
                                 gnss: str,
+                                incremental: bool = False,
                                 logger: logging.Logger = None) -> Tuple[str, str]:
     """
-    create_create_tabular_observations creates for the selected GNSSs the tabular observation file and returns its name
+    create_create_tabular_observations creates for the selected GNSSs the tabular observation file and returns its name.
+    In incremental mode the epochs following the last epoch of an existing tabular observation file are appended to it
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     # create the observation tabular file
     obs_tabf = '{basen:s}_{gnss:s}.obstab'.format(basen=os.path.splitext(obsf)[0], gnss=gnss)
 
+    # in incremental mode only the epochs from the last tabulated epoch on are tabulated in a temporary file
+    dt_last = None
+    if incremental and os.path.isfile(obs_tabf):
+        dt_last = obstab_loader.obstab_last_epoch(obstabf=obs_tabf)
+
+    if dt_last is None:
+        tabf = obs_tabf
+    else:
+        with tempfile.NamedTemporaryFile(suffix='.obstab', dir=os.path.dirname(os.path.abspath(obs_tabf)), delete=False) as ftmp:
+            tabf = ftmp.name
+
     args4GFZRNX = [gfzrnx, '-finp', obsf,
                            '-tab_obs',
-                           '-fout', obs_tabf,
+                           '-fout', tabf,
                            '-f', '-tab_sep', ',',
                            '-satsys', gnss]
+    if dt_last is not None:
+        args4GFZRNX += ['-epo_beg', dt_last.strftime('%Y%j_%H%M%S')]
 
     if logger is not None:
-        logger.info('{func:s} creating observation tabular file {obstab:s}'.format(obstab=colored(obs_tabf, 'blue'),
+        logger.info('{func:s} creating observation tabular file {obstab:s}'.format(obstab=colored(tabf, 'blue'),
                                                                                    func=cFuncName))
     # run program
     err_code, proc_out = amutils.run_subprocess_output(sub_proc=args4GFZRNX, logger=logger)
     if err_code != amc.E_SUCCESS:
         logger.error('{func:s}: error {err!s} creating observation tabular file {obstab:s}'.format(err=err_code,
-                                                                                                   obstab=colored(obs_tabf, 'blue'),
+                                                                                                   obstab=colored(tabf, 'blue'),
                                                                                                    func=cFuncName))
         sys.exit(err_code)
     else:
         print('proc_out = \n{!s}'.format(proc_out))
 
+    if dt_last is not None:
+        append_tabular_observations(obs_tabf=obs_tabf, new_tabf=tabf, dt_last=dt_last, logger=logger)
+        os.remove(tabf)
+
     # create the observation statistics file
     # gfzrnx -finp COMB00XXX_R_20191340000_01D_01S_MO.rnx -stk_obs -obs_types S
     obs_statf = '{basen:s}_{gnss:s}.obsstat'.format(basen=os.path.splitext(obsf)[0], gnss=gnss)
@@ -125,6 +152,46 @@ def create_tabular_observations(gfzrnx: str,
     return obs_tabf, obs_statf
 
 
+def append_tabular_observations(obs_tabf: str,
+                                new_tabf: str,
+                                dt_last: datetime,
+                                logger: logging.Logger = None) -> int:
+    """
+    append_tabular_observations appends the observations of new_tabf after epoch dt_last to obs_tabf and returns the number
+    of lines appended. Only complete epochs are appended so that the tabular observation file can be analysed incrementally
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    hdr_columns, _ = obstab_loader.obstab_header(obstabf=obs_tabf)
+    if obstab_loader.obstab_header(obstabf=new_tabf)[0] != hdr_columns:
+        logger.error('{func:s}: observation types of {new:s} differ from these in {obstab:s}, recreate it without incremental mode'
+                     .format(new=new_tabf, obstab=colored(obs_tabf, 'red'), func=cFuncName))
+        sys.exit(amc.E_FAILURE)
+    idx_date, idx_time = hdr_columns.index('DATE'), hdr_columns.index('TIME')
+
+    # the observations are sorted in time, the epochs up to dt_last are already in the tabular observation file
+    nr_lines = 0
+    is_new = False
+    with open(new_tabf, 'r') as fnew:
+        with open(obs_tabf, 'a') as ftab:
+            for line in fnew:
+                if not line.startswith('OBS'):
+                    continue
+                if not is_new:
+                    fields = line.split(',')
+                    is_new = pd.Timestamp('{date:s} {time:s}'.format(date=fields[idx_date], time=fields[idx_time])) > dt_last
+                    if not is_new:
+                        continue
+                ftab.write(line)
+                nr_lines += 1
+
+    if logger is not None:
+        logger.info('{func:s}: appended {count:d} observations after {last!s} to {obstab:s}'
+                    .format(count=nr_lines, last=dt_last, obstab=colored(obs_tabf, 'blue'), func=cFuncName))
+
+    return nr_lines
+
+
 def check_arguments(logger: logging.Logger = None):
     """
     check arhuments and change working directory
@@ -166,13 +233,14 @@ def main_rnx_obstab(argv) -> dict:
 
     # treat command line options
     dCLI = {}
-    rnx3obsf, dCLI['GNSSs'], logLevels = treatCmdOpts(argv)
+    rnx3obsf, dCLI['GNSSs'], dCLI['incremental'], logLevels = treatCmdOpts(argv)
     dCLI['obsf'] = os.path.basename(rnx3obsf)
     dCLI['path'] = os.path.dirname(rnx3obsf)
     dGFZ['cli'] = dCLI
 
     # create logging for better debugging
     logger, log_name = amc.createLoggers(baseName=os.path.basename(__file__), logLevels=logLevels)
+    am_profile.profile_init(baseName=os.path.basename(__file__), logger=logger)
 
     # verify input
     check_arguments(logger=logger)
@@ -184,11 +252,7 @@ def main_rnx_obstab(argv) -> dict:
     dGFZ['hdr'] = rnxobs_analysis.RX3obs_header_info(gfzrnx=dGFZ['bin']['gfzrnx'],
                                                      obs3f=dGFZ['cli']['obsf'],
                                                      logger=logger)
-    logger.info('{func:s}: dGFZ[hdr] =\n{json!s}'.format(func=cFuncName,
-                                                         json=json.dumps(dGFZ['hdr'],
-                                                                         sort_keys=False,
-                                                                         indent=4,
-                                                                         default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='dGFZ[hdr] =', dInfo=dGFZ['hdr'], logger=logger)
 
     # save the header info for later usage
     dGFZ['obshdr'] = '{obsf:s}.obshdr'.format(obsf=os.path.splitext(dCLI['obsf'])[0])
@@ -203,11 +267,7 @@ def main_rnx_obstab(argv) -> dict:
     dGFZ['info']['yyyy'] = int(dGFZ['cli']['obsf'][12:16])
     dGFZ['info']['doy'] = int(dGFZ['cli']['obsf'][16:19])
 
-    logger.info('{func:s}: dGFZ =\n{json!s}'.format(func=cFuncName,
-                                                    json=json.dumps(dGFZ,
-                                                                    sort_keys=False,
-                                                                    indent=4,
-                                                                    default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='dGFZ =', dInfo=dGFZ, logger=logger, level=logging.DEBUG)
 
     sec_script = ltx_rnxobs_reporting.rnxobs_script_information(dCli=dGFZ['cli'],
                                                                 dHdr=dGFZ['hdr'],
@@ -217,7 +277,8 @@ def main_rnx_obstab(argv) -> dict:
     dGFZ['ltx']['script'] = os.path.join(dGFZ['ltx']['path'],
                                          '{marker:s}_01_{gnsss:s}_script_info'.format(marker=dGFZ['info']['marker'],
                                                                                       gnsss=''.join(dGFZ['cli']['GNSSs'])))
-    sec_script.generate_tex(dGFZ['ltx']['script'])
+    with am_profile.profile_stage(stage='generate_tex'):
+        sec_script.generate_tex(dGFZ['ltx']['script'])
 
     # create the tabular observation file for the selected GNSSs
     for gnss in dGFZ['cli']['GNSSs']:
@@ -228,18 +289,16 @@ def main_rnx_obstab(argv) -> dict:
         dGFZ['obstab'][gnss][obs_tabf], dGFZ['obstab'][gnss][obs_statf] = create_tabular_observations(gfzrnx=dGFZ['bin']['gfzrnx'],
                                                                                                       obsf=dGFZ['cli']['obsf'],
                                                                                                       gnss=gnss,
+                                                                                                      incremental=dCLI['incremental'],
                                                                                                       logger=logger)
 
         # plot the observation statistics
         # obsstat_plot.obsstat_plot_obscount(obs_statf=dGFZ['obstab'][obs_statf], gnss=gnss, gfzrnx=dGFZ['bin']['gfzrnx'], show_plot=show_plot, logger=logger)
 
     # report to the user
-    logger.info('{func:s}: Project information =\n{json!s}'.format(func=cFuncName,
-                                                                   json=json.dumps(dGFZ,
-                                                                                   sort_keys=False,
-                                                                                   indent=4,
-                                                                                   default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='Project information =', dInfo=dGFZ, logger=logger)
 
+    am_profile.profile_save(dir=dGFZ['cli']['path'])
     copyfile(log_name, os.path.join(dGFZ['cli']['path'], '{:s}.log'.format(os.path.basename(__file__).replace('.', '_'))))
     os.remove(log_name)
 
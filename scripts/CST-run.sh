@@ -35,3 +35,15 @@ obstab_analyse.py  --freqs 1 6 --cutoff 0 --snr_th 2.5 --obstypes S  --jamsc ~/R
 
 obstab_analyse.py  --freqs 1 --cutoff 0 --snr_th 2.5 --obstypes S --prns G00  --jamsc ~/RxTURP/RFI-20349/CST/CST-jamming.csv --obstab ~/RxTURP/RFI-20349/CST/rnx/20349/P3RS04BEL_R_20203490000_01D_00U_MO_G.obstab --plot --elev_step 1
  obstab_analyse.py  --freqs 1 6 --cutoff 0 --snr_th 2.5 --obstypes S --prns E00  --jamsc ~/RxTURP/RFI-20349/CST/CST-jamming.csv --obstab ~/RxTURP/RFI-20349/CST/rnx/20349/P3RS04BEL_R_20203490000_01D_00U_MO_E.obstab --plot --elev_step 1
+
+# 5. incremental processing of the P3RS2 day, run after each new 15 minutes RINEX file
+rnx15_combine.py --from_dir ~/RxTURP/RFI-20349/P3RS2/ --marker P3RS --year 2020 --doy 349 --rnx_dir ~/RxTURP/RFI-20349/CST/rnx/ --incremental
+rnxobs_tabular.py --obsfile ~/RxTURP/RFI-20349/CST/rnx/20349/P3RS04BEL_R_20203490000_01D_00U_MO.rnx --gnsss E --incremental
+obsstat_analyse.py --obsstat ~/RxTURP/RFI-20349/CST/rnx/20349/P3RS04BEL_R_20203490000_01D_00U_MO_E.obsstat --freqs 1 6  --dbcvs ~/RxTURP/RFI-20349/CST/rnx/CST-db.cvs
+obstab_analyse.py  --freqs 1 6 --cutoff 0 --snr_th 2.5 --obstypes S --prns E00  --jamsc ~/RxTURP/RFI-20349/CST/CST-jamming.csv --obstab ~/RxTURP/RFI-20349/CST/rnx/20349/P3RS04BEL_R_20203490000_01D_00U_MO_E.obstab --elev_step 1 --incremental
+
+# 6. run the analyses by the analysis server which keeps the modules, time scale and TLEs loaded
+rnx3proc_server.py --jobs 2 &
+rnx3proc_client.py obsstat_analyse.py --obsstat ~/RxTURP/RFI-20349/CST/rnx/20349/SEPT00BEL_R_20203491400_30M_01S_MO_E.obsstat --freqs 1  --dbcvs ~/RxTURP/RFI-20349/CST/CST-db.cvs --plot
+rnx3proc_client.py obstab_analyse.py  --freqs 1 --cutoff 0 --snr_th 2.5 --obstypes S  --jamsc ~/RxTURP/RFI-20349/CST/CST-jamming.csv --obstab ~/RxTURP/RFI-20349/CST/rnx/20349/SEPT00BEL_R_20203491400_30M_01S_MO_E.obstab --prns E00 --plot --elev_step 1
+kill %1
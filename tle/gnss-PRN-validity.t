@@ -0,0 +1,2 @@
+E28,2018-07-25,,,GSAT0222
+E29,2018-07-25,,,GSAT0219
@@ -1,35 +1,163 @@
 import os
 import sys
+import glob
 import logging
+import functools
 from termcolor import colored
 import pandas as pd
 from bisect import bisect_left, bisect_right
 from typing import Tuple
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from skyfield import api as sf
 from skyfield.api import EarthSatellite
-import numpy as np
+from skyfield.timelib import Timescale
 
 from ampyutils import am_config as amc
 from ampyutils import amutils
 
 __author__ = 'amuls'
 
+# position of the RMA earth station for which the TLE visibility is determined
+RMA_LATITUDE = '50.8438 N'
+RMA_LONGITUDE = '4.3928 E'
 
-def read_norad2prn(logger: logging.Logger) -> pd.DataFrame:
+# directory with the NORAD TLE files, the NORAD / PRN table and the PRN validity periods
+TLE_DIR = 'RxTURP/BEGPIOS/tle/cmb'
+NORAD2PRN_FILE = 'gnss-NORAD-PRN.t'
+# PRN validity file with lines PRN,valid_from,valid_to,NORAD,SV-ID (dates as YYYY-MM-DD), taking precedence over the NORAD / PRN
+# table during their validity period. An empty valid_from is open, an empty valid_to ends at the next assignment of the PRN in
+# the table and an empty NORAD is taken from the table entry of the SV-ID. The file in this directory is used when the TLE
+# directory has none
+PRN_VALIDITY_FILE = 'gnss-PRN-validity.t'
+
+
+@functools.lru_cache(maxsize=None)
+def sf_timescale() -> Timescale:
+    """
+    sf_timescale loads the skyfield time scale, the time scale is kept for next calls
+    """
+    return sf.load.timescale()
+
+
+@functools.lru_cache(maxsize=None)
+def marker_topos(latitude: str = RMA_LATITUDE, longitude: str = RMA_LONGITUDE) -> sf.Topos:
+    """
+    marker_topos returns the topos of an earth station (default RMA), the topos is kept for next calls
+    """
+    return sf.Topos(latitude, longitude)
+
+
+@functools.lru_cache(maxsize=None)
+def read_tle_file(tle_file: str, mtime: int) -> Tuple[pd.DataFrame, tuple]:
+    """
+    read_tle_file reads a NORAD TLE file as dataframe and as lines, these are kept for next calls as long as the
+    file is not modified (mtime)
+    """
+    with open(tle_file, 'r') as fin:
+        lst_lines = tuple(fin.readlines())
+
+    return pd.read_csv(tle_file, header=None, delim_whitespace=True), lst_lines
+
+
+@functools.lru_cache(maxsize=None)
+def read_norad2prn_file(norad2prn_file: str, mtime: int) -> pd.DataFrame:
     """
-    read_norad2prn reads the files gnss-NORAD-PRN.t from dir ~/RxTURP/BEGPIOS/tle/cmb connecting NORAD number to PRN (period 2018-2020)
+    read_norad2prn_file reads the NORAD to PRN table, the table is kept for next calls as long as the file is not modified (mtime)
+    """
+    return pd.read_csv(norad2prn_file, header=None, names=['GNSS', 'SV-ID', 'PRN', 'NORAD', 'launch'])
+
+
+@functools.lru_cache(maxsize=None)
+def norad_prn_index(norad2prn_file: str, mtime: int, validity_file: str = None, validity_mtime: int = 0) -> pd.DataFrame:
+    """
+    norad_prn_index compiles the index of PRN assignments (columns PRN, valid_from, valid_to, NORAD, SV-ID, priority) from the
+    NORAD / PRN table and the PRN validity file. A satellite of the table holds its PRN from its launch until the launch of the
+    next satellite with that PRN. When assignments overlap, the lowest priority is used (0 for the validity file, 1 for the
+    table). The index is kept for next calls as long as the files are not modified (mtime)
+    """
+    dfNorad = read_norad2prn_file(norad2prn_file=norad2prn_file, mtime=mtime)
+
+    dfTable = pd.DataFrame({'PRN': dfNorad['PRN'],
+                            'valid_from': pd.to_datetime(dfNorad['launch'].astype(str), errors='coerce').fillna(pd.Timestamp.min),
+                            'NORAD': dfNorad['NORAD'],
+                            'SV-ID': dfNorad['SV-ID']})
+    dfTable = dfTable.sort_values(by=['PRN', 'valid_from'], kind='mergesort')
+    dfTable['valid_to'] = dfTable.groupby('PRN')['valid_from'].shift(-1).fillna(pd.Timestamp.max)
+    dfTable['priority'] = 1
+
+    lst_index = [dfTable]
+    if validity_file is not None:
+        dfValid = pd.read_csv(validity_file, header=None, names=['PRN', 'valid_from', 'valid_to', 'NORAD', 'SV-ID'], dtype={'NORAD': str})
+        dfValid['valid_from'] = pd.to_datetime(dfValid['valid_from']).fillna(pd.Timestamp.min)
+        dfNext = dfValid.reset_index().merge(dfTable[['PRN', 'valid_from']], on='PRN', suffixes=('', '_next'))
+        dfNext = dfNext[dfNext['valid_from_next'] > dfNext['valid_from']].groupby('index')['valid_from_next'].min()
+        dfValid['valid_to'] = pd.to_datetime(dfValid['valid_to']).fillna(dfNext).fillna(pd.Timestamp.max)
+        dfValid['NORAD'] = dfValid['NORAD'].fillna(dfValid['SV-ID'].map(dfNorad.drop_duplicates(subset='SV-ID').set_index('SV-ID')['NORAD']))
+        dfValid['priority'] = 0
+        lst_index.insert(0, dfValid)
+
+    dfIndex = pd.concat(lst_index, ignore_index=True)
+
+    return dfIndex[['PRN', 'valid_from', 'valid_to', 'NORAD', 'SV-ID', 'priority']]
+
+
+def norad_prn_files() -> dict:
+    """
+    norad_prn_files returns the NORAD / PRN table and PRN validity file (None when absent) with their modification times
+    """
+    tle_dir = os.path.join(os.environ['HOME'], TLE_DIR)
+
+    dFiles = {}
+    dFiles['norad2prn_file'] = os.path.join(tle_dir, NORAD2PRN_FILE)
+    dFiles['mtime'] = os.stat(dFiles['norad2prn_file']).st_mtime_ns
+    dFiles['validity_file'] = None
+    dFiles['validity_mtime'] = 0
+    for validity_dir in [tle_dir, os.path.dirname(os.path.abspath(__file__))]:
+        if os.path.isfile(os.path.join(validity_dir, PRN_VALIDITY_FILE)):
+            dFiles['validity_file'] = os.path.join(validity_dir, PRN_VALIDITY_FILE)
+            dFiles['validity_mtime'] = os.stat(dFiles['validity_file']).st_mtime_ns
+            break
+
+    return dFiles
+
+
+def tle_resources_warm(logger: logging.Logger = None) -> dict:
+    """
+    tle_resources_warm loads the time scale, the RMA topos, the PRN / NORAD index and the NORAD TLE files so that following
+    calls use them without reading or parsing
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # create the dictionary with dataframes to return
-    column_names = ['GNSS', 'SV-ID', 'PRN', 'NORAD', 'launch']
+    sf_timescale()
+    marker_topos()
+
+    dWarm = {}
+    dWarm['norad2prn'] = 0
+    dWarm['tle_files'] = 0
 
-    # read the NORAD2PRN file in dataframes
-    norad2prn_file = os.path.join(os.environ['HOME'], 'RxTURP/BEGPIOS/tle/cmb', 'gnss-NORAD-PRN.t')
+    tle_dir = os.path.join(os.environ['HOME'], TLE_DIR)
+    if os.path.isfile(os.path.join(tle_dir, NORAD2PRN_FILE)):
+        dWarm['norad2prn'] = len(norad_prn_index(**norad_prn_files()).index)
+    for tle_file in glob.glob(os.path.join(tle_dir, 'sat*.txt')):
+        read_tle_file(tle_file=tle_file, mtime=os.stat(tle_file).st_mtime_ns)
+        dWarm['tle_files'] += 1
+
+    if logger is not None:
+        logger.info('{func:s}: loaded time scale, topos {topo!s}, {norads:d} PRN / NORAD assignments and {tles:d} TLE files from {dir:s}'
+                    .format(topo=marker_topos(), norads=dWarm['norad2prn'], tles=dWarm['tle_files'], dir=colored(tle_dir, 'green'), func=cFuncName))
+
+    return dWarm
+
+
+def read_norad2prn(logger: logging.Logger) -> pd.DataFrame:
+    """
+    read_norad2prn returns the index of PRN assignments compiled from the files gnss-NORAD-PRN.t and gnss-PRN-validity.t from dir
+    ~/RxTURP/BEGPIOS/tle/cmb connecting NORAD number to PRN
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
     try:
-        dfNorad = pd.read_csv(norad2prn_file, header=None, names=column_names)
+        dfNorad = norad_prn_index(**norad_prn_files())
         amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfNorad, dfName='dfNorad')
         return dfNorad
     except NameError as e:
@@ -45,26 +173,24 @@ def read_norad2prn(logger: logging.Logger) -> pd.DataFrame:
 
 def get_norad_numbers(prns: list,
                       dfNorad: pd.DataFrame,
-                      logger: logging.Logger) -> dict:
+                      logger: logging.Logger,
+                      date: datetime = None) -> dict:
     """
-    get_norad_number returns the NORAD number for a fiven PRN
+    get_norad_number returns the NORAD numbers assigned to the given PRNs at date (default now) by the index dfNorad
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
-    # create dict of NORAD numbers corresponding to the given PRNs
-    dNorads = {}
-    for _, prn in enumerate(prns):
-        if prn == 'E28':
-            norad_prn = 'E33'
-        elif prn == 'E29':
-            norad_prn = 'E36'
-        else:
-            norad_prn = prn
-        try:
-            dNorads[prn] = dfNorad[dfNorad['PRN'] == norad_prn]['NORAD'].item()
-        except ValueError:
-            logger.warning('{func:s}: PRN {prn:s} has no corresponding NORAD entry'.format(prn=colored(prn, 'yellow'), func=cFuncName))
-            dNorads[prn] = ''
+    dt = pd.Timestamp.now() if date is None else pd.Timestamp(date)
+
+    # the assignments valid at date of all PRNs, per PRN the one with lowest priority
+    dfValid = dfNorad[(dfNorad['valid_from'] <= dt) & (dt < dfNorad['valid_to']) & dfNorad['PRN'].isin(prns)]
+    dfValid = dfValid.sort_values(by='priority', kind='mergesort').drop_duplicates(subset='PRN')
+    sr_norads = dfValid.set_index('PRN')['NORAD'].reindex(prns)
+
+    for prn in sr_norads.index[sr_norads.isna()]:
+        logger.warning('{func:s}: PRN {prn:s} has no corresponding NORAD entry'.format(prn=colored(prn, 'yellow'), func=cFuncName))
+
+    dNorads = sr_norads.fillna('').to_dict()
 
     logger.info('{func:s}: correponding PRN / NORAD numbers = {norad!s}'.format(norad=dNorads, func=cFuncName))
 
@@ -85,11 +211,11 @@ def find_norad_tle_yydoy(dNorads: dict,
     # reading the TLE per SV
     for prn, norad in dNorads.items():
         if norad != '':  # no TLE file available for this PRN
-            norad_tle_file = os.path.join(os.environ['HOME'], 'RxTURP/BEGPIOS/tle/cmb', 'sat{norad:s}.txt'.format(norad=norad[:-1]))
+            norad_tle_file = os.path.join(os.environ['HOME'], TLE_DIR, 'sat{norad:s}.txt'.format(norad=norad[:-1]))
             # logger.info('{func:s}: reading TLE file {name:s} for NORAD ID {norad:s} (PRN={prn:s})'.format(norad=colored(norad, 'green'), prn=colored(prn, 'green'), name=norad_tle_file, func=cFuncName))
 
             try:
-                df_tle_prn = pd.read_csv(norad_tle_file, header=None, delim_whitespace=True)
+                df_tle_prn, _ = read_tle_file(tle_file=norad_tle_file, mtime=os.stat(norad_tle_file).st_mtime_ns)
                 # amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=df_tle_prn, dfName='df_tle_prn')
 
                 # # look into rows with first column 1 (TLE Line 1) for date closest to YYDOY
@@ -134,8 +260,8 @@ def rise_set_yydoy(df_tle: pd.DataFrame,
 
     # load a time scale and set RMA as Topo
     # loader = sf.Loader(dir_tle, expire=True)  # loads the needed data files into the tle dir
-    ts = sf.load.timescale()
-    RMA = sf.Topos('50.8438 N', '4.3928 E')
+    ts = sf_timescale()
+    RMA = marker_topos()
     logger.info('{func:s}: Earth station RMA = {topo!s}'.format(topo=colored(RMA, 'green'), func=cFuncName))
 
     t0 = ts.utc(int(date_yydoy.strftime('%Y')), int(date_yydoy.strftime('%m')), int(date_yydoy.strftime('%d')))
@@ -185,15 +311,10 @@ def get_closests_tle(df: pd.DataFrame,
     df_sort = df.iloc[(df[col] - val).abs().argsort()[:1]]
     tle1_idx = df_sort.index.tolist()[0]
 
-    # read the 2 lines from the file
-    with open(norad_file) as fp:
-        for i, line in enumerate(fp):
-            if i == tle1_idx:
-                tle_line1 = line
-            elif i == tle1_idx + 1:
-                tle_line2 = line
-            elif i > tle1_idx + 1:
-                break
+    # take the 2 lines from the file
+    _, lst_lines = read_tle_file(tle_file=norad_file, mtime=os.stat(norad_file).st_mtime_ns)
+    tle_line1 = lst_lines[tle1_idx]
+    tle_line2 = lst_lines[tle1_idx + 1]
 
     logger.debug('{func:s}: found TLE1: {tle1!s}'.format(tle1=tle_line1[:-1], func=cFuncName))
     logger.debug('{func:s}: found TLE2: {tle2!s}'.format(tle2=tle_line2[:-1], func=cFuncName))
@@ -203,188 +324,3 @@ def get_closests_tle(df: pd.DataFrame,
 
 def take_closest(num: float, collection: list):
     return min(collection, key=lambda x: abs(x - num))
-
-
-def tle_rise_set_times(prn: int,
-                       df_tle: pd.DataFrame,
-                       marker: sf.Topos,
-                       t0_obs: sf.Time,
-                       t1_obs: sf.Time,
-                       elev_min: int,
-                       obs_int: float,
-                       logger: logging.Logger) -> Tuple[list, list, list, list]:
-    """
-    tle_rise_set_info calculates for a PRN based on TLEs the rise and set times and theoreticlal number of observations.
-    """
-    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
-
-    # create the to be returned lists
-    dt_tle_rise = []
-    dt_tle_set = []
-    dt_tle_cul = []
-    tle_arc_count = []
-
-    ts = sf.load.timescale()
-
-    # #DEBUG
-    # t0_obs = ts.utc(year=t0_obs.utc.year,
-    #                 month=t0_obs.utc.month,
-    #                 day=t0_obs.utc.day,
-    #                 hour=3,
-    #                 minute=27,
-    #                 second=30)
-    # t1_obs = ts.utc(year=t0_obs.utc.year,
-    #                 month=t0_obs.utc.month,
-    #                 day=t0_obs.utc.day,
-    #                 hour=21,
-    #                 minute=50,
-    #                 second=18)
-    # #DEBUG
-
-    day_t0 = ts.utc(year=t0_obs.utc.year,
-                    month=t0_obs.utc.month,
-                    day=t0_obs.utc.day,
-                    hour=0,
-                    minute=0,
-                    second=0)
-    # date_tomorrow = cur_date + timedelta(days=1)
-    # t1_obs = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-    day_t1 = ts.utc(year=t0_obs.utc.year,
-                    month=t0_obs.utc.month,
-                    day=t0_obs.utc.day,
-                    hour=23,
-                    minute=59,
-                    second=59)
-
-    # check with the TLEs what the theoretical rise / set times should be
-    try:
-        row = df_tle.index[df_tle['PRN'] == prn].tolist()[0]
-
-        # logger.info('{func:s}:    for NORAD {norad:s} ({prn:s})'.format(norad=colored(df_tle['NORAD'][row], 'green'),
-        #                                                                 prn=colored(prn, 'green'),
-        #                                                                 func=cFuncName))
-
-        # create a EarthSatellites from the TLE lines for this PRN
-        gnss_sv = EarthSatellite(df_tle['TLE1'][row], df_tle['TLE2'][row])
-        # logger.info('{func:s}:       created earth satellite {sat!s}'.format(sat=colored(gnss_sv, 'green'), func=cFuncName))
-
-        # find rise:set/cul times
-        t, events = gnss_sv.find_events(marker, day_t0, day_t1, altitude_degrees=elev_min)
-
-        # convert to t and events to a list
-        # print('{} {}'.format(t, type(t)))
-        t_events = [ti.utc_datetime().time().replace(microsecond=0) for ti in t]
-        id_events = events.tolist()
-        # print('t_events: {} {}'.format(t_events, type(t_events)))
-        # print('id_events: {} {}'.format(id_events, type(id_events)))
-
-        # if event does not start with a rise time, than set midnight as rise event and complte if needed with  culmination time set to NaN
-        if id_events[0] != 0:
-            if id_events[0] == 1:
-                id_events.insert(0, 0)
-                t_events.insert(0, day_t0.utc_datetime().time().replace(microsecond=0))
-            elif id_events[0] == 2:
-                id_events.insert(0, 1)
-                id_events.insert(0, 0)
-                t_events.insert(0, np.NaN)
-                t_events.insert(0, day_t0.utc_datetime().time().replace(microsecond=0))
-
-        # do the same and make sure we end the list with a set time
-        if id_events[-1] != 2:
-            if id_events[-1] == 1:
-                id_events.append(2)
-                t_events.append(day_t1.utc_datetime().time().replace(microsecond=0))
-            elif id_events[-1] == 0:
-                id_events.append(1)
-                id_events.append(2)
-                t_events.append(np.NaN)
-                t_events.append(day_t1.utc_datetime().time().replace(microsecond=0))
-
-        # print('id_events = {}'.format(id_events))
-        # print(' t_events = {}'.format(t_events))
-
-        for ti, event in zip(t, events):
-            name = ('rise above {cutoff:2d} degrees'.format(cutoff=elev_min),
-                    'culminate',
-                    'set below {cutoff:2d} degrees'.format(cutoff=elev_min))[event]
-            logger.info('{func:s}:         {jpl!s} -- {name!s}'.format(jpl=ti.utc_jpl(), name=name, func=cFuncName))
-
-        # check for start of observation to be between rise / set t_events times
-        for t_0, t_1 in zip(t_events[::3], t_events[2::3]):
-            print('t_0 = {}, t_1 = {}, t0_obs = {}, {} t1_obs = {}, {}'
-                  .format(t_0, t_1,
-                          t0_obs.utc_datetime().time(),
-                          amutils.is_between(t0_obs.utc_datetime().time(), [t_0, t_1]),
-                          t1_obs.utc_datetime().time(),
-                          amutils.is_between(t1_obs.utc_datetime().time(), [t_0, t_1])))
-
-            # 1. check when we have TRUE for bith observation start / end interval
-            obsstart_within = amutils.is_between(t0_obs.utc_datetime().time(), [t_0, t_1])
-            obsend_within = amutils.is_between(t1_obs.utc_datetime().time(), [t_0, t_1])
-
-            if obsstart_within and obsend_within:
-                # 2. check whether the observation interval is within a rise / set interval
-                dt_tle_rise.append(t0_obs.utc_datetime().time())
-                dt_tle_set.append(t1_obs.utc_datetime().time())
-
-            elif obsstart_within and not obsend_within:
-                # 3. start is within the interval, end is oafter the setting
-                dt_tle_rise.append(t0_obs.utc_datetime().time())
-                dt_tle_set.append(t_1)
-
-            elif not obsstart_within and obsend_within:
-                # 4. start is not within but end of obs is within
-                dt_tle_rise.append(t_0)
-                dt_tle_set.append(t1_obs.utc_datetime().time())
-
-            elif not obsstart_within and not obsend_within:
-                if t1_obs.utc_datetime().time() < t_0:
-                    pass
-                elif t0_obs.utc_datetime().time() > t_1:
-                    pass
-                else:
-                    dt_tle_rise.append(t_0)
-                    dt_tle_set.append(t_1)
-
-            elif (t_1 == t_events[-1]) and t1_obs.utc_datetime().time() > t_1:
-                # 5. end time of observation is behind the last TLE epoch
-                dt_tle_rise.append(max(t_0, t0_obs.utc_datetime().time()))
-                dt_tle_set.append(t_1)
-
-            # print('xxx dt_tle_rise = {}'.format(dt_tle_rise))
-            # print('xxx dt_tle_set = {}'.format(dt_tle_set))
-
-        # count the theoretical observations based on TLEs within observation interval
-        for tle_rise, tle_set in zip(dt_tle_rise, dt_tle_set):
-            # print('type tle_rise {!s}'.format(type(tle_rise)))
-            rise_sec = int(timedelta(hours=tle_rise.hour,
-                                     minutes=tle_rise.minute,
-                                     seconds=tle_rise.second).total_seconds())
-            set_sec = int(timedelta(hours=tle_set.hour,
-                                    minutes=tle_set.minute,
-                                    seconds=tle_set.second).total_seconds())
-
-            tle_arc_count.append((set_sec - rise_sec) / obs_int)
-
-        # print('xxx tle_arc_count = {}'.format(tle_arc_count))
-
-        # check whether the culmination points are somewhere in th eobservation interval
-        for dt_rise, dt_set in zip(dt_tle_rise, dt_tle_set):
-            dt_tle_cul.append(np.NaN)
-            for dt_cul in t_events[1::3]:
-                if not isinstance(dt_cul, float) and amutils.is_between(dt_cul, [dt_rise, dt_set]):
-                    dt_tle_cul[-1] = dt_cul
-
-        # print('xxx dt_tle_cul = {}'.format(dt_tle_cul))
-
-
-    except IndexError:
-        logger.info('{func:s}: No NORAD TLE file present for {prn:s}'.format(prn=colored(prn, 'red'), func=cFuncName))
-
-    # print('dt_tle_rise = {}'.format(dt_tle_rise))
-    # print('dt_tle_set = {}'.format(dt_tle_set))
-    # print('dt_tle_cul = {}'.format(dt_tle_cul))
-
-    # input('key press')
-
-    return dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count
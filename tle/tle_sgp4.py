@@ -0,0 +1,268 @@
+import sys
+import os
+import logging
+from termcolor import colored
+from datetime import datetime
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from sgp4.api import Satrec, SatrecArray, jday
+from skyfield import api as sf
+from skyfield.sgp4lib import theta_GMST1982
+
+from tle import tle_parser
+
+__author__ = 'amuls'
+
+SGP4_STEP = 60  # seconds between the epochs of the time grid on which the PRNs are propagated
+SGP4_BLOCK = 1440  # number of epochs propagated at once (limits the memory used for multi-day grids)
+SGP4_ITER = 4  # number of iterations refining the time of an elevation crossing
+WGS84_A = 6378.137  # semi-major axis of the WGS84 ellipsoid in km
+WGS84_F = 1 / 298.257223563  # flattening of the WGS84 ellipsoid
+
+
+def tle_satrec_array(df_tle: pd.DataFrame) -> Tuple[list, SatrecArray]:
+    """
+    tle_satrec_array creates the SGP4 satellite array for the PRNs in df_tle (as returned by find_norad_tle_yydoy)
+    """
+    lst_prns = df_tle['PRN'].tolist()
+    lst_satrecs = [Satrec.twoline2rv(tle1, tle2) for tle1, tle2 in zip(df_tle['TLE1'], df_tle['TLE2'])]
+
+    return lst_prns, SatrecArray(lst_satrecs)
+
+
+def marker_itrs(marker: sf.Topos) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    marker_itrs returns the ITRS position (km) of the marker and its local vertical (unit vector)
+    """
+    lat = marker.latitude.radians
+    lon = marker.longitude.radians
+    height = marker.elevation.km
+
+    e2 = WGS84_F * (2 - WGS84_F)
+    N = WGS84_A / np.sqrt(1 - e2 * np.sin(lat)**2)
+    xyz = np.array([(N + height) * np.cos(lat) * np.cos(lon),
+                    (N + height) * np.cos(lat) * np.sin(lon),
+                    (N * (1 - e2) + height) * np.sin(lat)])
+    up = np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+    return xyz, up
+
+
+def sgp4_elevation(satrecs: SatrecArray, DTG_start: datetime, secs: np.ndarray, marker: sf.Topos) -> np.ndarray:
+    """
+    sgp4_elevation propagates all satellites of satrecs at the epochs secs (seconds after DTG_start) and returns their elevation
+    angles (degrees, one row per satellite) as seen from marker. Failed propagations have elevation NaN
+    """
+    # SGP4 takes UTC julian dates, the rotation from TEME to ITRS the UT1 julian dates
+    jd0, fr0 = jday(DTG_start.year, DTG_start.month, DTG_start.day, DTG_start.hour, DTG_start.minute, DTG_start.second)
+    t = tle_parser.sf_timescale().utc(DTG_start.year, DTG_start.month, DTG_start.day, DTG_start.hour, DTG_start.minute,
+                                      DTG_start.second + secs)
+    theta, _ = theta_GMST1982(t.whole, t.ut1_fraction)
+
+    err, r, _ = satrecs.sgp4(np.full(secs.shape, jd0), fr0 + secs / 86400.)
+
+    # rotation around the z-axis from TEME to ITRS (polar motion neglected)
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    r_itrs = np.stack([cos_theta * r[..., 0] + sin_theta * r[..., 1],
+                       -sin_theta * r[..., 0] + cos_theta * r[..., 1],
+                       r[..., 2]], axis=-1)
+
+    xyz, up = marker_itrs(marker=marker)
+    rho = r_itrs - xyz
+    elev = np.degrees(np.arcsin(rho.dot(up) / np.linalg.norm(rho, axis=-1)))
+    elev[err != 0] = np.nan
+
+    return elev
+
+
+def sgp4_elevation_grid(satrecs: SatrecArray, DTG_start: datetime, DTG_end: datetime, step: float, marker: sf.Topos) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    sgp4_elevation_grid returns the epochs (seconds after DTG_start) of the time grid between DTG_start and DTG_end and the
+    elevation angles of all satellites at these epochs. The grid is propagated in blocks of SGP4_BLOCK epochs
+    """
+    secs = np.arange(0, (DTG_end - DTG_start).total_seconds() + step, step, dtype=float)
+    secs[-1] = min(secs[-1], (DTG_end - DTG_start).total_seconds())
+
+    elev = np.empty((len(satrecs), secs.size))
+    for i in range(0, secs.size, SGP4_BLOCK):
+        elev[:, i:i + SGP4_BLOCK] = sgp4_elevation(satrecs=satrecs, DTG_start=DTG_start, secs=secs[i:i + SGP4_BLOCK], marker=marker)
+
+    return secs, elev
+
+
+def crossings_refine(satrecs: SatrecArray,
+                     DTG_start: datetime,
+                     sat_idx: np.ndarray,
+                     sec_0: np.ndarray,
+                     sec_1: np.ndarray,
+                     f_0: np.ndarray,
+                     f_1: np.ndarray,
+                     elev_min: np.ndarray,
+                     marker: sf.Topos) -> np.ndarray:
+    """
+    crossings_refine determines for the satellites sat_idx the epochs of crossing elev_min (per crossing) within the brackets [sec_0, sec_1]
+    (with elevations above elev_min f_0 and f_1 of opposite sign) by regula falsi, all crossings being refined at once
+    """
+    sec_x = sec_0 - f_0 * (sec_1 - sec_0) / (f_1 - f_0)
+    for _ in range(SGP4_ITER):
+        if sec_x.size == 0:
+            break
+        # all satellites are propagated at the epochs of all crossings, keep for each crossing its own satellite
+        f_x = sgp4_elevation(satrecs=satrecs, DTG_start=DTG_start, secs=sec_x, marker=marker)[sat_idx, np.arange(sec_x.size)] - elev_min
+        same = np.sign(f_x) == np.sign(f_0)
+        sec_0, f_0 = np.where(same, sec_x, sec_0), np.where(same, f_x, f_0)
+        sec_1, f_1 = np.where(same, sec_1, sec_x), np.where(same, f_1, f_x)
+        sec_x = sec_0 - f_0 * (sec_1 - sec_0) / (f_1 - f_0)
+
+    return sec_x
+
+
+def elevation_crossings(satrecs: SatrecArray,
+                        DTG_start: datetime,
+                        secs: np.ndarray,
+                        elev: np.ndarray,
+                        lst_elevs: list,
+                        marker: sf.Topos) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    elevation_crossings detects the rises (0) and sets (2) above the elevation angles lst_elevs from the sign changes of the
+    elevation grid elev, the crossings of all elevation angles are refined together. Returns the satellite index, epoch (seconds
+    after DTG_start), event and elevation angle of the crossings
+    """
+    # failed propagations do not delimit a crossing
+    valid = ~np.isnan(elev[:, :-1]) & ~np.isnan(elev[:, 1:])
+
+    lst_sat, lst_epo, lst_elev = [], [], []
+    for elev_min in lst_elevs:
+        above = elev > elev_min
+        sat_idx, epo_idx = np.nonzero((above[:, :-1] != above[:, 1:]) & valid)
+        lst_sat.append(sat_idx)
+        lst_epo.append(epo_idx)
+        lst_elev.append(np.full(sat_idx.size, elev_min))
+
+    sat_idx, epo_idx, elev_x = np.concatenate(lst_sat), np.concatenate(lst_epo), np.concatenate(lst_elev)
+    f_0 = elev[sat_idx, epo_idx] - elev_x
+    sec_x = crossings_refine(satrecs=satrecs, DTG_start=DTG_start, sat_idx=sat_idx,
+                             sec_0=secs[epo_idx], sec_1=secs[epo_idx + 1], f_0=f_0, f_1=elev[sat_idx, epo_idx + 1] - elev_x,
+                             elev_min=elev_x, marker=marker)
+
+    return sat_idx, sec_x, np.where(f_0 > 0, 2, 0), elev_x
+
+
+def elevation_culminations(secs: np.ndarray, elev: np.ndarray, elev_min: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    elevation_culminations detects the maxima of the elevation grid elev above elev_min. Returns the satellite index, the epoch
+    and elevation of the top of the parabola through the 3 epochs around the maximum
+    """
+    d_elev = np.diff(elev, axis=1)
+    sat_idx, epo_idx = np.nonzero((d_elev[:, :-1] > 0) & (d_elev[:, 1:] <= 0) & (elev[:, 1:-1] > elev_min))
+
+    e_prev, e_cul, e_next = elev[sat_idx, epo_idx], elev[sat_idx, epo_idx + 1], elev[sat_idx, epo_idx + 2]
+    curv = e_prev - 2 * e_cul + e_next
+    offset = np.where(curv < 0, 0.5 * (e_prev - e_next) / np.where(curv < 0, curv, -1), 0)
+
+    sec_cul = secs[epo_idx + 1] + offset * (secs[epo_idx + 2] - secs[epo_idx + 1])
+    elev_cul = e_cul - 0.25 * (e_prev - e_next) * offset
+
+    return sat_idx, sec_cul, elev_cul
+
+
+def prns_events(df_tle: pd.DataFrame,
+                DTG_start: datetime,
+                DTG_end: datetime,
+                elev_min: float,
+                step: float = SGP4_STEP,
+                marker: sf.Topos = None,
+                logger: logging.Logger = None) -> pd.DataFrame:
+    """
+    prns_events determines for all PRNs in df_tle the rise (0), culmination (1) and set (2) events above elev_min between DTG_start
+    and DTG_end, numbered as by EarthSatellite.find_events, by propagating the PRNs together on a time grid. Returns the events
+    per PRN in time order (columns PRN, DATE_TIME, event, elevation). A PRN above elev_min at DTG_start has event -1 at DTG_start
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    if len(df_tle.index) == 0:
+        return pd.DataFrame(columns=['PRN', 'DATE_TIME', 'event', 'elevation'])
+
+    if marker is None:
+        marker = tle_parser.marker_topos()
+
+    lst_prns, satrecs = tle_satrec_array(df_tle=df_tle)
+    secs, elev = sgp4_elevation_grid(satrecs=satrecs, DTG_start=DTG_start, DTG_end=DTG_end, step=step, marker=marker)
+
+    sat_x, sec_x, events_x, _ = elevation_crossings(satrecs=satrecs, DTG_start=DTG_start, secs=secs, elev=elev, lst_elevs=[elev_min], marker=marker)
+    sat_cul, sec_cul, elev_cul = elevation_culminations(secs=secs, elev=elev, elev_min=elev_min)
+    sat_start = np.nonzero(elev[:, 0] > elev_min)[0]
+
+    sat_idx = np.concatenate([sat_start, sat_x, sat_cul])
+    sec_events = np.concatenate([np.zeros(sat_start.size), sec_x, sec_cul])
+    events = np.concatenate([np.full(sat_start.size, -1), events_x, np.ones(sat_cul.size, dtype=int)])
+    elev_events = np.concatenate([elev[sat_start, 0], np.full(sec_x.size, float(elev_min)), elev_cul])
+    order = np.lexsort((sec_events, events != -1, sat_idx))
+
+    df_events = pd.DataFrame({'PRN': np.array(lst_prns, dtype=object)[sat_idx[order]],
+                              'DATE_TIME': pd.Timestamp(DTG_start) + pd.to_timedelta(np.round(sec_events[order], 3), unit='s'),
+                              'event': events[order],
+                              'elevation': elev_events[order]})
+
+    if logger is not None:
+        logger.info('{func:s}: {events:d} events above {elev:.0f} degrees for {prns:d} PRNs ({epochs:d} epochs of {step:.0f} s)'
+                    .format(events=len(df_events.index), elev=elev_min, prns=len(lst_prns), epochs=secs.size, step=step, func=cFuncName))
+
+    return df_events
+
+
+def prns_crossings(df_tle: pd.DataFrame,
+                   DTG_start: datetime,
+                   DTG_end: datetime,
+                   lst_elevs: list,
+                   step: float = SGP4_STEP,
+                   marker: sf.Topos = None) -> pd.DataFrame:
+    """
+    prns_crossings determines for all PRNs in df_tle the times of rising above (0) and setting below (2) each of the elevation
+    angles lst_elevs from one propagation of the PRNs. Returns the crossings (columns PRN, DATE_TIME, event, elevation)
+    """
+    if len(df_tle.index) == 0:
+        return pd.DataFrame(columns=['PRN', 'DATE_TIME', 'event', 'elevation'])
+
+    if marker is None:
+        marker = tle_parser.marker_topos()
+
+    lst_prns, satrecs = tle_satrec_array(df_tle=df_tle)
+    secs, elev = sgp4_elevation_grid(satrecs=satrecs, DTG_start=DTG_start, DTG_end=DTG_end, step=step, marker=marker)
+
+    sat_x, sec_x, events_x, elev_x = elevation_crossings(satrecs=satrecs, DTG_start=DTG_start, secs=secs, elev=elev, lst_elevs=lst_elevs, marker=marker)
+
+    return pd.DataFrame({'PRN': np.array(lst_prns, dtype=object)[sat_x],
+                         'DATE_TIME': pd.Timestamp(DTG_start) + pd.to_timedelta(np.round(sec_x, 3), unit='s'),
+                         'event': events_x,
+                         'elevation': elev_x})
+
+
+def prns_arcs(df_events: pd.DataFrame, DTG_end: datetime) -> pd.DataFrame:
+    """
+    prns_arcs creates the table of visibility arcs (columns PRN, rise, cul, set, elevation) from the events of prns_events. An arc
+    which has not set at DTG_end ends at DTG_end, the culmination of an arc is its highest culmination (NaT if none)
+    """
+    lst_arcs = []
+    for prn, df_prn in df_events.groupby('PRN', sort=False):
+        events = df_prn['event'].to_numpy()
+        dts = df_prn['DATE_TIME'].to_numpy()
+        elevs = df_prn['elevation'].to_numpy()
+
+        rises = dts[events <= 0]
+        sets = dts[events == 2]
+        if len(rises) > len(sets):
+            sets = np.append(sets, np.datetime64(DTG_end))
+
+        is_cul = events == 1
+        for rise, set_ in zip(rises, sets):
+            in_arc = np.nonzero(is_cul & (dts >= rise) & (dts <= set_))[0]
+            if in_arc.size > 0:
+                top = in_arc[np.argmax(elevs[in_arc])]
+                lst_arcs.append([prn, rise, dts[top], set_, elevs[top]])
+            else:
+                lst_arcs.append([prn, rise, np.datetime64('NaT'), set_, np.nan])
+
+    return pd.DataFrame(lst_arcs, columns=['PRN', 'rise', 'cul', 'set', 'elevation'])
@@ -2,27 +2,27 @@ import sys
 import os
 import logging
 from termcolor import colored
-from datetime import datetime
-from skyfield.api import EarthSatellite
-from skyfield import api as sf
-import pandas as pd
+from datetime import datetime, timedelta, time
 import numpy as np
+import pandas as pd
 from typing import Tuple
 
-from tle import tle_parser
-from ampyutils import amutils
+from tle import tle_parser, tle_sgp4
+from ampyutils import amutils, am_profile, am_intervals
 
 __author__ = 'amuls'
 
 
+@am_profile.profile_func(rows_arg='prn_lst')
 def PRNs_visibility(prn_lst: list,
                     DTG_start: datetime,
                     DTG_end: datetime,
                     interval: float,
                     cutoff: int = 5,
-                    logger: logging.Logger = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+                    logger: logging.Logger = None) -> Tuple[pd.DataFrame, pd.DataFrame, tuple]:
     """
-    PRNs_visibility determines the visibilty info for list of PRNs passed
+    PRNs_visibility determines the visibilty info for list of PRNs passed. Returns the TLEs, the rise / set / culmination times
+    and number of observations per arc and PRN, and the TLE arcs as set of intervals (see am_intervals) keyed by index in prn_lst
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
@@ -37,14 +37,13 @@ def PRNs_visibility(prn_lst: list,
     amutils.logHeadTailDataFrame(logger=logger, callerName=cFuncName, df=dfNORAD, dfName='dfNORAD')
 
     # get the corresponding NORAD nrs for the given PRNs
-    dNORADs = tle_parser.get_norad_numbers(prns=prn_lst, dfNorad=dfNORAD, logger=logger)
+    dNORADs = tle_parser.get_norad_numbers(prns=prn_lst, dfNorad=dfNORAD, logger=logger, date=DTG_start)
     if logger is not None:
         logger.info('{func:s}: corresponding NORAD nrs (#{count:d}):'.format(count=len(dNORADs), func=cFuncName))
 
-    # load a time scale and set RMA as Topo
+    # set RMA as Topo
     # loader = sf.Loader(dir_tle, expire=True)  # loads the needed data files into the tle dir
-    ts = sf.load.timescale()
-    RMA = sf.Topos('50.8438 N', '4.3928 E')
+    RMA = tle_parser.marker_topos()
     if logger is not None:
         logger.info('{func:s}: Earth station RMA @ {topo!s}'.format(topo=colored(RMA, 'green'), func=cFuncName))
         # get the datetime that corresponds to yydoy
@@ -55,54 +54,31 @@ def PRNs_visibility(prn_lst: list,
                             DTGend=DTG_end.strftime('%Y/%m/%d %H:%M:%S'),
                             func=cFuncName))
 
-    # print(DTG_start.strftime('%Y/%m/%d %H:%M:%S'))
-    # print(DTG_end.strftime('%Y/%m/%d %H:%M:%S'))
-    tobs_0 = ts.utc(year=int(DTG_start.strftime('%Y')),
-                    month=int(DTG_start.strftime('%m')),
-                    day=int(DTG_start.strftime('%d')),
-                    hour=int(DTG_start.strftime('%H')),
-                    minute=int(DTG_start.strftime('%M')),
-                    second=int(DTG_start.strftime('%S')))
-    # date_tomorrow = cur_date + timedelta(days=1)
-    # t1 = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-    tobs_1 = ts.utc(year=int(DTG_end.strftime('%Y')),
-                    month=int(DTG_end.strftime('%m')),
-                    day=int(DTG_end.strftime('%d')),
-                    hour=int(DTG_end.strftime('%H')),
-                    minute=int(DTG_end.strftime('%M')),
-                    second=int(DTG_end.strftime('%S')))
-
-    # print('tobs_0 = {}'.format(tobs_0))
-    # print('tobs_1 = {}'.format(tobs_1))
-
     # find corresponding TLE record for NORAD nrs
     df_tles = tle_parser.find_norad_tle_yydoy(dNorads=dNORADs, yydoy=DTG_start.strftime('%y%j'), logger=logger)
 
-    # list of rise / set times by observation / TLEs
-    lst_obs_rise = []
-
-    # find in observations and by TLEs what the riuse/set times are and number of observations
-    for prn in prn_lst:
-        # print('-' * 25)
-        # print(prn)
-        # find rise:set times using TLEs
-        dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count = \
-            tle_parser.tle_rise_set_times(prn=prn,
-                                          df_tle=df_tles,
-                                          marker=RMA,
-                                          t0_obs=tobs_0,
-                                          t1_obs=tobs_1,
-                                          elev_min=cutoff,
-                                          obs_int=1,
-                                          logger=logger)
-
-        # add to list for creating dataframe
-        lst_obs_rise.append([dt_tle_rise, dt_tle_set, dt_tle_cul, tle_arc_count])
-
-    # test to import in dataframe
-    df_rise_set_tmp = pd.DataFrame(lst_obs_rise,
-                                   columns=['tle_rise', 'tle_set', 'tle_cul', 'tle_arc_count'],
-                                   index=prn_lst)
+    # rise / culmination / set events of the observation days for all PRNs by one propagation
+    df_events = tle_sgp4.prns_events(df_tle=df_tles,
+                                     DTG_start=datetime.combine(DTG_start.date(), time()),
+                                     DTG_end=datetime.combine(DTG_end.date(), time()) + timedelta(days=1, seconds=-1),
+                                     elev_min=cutoff,
+                                     marker=RMA,
+                                     logger=logger)
+
+    # the TLE arcs of the PRNs within the observation interval
+    ivTLE = tle_visible_intervals(df_events=df_events, lst_prns=prn_lst, DTG_start=DTG_start, DTG_end=DTG_end)
+    if logger is not None:
+        df_log = df_events[df_events['event'] >= 0]
+        for prn, dt_event, event in zip(df_log['PRN'], df_log['DATE_TIME'], df_log['event']):
+            name = ('rise above {cutoff:2d} degrees'.format(cutoff=cutoff),
+                    'culminate',
+                    'set below {cutoff:2d} degrees'.format(cutoff=cutoff))[event]
+            logger.info('{func:s}:         {prn:s} {dt:s} UTC -- {name!s}'.format(prn=prn, dt=dt_event.strftime('%Y-%m-%d %H:%M:%S.%f')[:-2], name=name, func=cFuncName))
+        logger.info('{func:s}: {arcs:d} TLE arcs of {prns:d} PRNs within the observation interval'
+                    .format(arcs=ivTLE[0].size, prns=len(prn_lst), func=cFuncName))
+
+    # rise / set / culmination times and theoretical number of observations per TLE arc
+    df_rise_set_tmp = tle_visibility_table(ivTLE=ivTLE, df_events=df_events, lst_prns=prn_lst, obs_int=1)
 
     # sys.exit(56)
     print('df_tles = \n{}'.format(df_tles))
@@ -111,9 +87,96 @@ def PRNs_visibility(prn_lst: list,
     print('df_rise_set_tmp = \n{}'.format(df_rise_set_tmp))
     print('type(df_rise_set_tmp) = \n{}'.format(type(df_rise_set_tmp)))
 
-    return df_tles, df_rise_set_tmp
+    return df_tles, df_rise_set_tmp, ivTLE
 
 
+def tle_visible_intervals(df_events: pd.DataFrame,
+                          lst_prns: list,
+                          DTG_start: datetime,
+                          DTG_end: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    tle_visible_intervals creates from the events of tle_sgp4.prns_events the arcs of the PRNs in lst_prns within DTG_start
+    and DTG_end as set of intervals keyed by the index of the PRN in lst_prns. The events must cover the observation interval
+    """
+    t_start = am_intervals.iv_seconds(DTG_start)
+    t_end = am_intervals.iv_seconds(DTG_end)
+
+    # rise (the start of the events counts as rise for a PRN above the cutoff) and set events per PRN in time order
+    df_rs = df_events[df_events['event'] != 1]
+    keys = pd.Index(lst_prns).get_indexer(df_rs['PRN'])
+    secs = am_intervals.iv_seconds(df_rs['DATE_TIME'])
+    is_rise = df_rs['event'].to_numpy() <= 0
+    keys, secs, is_rise = keys[keys >= 0], secs[keys >= 0], is_rise[keys >= 0]
+    order = np.lexsort((secs, keys))
+    keys, secs, is_rise = keys[order], secs[order], is_rise[order]
+
+    # a rise is closed by the following set of the PRN, an arc not closed ends after the observation interval
+    closed = np.r_[(keys[1:] == keys[:-1]) & ~is_rise[1:], False]
+    rise_ends = np.where(closed, np.r_[secs[1:], t_end], t_end)
+    # a set not preceded by a rise of the PRN closes an arc started before the observation interval
+    opened = np.r_[False, (keys[1:] == keys[:-1]) & is_rise[:-1]]
+    set_first = ~is_rise & ~opened
+
+    ivArcs = am_intervals.iv_normalise(keys=np.concatenate([keys[is_rise], keys[set_first]]),
+                                       starts=np.concatenate([secs[is_rise], np.full(np.count_nonzero(set_first), t_start)]),
+                                       ends=np.concatenate([rise_ends[is_rise], secs[set_first]]))
+
+    return am_intervals.iv_clip(iv=ivArcs, start=t_start, end=t_end)
+
+
+def tle_visibility_table(ivTLE: tuple,
+                         df_events: pd.DataFrame,
+                         lst_prns: list,
+                         obs_int: float) -> pd.DataFrame:
+    """
+    tle_visibility_table creates per PRN the lists of rise, set and culmination times (datetime.time, NaN for an arc without
+    culmination) and the theoretical number of observations at obs_int of the TLE arcs ivTLE of the PRNs in lst_prns
+    """
+    # the latest culmination within each arc
+    df_cul = df_events[df_events['event'] == 1]
+    secs_cul = am_intervals.iv_seconds(df_cul['DATE_TIME'])
+    idx_arcs = am_intervals.iv_locate(iv=ivTLE, keys=pd.Index(lst_prns).get_indexer(df_cul['PRN']), secs=secs_cul)
+    arc_cul = np.full(ivTLE[0].size, -1, dtype=np.int64)
+    np.maximum.at(arc_cul, idx_arcs[idx_arcs >= 0], secs_cul[idx_arcs >= 0])
+
+    lst_rise = [dt.time() for dt in am_intervals.iv_datetimes(ivTLE[1]).tolist()]
+    lst_set = [dt.time() for dt in am_intervals.iv_datetimes(ivTLE[2]).tolist()]
+    lst_cul = [np.NaN if sec < 0 else dt.time() for sec, dt in zip(arc_cul, am_intervals.iv_datetimes(arc_cul).tolist())]
+    lst_count = ((ivTLE[2] - ivTLE[1]) / obs_int).tolist()
+
+    # split the arcs per PRN
+    idx_prns = np.cumsum(am_intervals.iv_count(iv=ivTLE, nr_keys=len(lst_prns)))[:-1]
+    lst_prn_arcs = []
+    for lst_arcs in (lst_rise, lst_set, lst_cul, lst_count):
+        lst_prn_arcs.append([lst_arcs[idx_0:idx_1] for idx_0, idx_1 in zip(np.r_[0, idx_prns], np.r_[idx_prns, len(lst_arcs)])])
+
+    return pd.DataFrame(dict(zip(['tle_rise', 'tle_set', 'tle_cul', 'tle_arc_count'], lst_prn_arcs)), index=lst_prns)
+
+
+def prns_coverage(ivTLE: tuple,
+                  ivObs: tuple,
+                  lst_prns: list) -> pd.DataFrame:
+    """
+    prns_coverage compares per PRN in lst_prns the TLE arcs ivTLE with the observed arcs ivObs. Returns per PRN the number and
+    duration (s) of the TLE, observed and missed arcs (visible by TLE but not observed), the duration observed outside the
+    TLE arcs and the completeness (percentage of the TLE arcs observed)
+    """
+    ivMissed = am_intervals.iv_difference(iv_a=ivTLE, iv_b=ivObs)
+    ivExtra = am_intervals.iv_difference(iv_a=ivObs, iv_b=ivTLE)
+
+    dfCoverage = pd.DataFrame(index=pd.Index(lst_prns, name='PRN'))
+    for name, iv in (('tle', ivTLE), ('obs', ivObs), ('missed', ivMissed)):
+        dfCoverage['{name:s}_arcs'.format(name=name)] = am_intervals.iv_count(iv=iv, nr_keys=len(lst_prns))
+        dfCoverage['{name:s}_secs'.format(name=name)] = am_intervals.iv_duration(iv=iv, nr_keys=len(lst_prns))
+    dfCoverage['extra_secs'] = am_intervals.iv_duration(iv=ivExtra, nr_keys=len(lst_prns))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dfCoverage['completeness'] = np.round(100 * (1 - dfCoverage['missed_secs'] / dfCoverage['tle_secs']), 1)
+
+    return dfCoverage
+
+
+@am_profile.profile_func()
 def prn_elevation(prn: str,
                   df_tle_prn: pd.DataFrame,
                   elev_step: int,
@@ -127,100 +190,31 @@ def prn_elevation(prn: str,
 
     # print('df_tle_prn = \n{}'.format(df_tle_prn))
 
-    # load a time scale and set RMA as Topo
-    # loader = sf.Loader(dir_tle, expire=True)  # loads the needed data files into the tle dir
-    ts = sf.load.timescale()
-    RMA = sf.Topos('50.8438 N', '4.3928 E')
+    # set RMA as Topo
+    RMA = tle_parser.marker_topos()
     if logger is not None:
         logger.info('{func:s}: Earth station RMA @ {topo!s}'.format(topo=colored(RMA, 'green'), func=cFuncName))
-        # get the datetime that corresponds to yydoy
 
-    t0 = ts.utc(year=int(DTG_start.strftime('%Y')),
-                month=int(DTG_start.strftime('%m')),
-                day=int(DTG_start.strftime('%d')),
-                hour=int(DTG_start.strftime('%H')),
-                minute=int(DTG_start.strftime('%M')),
-                second=int(DTG_start.strftime('%S')))
-    # date_tomorrow = cur_date + timedelta(days=1)
-    # t1 = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-    t1 = ts.utc(year=int(DTG_end.strftime('%Y')),
-                month=int(DTG_end.strftime('%m')),
-                day=int(DTG_end.strftime('%d')),
-                hour=int(DTG_end.strftime('%H')),
-                minute=int(DTG_end.strftime('%M')),
-                second=int(DTG_end.strftime('%S')))
-
-    elev_t0 = ts.utc(year=int(DTG_start.strftime('%Y')),
-                     month=int(DTG_start.strftime('%m')),
-                     day=int(DTG_start.strftime('%d')),
-                     hour=0,
-                     minute=0,
-                     second=0)
-    # date_tomorrow = cur_date + timedelta(days=1)
-    # t1 = ts.utc(int(date_tomorrow.strftime('%Y')), int(date_tomorrow.strftime('%m')), int(date_tomorrow.strftime('%d')))
-    elev_t1 = ts.utc(year=int(DTG_end.strftime('%Y')),
-                     month=int(DTG_end.strftime('%m')),
-                     day=int(DTG_end.strftime('%d')),
-                     hour=23,
-                     minute=59,
-                     second=59)
-
-    # print('elev_t0 = {}'.format(elev_t0))
-    # print('elev_t1 = {}'.format(elev_t1))
-
-    # create a EarthSatellites from the TLE lines for this PRN
+    elev_t0 = datetime.combine(DTG_start.date(), time())
+    elev_t1 = datetime.combine(DTG_end.date(), time()) + timedelta(days=1, seconds=-1)
+
     if len(df_tle_prn.index) != 0:
-        gnss_sv = EarthSatellite(df_tle_prn.iloc[0]['TLE1'], df_tle_prn.iloc[0]['TLE2'])
-        # print('gnss_sv = {}'.format(gnss_sv))
-
-        # keep list of events for elevation
-        data_elev = []
-
-        for elev in range(0, 90, elev_step):
-            ti, elev_events = gnss_sv.find_events(RMA, elev_t0, elev_t1, altitude_degrees=elev)
-            # print('{}: {} {} {}'.format(elev, elev_events, elev_events.size, type(elev_events)))
-            if elev_events.size > 0 and (0 in elev_events or 2 in elev_events):
-                # print('HERE {} @ {} elev_events {}: \n{}'.format(prn, elev, elev_events, ti.utc_datetime()))
-
-                # find the times for rising above elev angle
-                idx_rises = np.where(elev_events == 0)
-                # print('idx_rises = {}'.format(idx_rises))
-                for idx_rise in idx_rises[0]:
-                    # print('idx_rise = {}'.format(idx_rise))
-                    # t_rise = ti[idx_rise].utc_datetime()
-                    t_rise = ti[idx_rise].utc_datetime().time().replace(microsecond=0)
-                    # print('t_rise = {}'.format(t_rise))
-
-                    # if in observation interval, add to df_PRNelev
-                    if t0.utc_datetime().time() <= t_rise <= t1.utc_datetime().time():
-                        # print('t_rise of PRN {} above {} degrees at {}'.format(prn, elev, t_rise))
-                        data_elev.append([datetime.combine(DTG_start.date(), t_rise), elev])
-
-                # find the times for rising above elev angle
-                idx_sets = np.where(elev_events == 2)
-                # print('idx_sets = {}'.format(idx_sets))
-                for idx_set in idx_sets[0]:
-                    # print('idx_set = {}'.format(idx_set))
-                    # t_set = ti[idx_set].utc_datetime()
-                    t_set = ti[idx_set].utc_datetime().time().replace(microsecond=0)
-                    # print('t_set = {}'.format(t_set))
-
-                    if t0.utc_datetime().time() <= t_set <= t1.utc_datetime().time():
-                        # print('t_set of PRN {} below {} degrees at {}'.format(prn, elev, t_set))
-                        data_elev.append([datetime.combine(DTG_start.date(), t_set), elev])
-
-            # svrise, svset, svcul, tle_count = tle_parser.tle_rise_set_times(prn=prn,
-            #                                                                 df_tle=df_tles,
-            #                                                                 marker=RMA,
-            #                                                                 t0=t0,
-            #                                                                 t1=t1,
-            #                                                                 elev_min=elev,
-            #                                                                 obs_int=1,
-            #                                                                 logger=logger)
-            # print('this {} @ {}: {} {} {}'.format(prn, elev, svrise, svcul, svset))
+        # times at which the PRN rises above / sets below each elevation angle, by one propagation over the days
+        df_cross = tle_sgp4.prns_crossings(df_tle=df_tle_prn.iloc[:1],
+                                           DTG_start=elev_t0,
+                                           DTG_end=elev_t1,
+                                           lst_elevs=list(range(0, 90, elev_step)),
+                                           marker=RMA)
+        df_cross = df_cross.sort_values(by=['elevation', 'event'], kind='mergesort')
+
+        # keep the times (to the second) within the observation interval
+        tod_cross = df_cross['DATE_TIME'].dt.floor('s') - df_cross['DATE_TIME'].dt.normalize()
+        in_obs = (tod_cross >= DTG_start - datetime.combine(DTG_start.date(), time())) & \
+                 (tod_cross <= DTG_end - datetime.combine(DTG_end.date(), time()))
 
         # create dataframe containing the DATE_TIME at which time a elevation angle is reached
-        df_PRNelev = pd.DataFrame(data_elev, columns=['DATE_TIME', 'elevation'])
+        df_PRNelev = pd.DataFrame({'DATE_TIME': pd.Timestamp(DTG_start.date()) + tod_cross[in_obs],
+                                   'elevation': df_cross['elevation'][in_obs]}).reset_index(drop=True)
 
     else:  # create empty dataframe
         df_PRNelev = pd.DataFrame(columns=['DATE_TIME', 'elevation'])
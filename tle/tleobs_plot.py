@@ -8,16 +8,21 @@ import logging
 import datetime as dt
 from matplotlib import dates
 from typing import Tuple
-from matplotlib.ticker import MultipleLocator, MaxNLocator
+from matplotlib.ticker import MultipleLocator, MaxNLocator, FixedLocator
 from math import ceil, floor
 
-from ampyutils import amutils
+from ampyutils import amutils, am_profile
 from plot import plot_utils
 from gfzrnx import gfzrnx_constants as gco
 
 __author__ = 'amuls'
 
+# layout of the plot with the PRN arcs, its availability matrix has a row per PRN number and a column per pixel
+ARCS_FIGSIZE = (12.0, 8.0)
+ARCS_MAX_PRN = 36
 
+
+@am_profile.profile_func()
 def tle_plot_arcs(marker: str,
                   obsf: str,
                   lst_PRNs: list,
@@ -144,6 +149,7 @@ def tle_plot_arcs(marker: str,
         logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(plt_name, 'green')))
 
 
+@am_profile.profile_func()
 def obstle_plot_obscount(marker: str,
                          obsf: str,
                          dfObsTle: pd.DataFrame,
@@ -160,7 +166,7 @@ def obstle_plot_obscount(marker: str,
     fig, ax = plt.subplots(figsize=(8, 6))
 
     gnss_id = dfObsTle.PRN.iloc[0][0]
-    y_prns = [int(prn[1:]) for prn in dfObsTle.PRN.to_list()]
+    y_prns = dfObsTle.PRN.str[1:].astype(int).to_numpy()
 
     # select the columns used for plotting
     col_names = dfObsTle.columns.tolist()
@@ -172,23 +178,14 @@ def obstle_plot_obscount(marker: str,
     # create colormap with nrcolors discrete colors
     bar_colors, title_font = amutils.create_colormap_font(nrcolors=len(obstypes), font_size=12)
 
-    # plot the TLE observation count
-    for i, (y_prn, prn) in enumerate(zip(y_prns, dfObsTle.PRN)):
-        for j, (obst, dy_obst, bar_color) in enumerate(zip(list(reversed(obstypes)),
-                                                           list(reversed(dy_obstypes)),
-                                                           list(reversed(bar_colors)))):
-            prn_width = dfObsTle.iloc[i][obst]
-            if i == 0:
-                ax.barh(y=y_prn + dy_obst,
-                        width=prn_width,
-                        height=bar_width,
-                        color=bar_color,
-                        label=obst)
-            else:
-                ax.barh(y=y_prn + dy_obst,
-                        width=prn_width,
-                        height=bar_width,
-                        color=bar_color)
+    # PRN x observable matrix of the observation counts, the bars of all PRNs for an observable are drawn at once
+    mObsCount = dfObsTle[obstypes].to_numpy()
+    for j, dy_obst, bar_color in zip(reversed(range(len(obstypes))), reversed(dy_obstypes), reversed(bar_colors)):
+        ax.barh(y=y_prns + dy_obst,
+                width=mObsCount[:, j],
+                height=bar_width,
+                color=bar_color,
+                label=obstypes[j])
 
     # beautify plot
     ax.xaxis.grid(b=True, which='major')
@@ -210,15 +207,16 @@ def obstle_plot_obscount(marker: str,
     # setticks on Y axis to represent the PRNs
     _, xlim_right = ax.get_xlim()
     ylim_left, ylim_right = ax.get_ylim()
-    for i in np.arange(int(ylim_left), int(ylim_right)):
-        if i % 2 == 0:
-            ax.barh(y=i, height=1, width=xlim_right, color='black', alpha=0.1)
+    y_bands = np.arange(int(ylim_left), int(ylim_right))
+    y_bands = y_bands[y_bands % 2 == 0]
+    ax.barh(y=y_bands, height=1, width=xlim_right, color='black', alpha=0.1)
 
     ax.yaxis.set_ticks(np.arange(1, y_prns[-1] + 1))
+    set_prns = set(dfObsTle.PRN)
     tick_labels = []
     for i in np.arange(1, y_prns[-1] + 1):
         tick_prn = '{gnss:s}{prn:02d}'.format(gnss=gnss_id, prn=i)
-        if tick_prn in dfObsTle.PRN.to_list():
+        if tick_prn in set_prns:
             tick_labels.append(tick_prn)
         else:
             tick_labels.append('')
@@ -268,10 +266,10 @@ def bars_info(nr_arcs: int,
     # print('dx_obs = {}'.format(dx_obs))
     # print('width_arc = {}'.format(width_arc))
 
-
     return dx_obs, width_arc
 
 
+@am_profile.profile_func()
 def obstle_plot_relative(marker: str,
                          obsf: str,
                          dfObsTle: pd.DataFrame,
@@ -288,7 +286,7 @@ def obstle_plot_relative(marker: str,
     fig, ax = plt.subplots(figsize=(8, 6))
 
     gnss_id = dfObsTle.PRN.iloc[0][0]
-    x_prns = [int(prn[1:]) for prn in dfObsTle.PRN.to_list()]
+    x_prns = dfObsTle.PRN.str[1:].astype(int).to_numpy()
     x_crds = np.arange(1, 38)
 
     # select the columns used for plotting
@@ -297,58 +295,23 @@ def obstle_plot_relative(marker: str,
 
     # create colormap with nrcolors discrete colors
     colors, title_font = amutils.create_colormap_font(nrcolors=len(obstypes[:-1]), font_size=12)
-    # used markers
-    lst_markers = ['o', 'v', '^', '<', '>', 'x', '+', 's', 'd', '.', ',']
 
     # create an offset to plot the markers per PRN
-    # print('obstypes[:-1] = {}'.format(obstypes[:-1]))
-    # print('len(obstypes[:-1]) = {}'.format(len(obstypes[:-1])))
     dx_obs, dx_width = bars_info(nr_arcs=len(obstypes[:-1]), logger=logger)
-    # print('dx_obs = {}'.format(dx_obs))
-    # print('dx_width = {}'.format(dx_width))
-    # print('x_prns = {}'.format(x_prns))
-
-    # store the percantages in a dict
-    for j, (obst, color, plotmarker) in enumerate(zip(list(reversed(obstypes[:-1])), list(reversed(colors)), lst_markers)):
-        obs_percentages = [np.NaN] * 37
-
-        # print('j = {}'.format(j))
-        # print('dx_width = {}'.format(dx_width))
-
-        for i, (x_prn, prn) in enumerate(zip(x_prns, dfObsTle.PRN)):
-            tle_maxobs = dfObsTle.iloc[i][obstypes[-1]] / 100
-            if tle_maxobs != 0:
-                obs_perc = dfObsTle.iloc[i][obst] / tle_maxobs
-                obs_percentages[x_prn] = obs_perc
-            else:
-                obs_percentages[x_prn] = np.NaN
-
-            # print('\nj = {}'.format(j))
-            # print('prn = {}'.format(prn))
-            # print('x_prn = {}'.format(x_prn))
-            # print('dx_width = {}'.format(dx_width))
-            # print('dx_obs[j] = {}'.format(dx_obs[j]))
-            # print('x_prn + dx_obs[j] = {}'.format(x_prn + dx_obs[j]))
-            # print('x_prn + dx_obs[j]  + j * dx_width / len(dx_obs) = {}'.format(x_prn + dx_obs[j] + j * dx_width / len(dx_obs)))
-            # print('x_prn + dx_obs[j] * j + j * dx_width / len(dx_obs) = {}'.format(x_prn + dx_obs[j] * j + j * dx_width / len(dx_obs)))
-            # print('x_prn + dx_obs[j] + j * dx_width = {}'.format(x_prn + dx_obs[j] + j * dx_width))
-            # print('x_prn + dx_obs[j] = {}'.format(x_prn + dx_obs[j]))
-
-            # plot the current percentages per PRN and per OBST
-            if i == 0:
-                ax.bar(x=x_prn + dx_obs[j],
-                       height=obs_perc,
-                       width=dx_width,
-                       color=color,
-                       label=obst,
-                       align='center')
-            else:
-                ax.bar(x=x_prn + dx_obs[j],
-                       height=obs_perc,
-                       width=dx_width,
-                       color=color,
-                       align='center')
 
+    # PRN x observable matrix of the percentages observed wrt the TLE count (last column), NaN where TLE gives no observations
+    tle_maxobs = dfObsTle[obstypes[-1]].to_numpy(dtype=float) / 100
+    tle_maxobs[tle_maxobs == 0] = np.NaN
+    mObsPerc = dfObsTle[obstypes[:-1]].to_numpy(dtype=float) / tle_maxobs[:, np.newaxis]
+
+    # plot the percentages of all PRNs per OBST at once
+    for j, (k, color) in enumerate(zip(reversed(range(len(obstypes[:-1]))), reversed(colors))):
+        ax.bar(x=x_prns + dx_obs[j],
+               height=mObsPerc[:, k],
+               width=dx_width,
+               color=color,
+               label=obstypes[k],
+               align='center')
 
     # beautify plot
     ax.xaxis.grid(b=False)
@@ -374,16 +337,14 @@ def obstle_plot_relative(marker: str,
     # setticks on X axis to represent the PRNs
     # print('\nx_crds[-1] = {}'.format(x_crds[-1]))
     ax.xaxis.set_ticks(np.arange(0, x_crds[-1]))
+    # create a grey bar for separating between PRNs
+    ax.bar(np.arange(0, x_crds[-1], 2), 100, width=1, color='black', alpha=0.05)
+
+    set_prns = set(dfObsTle.PRN)
     tick_labels = []
     for i in np.arange(0, x_crds[-1]):
-        # create a grey bar for separating between PRNs
-        if i % 2 == 0:
-            ax.bar(i, 100, width=1, color='black', alpha=0.05)
-
         tick_prn = '{gnss:s}{prn:02d}'.format(gnss=gnss_id, prn=i)
-        # print('tick_prn[{}] = {}'.format(i, tick_prn))
-
-        if tick_prn in dfObsTle.PRN.to_list():
+        if tick_prn in set_prns:
             tick_labels.append(tick_prn)
         else:
             tick_labels.append('')
@@ -406,6 +367,7 @@ def obstle_plot_relative(marker: str,
     return plt_name
 
 
+@am_profile.profile_func()
 def obstle_plot_arcs_prns(marker: str,
                           obsf: str,
                           dTime: dict,
@@ -413,10 +375,12 @@ def obstle_plot_arcs_prns(marker: str,
                           lst_PRNs: list,
                           dfNavSig: pd.DataFrame,
                           dfTleVis: pd.DataFrame,
+                          obs_cnt: np.ndarray = None,
                           show_plot: bool = False,
                           logger: logging.Logger = None) -> str:
     """
-    obstle_plot_arcs_prns plots the arcs caclculated by TLE for the GNSS and selected PRNs
+    obstle_plot_arcs_prns plots the arcs caclculated by TLE for the GNSS and selected PRNs. The observation counts per PRN and
+    pixel column (see plot_utils.availability_counts) are taken from obs_cnt when given instead of counted from dfNavSig
     """
     cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
 
@@ -428,11 +392,11 @@ def obstle_plot_arcs_prns(marker: str,
     amutils.logHeadTailDataFrame(df=dfTleVis, dfName='dfTleVis', callerName=cFuncName, logger=logger)
 
     # create colormap with 36 discrete colors
-    max_prn = 36
+    max_prn = ARCS_MAX_PRN
     prn_colors, title_font = amutils.create_colormap_font(nrcolors=max_prn, font_size=12)
 
     # subplots
-    fig, ax = plt.subplots(figsize=(12.0, 8.0))
+    fig, ax = plt.subplots(figsize=ARCS_FIGSIZE)
     # print('dTime = {}'.format(dTime))
     fig.suptitle('{marker:s} - {navs:s} - {date:s} ({yy:04d}/{doy:03d} - Obs vs TLE)'.format(
                  marker=marker,
@@ -440,48 +404,52 @@ def obstle_plot_arcs_prns(marker: str,
                  navs=navsig_name,
                  yy=dTime['YYYY'],
                  doy=dTime['DOY']),
-                 fontdict=title_font,
-                 fontsize=18)
+                 fontdict={**title_font, 'size': 18})
 
     # PLOT PRN ARCS FROM OBSERVED AND TLE
+    # the observed and TLE visible epochs per PRN are rasterised in a PRN x time matrix drawn as a single image
+    lst_visible = []
+    dt_cul = []
+    y_cul = []
     for prn in lst_PRNs:
         y_prn = int(prn[1:]) - 1
 
-        # get the lists with rise / set times as observed
-        # for dt_obs_rise, dt_obs_set in zip(dfTleVis.loc[prn]['obs_rise'], dfTleVis.loc[prn]['obs_set']):
-        #     ax.plot_date([dt_obs_rise, dt_obs_set], [y_prn, y_prn], linestyle='solid', color=prn_colors[y_prn], linewidth=2, marker='v', markersize=4, alpha=1)
-
         # get the lists with rise / set times by TLEs
         for tle_rise, tle_set, tle_cul in zip(dfTleVis.loc[prn]['tle_rise'],
                                               dfTleVis.loc[prn]['tle_set'],
                                               dfTleVis.loc[prn]['tle_cul']):
-            ax.plot_date([dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_rise),
-                          dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_set)],
-                         [y_prn, y_prn],
-                         linestyle='-',
-                         color=prn_colors[y_prn],
-                         linewidth=11,
-                         marker='|',
-                         markersize=16,
-                         alpha=0.3)
+            lst_visible.append((y_prn,
+                                dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_rise),
+                                dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_set)))
 
             # add a indicator for the culmination time of PRN
             if isinstance(tle_cul, dt.time):
-                ax.plot(dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_cul),
-                        y_prn,
-                        marker='^',
-                        markersize=13,
-                        alpha=0.3,
-                        color=prn_colors[y_prn])
-
-        # get the data for this particular PRN out of dfNavSig
-        dfPrnObs = dfNavSig[dfNavSig['PRN'] == prn]
-        ax.plot(dfPrnObs['DATE_TIME'],
-                [y_prn] * dfPrnObs.shape[0],
-                linestyle='',
-                marker='.',
-                markersize=6,
-                color=prn_colors[y_prn])
+                dt_cul.append(dt.datetime.combine(dfNavSig.DATE_TIME.iloc[0], tle_cul))
+                y_cul.append(y_prn)
+
+    dfPrnsObs = dfNavSig[dfNavSig['PRN'].isin(lst_PRNs)]
+    mAvail = plot_utils.availability_matrix(obs_epochs=dfPrnsObs['DATE_TIME'].values,
+                                            obs_rows=dfPrnsObs['PRN'].map({prn: int(prn[1:]) - 1 for prn in lst_PRNs}).to_numpy(dtype=np.int64),
+                                            nr_rows=max_prn,
+                                            lst_visible=lst_visible,
+                                            dt_start=dTime['start'],
+                                            dt_end=dTime['end'],
+                                            interval=dTime['interval'],
+                                            width_px=int(fig.get_figwidth() * plot_utils.DECIMATE_DPI),
+                                            obs_cnt=obs_cnt)
+
+    ax.imshow(plot_utils.availability_image(mAvail=mAvail, lst_colors=prn_colors),
+              aspect='auto',
+              interpolation='nearest',
+              origin='lower',
+              extent=[dates.date2num(dTime['start']), dates.date2num(dTime['end']), -0.5, max_prn - 0.5])
+    ax.xaxis_date()
+
+    ax.scatter(dt_cul, y_cul,
+               marker='^',
+               s=13 ** 2,
+               alpha=0.3,
+               c=[prn_colors[y_prn] for y_prn in y_cul])
 
     # format the date time ticks
     # ax.xaxis.set_major_locator(dates.DayLocator(interval=1))
@@ -551,33 +519,14 @@ def obstle_plot_arcs_prns(marker: str,
     return plt_name
 
 
-def plot_prn_navsig_obs(marker: str,
-                        dTime: dict,
-                        obsf: str,
-                        prn: str,
-                        dfPrnObst: pd.DataFrame,
-                        dfTleVisPrn: pd.DataFrame,
-                        df_PRNElev: pd.DataFrame,
+def prn_navsig_template(dTime: dict,
                         dfJam: pd.DataFrame,
-                        obst: str,
-                        posidx_gaps: list,
-                        snrth: float,
-                        show_plot: bool = False,
-                        logger: logging.Logger = None) -> str:
+                        obst: str) -> dict:
     """
-    plot_prn_navsig_obs plots for a given PRN the observation OBST for a navigation signal (with the exponential moving average)
+    prn_navsig_template creates the static layout of the plot of observable OBST per PRN (axes, time ticks, jamming scenario).
+    The PRN dependent data are drawn in the returned artists which are updated for each PRN
     """
-    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
-
-    amutils.logHeadTailDataFrame(df=dfPrnObst, dfName='dfPrnObst', callerName=cFuncName, logger=logger)
-    amutils.logHeadTailDataFrame(df=dfTleVisPrn, dfName='dfTleVisPrn', callerName=cFuncName, logger=logger)
-
-    # sys.exit(98)
-
-    # used markers
-    lst_markers = ['o', 'x', '+', '.', ',', 'v', '^', '<', '>', 's', 'd']
-    lst_colors, title_font = amutils.create_colormap_font(nrcolors=1, font_size=12)
-
+    dTempl = {}
     if obst[0] == 'S':  # more detailed plot for SNR analysis
         fig = plt.figure(figsize=(12, 7))
         gs = fig.add_gridspec(nrows=3, hspace=0.1, height_ratios=[8, 3, 1])
@@ -587,25 +536,22 @@ def plot_prn_navsig_obs(marker: str,
         fig = plt.figure(figsize=(9, 7))
         gs = fig.add_gridspec(nrows=2, hspace=0.1, height_ratios=[11, 1])
         axObst, axTLE = gs.subplots(sharex=True)
+        axSNR = None
 
-    # print('posidx_gaps = {}'.format(posidx_gaps))
-    # plot on axObst the curves, on axSNR difference with previous value (only for SNR) and TLE on axTLE
-    for plot_marker, color in zip(lst_markers[:1], lst_colors):
-        # go over the time intervals
-        for posidx_start, posidx_stop in zip(posidx_gaps[:-1], posidx_gaps[1:]):
-            dfTimeSegment = dfPrnObst.iloc[posidx_start:posidx_stop]
-            # print('dfTimeSegment = \n{}'.format(dfTimeSegment))
-
-            axObst.plot(dfTimeSegment['DATE_TIME'],
-                        dfTimeSegment[obst],
-                        linestyle='--', dashes=(1, 2), marker=plot_marker, markersize=2, color='blue')
-
-            if obst[0] == 'S':
-                axSNR.fill_between(dfTimeSegment['DATE_TIME'], -snrth, +snrth,
-                                   color='black', alpha=0.20, linestyle='-')
-                axSNR.plot(dfTimeSegment['DATE_TIME'],
-                           dfTimeSegment['d{obst:s}'.format(obst=obst)],
-                           linestyle='--', dashes=(1, 2), marker=plot_marker, markersize=2, color='blue')
+    dTempl['fig'] = fig
+    dTempl['axes'] = {'obst': axObst, 'snr': axSNR, 'tle': axTLE}
+
+    # the series are reduced to the minimum / maximum per pixel column of the figure
+    dTempl['width_px'] = int(fig.get_figwidth() * plot_utils.DECIMATE_DPI)
+
+    # the lines which are updated for each PRN
+    dTempl['lines'] = {}
+    dTempl['lines']['obst'], = axObst.plot([], [], linestyle='--', dashes=(1, 2), marker='o', markersize=2, color='blue')
+    if axSNR is not None:
+        dTempl['lines']['snr'], = axSNR.plot([], [], linestyle='--', dashes=(1, 2), marker='o', markersize=2, color='blue')
+
+    # artists specific for a PRN, removed before plotting the next PRN
+    dTempl['prn_artists'] = []
 
     # plot the SINR against time on second y-axis for the axPRNcnt plot
     if len(dfJam.index) > 0:
@@ -621,31 +567,11 @@ def plot_prn_navsig_obs(marker: str,
         axJam.set_ylim([jam_min, jam_max])
         axJam.set_ylabel('SINR [dB]')
 
-    # read in the timings for the TLE of this PRN
-    for tle_rise, tle_set, tle_cul in zip(dfTleVisPrn['tle_rise'], dfTleVisPrn['tle_set'], dfTleVisPrn['tle_cul']):
-        axTLE.plot_date([dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_rise),
-                         dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_set)],
-                        [1, 1],
-                        linestyle='-', linewidth=9, marker='')
-
-        # add a tick at culmination point
-        if isinstance(tle_cul, dt.time):
-            axTLE.plot(dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_cul),
-                       1,
-                       marker='v', markersize=14)
-
-    # print the elevation values at the according time
-    # ax.text(x=x_text_annotation, y=670000, s='Holiday in US', alpha=0.7, color='#334f8d')
-    for ind in df_PRNElev.index:
-        axTLE.text(x=df_PRNElev.loc[ind].DATE_TIME,
-                   y=1,
-                   s=df_PRNElev.loc[ind].elevation,
-                   horizontalalignment='center',
-                   fontweight='heavy',
-                   rotation='vertical')
-
     # create title
-    fig.suptitle('{marker:s}: {obst:s} for {prn:s} @ {dt:s} ({yyyy:04d}/{doy:03d})'.format(marker=marker, obst=obst, prn=prn, dt=dTime['date'].strftime('%d/%m/%Y'), yyyy=dTime['YYYY'], doy=dTime['DOY']))
+    dTempl['title'] = fig.suptitle('')
+
+    # the bounding box of the saved plot is determined at the first save
+    dTempl['bbox'] = 'tight'
 
     # beautify plot
     axObst.xaxis.grid(b=True, which='both')
@@ -659,14 +585,6 @@ def plot_prn_navsig_obs(marker: str,
         axSNR.yaxis.grid(b=True, which='both')
         axSNR.set_ylabel('d({snr:s})'.format(snr=obst))
 
-        # print(dfPrnObst)
-        # print(dfPrnObst['d{obst:s}'.format(obst=obst)])
-        # print(type(dfPrnObst['d{obst:s}'.format(obst=obst)]))
-        # print(dfPrnObst['d{obst:s}'.format(obst=obst)].abs())
-        # print('max = {}'.format(dfPrnObst['d{obst:s}'.format(obst=obst)].abs().max()))
-        ylim = max(3 * snrth, ceil(dfPrnObst['d{obst:s}'.format(obst=obst)].abs().max()))
-        axSNR.set_ylim([-ylim, +ylim])
-
     axTLE.xaxis.grid(b=True)
     axTLE.yaxis.grid(b=False)
     axTLE.tick_params(left=False)
@@ -693,23 +611,168 @@ def plot_prn_navsig_obs(marker: str,
         # tick.tick2line.set_markersize(0)
         tick.label1.set_horizontalalignment('center')
 
+    return dTempl
+
+
+def template_ylims(dTempl: dict) -> list:
+    """
+    template_ylims returns the limits of the y-axes of a template, which determine the width of the y tick labels
+    """
+    return [ax.get_ylim() for ax in dTempl['axes'].values() if ax is not None]
+
+
+def template_freeze(dTempl: dict):
+    """
+    template_freeze fixes the time ticks and the bounding box of a drawn template so that they are not recomputed for the next plots.
+    The bounding box is kept for the y-axes limits at which it was determined
+    """
+    fig = dTempl['fig']
+
+    for ax in dTempl['axes'].values():
+        if ax is not None:
+            ax.xaxis.set_major_locator(FixedLocator(ax.xaxis.get_majorticklocs()))
+            ax.xaxis.set_minor_locator(FixedLocator(ax.xaxis.get_minorticklocs()))
+
+    dTempl['bbox'] = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+    dTempl['ylims'] = template_ylims(dTempl=dTempl)
+
+
+def close_templates(dTemplates: dict):
+    """
+    close_templates closes the figures of the plot templates
+    """
+    for dTempl in dTemplates.values():
+        plt.close(dTempl['fig'])
+    dTemplates.clear()
+
+
+@am_profile.profile_func()
+def plot_prn_navsig_obs(marker: str,
+                        dTime: dict,
+                        obsf: str,
+                        prn: str,
+                        dfPrnObst: pd.DataFrame,
+                        dfTleVisPrn: pd.DataFrame,
+                        df_PRNElev: pd.DataFrame,
+                        dfJam: pd.DataFrame,
+                        obst: str,
+                        posidx_gaps: list,
+                        snrth: float,
+                        dTemplates: dict = None,
+                        show_plot: bool = False,
+                        logger: logging.Logger = None) -> str:
+    """
+    plot_prn_navsig_obs plots for a given PRN the observation OBST for a navigation signal (with the exponential moving average).
+    The figure layout per OBST is kept in dTemplates so that the plots for the next PRNs only update the data
+    """
+    cFuncName = colored(os.path.basename(__file__), 'yellow') + ' - ' + colored(sys._getframe().f_code.co_name, 'green')
+
+    amutils.logHeadTailDataFrame(df=dfPrnObst, dfName='dfPrnObst', callerName=cFuncName, logger=logger, level=logging.DEBUG, throttle=True)
+    amutils.logHeadTailDataFrame(df=dfTleVisPrn, dfName='dfTleVisPrn', callerName=cFuncName, logger=logger, level=logging.DEBUG, throttle=True)
+
+    # an interactive plot is not reused
+    if dTemplates is None or show_plot:
+        dTempl = prn_navsig_template(dTime=dTime, dfJam=dfJam, obst=obst)
+    else:
+        if obst not in dTemplates:
+            dTemplates[obst] = prn_navsig_template(dTime=dTime, dfJam=dfJam, obst=obst)
+        dTempl = dTemplates[obst]
+
+    fig = dTempl['fig']
+    axObst, axSNR, axTLE = dTempl['axes']['obst'], dTempl['axes']['snr'], dTempl['axes']['tle']
+
+    # remove the artists of the previous PRN
+    for artist in dTempl['prn_artists']:
+        artist.remove()
+    dTempl['prn_artists'] = []
+    axTLE.set_prop_cycle(None)
+
+    # print('posidx_gaps = {}'.format(posidx_gaps))
+    # plot on axObst the curves, on axSNR difference with previous value (only for SNR) and TLE on axTLE
+    # the time intervals are joined in one line, separated by a NaN value
+    lst_dt_obst, lst_obst, lst_dt_dsnr, lst_dsnr = [], [], [], []
+    for posidx_start, posidx_stop in zip(posidx_gaps[:-1], posidx_gaps[1:]):
+        dfTimeSegment = dfPrnObst.iloc[posidx_start:posidx_stop]
+        if dfTimeSegment.shape[0] == 0:
+            continue
+
+        # the number of pixel columns for this segment is proportional to its part of the day
+        seg_span = (dfTimeSegment['DATE_TIME'].iloc[-1] - dfTimeSegment['DATE_TIME'].iloc[0]) / max(dTime['end'] - dTime['start'], dt.timedelta(seconds=1))
+        seg_px = max(1, int(dTempl['width_px'] * seg_span))
+
+        dt_obst, obst_values = plot_utils.decimate_minmax(x=dfTimeSegment['DATE_TIME'], y=dfTimeSegment[obst], width_px=seg_px)
+        lst_dt_obst += [dt_obst, dt_obst[-1:]]
+        lst_obst += [obst_values, [np.nan]]
+
+        if obst[0] == 'S':
+            dTempl['prn_artists'].append(axSNR.fill_between([dfTimeSegment['DATE_TIME'].iloc[0], dfTimeSegment['DATE_TIME'].iloc[-1]], -snrth, +snrth,
+                                                            color='black', alpha=0.20, linestyle='-'))
+            dt_dsnr, dsnr_values = plot_utils.decimate_minmax(x=dfTimeSegment['DATE_TIME'], y=dfTimeSegment['d{obst:s}'.format(obst=obst)], width_px=seg_px)
+            lst_dt_dsnr += [dt_dsnr, dt_dsnr[-1:]]
+            lst_dsnr += [dsnr_values, [np.nan]]
+
+    dTempl['lines']['obst'].set_data(np.concatenate(lst_dt_obst) if len(lst_dt_obst) > 0 else [], np.concatenate(lst_obst) if len(lst_obst) > 0 else [])
+    if obst[0] == 'S':
+        dTempl['lines']['snr'].set_data(np.concatenate(lst_dt_dsnr) if len(lst_dt_dsnr) > 0 else [], np.concatenate(lst_dsnr) if len(lst_dsnr) > 0 else [])
+    else:
+        # adjust the y-axis to the observable of this PRN
+        axObst.relim()
+        axObst.autoscale_view(scalex=False)
+
+    # read in the timings for the TLE of this PRN
+    for tle_rise, tle_set, tle_cul in zip(dfTleVisPrn['tle_rise'], dfTleVisPrn['tle_set'], dfTleVisPrn['tle_cul']):
+        dTempl['prn_artists'] += axTLE.plot_date([dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_rise),
+                                                  dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_set)],
+                                                 [1, 1],
+                                                 linestyle='-', linewidth=9, marker='')
+
+        # add a tick at culmination point
+        if isinstance(tle_cul, dt.time):
+            dTempl['prn_artists'] += axTLE.plot(dt.datetime.combine(dfPrnObst.DATE_TIME.iloc[0], tle_cul),
+                                                1,
+                                                marker='v', markersize=14)
+
+    # print the elevation values at the according time
+    # ax.text(x=x_text_annotation, y=670000, s='Holiday in US', alpha=0.7, color='#334f8d')
+    for elev_time, elevation in zip(df_PRNElev['DATE_TIME'], df_PRNElev['elevation']):
+        dTempl['prn_artists'].append(axTLE.text(x=elev_time,
+                                                y=1,
+                                                s=elevation,
+                                                horizontalalignment='center',
+                                                fontweight='heavy',
+                                                rotation='vertical'))
+
+    # create title
+    dTempl['title'].set_text('{marker:s}: {obst:s} for {prn:s} @ {dt:s} ({yyyy:04d}/{doy:03d})'.format(marker=marker, obst=obst, prn=prn, dt=dTime['date'].strftime('%d/%m/%Y'), yyyy=dTime['YYYY'], doy=dTime['DOY']))
+
+    if obst.startswith('S'):  # SNR displayed
+        ylim = max(3 * snrth, ceil(dfPrnObst['d{obst:s}'.format(obst=obst)].abs().max()))
+        axSNR.set_ylim([-ylim, +ylim])
+
+    # the y tick labels of other y-axes limits may not fit the frozen bounding box
+    if dTempl['bbox'] != 'tight' and dTempl['ylims'] != template_ylims(dTempl=dTempl):
+        dTempl['bbox'] = 'tight'
+
     # save the plot in subdir png
     amutils.mkdir_p('png')
     for ext in ['png']:
         tmp_name = '{basen:s}-{obst:s}-{prn:s}.{ext:s}'.format(basen=os.path.basename(obsf).split('.')[0], ext=ext, obst=obst, prn=prn)
         plt_name = os.path.join('png', tmp_name)
         # print('plt_name = {}'.format(plt_name))
-        fig.savefig(plt_name, dpi=150, bbox_inches='tight', format=ext)
+        fig.savefig(plt_name, dpi=150, bbox_inches=dTempl['bbox'], format=ext)
         logger.info('{func:s}: created plot {plot:s}'.format(func=cFuncName, plot=colored(plt_name, 'green')))
 
     if show_plot:
         plt.show(block=True)
-    else:
+    elif dTemplates is None:
         plt.close(fig)
+    elif dTempl['bbox'] == 'tight':
+        template_freeze(dTempl=dTempl)
 
     return plt_name
 
 
+@am_profile.profile_func()
 def obstle_plot_gnss_obst(marker: str,
                           obsf: str,
                           dTime: dict,
@@ -740,20 +803,26 @@ def obstle_plot_gnss_obst(marker: str,
     # get the date of observations
     cur_date = dfNavSig.DATE_TIME.iloc[0]
 
+    # split the observations per PRN once instead of selecting the PRN for each obst
+    dfNavSigPRNs = dict(tuple(dfNavSig[['DATE_TIME', 'PRN'] + navsig_obst_lst].groupby('PRN', sort=False, observed=True)))
+    dfNoPRN = dfNavSig.iloc[:0]
+
     # plot per obst all PRN  for this navigation signal
     for obst in navsig_obst_lst:
         fig = plt.figure(figsize=(10, 7))
         gs = fig.add_gridspec(nrows=3, hspace=0.1, height_ratios=[9, 3, 3])
         axObst, axPRNcnt, axTLE = gs.subplots(sharex=True)
 
+        # the series are reduced to the minimum / maximum per pixel column of the figure
+        width_px = int(fig.get_figwidth() * plot_utils.DECIMATE_DPI)
+
         # retain only the current obst in dataframe
-        dfNavSigObst = dfNavSig[['DATE_TIME', 'PRN', obst]]
         for prn, prn_color in zip(lst_PRNs, lst_colors[:len(lst_PRNs)]):
-            dfNavSigObstPRN = dfNavSigObst[(dfNavSigObst['PRN'] == prn)]
-            amutils.logHeadTailDataFrame(df=dfNavSigObstPRN, dfName='dfNavSigObstPRN', callerName=cFuncName, logger=logger)
+            dfNavSigObstPRN = dfNavSigPRNs.get(prn, dfNoPRN)[['DATE_TIME', 'PRN', obst]]
+            amutils.logHeadTailDataFrame(df=dfNavSigObstPRN, dfName='dfNavSigObstPRN', callerName=cFuncName, logger=logger, level=logging.DEBUG, throttle=True)
 
-            axObst.plot(dfNavSigObstPRN['DATE_TIME'],
-                        dfNavSigObstPRN[obst],
+            dt_obst, obst_values = plot_utils.decimate_minmax(x=dfNavSigObstPRN['DATE_TIME'], y=dfNavSigObstPRN[obst], width_px=width_px)
+            axObst.plot(dt_obst, obst_values,
                         linestyle='--', dashes=(1, 2), marker='.', markersize=2,
                         color=prn_color, label=prn)
 
@@ -779,12 +848,14 @@ def obstle_plot_gnss_obst(marker: str,
                                marker='v', markersize=3, color=prn_color)
 
         # display the number of PRNs still observed
-        axPRNcnt.plot(dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt >= 4].DATE_TIME,
-                      dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt >= 4].PRNcnt,
+        axPRNcnt.plot(*plot_utils.decimate_minmax(x=dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt >= 4].DATE_TIME,
+                                                  y=dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt >= 4].PRNcnt,
+                                                  width_px=width_px),
                       color='green',
                       linestyle='', marker='.', markersize=2)
-        axPRNcnt.plot(dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt < 4].DATE_TIME,
-                      dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt < 4].PRNcnt,
+        axPRNcnt.plot(*plot_utils.decimate_minmax(x=dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt < 4].DATE_TIME,
+                                                  y=dfNavSigPRNcnt[dfNavSigPRNcnt.PRNcnt < 4].PRNcnt,
+                                                  width_px=width_px),
                       color='red',
                       linestyle='', marker='.', markersize=2)
 
@@ -336,7 +336,7 @@ def main_ubx2rnx3(argv):
     dRnx['nav3f'] = lst_rnx_files[1]
 
     # report to the user
-    logger.info('{func:s}: dRnx =\n{json!s}'.format(func=cFuncName, json=json.dumps(dRnx, sort_keys=False, indent=4, default=amutils.json_convertor)))
+    amutils.logJSON(callerName=cFuncName, title='dRnx =', dInfo=dRnx, logger=logger)
 
     # store the json structure
     jsonName = os.path.join(dRnx['dirs']['rnx'], '{scrname:s}.json'.format(scrname=os.path.splitext(os.path.basename(__file__))[0]))